@@ -0,0 +1,236 @@
+"""
+Scrittura di file dati e format file per il bulk copy di SQL Server (bcp / BULK INSERT).
+"""
+
+import struct
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+# Prefissi di lunghezza per i valori NULL (formato nativo)
+_NULL_PREFIX_1 = b'\xff'
+_NULL_PREFIX_8 = struct.pack('<q', -1)
+
+
+class BcpWriter:
+    """
+    Converte righe già convertite per SQL Server in un file dati bcp.
+    
+    Il file viene scritto in streaming (una riga alla volta) insieme a un
+    format file non XML che descrive i campi. Nel formato 'native' BIGINT,
+    FLOAT e BIT sono scritti in binario con prefisso di lunghezza di un
+    byte, VARBINARY come byte grezzi e tutti gli altri tipi come testo
+    UTF-16 con prefisso di 8 byte: nessun terminatore, quindi qualsiasi
+    valore è rappresentabile e SQL Server converte il testo nel tipo della
+    colonna. Nel formato 'char' tutti i campi sono testo UTF-16 separati da
+    terminatori: i valori che contengono un terminatore non sono ammessi e
+    le stringhe vuote vengono caricate come NULL.
+    
+    Non richiede una connessione: il caricamento (BULK INSERT o utility
+    bcp con `-f <format file>`) è a carico del chiamante.
+    """
+    
+    FORMAT_NATIVE = 'native'
+    FORMAT_CHAR = 'char'
+    FORMATS = (FORMAT_NATIVE, FORMAT_CHAR)
+    
+    # Versione del format file (SQL Server 2017+ e utility bcp 14+)
+    FORMAT_VERSION = '14.0'
+    
+    FIELD_TERMINATOR = '\t'
+    ROW_TERMINATOR = '\r\n'
+    
+    # Tipi SQL Server scritti in binario nel formato nativo -> (tipo host, prefisso, lunghezza)
+    NATIVE_TYPES = {
+        'bigint': ('SQLBIGINT', 1, 8),
+        'float': ('SQLFLT8', 1, 8),
+        'bit': ('SQLBIT', 1, 1),
+        'varbinary': ('SQLBINARY', 8, 0),
+        'binary': ('SQLBINARY', 8, 0),
+    }
+    
+    def __init__(
+        self,
+        columns: List[str],
+        column_types: Dict[str, Tuple[str, Optional[int]]],
+        data_format: str = FORMAT_NATIVE
+    ):
+        """
+        Inizializza il writer per un layout di colonne.
+        
+        Args:
+            columns: Colonne dei valori di ogni riga, nell'ordine delle tuple
+            column_types: Tutte le colonne della tabella di destinazione nel loro
+                ordine, column_name -> (data_type, character_maximum_length)
+                come restituito da SQLImporter.get_column_types
+            data_format: 'native' (default) o 'char'
+        
+        Raises:
+            ValueError: Se il formato non è supportato o una colonna non esiste
+        """
+        if data_format not in self.FORMATS:
+            raise ValueError(f"Unsupported bcp data format: {data_format}")
+        
+        table_columns = list(column_types)
+        missing = [col for col in columns if col not in column_types]
+        if missing:
+            raise ValueError(f"Columns not in target table: {', '.join(missing)}")
+        
+        self.columns = list(columns)
+        self.data_format = data_format
+        self._ordinals = [table_columns.index(col) + 1 for col in self.columns]
+        
+        if data_format == self.FORMAT_NATIVE:
+            self._fields = [
+                self.NATIVE_TYPES.get(column_types[col][0], ('SQLNCHAR', 8, 0))
+                for col in self.columns
+            ]
+            self._encoders = [self._native_encoder(host_type) for host_type, _, _ in self._fields]
+        else:
+            self._fields = [('SQLNCHAR', 0, 0)] * len(self.columns)
+            self._encoders = []
+    
+    def format_file(self) -> str:
+        """
+        Contenuto del format file non XML.
+        
+        Returns:
+            Testo del format file
+        """
+        lines = [self.FORMAT_VERSION, str(len(self.columns))]
+        last = len(self.columns) - 1
+        
+        for index, (col, ordinal, (host_type, prefix, length)) in enumerate(
+            zip(self.columns, self._ordinals, self._fields)
+        ):
+            if self.data_format == self.FORMAT_CHAR:
+                terminator = self.ROW_TERMINATOR if index == last else self.FIELD_TERMINATOR
+                terminator = _format_terminator(terminator)
+            else:
+                terminator = ''
+            # Il nome della colonna nel format file è solo descrittivo (conta l'ordinale)
+            name = ''.join('_' if ch.isspace() else ch for ch in col) or '_'
+            lines.append(
+                f'{index + 1}\t{host_type}\t{prefix}\t{length}\t"{terminator}"\t{ordinal}\t{name}\t""'
+            )
+        
+        return '\n'.join(lines) + '\n'
+    
+    def write_format_file(self, path: str):
+        """
+        Scrive il format file.
+        
+        Args:
+            path: Path del format file
+        """
+        with open(path, 'w', encoding='ascii', newline='\r\n') as f:
+            f.write(self.format_file())
+    
+    def encode_row(self, values: Tuple[Any, ...]) -> bytes:
+        """
+        Codifica una riga nel formato del file dati.
+        
+        Args:
+            values: Valori della riga nell'ordine di `columns`
+        
+        Returns:
+            Byte della riga
+        
+        Raises:
+            ValueError: Se un valore non è rappresentabile nel formato
+        """
+        if self.data_format == self.FORMAT_NATIVE:
+            try:
+                return b''.join([encode(value) for encode, value in zip(self._encoders, values)])
+            except (struct.error, TypeError, ValueError) as e:
+                raise ValueError(f"Value not representable in bcp native format: {str(e)}")
+        
+        fields = []
+        for col, value in zip(self.columns, values):
+            text = _to_text(value)
+            if self.FIELD_TERMINATOR in text or self.ROW_TERMINATOR in text:
+                raise ValueError(f"Value of column {col} contains a bcp terminator")
+            fields.append(text)
+        return (self.FIELD_TERMINATOR.join(fields) + self.ROW_TERMINATOR).encode('utf-16-le')
+    
+    def write_data_file(self, path: str, rows: Iterable[Tuple[Any, ...]]) -> int:
+        """
+        Scrive il file dati consumando le righe in streaming.
+        
+        Args:
+            path: Path del file dati
+            rows: Tuple di valori nell'ordine di `columns` (es. da TypeMapper.build_row_converter)
+        
+        Returns:
+            Numero di righe scritte
+        """
+        count = 0
+        encode_row = self.encode_row
+        with open(path, 'wb') as f:
+            write = f.write
+            for values in rows:
+                write(encode_row(values))
+                count += 1
+        return count
+    
+    @staticmethod
+    def _native_encoder(host_type: str) -> Callable[[Any], bytes]:
+        """Funzione di codifica di un campo nel formato nativo."""
+        if host_type == 'SQLBIGINT':
+            pack = struct.Struct('<q').pack
+            return lambda value: _NULL_PREFIX_1 if value is None else b'\x08' + pack(int(value))
+        if host_type == 'SQLFLT8':
+            pack = struct.Struct('<d').pack
+            return lambda value: _NULL_PREFIX_1 if value is None else b'\x08' + pack(float(value))
+        if host_type == 'SQLBIT':
+            return lambda value: _NULL_PREFIX_1 if value is None else (b'\x01\x01' if value else b'\x01\x00')
+        
+        pack_length = struct.Struct('<q').pack
+        if host_type == 'SQLBINARY':
+            def encode_binary(value):
+                if value is None:
+                    return _NULL_PREFIX_8
+                data = bytes(value)
+                return pack_length(len(data)) + data
+            return encode_binary
+        
+        def encode_text(value):
+            if value is None:
+                return _NULL_PREFIX_8
+            data = _to_text(value).encode('utf-16-le')
+            return pack_length(len(data)) + data
+        return encode_text
+
+
+def _to_text(value: Any) -> str:
+    """
+    Rappresentazione testuale di un valore convertibile da SQL Server.
+    
+    Args:
+        value: Valore convertito (str, numeri, bool, datetime, bytes o None)
+    
+    Returns:
+        Testo del valore ('' per None)
+    """
+    if value is None:
+        return ''
+    if type(value) is str:
+        return value
+    if type(value) is bool:
+        return '1' if value else '0'
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, (bytes, bytearray)):
+        return '0x' + bytes(value).hex()
+    if type(value) is float:
+        return repr(value)
+    return str(value)
+
+
+def _format_terminator(terminator: str) -> str:
+    """Terminatore UTF-16 nella notazione del format file (es. "\\t\\0")."""
+    escapes = {'\t': '\\t', '\r': '\\r', '\n': '\\n'}
+    return ''.join(escapes.get(ch, ch) + '\\0' for ch in terminator)
+
+
+__all__ = ['BcpWriter']
@@ -1,5 +1,5 @@
 ﻿from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 @dataclass
 class ConvexConfig:
@@ -7,6 +7,10 @@ class ConvexConfig:
     deploy_key: str
     tables: Optional[List[str]] = None
     table_mapping: Optional[Dict[str, str]] = None  # convex_table -> sql_table
+    table_options: Optional[Dict[str, Dict[str, Any]]] = None  # convex_table -> {option: value}
+    deployment_url: Optional[str] = None  # es. https://happy-animal-123.convex.cloud (default: ricavato dalla deploy key)
+    export_transport: str = "auto"  # "http" (API di export), "cli" (npx convex export) o "auto" (http con fallback al CLI)
+    export_mode: str = "snapshot"  # "snapshot" (backup ZIP) o "streaming" (list_snapshot + document_deltas)
     
     def __post_init__(self):
         if not self.app_name or not isinstance(self.app_name, str):
@@ -17,6 +21,45 @@ class ConvexConfig:
             raise ValueError("tables must be a list or None")
         if self.table_mapping is not None and not isinstance(self.table_mapping, dict):
             raise ValueError("table_mapping must be a dictionary or None")
+        if self.deployment_url is not None and (
+            not isinstance(self.deployment_url, str)
+            or not self.deployment_url.startswith(("http://", "https://"))
+        ):
+            raise ValueError("deployment_url must be an http(s) URL or None")
+        if self.export_transport not in ("auto", "http", "cli"):
+            raise ValueError("export_transport must be 'auto', 'http' or 'cli'")
+        if self.export_mode not in ("snapshot", "streaming"):
+            raise ValueError("export_mode must be 'snapshot' or 'streaming'")
+        if self.table_options is not None:
+            if not isinstance(self.table_options, dict):
+                raise ValueError("table_options must be a dictionary or None")
+            for table_name, options in self.table_options.items():
+                if not isinstance(options, dict):
+                    raise ValueError(f"table_options['{table_name}'] must be a dictionary")
+                sync_mode = options.get('sync_mode', 'full')
+                if sync_mode not in ('full', 'incremental'):
+                    raise ValueError(
+                        f"table_options['{table_name}'].sync_mode must be 'full' or 'incremental'"
+                    )
+                flatten = options.get('flatten', False)
+                if not isinstance(flatten, bool) and not (
+                    isinstance(flatten, list) and all(isinstance(path, str) and path for path in flatten)
+                ):
+                    raise ValueError(
+                        f"table_options['{table_name}'].flatten must be a boolean or a list of paths"
+                    )
+                insert_method = options.get('insert_method')
+                if insert_method not in (None, 'executemany', 'tvp', 'bcp'):
+                    raise ValueError(
+                        f"table_options['{table_name}'].insert_method must be 'executemany', 'tvp' or 'bcp'"
+                    )
+                child_tables = options.get('child_tables', [])
+                if not isinstance(child_tables, list) or not all(
+                    isinstance(path, str) and path for path in child_tables
+                ):
+                    raise ValueError(
+                        f"table_options['{table_name}'].child_tables must be a list of paths"
+                    )
     
     def get_sql_table_name(self, convex_table: str) -> str:
         """
@@ -25,19 +68,46 @@ class ConvexConfig:
         
         Args:
             convex_table: Nome tabella Convex
-            
+        
         Returns:
             Nome tabella SQL
         """
         if self.table_mapping and convex_table in self.table_mapping:
             return self.table_mapping[convex_table]
         return convex_table
+    
+    def get_table_option(self, convex_table: str, option: str, default: Any = None) -> Any:
+        """
+        Ottiene un'opzione di sync specifica di una tabella Convex.
+        
+        Args:
+            convex_table: Nome tabella Convex
+            option: Nome dell'opzione (es. 'sync_mode')
+            default: Valore se l'opzione non è configurata
+        
+        Returns:
+            Valore dell'opzione
+        """
+        if self.table_options and convex_table in self.table_options:
+            return self.table_options[convex_table].get(option, default)
+        return default
 
 @dataclass
 class SQLConfig:
     connection_string: str
     schema: str
     timeout: int = 30
+    fast_executemany: bool = True  # usato solo se il driver lo supporta
+    batch_rows: int = 5000  # righe massime per chunk di insert
+    batch_bytes: int = 16 * 1024 * 1024  # byte stimati massimi per chunk di insert
+    load_mode: str = "truncate"  # "truncate" o "swap" (staging + swap atomico)
+    pipeline_queue_size: int = 4  # batch decodificati in coda verso l'insert (0 = pipeline disattivata)
+    schema_inference: str = "full"  # tipi delle tabelle nuove da tutti i documenti ("full") o da un campione ("sample")
+    metadata_cache: bool = True  # catalogo di tabelle e colonne caricato una volta alla connessione
+    insert_method: str = "executemany"  # "executemany", "tvp" (un table-valued parameter per chunk) o "bcp" (BULK INSERT)
+    bulk_dir: Optional[str] = None  # directory dei file bcp (default: directory temporanea)
+    bulk_server_dir: Optional[str] = None  # bulk_dir vista da SQL Server, se diversa (es. share UNC)
+    dialect: str = "sqlserver"  # "sqlserver", "sqlite" o "duckdb" (connection_string = path del file)
     
     def __post_init__(self):
         if not self.connection_string or not isinstance(self.connection_string, str):
@@ -46,6 +116,28 @@ class SQLConfig:
             raise ValueError("schema must be a non-empty string")
         if not isinstance(self.timeout, int) or self.timeout <= 0:
             raise ValueError("timeout must be a positive integer")
+        if not isinstance(self.fast_executemany, bool):
+            raise ValueError("fast_executemany must be a boolean")
+        if not isinstance(self.batch_rows, int) or self.batch_rows <= 0:
+            raise ValueError("batch_rows must be a positive integer")
+        if not isinstance(self.batch_bytes, int) or self.batch_bytes <= 0:
+            raise ValueError("batch_bytes must be a positive integer")
+        if self.load_mode not in ("truncate", "swap"):
+            raise ValueError("load_mode must be 'truncate' or 'swap'")
+        if not isinstance(self.pipeline_queue_size, int) or self.pipeline_queue_size < 0:
+            raise ValueError("pipeline_queue_size must be a non-negative integer")
+        if self.schema_inference not in ("full", "sample"):
+            raise ValueError("schema_inference must be 'full' or 'sample'")
+        if not isinstance(self.metadata_cache, bool):
+            raise ValueError("metadata_cache must be a boolean")
+        if self.insert_method not in ("executemany", "tvp", "bcp"):
+            raise ValueError("insert_method must be 'executemany', 'tvp' or 'bcp'")
+        for name in ("bulk_dir", "bulk_server_dir"):
+            value = getattr(self, name)
+            if value is not None and (not isinstance(value, str) or not value):
+                raise ValueError(f"{name} must be a non-empty string or None")
+        if self.dialect not in ("sqlserver", "sqlite", "duckdb"):
+            raise ValueError("dialect must be 'sqlserver', 'sqlite' or 'duckdb'")
 
 @dataclass
 class EmailConfig:
@@ -84,6 +176,11 @@ class Config:
     log_dir: str = "logs"
     retry_attempts: int = 3
     retry_backoff: float = 2.0
+    state_dir: str = "state"
+    snapshot_cache_dir: Optional[str] = None  # directory della cache degli snapshot (None = cache disattivata)
+    snapshot_cache_max_bytes: int = 10 * 1024 * 1024 * 1024  # quota della cache, snapshot usati meno di recente eliminati
+    snapshot_cache_max_age: int = 0  # secondi entro cui uno snapshot in cache viene riusato (0 = sempre un export nuovo)
+    decode_workers: int = 0  # processi per la decodifica JSON dello snapshot (0 o 1 = nel processo corrente)
     
     def __post_init__(self):
         if not self.convex_apps or not isinstance(self.convex_apps, dict):
@@ -105,6 +202,18 @@ class Config:
             raise ValueError("retry_attempts must be a positive integer")
         if not isinstance(self.retry_backoff, (int, float)) or self.retry_backoff <= 0:
             raise ValueError("retry_backoff must be a positive number")
+        if not self.state_dir or not isinstance(self.state_dir, str):
+            raise ValueError("state_dir must be a non-empty string")
+        if self.snapshot_cache_dir is not None and (
+            not isinstance(self.snapshot_cache_dir, str) or not self.snapshot_cache_dir
+        ):
+            raise ValueError("snapshot_cache_dir must be a non-empty string or None")
+        if not isinstance(self.snapshot_cache_max_bytes, int) or self.snapshot_cache_max_bytes <= 0:
+            raise ValueError("snapshot_cache_max_bytes must be a positive integer")
+        if not isinstance(self.snapshot_cache_max_age, int) or self.snapshot_cache_max_age < 0:
+            raise ValueError("snapshot_cache_max_age must be a non-negative integer")
+        if not isinstance(self.decode_workers, int) or self.decode_workers < 0:
+            raise ValueError("decode_workers must be a non-negative integer")
 
 class ConfigurationError(Exception):
     pass
@@ -139,7 +248,11 @@ class ConfigurationManager:
                     app_name=app_name,
                     deploy_key=app_config.get('deploy_key', ''),
                     tables=app_config.get('tables'),
-                    table_mapping=app_config.get('table_mapping')
+                    table_mapping=app_config.get('table_mapping'),
+                    table_options=app_config.get('table_options'),
+                    deployment_url=app_config.get('deployment_url'),
+                    export_transport=app_config.get('export_transport', 'auto'),
+                    export_mode=app_config.get('export_mode', 'snapshot')
                 )
             
             sql_data = data.get('sql_server', {})
@@ -149,7 +262,18 @@ class ConfigurationManager:
             sql_config = SQLConfig(
                 connection_string=sql_data.get('connection_string', ''),
                 schema=sql_data.get('schema', ''),
-                timeout=sql_data.get('timeout', 30)
+                timeout=sql_data.get('timeout', 30),
+                fast_executemany=sql_data.get('fast_executemany', True),
+                batch_rows=sql_data.get('batch_rows', 5000),
+                batch_bytes=sql_data.get('batch_bytes', 16 * 1024 * 1024),
+                load_mode=sql_data.get('load_mode', 'truncate'),
+                pipeline_queue_size=sql_data.get('pipeline_queue_size', 4),
+                schema_inference=sql_data.get('schema_inference', 'full'),
+                metadata_cache=sql_data.get('metadata_cache', True),
+                insert_method=sql_data.get('insert_method', 'executemany'),
+                bulk_dir=sql_data.get('bulk_dir'),
+                bulk_server_dir=sql_data.get('bulk_server_dir'),
+                dialect=sql_data.get('dialect', 'sqlserver')
             )
             
             email_data = data.get('email', {})
@@ -172,11 +296,16 @@ class ConfigurationManager:
                 email=email_config,
                 log_dir=data.get('log_dir', 'logs'),
                 retry_attempts=data.get('retry_attempts', 3),
-                retry_backoff=data.get('retry_backoff', 2.0)
+                retry_backoff=data.get('retry_backoff', 2.0),
+                state_dir=data.get('state_dir', 'state'),
+                snapshot_cache_dir=data.get('snapshot_cache_dir'),
+                snapshot_cache_max_bytes=data.get('snapshot_cache_max_bytes', 10 * 1024 * 1024 * 1024),
+                snapshot_cache_max_age=data.get('snapshot_cache_max_age', 0),
+                decode_workers=data.get('decode_workers', 0)
             )
             
             return self._config
-            
+        
         except ValueError as e:
             raise ConfigurationError(f"Configuration validation failed: {e}")
         except KeyError as e:
@@ -2,14 +2,41 @@
 Convex client per scaricare backup.
 """
 
+import base64
+import collections
+import re
+import shutil
+import struct
 import subprocess
 import zipfile
 import json
 import os
 import tempfile
 import time
-from typing import Dict, List, Any, Optional, Callable
+import threading
+import zlib
+import requests
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Callable, Iterator, Tuple, Union
+from dataclasses import dataclass, field
 from datetime import datetime
+from src.profiling import NULL_PROFILER
+
+
+# Suffisso dei membri ZIP che contengono i documenti di una tabella
+DOCUMENTS_SUFFIX = '/documents.jsonl'
+
+# Trasporti di export: API HTTP del deployment, CLI di Convex o HTTP con fallback al CLI
+EXPORT_TRANSPORTS = ('auto', 'http', 'cli')
+
+# Suffisso del file in download (ripreso con richieste Range dopo un errore)
+PARTIAL_SUFFIX = '.partial'
+
+# Campi di sistema aggiunti dalle API di streaming export (assenti nei documenti dello ZIP)
+STREAMING_SYSTEM_FIELDS = ('_table', '_ts')
+
+# Path di npx usato dal CLI se presente (altrimenti npx dal PATH)
+NPX_PATH = r"C:\Program Files\nodejs\npx.cmd"
 
 
 class ConvexError(Exception):
@@ -17,6 +44,36 @@ class ConvexError(Exception):
     pass
 
 
+@dataclass
+class SnapshotTable:
+    """Membro documents.jsonl di una tabella, letto dalla central directory."""
+    name: str
+    member: str
+    crc: int
+    file_size: int
+    compress_size: int
+
+
+@dataclass
+class SnapshotManifest:
+    """
+    Contenuto di un backup ricavato dalla sola central directory dello ZIP.
+    
+    Le tabelle escluse dal filtro non vengono mai decompresse: i byte
+    corrispondenti sono riportati in skipped_bytes/skipped_compressed_bytes.
+    """
+    tables: Dict[str, SnapshotTable] = field(default_factory=dict)
+    missing_tables: List[str] = field(default_factory=list)
+    skipped_tables: List[str] = field(default_factory=list)
+    skipped_bytes: int = 0
+    skipped_compressed_bytes: int = 0
+    
+    @property
+    def selected_bytes(self) -> int:
+        """Byte non compressi delle tabelle selezionate."""
+        return sum(table.file_size for table in self.tables.values())
+
+
 def retry_with_backoff(
     func: Callable,
     max_attempts: int = 3,
@@ -64,31 +121,612 @@ def retry_with_backoff(
     raise last_exception
 
 
+def deployment_url_from_key(deploy_key: str) -> Optional[str]:
+    """
+    Ricava l'URL del deployment da una deploy key di produzione o sviluppo.
+    
+    Args:
+        deploy_key: Deploy key (formato: prod:happy-animal-123|token)
+    
+    Returns:
+        URL del deployment o None se la key non contiene il nome del deployment
+        (es. le preview key, per cui va configurato deployment_url)
+    """
+    prefix, separator, _ = deploy_key.partition('|')
+    parts = prefix.split(':')
+    if not separator or len(parts) != 2 or parts[0] not in ('prod', 'dev') or not parts[1]:
+        return None
+    return f"https://{parts[1]}.convex.cloud"
+
+
+def _snapshot_info(timestamp: Union[int, str]) -> Dict[str, str]:
+    """
+    Informazioni su uno snapshot a partire dal suo timestamp.
+    
+    Args:
+        timestamp: Timestamp dello snapshot in nanosecondi
+    
+    Returns:
+        Dizionario con timestamp e timestamp_formatted
+    """
+    info = {'timestamp': str(timestamp)}
+    try:
+        dt = datetime.fromtimestamp(int(timestamp) / 1_000_000_000)
+        info['timestamp_formatted'] = dt.strftime('%Y-%m-%d %H:%M:%S')
+    except (ValueError, OverflowError, OSError):
+        info['timestamp_formatted'] = str(timestamp)
+    return info
+
+
+def decode_json_lines(data: bytes) -> Tuple[List[Tuple[Tuple[str, ...], Tuple[Any, ...]]], float]:
+    """
+    Decodifica un blocco di righe JSONL (eseguita nei processi di decodifica).
+    
+    I documenti sono restituiti in forma compatta come coppie (chiavi, valori):
+    le tuple delle chiavi sono condivise tra i documenti con gli stessi campi,
+    quindi pickle le serializza una sola volta per blocco invece di ripetere i
+    nomi dei campi in ogni dict.
+    
+    Args:
+        data: Righe complete di un documents.jsonl (UTF-8)
+    
+    Returns:
+        Tupla (documenti compatti, secondi di CPU del processo)
+    """
+    cpu_start = time.process_time()
+    keysets = {}
+    documents = []
+    for line in data.split(b'\n'):
+        if not line.strip():
+            continue
+        document = json.loads(line)
+        keys = tuple(document)
+        documents.append((keysets.setdefault(keys, keys), tuple(document.values())))
+    return documents, time.process_time() - cpu_start
+
+
+def transform_json_lines(data: bytes, transform: Callable[[List[Dict[str, Any]]], Any]) -> Tuple[Any, int, float]:
+    """
+    Decodifica un blocco di righe JSONL e lo trasforma nello stesso processo.
+    
+    Usata da iter_table con `transform`: al processo principale torna solo
+    il risultato della trasformazione (es. righe già convertite nei valori
+    SQL) invece dei documenti da ricostruire.
+    
+    Args:
+        data: Righe complete di un documents.jsonl (UTF-8)
+        transform: Funzione picklable documenti del blocco -> risultato
+    
+    Returns:
+        Tupla (risultato di transform, documenti del blocco, secondi di CPU del processo)
+    """
+    cpu_start = time.process_time()
+    documents = [json.loads(line) for line in data.split(b'\n') if line.strip()]
+    return transform(documents), len(documents), time.process_time() - cpu_start
+
+
+def _remove_partial(output_path: str):
+    """
+    Rimuove il file parziale di un download, se presente.
+    
+    Args:
+        output_path: Path del file ZIP
+    """
+    partial_path = output_path + PARTIAL_SUFFIX
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+
+
+def verify_snapshot(zip_path: str, chunk_size: int = 1024 * 1024) -> List[Tuple[str, int, int]]:
+    """
+    Verifica l'integrità di un backup ZIP in un'unica passata in streaming.
+    
+    Legge la central directory e decomprime ogni membro a blocchi: il CRC32
+    viene controllato da zipfile alla fine di ciascun membro, senza estrarre
+    nulla su disco.
+    
+    Args:
+        zip_path: Path del file ZIP
+        chunk_size: Byte decompressi per lettura
+    
+    Returns:
+        Membri corrotti come (nome, offset iniziale, offset finale) dei byte
+        del membro nel file (header locale incluso); lista vuota se il backup è integro
+    
+    Raises:
+        ConvexError: Se la central directory non è leggibile
+    """
+    try:
+        zip_ref = zipfile.ZipFile(zip_path, 'r')
+    except (zipfile.BadZipFile, OSError) as e:
+        raise ConvexError(f"Central directory del backup non valida: {str(e)}")
+    
+    corrupt = []
+    with zip_ref:
+        infos = sorted(zip_ref.infolist(), key=lambda info: info.header_offset)
+        for index, info in enumerate(infos):
+            try:
+                with zip_ref.open(info, 'r') as member:
+                    while member.read(chunk_size):
+                        pass
+            except (zipfile.BadZipFile, zlib.error, EOFError, OSError):
+                # I byte del membro arrivano fino all'header successivo
+                # (o alla central directory per l'ultimo membro)
+                end = infos[index + 1].header_offset if index + 1 < len(infos) else zip_ref.start_dir
+                corrupt.append((info.filename, info.header_offset, end))
+    
+    return corrupt
+
+
+def intact_prefix(zip_path: str, chunk_size: int = 1024 * 1024) -> int:
+    """
+    Byte iniziali di un backup ZIP occupati da membri completi e integri.
+    
+    Non usa la central directory (che può mancare in un file troncato o
+    corrotto): scorre gli header locali dei membri e ne verifica il CRC32
+    decomprimendoli a blocchi. La scansione si ferma al primo membro
+    incompleto, corrotto o con dimensioni note solo dal data descriptor.
+    
+    Args:
+        zip_path: Path del file ZIP
+        chunk_size: Byte letti per blocco
+    
+    Returns:
+        Offset dell'header del primo membro non integro (0 = nessun membro integro)
+    """
+    offset = 0
+    with open(zip_path, 'rb') as f:
+        while True:
+            f.seek(offset)
+            header = f.read(30)
+            if len(header) < 30 or header[:4] != b'PK\x03\x04':
+                return offset
+            (flags, method, crc, compressed_size, name_length, extra_length) = (
+                struct.unpack('<6xHH4xII4xHH', header)
+            )
+            if flags & 0x08 or method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED) or compressed_size == 0xFFFFFFFF:
+                return offset
+            
+            data_start = offset + 30 + name_length + extra_length
+            f.seek(data_start)
+            decompressor = zlib.decompressobj(-15) if method == zipfile.ZIP_DEFLATED else None
+            remaining = compressed_size
+            value = 0
+            try:
+                while remaining:
+                    block = f.read(min(chunk_size, remaining))
+                    if not block:
+                        return offset
+                    remaining -= len(block)
+                    value = zlib.crc32(decompressor.decompress(block) if decompressor else block, value)
+                if decompressor:
+                    value = zlib.crc32(decompressor.flush(), value)
+            except zlib.error:
+                return offset
+            if value != crc:
+                return offset
+            offset = data_start + compressed_size
+
+
+def _truncate(path: str, size: int):
+    """Tronca un file a size byte (se esiste)."""
+    if os.path.exists(path):
+        with open(path, 'r+b') as f:
+            f.truncate(size)
+
+
+class HttpExportTransport:
+    """
+    Export di uno snapshot tramite le API HTTP del deployment.
+    
+    Stesso flusso di `npx convex export`, senza Node: richiesta dell'export,
+    polling dello stato con la query di sistema `_system/cli/exports:getLatest`
+    e download dello ZIP in streaming a blocchi, riprendibile con richieste Range
+    e verificato prima dell'uso.
+    """
+    
+    EXPORT_QUERY = '_system/cli/exports:getLatest'
+    
+    def __init__(
+        self,
+        deployment_url: str,
+        deploy_key: str,
+        poll_interval: float = 1.0,
+        timeout: float = 300,
+        chunk_size: int = 1024 * 1024,
+        request_timeout: float = 60,
+        session: Optional[requests.Session] = None
+    ):
+        """
+        Inizializza il trasporto HTTP.
+        
+        Args:
+            deployment_url: URL del deployment (es. https://happy-animal-123.convex.cloud)
+            deploy_key: Deploy key usata come admin key
+            poll_interval: Secondi tra due controlli dello stato dell'export
+            timeout: Secondi massimi di attesa del completamento dell'export
+            chunk_size: Byte letti per blocco durante il download
+            request_timeout: Timeout (secondi) di connessione e lettura delle singole richieste
+            session: Sessione requests opzionale (default: nuova sessione)
+        """
+        self.deployment_url = deployment_url.rstrip('/')
+        self.deploy_key = deploy_key
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.request_timeout = request_timeout
+        self.session = session or requests.Session()
+        self.session.headers['Authorization'] = f"Convex {deploy_key}"
+        # Snapshot in download e sua dimensione (per riprendere dopo un errore)
+        self.snapshot_ts: Optional[int] = None
+        self.total_bytes: Optional[int] = None
+    
+    def request_export(self):
+        """
+        Richiede un nuovo export dello snapshot (senza file storage).
+        
+        Raises:
+            ConvexError: Se il deployment rifiuta la richiesta
+        """
+        response = self.session.post(
+            f"{self.deployment_url}/api/export/request/zip",
+            params={'includeStorage': 'false'},
+            timeout=self.request_timeout
+        )
+        self._check_response(response, "richiesta dell'export")
+    
+    def latest_export(self) -> Optional[Dict[str, Any]]:
+        """
+        Stato dell'ultimo export del deployment.
+        
+        Returns:
+            Documento dell'export (state, start_ts, ...) o None se non esiste
+        
+        Raises:
+            ConvexError: Se la query fallisce
+        """
+        response = self.session.post(
+            f"{self.deployment_url}/api/query",
+            json={'path': self.EXPORT_QUERY, 'args': {}, 'format': 'json'},
+            timeout=self.request_timeout
+        )
+        self._check_response(response, "lettura dello stato dell'export")
+        
+        body = response.json()
+        if body.get('status') != 'success':
+            raise ConvexError(
+                f"Errore durante la lettura dello stato dell'export: {body.get('errorMessage', body)}"
+            )
+        return body.get('value')
+    
+    def wait_for_export(self) -> Dict[str, Any]:
+        """
+        Attende il completamento dell'ultimo export richiesto.
+        
+        Returns:
+            Documento dell'export completato
+        
+        Raises:
+            ConvexError: Se l'export fallisce o non termina entro il timeout
+        """
+        deadline = time.monotonic() + self.timeout
+        
+        while True:
+            export = self.latest_export()
+            state = export.get('state') if export else None
+            
+            if state == 'completed':
+                return export
+            if state == 'failed':
+                raise ConvexError("Export dello snapshot fallito sul deployment")
+            if state not in ('requested', 'in_progress'):
+                raise ConvexError(f"Stato dell'export non riconosciuto: {state}")
+            if time.monotonic() >= deadline:
+                raise ConvexError(f"Timeout durante l'export dello snapshot (> {self.timeout:g}s)")
+            
+            time.sleep(self.poll_interval)
+    
+    def download(
+        self,
+        snapshot_ts: int,
+        output_path: str,
+        progress: Optional[Callable[[int, Optional[int]], None]] = None
+    ) -> int:
+        """
+        Scarica lo ZIP di uno snapshot su disco a blocchi, in modo riprendibile.
+        
+        I byte vengono scritti in `<output_path>.partial`: se il file esiste già
+        (download precedente interrotto) viene chiesto solo il resto con una
+        richiesta Range. Terminato il download lo ZIP viene verificato
+        (central directory e CRC dei membri) e dei membri corrotti vengono
+        scaricati di nuovo solo i relativi byte; solo allora il file viene
+        rinominato in output_path. Se la central directory non è leggibile o
+        dei membri restano corrotti, il file parziale viene troncato
+        all'ultimo membro integro (vedi intact_prefix). Dopo un errore il file
+        parziale resta su disco e una nuova chiamata riprende da dove si era
+        interrotta.
+        
+        Args:
+            snapshot_ts: Timestamp dello snapshot (start_ts dell'export)
+            output_path: Path del file ZIP
+            progress: Callback opzionale (byte scaricati, byte totali o None)
+        
+        Returns:
+            Byte del file scaricato
+        
+        Raises:
+            ConvexError: Se il download fallisce o lo ZIP resta corrotto
+        """
+        url = f"{self.deployment_url}/api/export/zip/{snapshot_ts}"
+        partial_path = output_path + PARTIAL_SUFFIX
+        
+        size = self._fetch(url, partial_path, progress)
+        
+        try:
+            corrupt = verify_snapshot(partial_path, self.chunk_size)
+            if corrupt:
+                for _, range_start, range_end in corrupt:
+                    self._fetch_range(url, partial_path, range_start, range_end)
+                corrupt = verify_snapshot(partial_path, self.chunk_size)
+            if corrupt:
+                raise ConvexError(
+                    f"Snapshot corrotto dopo il download: {', '.join(name for name, _, _ in corrupt)}"
+                )
+        except ConvexError:
+            # Senza troncamento il file risulterebbe già completo e un nuovo
+            # tentativo non scaricherebbe nulla: si riprende dall'ultimo membro integro
+            _truncate(partial_path, intact_prefix(partial_path, self.chunk_size))
+            raise
+        
+        os.replace(partial_path, output_path)
+        return size
+    
+    def _fetch(
+        self,
+        url: str,
+        partial_path: str,
+        progress: Optional[Callable[[int, Optional[int]], None]] = None
+    ) -> int:
+        """
+        Completa il file parziale a partire dalla sua dimensione attuale.
+        
+        Args:
+            url: URL dello ZIP
+            partial_path: Path del file parziale
+            progress: Callback opzionale del download
+        
+        Returns:
+            Byte del file completo
+        
+        Raises:
+            ConvexError: Se il server risponde con un errore o il file è incompleto
+        """
+        offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        if self.total_bytes is not None and offset == self.total_bytes:
+            return offset
+        
+        headers = {'Range': f"bytes={offset}-"} if offset else {}
+        with self.session.get(url, headers=headers, stream=True, timeout=self.request_timeout) as response:
+            content_range = re.match(
+                r'bytes (\d+)-\d+/(\d+|\*)', response.headers.get('Content-Range', '')
+            )
+            if response.status_code == 206 and not (content_range and int(content_range.group(1)) == offset):
+                # Byte diversi da quelli richiesti: il file parziale non è più
+                # affidabile e il prossimo tentativo riparte da zero
+                _truncate(partial_path, 0)
+                raise ConvexError(
+                    f"Risposta parziale non valida per l'offset {offset}: "
+                    f"Content-Range {response.headers.get('Content-Range')!r}"
+                )
+            if response.status_code == 206:
+                total = content_range.group(2)
+                total = int(total) if total != '*' else None
+                mode = 'ab'
+            else:
+                # Range non supportato: si riparte da zero
+                self._check_response(response, "download dello snapshot")
+                total = response.headers.get('Content-Length')
+                total = int(total) if total else None
+                offset = 0
+                mode = 'wb'
+            self.total_bytes = total
+            
+            downloaded = offset
+            with open(partial_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    f.write(chunk)
+                    downloaded += len(chunk)
+                    if progress:
+                        progress(downloaded, total)
+        
+        if total is not None and downloaded != total:
+            raise ConvexError(
+                f"Download dello snapshot incompleto: {downloaded} di {total} byte"
+            )
+        return downloaded
+    
+    def _fetch_range(self, url: str, partial_path: str, start: int, end: int):
+        """
+        Scarica di nuovo i byte [start, end) e li sovrascrive nel file parziale.
+        
+        Args:
+            url: URL dello ZIP
+            partial_path: Path del file parziale
+            start: Offset iniziale
+            end: Offset finale (escluso)
+        
+        Raises:
+            ConvexError: Se il server non restituisce esattamente l'intervallo richiesto
+        """
+        with self.session.get(
+            url, headers={'Range': f"bytes={start}-{end - 1}"}, stream=True, timeout=self.request_timeout
+        ) as response:
+            self._check_response(response, "download dei byte corrotti")
+            content_range = re.match(r'bytes (\d+)-(\d+)/', response.headers.get('Content-Range', ''))
+            if (
+                response.status_code != 206
+                or not content_range
+                or (int(content_range.group(1)), int(content_range.group(2)) + 1) != (start, end)
+            ):
+                raise ConvexError(
+                    f"Intervallo {start}-{end - 1} dello snapshot non disponibile (HTTP {response.status_code})"
+                )
+            
+            written = 0
+            with open(partial_path, 'r+b') as f:
+                f.seek(start)
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    chunk = chunk[:end - start - written]
+                    f.write(chunk)
+                    written += len(chunk)
+        
+        if written != end - start:
+            raise ConvexError(
+                f"Intervallo {start}-{end - 1} dello snapshot incompleto: {written} di {end - start} byte"
+            )
+    
+    def export(
+        self,
+        output_path: str,
+        progress: Optional[Callable[[int, Optional[int]], None]] = None
+    ) -> Dict[str, str]:
+        """
+        Richiede un export, ne attende il completamento e scarica lo ZIP.
+        
+        Lo snapshot completato viene ricordato: se il download fallisce, una
+        nuova chiamata riprende il download dello stesso snapshot senza
+        richiedere un altro export.
+        
+        Args:
+            output_path: Path del file ZIP
+            progress: Callback opzionale del download
+        
+        Returns:
+            Informazioni sullo snapshot (timestamp, timestamp_formatted)
+        """
+        if self.snapshot_ts is None:
+            # Un file parziale di un altro snapshot non è riprendibile
+            _remove_partial(output_path)
+            
+            self.request_export()
+            export = self.wait_for_export()
+            self.snapshot_ts = self._int64(export['start_ts'])
+            self.total_bytes = None
+        
+        self.download(self.snapshot_ts, output_path, progress)
+        return _snapshot_info(self.snapshot_ts)
+    
+    @staticmethod
+    def _int64(value: Any) -> int:
+        """Intero Int64 restituito dalla query (numero o {"$integer": <base64>})."""
+        if isinstance(value, dict) and '$integer' in value:
+            return int.from_bytes(base64.b64decode(value['$integer']), 'little', signed=True)
+        return int(value)
+    
+    @staticmethod
+    def _check_response(response: requests.Response, operation: str):
+        """
+        Solleva ConvexError per le risposte HTTP non riuscite.
+        
+        Args:
+            response: Risposta HTTP
+            operation: Descrizione dell'operazione (per il messaggio di errore)
+        """
+        if response.status_code >= 400:
+            raise ConvexError(
+                f"Errore durante {operation}: HTTP {response.status_code} {response.text[:500]}"
+            )
+
+
 class ConvexClient:
     """
     Client semplificato per scaricare backup da Convex.
     
-    Usa il CLI di Convex (npx convex export) per scaricare i backup.
+    Scarica i backup con le API HTTP di export del deployment
+    (HttpExportTransport) oppure con il CLI di Convex (npx convex export),
+    usato anche come fallback quando l'export HTTP non è disponibile.
+    
+    In alternativa allo snapshot ZIP, iter_snapshot e iter_document_deltas
+    leggono i documenti a pagine con le API di streaming export
+    (list_snapshot e document_deltas): dopo il primo caricamento vengono
+    trasferiti solo i documenti modificati o eliminati.
     """
     
-    def __init__(self, deploy_key: str, logger=None):
+    # Documenti decodificati per blocco da iter_table senza batch_size
+    DECODE_BLOCK_SIZE = 256
+    # Byte di documents.jsonl inviati a ogni processo di decodifica (decode_workers > 1)
+    DECODE_CHUNK_BYTES = 4 * 1024 * 1024
+    
+    def __init__(
+        self,
+        deploy_key: str,
+        logger=None,
+        profiler=None,
+        deployment_url: Optional[str] = None,
+        transport: str = 'auto',
+        progress: Optional[Callable[[int, Optional[int]], None]] = None,
+        cache=None,
+        decode_workers: int = 0
+    ):
         """
         Inizializza il client Convex.
         
         Args:
             deploy_key: Deploy key di Convex (formato: preview:team:project|token)
             logger: Logger opzionale per registrare le operazioni
+            profiler: Profiler opzionale per i tempi di export, manifest e decodifica
+            deployment_url: URL del deployment per l'export HTTP (default: ricavato dalla deploy key)
+            transport: 'http', 'cli' o 'auto' (HTTP con fallback al CLI)
+            progress: Callback opzionale del download HTTP (byte scaricati, byte totali o None)
+            cache: SnapshotCache opzionale degli snapshot scaricati
+            decode_workers: Processi per la decodifica JSON delle tabelle dello
+                snapshot (0 o 1 = decodifica nel processo corrente)
         """
+        if transport not in EXPORT_TRANSPORTS:
+            raise ValueError(f"Unsupported export transport: {transport}")
+        
         self.deploy_key = deploy_key
         self.logger = logger
+        self.profiler = profiler or NULL_PROFILER
+        self.deployment_url = deployment_url or deployment_url_from_key(deploy_key)
+        self.transport = transport
+        self.progress = progress
+        self.cache = cache
+        # Informazioni sull'ultimo snapshot scaricato o letto dalla cache
+        self.snapshot_info: Dict[str, str] = {}
+        # Streaming export: snapshot letto per tabella (le riletture vedono gli
+        # stessi documenti) e cursore delle modifiche dopo l'ultima pagina letta
+        self.snapshot_timestamps: Dict[str, int] = {}
+        self.delta_cursors: Dict[str, int] = {}
+        self._session: Optional[requests.Session] = None
+        self.decode_workers = decode_workers
+        self._decode_pool: Optional[ProcessPoolExecutor] = None
+        self._decode_pool_lock = threading.Lock()
+    
+    def close(self):
+        """Termina i processi di decodifica, se avviati."""
+        with self._decode_pool_lock:
+            if self._decode_pool is not None:
+                self._decode_pool.shutdown(cancel_futures=True)
+                self._decode_pool = None
     
     def download_backup(self, output_path: Optional[str] = None, max_retries: int = 3) -> str:
         """
         Scarica un backup da Convex con retry automatico.
         
+        Con transport='auto' l'export HTTP viene tentato per primo; se fallisce
+        dopo tutti i retry (o l'URL del deployment non è noto) si usa il CLI.
+        
+        Con una cache, uno snapshot non più vecchio di cache.max_age viene
+        riusato senza esportarne uno nuovo; gli snapshot scaricati vengono
+        spostati nella cache e il path restituito è quello in cache (il
+        chiamante non deve eliminarlo, vedi SnapshotCache.contains). Uno
+        snapshot di cui non è noto il timestamp non entra nella cache: il
+        path restituito è un file temporaneo da eliminare dopo l'uso.
+        
         Args:
             output_path: Path dove salvare il backup ZIP (default: temp file)
-            max_retries: Numero massimo di tentativi (default: 3)
+            max_retries: Numero massimo di tentativi per trasporto (default: 3)
         
         Returns:
             Path del file ZIP scaricato
@@ -96,69 +734,165 @@ class ConvexClient:
         Raises:
             ConvexError: Se il download fallisce dopo tutti i retry
         """
-        def _download():
-            # Usa un file temporaneo se non specificato
-            nonlocal output_path
-            if output_path is None:
-                temp_dir = tempfile.gettempdir()
-                output_path = os.path.join(
-                    temp_dir, 
-                    f"convex_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                )
-            
-            # Imposta la variabile d'ambiente con la deploy key
-            env = os.environ.copy()
-            env['CONVEX_DEPLOY_KEY'] = self.deploy_key
-            
-            # Esegui il comando convex export
-            result = subprocess.run(
-                [r"C:\Program Files\nodejs\npx.cmd", "convex", "export", "--path", output_path],
-                env=env,
-                capture_output=True,
-                text=True,
-                timeout=300,  # 5 minuti
-                shell=False  # Cambiato da True a False per sicurezza
+        self.snapshot_info = {}
+        if self.cache is not None:
+            cached_path = self.cache.find(self.deploy_key)
+            if cached_path:
+                snapshot_ts = self.cache.FILE_PATTERN.match(os.path.basename(cached_path)).group(2)
+                self.snapshot_info = _snapshot_info(snapshot_ts)
+                if self.logger:
+                    self.logger.info(f"Using cached snapshot: {cached_path}")
+                print(f"  Using cached snapshot: {self.snapshot_info['timestamp_formatted']}")
+                return cached_path
+        
+        # Usa un file temporaneo se non specificato: entra nella cache solo
+        # con il timestamp dello snapshot noto (vedi SnapshotCache.put)
+        if output_path is None:
+            output_path = os.path.join(
+                tempfile.gettempdir(),
+                f"convex_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             )
-            
-            # Parse l'output per estrarre informazioni sul backup
-            snapshot_info = self._parse_export_output(result.stdout, result.stderr)
-            
-            # Log dell'output del comando (contiene info sul backup scaricato)
-            if self.logger:
-                if snapshot_info:
-                    self.logger.info(f"Snapshot info: timestamp={snapshot_info.get('timestamp', 'N/A')}, url={snapshot_info.get('url', 'N/A')}")
-                if result.stdout:
-                    self.logger.info(f"Convex export output:\n{result.stdout}")
-                if result.stderr:
-                    self.logger.info(f"Convex export details:\n{result.stderr}")
-            
-            # Mostra info sul backup nella console
-            if snapshot_info:
-                timestamp_display = snapshot_info.get('timestamp_formatted', snapshot_info.get('timestamp', 'N/A'))
-                print(f"  Snapshot created: {timestamp_display}")
-                if snapshot_info.get('url'):
-                    print(f"  Dashboard: {snapshot_info.get('url')}")
-            
-            if result.returncode != 0:
+        
+        transports = self._export_transports()
+        
+        with self.profiler.span('convex.export') as span:
+            for index, transport in enumerate(transports):
+                if transport == 'http':
+                    # Stesso trasporto per tutti i tentativi: un retry riprende il
+                    # download dello snapshot già esportato dai byte mancanti
+                    http = HttpExportTransport(self.deployment_url, self.deploy_key)
+                    export = lambda: self._export_with_http(output_path, http)
+                else:
+                    export = lambda: self._export_with_cli(output_path)
+                try:
+                    path = retry_with_backoff(export, max_attempts=max_retries, logger=self.logger)
+                    break
+                except Exception as e:
+                    if transport == 'http':
+                        _remove_partial(output_path)
+                    if index < len(transports) - 1:
+                        if self.logger:
+                            self.logger.warning(f"HTTP export failed, falling back to Convex CLI: {e}")
+                        print(f"  ⚠ HTTP export failed, falling back to Convex CLI")
+                        continue
+                    if isinstance(e, ConvexError):
+                        raise
+                    if isinstance(e, subprocess.TimeoutExpired):
+                        raise ConvexError("Timeout durante il download del backup (> 5 minuti)")
+                    raise ConvexError(f"Errore durante il download: {str(e)}")
+            span.add(bytes=os.path.getsize(path))
+        
+        timestamp = self.snapshot_info.get('timestamp')
+        if self.cache is not None and timestamp:
+            path = self.cache.put(self.deploy_key, int(timestamp), path)
+        return path
+    
+    def _export_transports(self) -> List[str]:
+        """
+        Trasporti da tentare in ordine.
+        
+        Returns:
+            Lista di 'http' e/o 'cli'
+        
+        Raises:
+            ConvexError: Se transport='http' e l'URL del deployment non è noto
+        """
+        if self.transport == 'cli':
+            return ['cli']
+        if self.deployment_url is None:
+            if self.transport == 'http':
                 raise ConvexError(
-                    f"Errore durante il download del backup: {result.stderr}"
+                    "URL del deployment non ricavabile dalla deploy key: configurare deployment_url"
                 )
-            
-            # Verifica che il file esista
-            if not os.path.exists(output_path):
-                raise ConvexError(f"File backup non trovato: {output_path}")
-            
-            return output_path
+            return ['cli']
+        return ['http'] if self.transport == 'http' else ['http', 'cli']
+    
+    def _export_with_http(self, output_path: str, transport: HttpExportTransport) -> str:
+        """
+        Scarica il backup con le API HTTP di export del deployment.
         
-        # Usa retry con backoff
-        try:
-            return retry_with_backoff(_download, max_attempts=max_retries, logger=self.logger)
-        except subprocess.TimeoutExpired:
-            raise ConvexError("Timeout durante il download del backup (> 5 minuti)")
-        except Exception as e:
-            if isinstance(e, ConvexError):
-                raise
-            raise ConvexError(f"Errore durante il download: {str(e)}")
+        Args:
+            output_path: Path del file ZIP
+            transport: Trasporto HTTP (mantiene lo snapshot tra i tentativi)
+        
+        Returns:
+            Path del file ZIP scaricato
+        """
+        snapshot_info = transport.export(output_path, self.progress)
+        self._report_snapshot(snapshot_info)
+        return output_path
+    
+    def _export_with_cli(self, output_path: str) -> str:
+        """
+        Scarica il backup con il CLI di Convex (npx convex export).
+        
+        Args:
+            output_path: Path del file ZIP
+        
+        Returns:
+            Path del file ZIP scaricato
+        """
+        # Imposta la variabile d'ambiente con la deploy key
+        env = os.environ.copy()
+        env['CONVEX_DEPLOY_KEY'] = self.deploy_key
+        npx = NPX_PATH if os.path.exists(NPX_PATH) else shutil.which('npx') or NPX_PATH
+        
+        # Esegui il comando convex export
+        result = subprocess.run(
+            [npx, "convex", "export", "--path", output_path],
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=300,  # 5 minuti
+            shell=False  # Cambiato da True a False per sicurezza
+        )
+        
+        # Parse l'output per estrarre informazioni sul backup
+        snapshot_info = self._parse_export_output(result.stdout, result.stderr)
+        
+        # Log dell'output del comando (contiene info sul backup scaricato)
+        if self.logger:
+            if result.stdout:
+                self.logger.info(f"Convex export output:\n{result.stdout}")
+            if result.stderr:
+                self.logger.info(f"Convex export details:\n{result.stderr}")
+        self._report_snapshot(snapshot_info)
+        
+        if result.returncode != 0:
+            raise ConvexError(
+                f"Errore durante il download del backup: {result.stderr}"
+            )
+        
+        # Verifica che il file esista e sia integro
+        if not os.path.exists(output_path):
+            raise ConvexError(f"File backup non trovato: {output_path}")
+        corrupt = verify_snapshot(output_path)
+        if corrupt:
+            raise ConvexError(
+                f"Snapshot corrotto: {', '.join(name for name, _, _ in corrupt)}"
+            )
+        
+        return output_path
+    
+    def _report_snapshot(self, snapshot_info: Dict[str, str]):
+        """
+        Registra e mostra le informazioni sullo snapshot scaricato.
+        
+        Args:
+            snapshot_info: Informazioni sul backup (timestamp, url, etc.)
+        """
+        if not snapshot_info:
+            return
+        
+        self.snapshot_info = snapshot_info
+        if self.logger:
+            self.logger.info(f"Snapshot info: timestamp={snapshot_info.get('timestamp', 'N/A')}, url={snapshot_info.get('url', 'N/A')}")
+        
+        # Mostra info sul backup nella console
+        timestamp_display = snapshot_info.get('timestamp_formatted', snapshot_info.get('timestamp', 'N/A'))
+        print(f"  Snapshot created: {timestamp_display}")
+        if snapshot_info.get('url'):
+            print(f"  Dashboard: {snapshot_info.get('url')}")
     
     def _parse_export_output(self, stdout: str, stderr: str) -> Dict[str, str]:
         """
@@ -174,24 +908,13 @@ class ConvexClient:
         info = {}
         
         # Cerca timestamp nel stderr (formato: "Created snapshot export at timestamp 1766487443024722602")
-        import re
-        
         combined_output = stdout + "\n" + stderr
         
         # Cerca timestamp
         timestamp_match = re.search(r'timestamp\s+(\d+)', combined_output)
         if timestamp_match:
-            timestamp_raw = timestamp_match.group(1)
-            info['timestamp'] = timestamp_raw
-            
-            # Converti timestamp (sembra essere in nanosecondi)
-            try:
-                # Prova a convertire da nanosecondi a secondi
-                timestamp_seconds = int(timestamp_raw) / 1_000_000_000
-                dt = datetime.fromtimestamp(timestamp_seconds)
-                info['timestamp_formatted'] = dt.strftime('%Y-%m-%d %H:%M:%S')
-            except:
-                info['timestamp_formatted'] = timestamp_raw
+            # Timestamp in nanosecondi
+            info.update(_snapshot_info(timestamp_match.group(1)))
         
         # Cerca URL dashboard
         url_match = re.search(r'https://dashboard\.convex\.dev/[^\s]+', combined_output)
@@ -200,50 +923,570 @@ class ConvexClient:
         
         return info
     
-    def extract_backup(self, zip_path: str, extract_dir: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    def _streaming_get(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Estrae e legge i dati da un backup ZIP di Convex.
+        Richiesta GET a un'API di streaming export del deployment, con retry.
         
         Args:
-            zip_path: Path del file ZIP del backup
-            extract_dir: Directory dove estrarre (default: temp dir)
+            endpoint: Endpoint sotto /api (es. 'list_snapshot')
+            params: Parametri della query string
         
         Returns:
-            Dizionario {table_name: [records]}
+            Risposta JSON
         
         Raises:
-            ConvexError: Se l'estrazione fallisce
+            ConvexError: Se l'URL del deployment non è noto o la richiesta fallisce
         """
-        if extract_dir is None:
-            extract_dir = tempfile.mkdtemp(prefix="convex_extract_")
+        if self.deployment_url is None:
+            raise ConvexError(
+                "URL del deployment non ricavabile dalla deploy key: configurare deployment_url"
+            )
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.headers['Authorization'] = f"Convex {self.deploy_key}"
+        
+        def _get():
+            response = self._session.get(
+                f"{self.deployment_url.rstrip('/')}/api/{endpoint}", params=params, timeout=60
+            )
+            HttpExportTransport._check_response(response, f"lettura di {endpoint}")
+            return response.json()
         
         try:
-            tables_data = {}
+            return retry_with_backoff(_get, logger=self.logger)
+        except ConvexError:
+            raise
+        except Exception as e:
+            raise ConvexError(f"Errore durante la lettura di {endpoint}: {str(e)}")
+    
+    def list_streaming_tables(self) -> List[str]:
+        """
+        Elenca le tabelle del deployment con le API di streaming export.
+        
+        Returns:
+            Nomi delle tabelle (ordine alfabetico)
+        
+        Raises:
+            ConvexError: Se la richiesta fallisce
+        """
+        schemas = self._streaming_get('json_schemas', {'deltaSchema': 'true', 'format': 'json'})
+        return sorted(schemas)
+    
+    def _iter_pages(
+        self,
+        endpoint: str,
+        table_name: str,
+        params: Dict[str, Any],
+        on_page: Callable[[Dict[str, Any]], None],
+        batch_size: Optional[int]
+    ) -> Iterator[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+        """
+        Documenti delle pagine di list_snapshot o document_deltas.
+        
+        Il tempo di richiesta e decodifica (escluso il lavoro del consumatore)
+        viene accumulato nella fase 'convex.stream' del profiler.
+        
+        Args:
+            endpoint: 'list_snapshot' o 'document_deltas'
+            table_name: Nome della tabella Convex
+            params: Parametri della prima pagina
+            on_page: Callback con la risposta di ogni pagina, chiamata prima di
+                restituirne i documenti; restituisce i parametri della pagina successiva
+            batch_size: Se indicato, restituisce liste di documenti (una per pagina
+                o più piccole) invece dei singoli documenti
+        
+        Yields:
+            Documenti (dict) oppure batch di documenti (list di dict)
+        """
+        has_more = True
+        while has_more:
+            wall_start, cpu_start = time.perf_counter(), time.thread_time()
+            page = self._streaming_get(endpoint, {'tableName': table_name, 'format': 'json', **params})
+            documents = []
+            for value in page.get('values', []):
+                for field_name in STREAMING_SYSTEM_FIELDS:
+                    value.pop(field_name, None)
+                documents.append(value)
+            self.profiler.record(
+                'convex.stream',
+                time.perf_counter() - wall_start,
+                time.thread_time() - cpu_start,
+                rows=len(documents),
+                table=table_name,
+                endpoint=endpoint
+            )
+            params = on_page(page)
+            has_more = bool(page.get('hasMore'))
             
+            if batch_size is None:
+                yield from documents
+            else:
+                for start in range(0, len(documents), batch_size):
+                    yield documents[start:start + batch_size]
+    
+    def iter_snapshot(
+        self,
+        table_name: str,
+        batch_size: Optional[int] = None
+    ) -> Iterator[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+        """
+        Legge tutti i documenti di una tabella con l'API list_snapshot, a pagine.
+        
+        La prima lettura fissa lo snapshot della tabella in
+        snapshot_timestamps: le letture successive (es. inferenza dello schema
+        e caricamento) restituiscono gli stessi documenti, e il timestamp è il
+        cursore da cui leggere le modifiche con iter_document_deltas.
+        
+        Args:
+            table_name: Nome della tabella Convex
+            batch_size: Se indicato, restituisce batch di documenti (vedi iter_table)
+        
+        Yields:
+            Documenti (dict) oppure batch di documenti (list di dict)
+        
+        Raises:
+            ConvexError: Se la lettura fallisce
+        """
+        params = {}
+        if table_name in self.snapshot_timestamps:
+            params['snapshot'] = self.snapshot_timestamps[table_name]
+        
+        def next_page(page):
+            self.snapshot_timestamps[table_name] = page['snapshot']
+            return {'snapshot': page['snapshot'], 'cursor': page['cursor']}
+        
+        return self._iter_pages('list_snapshot', table_name, params, next_page, batch_size)
+    
+    def iter_document_deltas(
+        self,
+        table_name: str,
+        cursor: int,
+        batch_size: Optional[int] = None
+    ) -> Iterator[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+        """
+        Legge i documenti modificati o eliminati di una tabella dopo un cursore.
+        
+        I documenti eliminati hanno `_deleted: true`. Dopo ogni pagina letta il
+        nuovo cursore è disponibile in delta_cursors[table_name]: va salvato
+        solo dopo aver applicato tutti i documenti restituiti.
+        
+        Args:
+            table_name: Nome della tabella Convex
+            cursor: Cursore salvato (timestamp dello snapshot iniziale o cursore
+                restituito dall'ultima lettura)
+            batch_size: Se indicato, restituisce batch di documenti (vedi iter_table)
+        
+        Yields:
+            Documenti (dict) oppure batch di documenti (list di dict)
+        
+        Raises:
+            ConvexError: Se la lettura fallisce
+        """
+        self.delta_cursors[table_name] = cursor
+        
+        def next_page(page):
+            self.delta_cursors[table_name] = page['cursor']
+            return {'cursor': page['cursor']}
+        
+        return self._iter_pages('document_deltas', table_name, {'cursor': cursor}, next_page, batch_size)
+    
+    def list_tables(self, zip_path: str) -> List[str]:
+        """
+        Elenca le tabelle presenti in un backup ZIP leggendo solo la central directory.
+        
+        Args:
+            zip_path: Path del file ZIP del backup
+        
+        Returns:
+            Lista dei nomi delle tabelle (ordine del backup)
+        
+        Raises:
+            ConvexError: Se il file ZIP non è leggibile
+        """
+        try:
             with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                # Estrai tutto
-                zip_ref.extractall(extract_dir)
-                
-                # Trova tutti i file documents.jsonl
-                for filename in zip_ref.namelist():
-                    if filename.endswith('/documents.jsonl'):
-                        table_name = filename.split('/')[0]
-                        
-                        # Leggi i record
-                        records = []
-                        doc_path = os.path.join(extract_dir, filename)
-                        
-                        with open(doc_path, 'r', encoding='utf-8') as f:
-                            for line in f:
-                                if line.strip():
-                                    records.append(json.loads(line))
-                        
-                        tables_data[table_name] = records
+                return [
+                    filename[:-len(DOCUMENTS_SUFFIX)]
+                    for filename in zip_ref.namelist()
+                    if filename.endswith(DOCUMENTS_SUFFIX)
+                ]
+        except Exception as e:
+            raise ConvexError(f"Errore durante la lettura del backup: {str(e)}")
+    
+    def read_manifest(
+        self,
+        zip_path: str,
+        table_filter: Optional[List[str]] = None
+    ) -> SnapshotManifest:
+        """
+        Legge la central directory del backup e seleziona le tabelle da importare.
+        
+        Nessun membro viene decompresso: per ogni tabella restano disponibili
+        CRC32 e dimensioni, mentre quelle escluse dal filtro vengono contate
+        nei byte saltati.
+        
+        Args:
+            zip_path: Path del file ZIP del backup
+            table_filter: Lista di tabelle da selezionare (None = tutte le tabelle)
+        
+        Returns:
+            SnapshotManifest con tabelle selezionate, mancanti e saltate
+        
+        Raises:
+            ConvexError: Se il file ZIP non è leggibile
+        """
+        manifest = SnapshotManifest()
+        wanted = set(table_filter) if table_filter is not None else None
+        
+        with self.profiler.span('convex.manifest') as span:
+            try:
+                with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                    infos = zip_ref.infolist()
+            except Exception as e:
+                raise ConvexError(f"Errore durante la lettura del backup: {str(e)}")
+            span.add(rows=len(infos))
+        
+        for info in infos:
+            if not info.filename.endswith(DOCUMENTS_SUFFIX):
+                continue
+            
+            table_name = info.filename[:-len(DOCUMENTS_SUFFIX)]
+            
+            if wanted is not None and table_name not in wanted:
+                manifest.skipped_tables.append(table_name)
+                manifest.skipped_bytes += info.file_size
+                manifest.skipped_compressed_bytes += info.compress_size
+                continue
             
-            return tables_data
+            manifest.tables[table_name] = SnapshotTable(
+                name=table_name,
+                member=info.filename,
+                crc=info.CRC,
+                file_size=info.file_size,
+                compress_size=info.compress_size
+            )
+        
+        if table_filter is not None:
+            # Mantiene l'ordine della configurazione
+            manifest.tables = {
+                name: manifest.tables[name] for name in table_filter if name in manifest.tables
+            }
+            manifest.missing_tables = [
+                name for name in table_filter if name not in manifest.tables
+            ]
+        
+        return manifest
+    
+    def has_documents(self, zip_path: str, table_name: str) -> bool:
+        """
+        Verifica se una tabella del backup contiene almeno un documento.
+        
+        Decomprime solo fino alla prima riga non vuota del membro: permette
+        di scegliere come caricare la tabella prima di avviarne la lettura.
+        
+        Args:
+            zip_path: Path del file ZIP del backup
+            table_name: Nome della tabella Convex
+        
+        Returns:
+            True se la tabella ha almeno un documento
+        
+        Raises:
+            ConvexError: Se la tabella non esiste o il backup non è leggibile
+        """
+        member = f"{table_name}{DOCUMENTS_SUFFIX}"
+        try:
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                try:
+                    zip_ref.getinfo(member)
+                except KeyError:
+                    raise ConvexError(f"Tabella '{table_name}' non trovata nel backup")
+                
+                with zip_ref.open(member, 'r') as doc_file:
+                    return any(line.strip() for line in doc_file)
+        except ConvexError:
+            raise
+        except Exception as e:
+            raise ConvexError(
+                f"Errore durante la lettura della tabella '{table_name}': {str(e)}"
+            )
+    
+    def iter_table(
+        self,
+        zip_path: str,
+        table_name: str,
+        batch_size: Optional[int] = None,
+        transform: Optional[Callable[[List[Dict[str, Any]]], Any]] = None
+    ) -> Iterator[Any]:
+        """
+        Legge in streaming i documenti di una tabella senza estrarre il backup su disco.
+        
+        Il membro `<table>/documents.jsonl` viene aperto direttamente con
+        `ZipFile.open` e decompresso riga per riga: la memoria usata dipende
+        da `batch_size` e non dalla dimensione del backup. Il tempo di
+        decompressione e decodifica (escluso il tempo del consumatore tra
+        un yield e l'altro) viene accumulato nella fase 'convex.decode'.
+        
+        Con `transform` ogni blocco di documenti viene trasformato nel
+        processo che lo decodifica e vengono restituiti i risultati, uno per
+        blocco: con decode_workers > 1 il lavoro per documento (es.
+        appiattimento e conversione nei valori SQL) avviene nei processi di
+        decodifica e al processo corrente arriva solo il risultato.
+        
+        Args:
+            zip_path: Path del file ZIP del backup
+            table_name: Nome della tabella Convex
+            batch_size: Se indicato, restituisce liste di al massimo
+                `batch_size` documenti invece dei singoli documenti
+            transform: Funzione picklable (a livello di modulo o istanza di
+                una classe) applicata a ogni blocco di documenti; i blocchi
+                sono di `batch_size` documenti nel processo corrente e di
+                circa DECODE_CHUNK_BYTES con i processi di decodifica
+        
+        Yields:
+            Documenti (dict), batch di documenti (list di dict) oppure i
+            risultati di `transform`
+        
+        Raises:
+            ConvexError: Se la tabella non esiste o il contenuto non è valido
+        """
+        member = f"{table_name}{DOCUMENTS_SUFFIX}"
+        # Senza batch_size i documenti vengono comunque decodificati a blocchi:
+        # i tempi sono misurati per blocco e non per documento
+        block_size = batch_size or self.DECODE_BLOCK_SIZE
+        
+        # Tempi misurati solo tra un yield e l'altro (non il lavoro del consumatore)
+        profiled = self.profiler.enabled
+        clock = time.perf_counter
+        cpu_clock = time.thread_time
+        wall = cpu = 0.0
+        rows = size = 0
+        
+        try:
+            wall_start, cpu_start = clock(), cpu_clock()
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                try:
+                    zip_ref.getinfo(member)
+                except KeyError:
+                    raise ConvexError(f"Tabella '{table_name}' non trovata nel backup")
+                
+                with zip_ref.open(member, 'r') as doc_file:
+                    if self.decode_workers > 1:
+                        blocks = self._decode_parallel(doc_file, block_size, transform)
+                    else:
+                        blocks = self._decode_serial(doc_file, block_size, transform)
+                    
+                    for batch, documents, block_bytes, worker_cpu in blocks:
+                        rows += documents
+                        size += block_bytes
+                        if profiled:
+                            wall += clock() - wall_start
+                            cpu += cpu_clock() - cpu_start + worker_cpu
+                        if batch_size is None and transform is None:
+                            yield from batch
+                        else:
+                            yield batch
+                        if profiled:
+                            wall_start, cpu_start = clock(), cpu_clock()
             
+            if profiled:
+                wall += clock() - wall_start
+                cpu += cpu_clock() - cpu_start
+        
+        except ConvexError:
+            raise
         except Exception as e:
-            raise ConvexError(f"Errore durante l'estrazione del backup: {str(e)}")
+            raise ConvexError(
+                f"Errore durante la lettura della tabella '{table_name}': {str(e)}"
+            )
+        finally:
+            # Anche per letture interrotte (es. schema in cache non valido)
+            self.profiler.record(
+                'convex.decode', wall, cpu, rows=rows, bytes=size, table=table_name
+            )
+    
+    @staticmethod
+    def _decode_serial(
+        doc_file,
+        block_size: int,
+        transform: Optional[Callable[[List[Dict[str, Any]]], Any]] = None
+    ) -> Iterator[Tuple[Any, int, int, float]]:
+        """
+        Decodifica riga per riga nel processo corrente.
+        
+        Args:
+            doc_file: Membro documents.jsonl aperto in lettura binaria
+            block_size: Documenti per blocco
+            transform: Trasformazione dei blocchi (vedi iter_table)
+        
+        Yields:
+            Tuple (documenti del blocco o risultato di transform, documenti,
+            byte letti, secondi di CPU dei processi di decodifica)
+        """
+        batch = []
+        size = 0
+        # json.loads accetta bytes UTF-8: evita il wrapper di testo
+        for line in doc_file:
+            if not line.strip():
+                continue
+            
+            batch.append(json.loads(line))
+            size += len(line)
+            if len(batch) >= block_size:
+                yield (transform(batch) if transform else batch), len(batch), size, 0.0
+                batch = []
+                size = 0
+        
+        if batch:
+            yield (transform(batch) if transform else batch), len(batch), size, 0.0
+    
+    def _decode_parallel(
+        self,
+        doc_file,
+        block_size: int,
+        transform: Optional[Callable[[List[Dict[str, Any]]], Any]] = None
+    ) -> Iterator[Tuple[Any, int, int, float]]:
+        """
+        Decodifica con i processi di decodifica, mantenendo l'ordine dei documenti.
+        
+        Il membro viene decompresso in questo processo e diviso in blocchi di
+        circa DECODE_CHUNK_BYTES terminati a fine riga: le tabelle grandi sono
+        quindi ripartite per intervalli di righe tra i processi. Restano in
+        corso al massimo 2 blocchi per processo, così la memoria non dipende
+        dalla dimensione della tabella.
+        
+        Senza `transform` i documenti tornano in forma compatta (vedi
+        decode_json_lines) e i dict vengono ricostruiti qui: il costo di
+        unpickle e ricostruzione resta nel processo corrente. Con `transform`
+        torna solo il risultato di ogni blocco (vedi transform_json_lines).
+        
+        Args:
+            doc_file: Membro documents.jsonl aperto in lettura binaria
+            block_size: Documenti per blocco restituito (senza transform)
+            transform: Trasformazione dei blocchi (vedi iter_table)
+        
+        Yields:
+            Tuple (documenti del blocco o risultato di transform, documenti,
+            byte letti, secondi di CPU dei processi di decodifica)
+        """
+        pool = self._get_decode_pool()
+        max_pending = self.decode_workers * 2
+        pending = collections.deque()
+        tail = b''
+        
+        try:
+            while True:
+                data = doc_file.read(self.DECODE_CHUNK_BYTES)
+                chunk = b''
+                if data:
+                    # Il blocco termina all'ultima riga completa, il resto passa al successivo
+                    cut = data.rfind(b'\n') + 1
+                    if cut:
+                        chunk, tail = tail + data[:cut], data[cut:]
+                    else:
+                        tail += data
+                else:
+                    chunk, tail = tail, b''
+                if chunk:
+                    if transform is None:
+                        future = pool.submit(decode_json_lines, chunk)
+                    else:
+                        future = pool.submit(transform_json_lines, chunk, transform)
+                    pending.append((future, len(chunk)))
+                
+                while pending and (len(pending) >= max_pending or not data):
+                    future, chunk_bytes = pending.popleft()
+                    if transform is not None:
+                        result, documents, worker_cpu = future.result()
+                        yield result, documents, chunk_bytes, worker_cpu
+                        continue
+                    
+                    documents, worker_cpu = future.result()
+                    batch = [dict(zip(keys, values)) for keys, values in documents]
+                    for start in range(0, len(batch), block_size):
+                        # Byte e CPU del blocco attribuiti al primo batch
+                        first = start == 0
+                        block = batch[start:start + block_size]
+                        yield (
+                            block,
+                            len(block),
+                            chunk_bytes if first else 0,
+                            worker_cpu if first else 0.0
+                        )
+                
+                if not data:
+                    break
+        finally:
+            # Lettura interrotta: i blocchi non ancora avviati non servono più
+            for future, _ in pending:
+                future.cancel()
+    
+    def _get_decode_pool(self) -> ProcessPoolExecutor:
+        """
+        Pool dei processi di decodifica, creato al primo uso e condiviso tra le
+        tabelle (anche importate in parallelo da più thread).
+        
+        Returns:
+            ProcessPoolExecutor con decode_workers processi
+        """
+        with self._decode_pool_lock:
+            if self._decode_pool is None:
+                self._decode_pool = ProcessPoolExecutor(max_workers=self.decode_workers)
+                if self.logger:
+                    self.logger.info(f"Started {self.decode_workers} JSON decode workers")
+            return self._decode_pool
+    
+    def extract_backup(
+        self,
+        zip_path: str,
+        extract_dir: Optional[str] = None,
+        table_filter: Optional[List[str]] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Legge i dati da un backup ZIP di Convex.
+        
+        I documenti vengono letti in streaming da `iter_table`, senza
+        estrarre il backup su disco; con `table_filter` vengono decompresse
+        solo le tabelle richieste. Per backup grandi usare direttamente
+        `iter_table` per non caricare tutte le tabelle in memoria.
+        
+        Args:
+            zip_path: Path del file ZIP del backup
+            extract_dir: Non più utilizzato (mantenuto per compatibilità)
+            table_filter: Lista di tabelle da leggere (None = tutte le tabelle)
+        
+        Returns:
+            Dizionario {table_name: [records]}
+        
+        Raises:
+            ConvexError: Se l'estrazione fallisce
+        """
+        manifest = self.read_manifest(zip_path, table_filter)
+        self._log_manifest(manifest)
+        
+        tables_data = {}
+        
+        for table_name in manifest.tables:
+            tables_data[table_name] = list(self.iter_table(zip_path, table_name))
+        
+        return tables_data
+    
+    def _log_manifest(self, manifest: SnapshotManifest):
+        """
+        Registra le tabelle mancanti e i byte non decompressi grazie al filtro.
+        
+        Args:
+            manifest: Manifest del backup
+        """
+        for table_name in manifest.missing_tables:
+            print(f"⚠ Warning: Tabella '{table_name}' non trovata nel backup")
+        
+        if self.logger and manifest.skipped_tables:
+            self.logger.info(
+                f"Skipped {len(manifest.skipped_tables)} unselected tables",
+                bytes_skipped=manifest.skipped_bytes,
+                compressed_bytes_skipped=manifest.skipped_compressed_bytes
+            )
     
     def get_backup_data(self, table_filter: Optional[List[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
         """
@@ -262,30 +1505,22 @@ class ConvexClient:
         zip_path = self.download_backup()
         
         try:
-            # Estrai i dati
-            all_data = self.extract_backup(zip_path)
-            
-            # Filtra le tabelle se richiesto
-            if table_filter is not None:
-                filtered_data = {}
-                for table_name in table_filter:
-                    if table_name in all_data:
-                        filtered_data[table_name] = all_data[table_name]
-                    else:
-                        # Tabella non trovata - log warning ma continua
-                        print(f"⚠ Warning: Tabella '{table_name}' non trovata nel backup")
-                
-                return filtered_data
-            
-            return all_data
-            
+            # Estrai solo le tabelle richieste (le altre non vengono decompresse)
+            return self.extract_backup(zip_path, table_filter=table_filter)
+        
         finally:
-            # Pulisci il file ZIP temporaneo
-            if os.path.exists(zip_path):
+            # Pulisci il file ZIP temporaneo (gli snapshot in cache restano)
+            cached = self.cache is not None and self.cache.contains(zip_path)
+            if not cached and os.path.exists(zip_path):
                 try:
                     os.remove(zip_path)
                 except:
                     pass  # Ignora errori di pulizia
 
 
-__all__ = ['ConvexClient', 'ConvexError', 'retry_with_backoff']
+__all__ = [
+    'ConvexClient', 'ConvexError', 'SnapshotManifest', 'SnapshotTable', 'HttpExportTransport',
+    'retry_with_backoff', 'deployment_url_from_key', 'verify_snapshot', 'intact_prefix', 'decode_json_lines',
+    'transform_json_lines',
+    'DOCUMENTS_SUFFIX', 'EXPORT_TRANSPORTS', 'PARTIAL_SUFFIX', 'STREAMING_SYSTEM_FIELDS'
+]
@@ -0,0 +1,570 @@
+"""
+Dialetti SQL dei database di destinazione (SQL Server, SQLite, DuckDB).
+
+SQLImporter genera i tipi delle colonne nel vocabolario di SQL Server
+(es. 'NVARCHAR(256)', 'BIGINT', 'VARBINARY(MAX)') e delega a un dialetto
+connessione, quoting, DDL, lettura dei metadati, swap e merge. I driver
+(pyodbc, duckdb) vengono importati solo alla connessione.
+"""
+
+import re
+import sqlite3
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# Tipi con lunghezza in CHARACTER_MAXIMUM_LENGTH
+SIZED_TYPES = ('nvarchar', 'nchar', 'varchar', 'char', 'varbinary', 'binary')
+
+# Colonna come in INFORMATION_SCHEMA.COLUMNS: (data_type, character_maximum_length)
+ColumnType = Tuple[str, Optional[int]]
+
+# datetime come testo ISO (l'adapter di default è deprecato da Python 3.12);
+# registrato una volta per processo e non a ogni connessione
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(sep=' '))
+
+
+def parse_sql_type(sql_type: str) -> ColumnType:
+    """
+    Converte un tipo SQL Server nel formato di INFORMATION_SCHEMA.COLUMNS.
+    
+    Args:
+        sql_type: Tipo come in CREATE/ALTER TABLE (es. 'NVARCHAR(64)', 'BIGINT')
+    
+    Returns:
+        Tupla (data_type, character_maximum_length), con -1 per i tipi (MAX)
+        e None per i tipi senza lunghezza
+    """
+    match = re.match(r'\s*(\w+)\s*(?:\(\s*(\w+))?', sql_type)
+    data_type = match.group(1).lower()
+    size = match.group(2)
+    
+    if data_type not in SIZED_TYPES:
+        return data_type, None
+    if size is None:
+        return data_type, 1
+    return data_type, -1 if size.lower() == 'max' else int(size)
+
+
+def format_sql_type(data_type: str, max_length: Optional[int]) -> str:
+    """
+    Tipo SQL Server da (data_type, character_maximum_length) (inverso di parse_sql_type).
+    
+    Args:
+        data_type: DATA_TYPE della colonna
+        max_length: Lunghezza (-1 o None per MAX nei tipi con lunghezza)
+    
+    Returns:
+        Tipo per CREATE/ALTER TABLE (es. 'NVARCHAR(MAX)')
+    """
+    if data_type in SIZED_TYPES:
+        size = 'MAX' if max_length is None or max_length < 0 else max_length
+        return f"{data_type.upper()}({size})"
+    return data_type.upper()
+
+
+class Dialect(ABC):
+    """
+    Differenze SQL tra i database di destinazione.
+    
+    L'implementazione di base usa SQL standard con identificatori tra
+    doppi apici; le sottoclassi implementano connect() e load_columns()
+    e ridefiniscono solo quello che cambia.
+    """
+    
+    name = ''
+    label = ''
+    
+    # Funzione SQL per il timestamp corrente (UTC)
+    NOW_SQL = 'CURRENT_TIMESTAMP'
+    
+    # Metodi di insert supportati oltre a executemany
+    INSERT_METHODS = ('executemany',)
+    
+    @abstractmethod
+    def connect(self, connection_string: str, timeout: int):
+        """
+        Apre una connessione DB-API con transazioni esplicite.
+        
+        Args:
+            connection_string: Stringa di connessione o path del database
+            timeout: Timeout di connessione/lock in secondi
+        
+        Returns:
+            Connessione (commit/rollback/cursor/close)
+        """
+    
+    def prepare(self, cursor, schema: str):
+        """Prepara il database dopo la connessione (es. crea lo schema)."""
+    
+    def supports_fast_executemany(self, connection, cursor) -> bool:
+        """True se il driver supporta fast_executemany + setinputsizes."""
+        return False
+    
+    def quote(self, identifier: str) -> str:
+        """Identificatore tra delimitatori."""
+        return '"' + identifier.replace('"', '""') + '"'
+    
+    def table(self, schema: str, table_name: str) -> str:
+        """Nome qualificato di una tabella."""
+        return f"{self.quote(schema)}.{self.quote(table_name)}"
+    
+    def column_type(self, sql_type: str) -> str:
+        """
+        Tipo nativo per un tipo SQL Server generato da TypeMapper.
+        
+        Args:
+            sql_type: Tipo SQL Server (es. 'NVARCHAR(MAX)')
+        
+        Returns:
+            Tipo da usare nel DDL del dialetto
+        """
+        return sql_type
+    
+    def normalize_type(self, sql_type: str) -> ColumnType:
+        """
+        (data_type, max_length) che il database riporterà per una colonna creata con sql_type.
+        
+        Args:
+            sql_type: Tipo SQL Server (es. 'NVARCHAR(64)')
+        
+        Returns:
+            Tipo nel formato di INFORMATION_SCHEMA.COLUMNS
+        """
+        return parse_sql_type(sql_type)
+    
+    @abstractmethod
+    def load_columns(self, cursor, schema: str) -> Iterable[Tuple[str, str, str, Optional[int]]]:
+        """
+        Colonne di tutte le tabelle di uno schema.
+        
+        Args:
+            cursor: Cursor della connessione
+            schema: Schema di destinazione
+        
+        Returns:
+            Tuple (table_name, column_name, data_type, max_length) nell'ordine delle colonne
+        """
+    
+    def table_exists(self, cursor, schema: str, table_name: str) -> bool:
+        """True se la tabella esiste (senza catalogo)."""
+        key = table_name.lower()
+        return any(table.lower() == key for table, _, _, _ in self.load_columns(cursor, schema))
+    
+    def column_types(self, cursor, schema: str, table_name: str) -> Dict[str, ColumnType]:
+        """Colonne di una tabella, column_name -> (data_type, max_length) (senza catalogo)."""
+        key = table_name.lower()
+        return {
+            column: (data_type, max_length)
+            for table, column, data_type, max_length in self.load_columns(cursor, schema)
+            if table.lower() == key
+        }
+    
+    def column_definition(self, column: str, sql_type: str, constraint: str = '') -> str:
+        """Definizione di una colonna per CREATE TABLE."""
+        definition = f"{self.quote(column)} {self.column_type(sql_type)}"
+        return f"{definition} {constraint}" if constraint else definition
+    
+    def create_table_sql(self, table_sql: str, definitions: List[str]) -> str:
+        """CREATE TABLE con le definizioni di colonna indicate."""
+        columns_sql = ',\n    '.join(definitions)
+        return f"\nCREATE TABLE {table_sql} (\n    {columns_sql}\n)\n"
+    
+    def create_table_if_missing_sql(self, table_sql: str, definitions: List[str]) -> str:
+        """CREATE TABLE eseguito solo se la tabella non esiste."""
+        columns_sql = ',\n    '.join(definitions)
+        return f"CREATE TABLE IF NOT EXISTS {table_sql} (\n    {columns_sql}\n)"
+    
+    def add_column_sql(self, table_sql: str, column: str, sql_type: str) -> List[str]:
+        """Statement per aggiungere una colonna nullable."""
+        return [f"ALTER TABLE {table_sql} ADD COLUMN {self.quote(column)} {self.column_type(sql_type)}"]
+    
+    def alter_column_sql(self, table_sql: str, column: str, sql_type: str) -> List[str]:
+        """Statement per cambiare il tipo di una colonna mantenendo i valori."""
+        return [
+            f"ALTER TABLE {table_sql} ALTER COLUMN {self.quote(column)} "
+            f"SET DATA TYPE {self.column_type(sql_type)}"
+        ]
+    
+    def copy_structure_sql(self, source_sql: str, target_sql: str) -> Optional[str]:
+        """
+        Statement che crea una tabella vuota con le colonne di un'altra.
+        
+        Returns:
+            SQL, oppure None se la copia va fatta con CREATE TABLE dai tipi del catalogo
+        """
+        return f"CREATE TABLE {target_sql} AS SELECT * FROM {source_sql} LIMIT 0"
+    
+    def truncate_sql(self, table_sql: str) -> str:
+        """Statement che svuota una tabella."""
+        return f"DELETE FROM {table_sql}"
+    
+    def table_hint_sql(self, table_hint: Optional[str]) -> str:
+        """Hint di tabella per INSERT (solo SQL Server)."""
+        return ''
+    
+    def rename_table_statements(
+        self,
+        schema: str,
+        table_name: str,
+        new_name: str
+    ) -> List[Tuple[str, Tuple[Any, ...]]]:
+        """Statement (sql, parametri) che rinominano una tabella nello stesso schema."""
+        return [(f"ALTER TABLE {self.table(schema, table_name)} RENAME TO {self.quote(new_name)}", ())]
+    
+    def begin_swap_sql(self) -> Optional[str]:
+        """Statement da eseguire prima dei rename dello swap."""
+        return None
+    
+    def end_swap_sql(self) -> Optional[str]:
+        """Statement che annulla begin_swap_sql dopo commit o rollback dello swap."""
+        return None
+    
+    def upsert_sql(self, target_sql: str, source_sql: str, columns: List[str], key: str) -> List[str]:
+        """
+        Statement che uniscono le righe di source nella tabella target per chiave.
+        
+        Le righe già presenti vengono sostituite (DELETE + INSERT nella
+        stessa transazione), senza richiedere un indice univoco sulla chiave.
+        """
+        key_sql = self.quote(key)
+        columns_sql = ', '.join(self.quote(col) for col in columns)
+        return [
+            f"DELETE FROM {target_sql} WHERE {key_sql} IN (SELECT {key_sql} FROM {source_sql})",
+            f"INSERT INTO {target_sql} ({columns_sql}) SELECT {columns_sql} FROM {source_sql}",
+        ]
+
+
+class SQLServerDialect(Dialect):
+    """T-SQL via pyodbc (ODBC Driver for SQL Server)."""
+    
+    name = 'sqlserver'
+    label = 'SQL Server'
+    NOW_SQL = 'SYSUTCDATETIME()'
+    INSERT_METHODS = ('executemany', 'tvp', 'bcp')
+    
+    # Driver ODBC che supportano fast_executemany (Microsoft ODBC Driver 17/18)
+    FAST_EXECUTEMANY_DRIVERS = ('msodbcsql',)
+    
+    COLUMNS_QUERY = """
+        SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = ?
+        ORDER BY TABLE_NAME, ORDINAL_POSITION
+    """
+    
+    @property
+    def driver(self):
+        """Modulo pyodbc (importato alla prima connessione)."""
+        import pyodbc
+        return pyodbc
+    
+    def connect(self, connection_string: str, timeout: int):
+        return self.driver.connect(connection_string, timeout=timeout)
+    
+    def supports_fast_executemany(self, connection, cursor) -> bool:
+        """
+        Il vecchio driver "SQL Server" (SQLSRV32) non gestisce correttamente
+        gli array di parametri: solo i driver Microsoft ODBC Driver for SQL Server.
+        """
+        if not hasattr(cursor, 'fast_executemany'):
+            return False
+        
+        try:
+            driver_name = connection.getinfo(self.driver.SQL_DRIVER_NAME) or ''
+        except Exception:
+            return False
+        
+        driver_name = driver_name.lower()
+        return any(driver in driver_name for driver in self.FAST_EXECUTEMANY_DRIVERS)
+    
+    def quote(self, identifier: str) -> str:
+        return '[' + identifier.replace(']', ']]') + ']'
+    
+    def load_columns(self, cursor, schema: str):
+        cursor.execute(self.COLUMNS_QUERY, (schema,))
+        return [
+            (table_name, column, data_type.lower(), max_length)
+            for table_name, column, data_type, max_length in cursor.fetchall()
+        ]
+    
+    def table_exists(self, cursor, schema: str, table_name: str) -> bool:
+        query = """
+            SELECT COUNT(*)
+            FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ?
+        """
+        cursor.execute(query, (schema, table_name))
+        return cursor.fetchone()[0] > 0
+    
+    def column_types(self, cursor, schema: str, table_name: str) -> Dict[str, ColumnType]:
+        query = """
+            SELECT COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ?
+            ORDER BY ORDINAL_POSITION
+        """
+        cursor.execute(query, (schema, table_name))
+        return {row[0]: (row[1].lower(), row[2]) for row in cursor.fetchall()}
+    
+    def create_table_if_missing_sql(self, table_sql: str, definitions: List[str]) -> str:
+        columns_sql = ',\n    '.join(definitions)
+        return (
+            f"\nIF OBJECT_ID(N'{table_sql}', N'U') IS NULL\n"
+            f"CREATE TABLE {table_sql} (\n    {columns_sql}\n)\n"
+        )
+    
+    def add_column_sql(self, table_sql: str, column: str, sql_type: str) -> List[str]:
+        return [f"ALTER TABLE {table_sql} ADD {self.quote(column)} {sql_type} NULL"]
+    
+    def alter_column_sql(self, table_sql: str, column: str, sql_type: str) -> List[str]:
+        return [f"ALTER TABLE {table_sql} ALTER COLUMN {self.quote(column)} {sql_type} NULL"]
+    
+    def copy_structure_sql(self, source_sql: str, target_sql: str) -> Optional[str]:
+        return f"SELECT TOP 0 * INTO {target_sql} FROM {source_sql}"
+    
+    def truncate_sql(self, table_sql: str) -> str:
+        return f"TRUNCATE TABLE {table_sql}"
+    
+    def table_hint_sql(self, table_hint: Optional[str]) -> str:
+        return f" WITH ({table_hint})" if table_hint else ''
+    
+    def rename_table_statements(self, schema: str, table_name: str, new_name: str):
+        return [("EXEC sp_rename ?, ?", (self.table(schema, table_name), new_name))]
+    
+    def begin_swap_sql(self) -> Optional[str]:
+        # Un errore in uno dei due sp_rename annulla l'intera transazione
+        return "SET XACT_ABORT ON"
+    
+    def end_swap_sql(self) -> Optional[str]:
+        # XACT_ABORT è un'opzione di sessione: la connessione torna al default
+        return "SET XACT_ABORT OFF"
+    
+    def upsert_sql(self, target_sql: str, source_sql: str, columns: List[str], key: str) -> List[str]:
+        update_columns = [col for col in columns if col != key]
+        update_sql = ', '.join(f"target.{self.quote(col)} = source.{self.quote(col)}" for col in update_columns)
+        columns_sql = ', '.join(self.quote(col) for col in columns)
+        values_sql = ', '.join(f"source.{self.quote(col)}" for col in columns)
+        
+        query = f"""
+MERGE {target_sql} WITH (HOLDLOCK) AS target
+USING {source_sql} AS source
+    ON target.{self.quote(key)} = source.{self.quote(key)}
+"""
+        if update_columns:
+            query += f"WHEN MATCHED THEN UPDATE SET {update_sql}\n"
+        query += f"WHEN NOT MATCHED BY TARGET THEN INSERT ({columns_sql}) VALUES ({values_sql});"
+        return [query]
+
+
+class _TransactionalConnection:
+    """
+    Connessione con una transazione sempre aperta (BEGIN dopo commit/rollback).
+    
+    SQLite (isolation_level=None) e DuckDB sono in autocommit: così DDL e
+    DML tra due commit sono atomici come con pyodbc (autocommit off).
+    """
+    
+    def __init__(self, connection, cursor):
+        self._connection = connection
+        self._cursor = cursor
+        self._cursor.execute('BEGIN TRANSACTION')
+    
+    def cursor(self):
+        return self._cursor
+    
+    def commit(self):
+        self._cursor.execute('COMMIT')
+        self._cursor.execute('BEGIN TRANSACTION')
+    
+    def rollback(self):
+        self._cursor.execute('ROLLBACK')
+        self._cursor.execute('BEGIN TRANSACTION')
+    
+    def close(self):
+        # Il cursor può essere già stato chiuso (DuckDB: è la connessione stessa)
+        try:
+            self._connection.rollback()
+        except Exception:
+            pass
+        self._connection.close()
+
+
+class SQLiteDialect(Dialect):
+    """
+    File SQLite locale (connection_string = path del database).
+    
+    Lo schema non esiste in SQLite: tutte le tabelle sono nel database
+    principale. I tipi dichiarati restano quelli di SQL Server (SQLite li
+    conserva e ne ricava l'affinità), con i tipi (MAX) senza lunghezza.
+    """
+    
+    name = 'sqlite'
+    label = 'SQLite'
+    
+    def connect(self, connection_string: str, timeout: int):
+        connection = sqlite3.connect(
+            connection_string, timeout=timeout, isolation_level=None, check_same_thread=False
+        )
+        cursor = connection.cursor()
+        if connection_string != ':memory:':
+            # Import paralleli: lettori e scrittore non si bloccano a vicenda
+            cursor.execute('PRAGMA journal_mode=WAL')
+        return _TransactionalConnection(connection, cursor)
+    
+    def table(self, schema: str, table_name: str) -> str:
+        return self.quote(table_name)
+    
+    def column_type(self, sql_type: str) -> str:
+        return re.sub(r'\(\s*max\s*\)', '', sql_type, flags=re.IGNORECASE)
+    
+    def load_columns(self, cursor, schema: str):
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )
+        columns = []
+        for (table_name,) in cursor.fetchall():
+            cursor.execute(f"PRAGMA table_info({self.quote(table_name)})")
+            for _, column, declared_type, _, _, _ in cursor.fetchall():
+                data_type, max_length = self._parse_declared_type(declared_type)
+                columns.append((table_name, column, data_type, max_length))
+        return columns
+    
+    @staticmethod
+    def _parse_declared_type(declared_type: str) -> ColumnType:
+        """Tipo dichiarato SQLite -> (data_type, max_length); senza lunghezza = MAX."""
+        if not declared_type:
+            return 'nvarchar', -1
+        data_type, max_length = parse_sql_type(declared_type)
+        if data_type in SIZED_TYPES and '(' not in declared_type:
+            max_length = -1
+        return data_type, max_length
+    
+    def alter_column_sql(self, table_sql: str, column: str, sql_type: str) -> List[str]:
+        # SQLite non ha ALTER COLUMN: nuova colonna, copia dei valori, rimozione della vecchia
+        old_column = self.quote(f"{column}__old")
+        return [
+            f"ALTER TABLE {table_sql} RENAME COLUMN {self.quote(column)} TO {old_column}",
+            f"ALTER TABLE {table_sql} ADD COLUMN {self.quote(column)} {self.column_type(sql_type)}",
+            f"UPDATE {table_sql} SET {self.quote(column)} = {old_column}",
+            f"ALTER TABLE {table_sql} DROP COLUMN {old_column}",
+        ]
+    
+    def copy_structure_sql(self, source_sql: str, target_sql: str) -> Optional[str]:
+        # CREATE TABLE AS in SQLite perde i tipi dichiarati
+        return None
+
+
+class DuckDBDialect(Dialect):
+    """
+    Database DuckDB locale, colonnare (connection_string = path del database).
+    
+    Richiede il pacchetto opzionale `duckdb`.
+    """
+    
+    name = 'duckdb'
+    label = 'DuckDB'
+    
+    # Tipo SQL Server -> tipo DuckDB
+    TYPES = {
+        'nvarchar': 'VARCHAR', 'varchar': 'VARCHAR', 'nchar': 'VARCHAR', 'char': 'VARCHAR',
+        'bigint': 'BIGINT', 'int': 'INTEGER', 'smallint': 'SMALLINT', 'tinyint': 'UTINYINT',
+        'float': 'DOUBLE', 'real': 'REAL', 'bit': 'BOOLEAN',
+        'datetime2': 'TIMESTAMP', 'datetime': 'TIMESTAMP', 'date': 'DATE',
+        'varbinary': 'BLOB', 'binary': 'BLOB',
+    }
+    
+    # Tipo DuckDB (information_schema) -> (data_type, max_length) SQL Server
+    SQL_SERVER_TYPES = {
+        'varchar': ('nvarchar', -1),
+        'bigint': ('bigint', None),
+        'integer': ('int', None),
+        'smallint': ('smallint', None),
+        'utinyint': ('tinyint', None),
+        'double': ('float', None),
+        'real': ('real', None),
+        'float': ('real', None),
+        'boolean': ('bit', None),
+        'timestamp': ('datetime2', None),
+        'date': ('date', None),
+        'blob': ('varbinary', -1),
+    }
+    
+    def connect(self, connection_string: str, timeout: int):
+        try:
+            import duckdb
+        except ImportError:
+            raise Exception("The duckdb package is required for the DuckDB dialect (pip install duckdb)")
+        
+        connection = duckdb.connect(connection_string)
+        # Il cursor DuckDB è una connessione separata: si usa la connessione stessa
+        return _TransactionalConnection(connection, connection)
+    
+    def prepare(self, cursor, schema: str):
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {self.quote(schema)}")
+    
+    def column_type(self, sql_type: str) -> str:
+        data_type, _ = parse_sql_type(sql_type)
+        return self.TYPES.get(data_type, sql_type)
+    
+    def normalize_type(self, sql_type: str) -> ColumnType:
+        return self._to_sql_server(self.column_type(sql_type))
+    
+    def _to_sql_server(self, duckdb_type: str) -> ColumnType:
+        """Tipo DuckDB -> (data_type, max_length) nel vocabolario di SQL Server."""
+        return self.SQL_SERVER_TYPES.get(duckdb_type.lower(), (duckdb_type.lower(), None))
+    
+    def load_columns(self, cursor, schema: str):
+        cursor.execute(
+            """
+            SELECT table_name, column_name, data_type
+            FROM information_schema.columns
+            WHERE table_schema = ?
+            ORDER BY table_name, ordinal_position
+            """,
+            (schema,)
+        )
+        return [
+            (table_name, column, *self._to_sql_server(data_type))
+            for table_name, column, data_type in cursor.fetchall()
+        ]
+
+
+# Dialetti disponibili per nome (sql_server.dialect)
+DIALECTS = {
+    SQLServerDialect.name: SQLServerDialect,
+    SQLiteDialect.name: SQLiteDialect,
+    DuckDBDialect.name: DuckDBDialect,
+}
+
+
+def get_dialect(name: str) -> Dialect:
+    """
+    Dialetto per nome.
+    
+    Args:
+        name: 'sqlserver', 'sqlite' o 'duckdb'
+    
+    Returns:
+        Istanza del dialetto
+    
+    Raises:
+        ValueError: Se il dialetto non esiste
+    """
+    if name not in DIALECTS:
+        raise ValueError(f"Unsupported SQL dialect: {name}")
+    return DIALECTS[name]()
+
+
+__all__ = [
+    'Dialect',
+    'SQLServerDialect',
+    'SQLiteDialect',
+    'DuckDBDialect',
+    'DIALECTS',
+    'get_dialect',
+    'SIZED_TYPES',
+    'parse_sql_type',
+    'format_sql_type',
+]
@@ -2,7 +2,7 @@
 Data exporter per filtrare e validare dati da Convex.
 """
 
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple, Union
 from dataclasses import dataclass
 
 
@@ -98,4 +98,180 @@ class DataExporter:
         return valid_tables, missing_tables
 
 
-__all__ = ['DataExporter', 'TableData']
+def _is_encoded_value(value: Dict[str, Any]) -> bool:
+    """
+    Verifica se un oggetto è un valore Convex codificato (es. {"$integer": ...}).
+    
+    I nomi dei campi Convex non possono iniziare con '$': un oggetto con un
+    solo campo di questo tipo è un valore scalare, non va espanso.
+    """
+    return len(value) == 1 and next(iter(value)).startswith('$')
+
+
+class DocumentFlattener:
+    """
+    Proietta documenti Convex annidati su colonne e tabelle relazionali.
+    
+    Gli oggetti dei percorsi indicati in `flatten` (o tutti, con True)
+    diventano colonne con i nomi dei campi uniti da SEPARATOR
+    (`address.city` -> `address_city`); gli oggetti non indicati restano
+    serializzati come JSON. Gli array dei percorsi in `child_tables` non
+    vengono salvati nella riga del documento ma in una tabella figlia
+    `<tabella>_<percorso>`, una riga per elemento con l'`_id` del documento
+    (`_parent_id`) e la posizione nell'array (`_ordinal`): gli elementi
+    oggetto sono appiattiti completamente, quelli scalari vanno nella
+    colonna `value`. Gli oggetti che contengono un array di `child_tables`
+    vengono appiattiti. Due campi che producono lo stesso nome di colonna
+    (es. `address.city` e `address_city`) sollevano ValueError invece di
+    sovrascriversi.
+    
+    Esempio:
+        flattener = DocumentFlattener(flatten=['address'], child_tables=['tags'])
+        flattener.flatten({'_id': 'a', 'address': {'city': 'Roma'}, 'tags': ['x']})
+        # {'_id': 'a', 'address_city': 'Roma'}
+        list(flattener.iter_children(documents, 'tags'))
+        # [{'_parent_id': 'a', '_ordinal': 0, 'value': 'x'}]
+    """
+    
+    SEPARATOR = '_'
+    PARENT_ID_COLUMN = '_parent_id'
+    ORDINAL_COLUMN = '_ordinal'
+    VALUE_COLUMN = 'value'
+    
+    def __init__(self, flatten: Union[bool, List[str]] = False, child_tables: Optional[List[str]] = None):
+        """
+        Inizializza il flattener.
+        
+        Args:
+            flatten: True per appiattire tutti gli oggetti, oppure lista di
+                percorsi puntati degli oggetti da appiattire
+            child_tables: Percorsi puntati degli array da proiettare in tabelle figlie
+        """
+        self.flatten_all = flatten is True
+        self.child_paths = list(child_tables or [])
+        self._child_set = set(self.child_paths)
+        
+        # Un percorso 'a.b' richiede di espandere anche 'a'
+        paths = [] if isinstance(flatten, bool) else list(flatten)
+        paths += [path.rsplit('.', 1)[0] for path in self.child_paths if '.' in path]
+        self._expand = set()
+        for path in paths:
+            parts = path.split('.')
+            for index in range(1, len(parts) + 1):
+                self._expand.add('.'.join(parts[:index]))
+    
+    @property
+    def enabled(self) -> bool:
+        """True se il flattener modifica i documenti."""
+        return bool(self.flatten_all or self._expand or self.child_paths)
+    
+    def flatten(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Appiattisce un documento nella riga della tabella principale.
+        
+        Args:
+            document: Documento Convex
+        
+        Returns:
+            Riga con gli oggetti selezionati espansi e senza gli array delle tabelle figlie
+        
+        Raises:
+            ValueError: Se due campi producono lo stesso nome di colonna
+        """
+        row = {}
+        self._flatten_into(row, document, '', '', self.flatten_all, True)
+        return row
+    
+    def _flatten_into(
+        self,
+        row: Dict[str, Any],
+        obj: Dict[str, Any],
+        path_prefix: str,
+        column_prefix: str,
+        expand_all: bool,
+        split_children: bool
+    ):
+        """
+        Copia i campi di un oggetto nella riga espandendo gli oggetti annidati.
+        
+        Args:
+            row: Riga di destinazione
+            obj: Oggetto da copiare
+            path_prefix: Percorso puntato dell'oggetto nel documento
+            column_prefix: Prefisso dei nomi di colonna
+            expand_all: Espande tutti gli oggetti annidati
+            split_children: Esclude gli array delle tabelle figlie
+        
+        Raises:
+            ValueError: Se la colonna di un campo è già presente nella riga
+        """
+        for key, value in obj.items():
+            path = f"{path_prefix}.{key}" if path_prefix else key
+            column = f"{column_prefix}{self.SEPARATOR}{key}" if column_prefix else key
+            
+            if type(value) is dict and (expand_all or path in self._expand) and not _is_encoded_value(value):
+                self._flatten_into(row, value, path, column, expand_all, split_children)
+            elif split_children and type(value) is list and path in self._child_set:
+                continue
+            elif column in row:
+                raise ValueError(
+                    f"Field '{path}' collides with existing column '{column}' "
+                    f"(document {row.get('_id', obj.get('_id'))!r})"
+                )
+            else:
+                row[column] = value
+    
+    def child_table_name(self, table_name: str, path: str) -> str:
+        """
+        Nome della tabella figlia di un array.
+        
+        Args:
+            table_name: Nome della tabella principale
+            path: Percorso puntato dell'array
+        
+        Returns:
+            Nome della tabella figlia (es. 'users_tags')
+        """
+        return f"{table_name}{self.SEPARATOR}{path.replace('.', self.SEPARATOR)}"
+    
+    def iter_children(self, documents: Iterable[Dict[str, Any]], path: str) -> Iterator[Dict[str, Any]]:
+        """
+        Righe della tabella figlia di un array, una per elemento.
+        
+        Args:
+            documents: Documenti Convex (non appiattiti)
+            path: Percorso puntato dell'array
+        
+        Yields:
+            Righe con _parent_id, _ordinal e i campi dell'elemento
+        
+        Raises:
+            ValueError: Se un elemento ha un campo _parent_id o _ordinal
+        """
+        keys = path.split('.')
+        
+        for document in documents:
+            value = document
+            for key in keys:
+                value = value.get(key) if type(value) is dict else None
+            if type(value) is not list:
+                continue
+            
+            parent_id = document.get('_id')
+            for ordinal, element in enumerate(value):
+                child = {self.PARENT_ID_COLUMN: parent_id, self.ORDINAL_COLUMN: ordinal}
+                if type(element) is dict:
+                    # Le chiavi generate non possono essere sovrascritte dai campi dell'elemento
+                    reserved = child.keys() & element.keys()
+                    if reserved:
+                        raise ValueError(
+                            f"Element {ordinal} of '{path}' in document {parent_id!r} "
+                            f"has reserved field(s): {', '.join(sorted(reserved))}"
+                        )
+                    self._flatten_into(child, element, '', '', True, False)
+                else:
+                    child[self.VALUE_COLUMN] = element
+                yield child
+
+
+__all__ = ['DataExporter', 'DocumentFlattener', 'TableData']
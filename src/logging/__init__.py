@@ -31,6 +31,7 @@ class SyncLogger:
         
         # Crea il nome del file di log con timestamp
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.timestamp = timestamp
         log_filename = f"sync_{app_name}_{timestamp}.log"
         self.log_path = os.path.join(log_dir, log_filename)
         
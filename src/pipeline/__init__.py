@@ -0,0 +1,202 @@
+"""
+Pipeline producer/consumer per sovrapporre decodifica JSON e insert SQL.
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+
+# Marcatore di fine stream nella coda
+_END = object()
+
+
+@dataclass
+class StageStats:
+    """Tempo attivo e tempo in attesa di uno stadio della pipeline."""
+    name: str
+    busy_seconds: float = 0.0
+    idle_seconds: float = 0.0
+    items: int = 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Rappresentazione serializzabile (log, report)."""
+        return {
+            'busy_seconds': round(self.busy_seconds, 3),
+            'idle_seconds': round(self.idle_seconds, 3),
+            'items': self.items
+        }
+
+
+@dataclass
+class PipelineStats:
+    """
+    Statistiche di una pipeline decode -> insert.
+    
+    Per il decoder l'attesa è il tempo bloccato su una coda piena
+    (backpressure: l'insert è il collo di bottiglia); per l'insert è il
+    tempo passato ad aspettare batch dalla coda vuota (il decoder è il
+    collo di bottiglia).
+    """
+    decode: StageStats = field(default_factory=lambda: StageStats('decode'))
+    insert: StageStats = field(default_factory=lambda: StageStats('insert'))
+    max_queue_depth: int = 0
+    
+    @property
+    def bottleneck(self) -> str:
+        """Stadio con meno tempo in attesa."""
+        return 'decode' if self.decode.idle_seconds < self.insert.idle_seconds else 'insert'
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Rappresentazione serializzabile (log, report)."""
+        return {
+            'decode': self.decode.to_dict(),
+            'insert': self.insert.to_dict(),
+            'max_queue_depth': self.max_queue_depth,
+            'bottleneck': self.bottleneck
+        }
+
+
+class BatchPipeline:
+    """
+    Decodifica i batch di una sorgente in un thread dedicato.
+    
+    Il thread decoder legge i batch (es. ConvexClient.iter_table con
+    batch_size) e li mette in una coda limitata; il consumer li legge
+    riga per riga con rows(). La coda piena blocca il decoder, quindi in
+    memoria restano al massimo `queue_size` batch più quello in uso.
+    
+    Esempio:
+        pipeline = BatchPipeline(client.iter_table(zip_path, 'users', batch_size=1000))
+        pipeline.start()
+        try:
+            importer.import_table('users', pipeline.rows(), type_mapper)
+        finally:
+            pipeline.close()
+        print(pipeline.stats.to_dict())
+    """
+    
+    # Intervallo di controllo della richiesta di stop durante le attese
+    POLL_INTERVAL = 0.1
+    
+    def __init__(self, batches: Iterable[List[Dict[str, Any]]], queue_size: int = 4, name: str = 'pipeline'):
+        """
+        Inizializza la pipeline.
+        
+        Args:
+            batches: Sorgente di batch di righe
+            queue_size: Batch massimi in coda (backpressure)
+            name: Nome del thread decoder
+        """
+        if queue_size < 1:
+            raise ValueError("queue_size must be a positive integer")
+        
+        self.stats = PipelineStats()
+        self._batches = batches
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._produce, name=f"{name}-decoder", daemon=True)
+        self._consumer_start: Optional[float] = None
+    
+    def start(self) -> 'BatchPipeline':
+        """Avvia il thread decoder."""
+        self._thread.start()
+        return self
+    
+    def _put(self, item) -> bool:
+        """
+        Mette un elemento in coda attendendo spazio, salvo richiesta di stop.
+        
+        Returns:
+            False se la pipeline è stata chiusa durante l'attesa
+        """
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=self.POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _produce(self):
+        """Corpo del thread decoder."""
+        decode = self.stats.decode
+        batches = iter(self._batches)
+        
+        try:
+            while not self._stop.is_set():
+                started = time.perf_counter()
+                batch = next(batches, _END)
+                decode.busy_seconds += time.perf_counter() - started
+                
+                if batch is _END:
+                    break
+                
+                started = time.perf_counter()
+                if not self._put(batch):
+                    return
+                decode.idle_seconds += time.perf_counter() - started
+                decode.items += 1
+                self.stats.max_queue_depth = max(self.stats.max_queue_depth, self._queue.qsize())
+            
+            self._put(_END)
+        except BaseException as e:
+            # L'errore viene rilanciato nel thread consumer
+            self._put(_PipelineError(e))
+        finally:
+            close = getattr(batches, 'close', None)
+            if close is not None:
+                close()
+    
+    def batches(self) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Restituisce i batch decodificati man mano che sono pronti.
+        
+        Raises:
+            Eccezione sollevata dalla sorgente nel thread decoder
+        """
+        insert = self.stats.insert
+        if self._consumer_start is None:
+            self._consumer_start = time.perf_counter()
+        
+        while True:
+            started = time.perf_counter()
+            item = self._queue.get()
+            insert.idle_seconds += time.perf_counter() - started
+            
+            if item is _END:
+                return
+            if isinstance(item, _PipelineError):
+                raise item.error
+            
+            insert.items += 1
+            yield item
+    
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """Restituisce le righe decodificate una alla volta."""
+        for batch in self.batches():
+            yield from batch
+    
+    def close(self):
+        """
+        Ferma il decoder (se ancora attivo) e chiude le statistiche del consumer.
+        """
+        self._stop.set()
+        self._thread.join()
+        
+        if self._consumer_start is not None:
+            wall = time.perf_counter() - self._consumer_start
+            self.stats.insert.busy_seconds = max(0.0, wall - self.stats.insert.idle_seconds)
+            self._consumer_start = None
+
+
+class _PipelineError:
+    """Eccezione del decoder trasportata nella coda."""
+    
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+__all__ = ['BatchPipeline', 'PipelineStats', 'StageStats']
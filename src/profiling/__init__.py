@@ -0,0 +1,410 @@
+"""
+Profiler delle fasi del sync: tempi, righe, byte e memoria in un report JSON.
+"""
+
+import cProfile
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """
+    Picco di memoria residente del processo.
+    
+    Returns:
+        Byte (ru_maxrss su Unix, PeakWorkingSetSize su Windows) o None se non disponibile
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss è in KiB su Linux e in byte su macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+    
+    if sys.platform == 'win32':
+        try:
+            import ctypes
+            from ctypes import wintypes
+            
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ('cb', wintypes.DWORD),
+                    ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t),
+                    ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t),
+                    ('PeakPagefileUsage', ctypes.c_size_t),
+                ]
+            
+            kernel32 = ctypes.windll.kernel32
+            kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+            get_info = ctypes.windll.psapi.GetProcessMemoryInfo
+            get_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD]
+            
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            if get_info(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+                return counters.PeakWorkingSetSize
+        except Exception:
+            return None
+    
+    return None
+
+
+class Span:
+    """
+    Misura di una fase: tempo reale, tempo CPU del thread, righe e byte.
+    
+    Si usa come context manager (`with profiler.span('export'):`) oppure con
+    start()/stop() quando la fase non corrisponde a un blocco di codice.
+    """
+    
+    def __init__(self, profiler: 'Profiler', name: str, attrs: Dict[str, Any]):
+        self.profiler = profiler
+        self.name = name
+        self.attrs = attrs
+        self.parent: Optional[str] = None
+        self.started_at = 0.0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.count = 0
+        self.peak_rss_bytes: Optional[int] = None
+        self._wall_start: Optional[float] = None
+        self._cpu_start = 0.0
+        self._cprofile: Optional[cProfile.Profile] = None
+    
+    def add(self, rows: int = 0, bytes: int = 0):
+        """
+        Aggiunge righe e byte elaborati dalla fase.
+        
+        Args:
+            rows: Righe (documenti) elaborate
+            bytes: Byte letti o scritti
+        """
+        self.rows += rows
+        self.bytes += bytes
+    
+    def start(self) -> 'Span':
+        """Inizia la misura."""
+        self.profiler._enter(self)
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        return self
+    
+    def stop(self):
+        """Termina la misura e registra la fase (nessun effetto se non iniziata)."""
+        if self._wall_start is None:
+            return
+        self.wall_seconds += time.perf_counter() - self._wall_start
+        self.cpu_seconds += time.thread_time() - self._cpu_start
+        self._wall_start = None
+        self.count += 1
+        self.profiler._exit(self)
+    
+    def __enter__(self) -> 'Span':
+        return self.start()
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Rappresentazione serializzabile (report)."""
+        data = {'name': self.name}
+        data.update(self.attrs)
+        if self.parent is not None:
+            data['parent'] = self.parent
+        data.update({
+            'started_at': round(self.started_at, 3),
+            'wall_seconds': round(self.wall_seconds, 3),
+            'cpu_seconds': round(self.cpu_seconds, 3),
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'peak_rss_bytes': self.peak_rss_bytes,
+        })
+        if self.count > 1:
+            data['count'] = self.count
+        return data
+
+
+class _NullSpan:
+    """Span che non misura nulla (profiler disattivato)."""
+    
+    def add(self, rows: int = 0, bytes: int = 0):
+        pass
+    
+    def start(self) -> '_NullSpan':
+        return self
+    
+    def stop(self):
+        pass
+    
+    def __enter__(self) -> '_NullSpan':
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Profiler:
+    """
+    Raccoglie le misure delle fasi di un'esecuzione del sync.
+    
+    Le fasi sono annidabili (la fase padre è quella aperta nello stesso
+    thread) e possono essere registrate da più thread. Le fasi ripetute
+    molte volte (es. un chunk di insert) vanno accumulate con record() per
+    non produrre una voce per ripetizione.
+    
+    Con cprofile=True ogni fase di primo livello di un thread viene anche
+    eseguita sotto cProfile; le statistiche delle fasi con lo stesso nome
+    vengono unite e salvate con dump_cprofile(). Le fasi annidate sono
+    incluse nella fase di primo livello che le contiene.
+    
+    cProfile misura solo il thread in cui viene attivato: con --parallel la
+    fase 'import' del thread principale non contiene il lavoro dei worker,
+    che compare nelle fasi 'table' dei loro thread; il codice dei worker
+    fuori da una fase (es. l'apertura delle connessioni) non è misurato.
+    Da Python 3.12 può essere attivo un solo cProfile per processo: le fasi
+    avviate mentre un altro è attivo (es. le tabelle dei worker durante
+    'import') non hanno statistiche proprie.
+    """
+    
+    def __init__(self, enabled: bool = True, cprofile: bool = False):
+        """
+        Inizializza il profiler.
+        
+        Args:
+            enabled: False per un profiler che non misura nulla
+            cprofile: Esegue le fasi di primo livello sotto cProfile
+        """
+        self.enabled = enabled
+        self.cprofile = cprofile and enabled
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._spans: List[Span] = []
+        self._records: Dict[Any, Span] = {}
+        self._cprofiles: Dict[str, List[cProfile.Profile]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+    
+    def span(self, name: str, **attrs) -> Span:
+        """
+        Nuova fase da misurare.
+        
+        Args:
+            name: Nome della fase (es. 'export', 'sql.insert')
+            **attrs: Attributi del report (es. table='users')
+        
+        Returns:
+            Span da usare come context manager o con start()/stop()
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, attrs)
+    
+    def record(
+        self,
+        name: str,
+        wall_seconds: float,
+        cpu_seconds: float = 0.0,
+        rows: int = 0,
+        bytes: int = 0,
+        **attrs
+    ):
+        """
+        Accumula una misura già effettuata in una fase con lo stesso nome e attributi.
+        
+        Args:
+            name: Nome della fase
+            wall_seconds: Tempo reale
+            cpu_seconds: Tempo CPU
+            rows: Righe elaborate
+            bytes: Byte elaborati
+            **attrs: Attributi del report (es. table='users')
+        """
+        if not self.enabled:
+            return
+        
+        key = (name, tuple(sorted(attrs.items())))
+        with self._lock:
+            span = self._records.get(key)
+            if span is None:
+                span = Span(self, name, attrs)
+                span.parent = self._current()
+                span.started_at = time.perf_counter() - self._start - wall_seconds
+                self._records[key] = span
+                self._spans.append(span)
+            span.wall_seconds += wall_seconds
+            span.cpu_seconds += cpu_seconds
+            span.rows += rows
+            span.bytes += bytes
+            span.count += 1
+        span.peak_rss_bytes = peak_rss_bytes()
+    
+    def _stack(self) -> List[Span]:
+        """Fasi aperte nel thread corrente."""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+    
+    def _current(self) -> Optional[str]:
+        """Nome della fase aperta nel thread corrente."""
+        stack = self._stack()
+        return stack[-1].name if stack else None
+    
+    def _enter(self, span: Span):
+        """Registra l'inizio di una fase."""
+        stack = self._stack()
+        span.parent = stack[-1].name if stack else None
+        span.started_at = time.perf_counter() - self._start
+        
+        if self.cprofile and not stack:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                span._cprofile = profile
+            except ValueError:
+                # Un altro profiler è già attivo (Python 3.12+: uno per processo)
+                pass
+        stack.append(span)
+    
+    def _exit(self, span: Span):
+        """Registra la fine di una fase."""
+        stack = self._stack()
+        if span in stack:
+            stack.remove(span)
+        
+        if span._cprofile is not None:
+            span._cprofile.disable()
+        span.peak_rss_bytes = peak_rss_bytes()
+        
+        with self._lock:
+            if span._cprofile is not None:
+                self._cprofiles.setdefault(span.name, []).append(span._cprofile)
+                span._cprofile = None
+            self._spans.append(span)
+    
+    def stage_totals(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Totali per nome di fase.
+        
+        Returns:
+            Dict {fase: {count, wall_seconds, cpu_seconds, rows, bytes}}
+        """
+        totals = {}
+        with self._lock:
+            spans = list(self._spans)
+        
+        for span in spans:
+            stage = totals.setdefault(span.name, {
+                'count': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'rows': 0, 'bytes': 0
+            })
+            stage['count'] += span.count
+            stage['wall_seconds'] += span.wall_seconds
+            stage['cpu_seconds'] += span.cpu_seconds
+            stage['rows'] += span.rows
+            stage['bytes'] += span.bytes
+        
+        for stage in totals.values():
+            stage['wall_seconds'] = round(stage['wall_seconds'], 3)
+            stage['cpu_seconds'] = round(stage['cpu_seconds'], 3)
+        return totals
+    
+    def report(self, **metadata) -> Dict[str, Any]:
+        """
+        Report dell'esecuzione.
+        
+        Args:
+            **metadata: Campi aggiuntivi del report (es. app_name, exit_code)
+        
+        Returns:
+            Dizionario serializzabile in JSON
+        """
+        with self._lock:
+            spans = sorted(self._spans, key=lambda span: span.started_at)
+        
+        report = dict(metadata)
+        report.update({
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'duration_seconds': round(time.perf_counter() - self._start, 3),
+            'cpu_seconds': round(time.process_time() - self._cpu_start, 3),
+            'peak_rss_bytes': peak_rss_bytes(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'stages': self.stage_totals(),
+            'spans': [span.to_dict() for span in spans],
+        })
+        return report
+    
+    def write_report(self, path: str, **metadata) -> Dict[str, Any]:
+        """
+        Scrive il report JSON.
+        
+        Args:
+            path: Path del file JSON
+            **metadata: Campi aggiuntivi del report
+        
+        Returns:
+            Report scritto
+        """
+        report = self.report(**metadata)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, default=str)
+        return report
+    
+    def dump_cprofile(self, path_prefix: str) -> Dict[str, str]:
+        """
+        Salva le statistiche cProfile di ogni fase (formato pstats).
+        
+        Args:
+            path_prefix: Prefisso dei file, seguito da `_<fase>.prof`
+        
+        Returns:
+            Dict {fase: path del file}
+        """
+        with self._lock:
+            profiles = {name: list(items) for name, items in self._cprofiles.items()}
+        
+        paths = {}
+        for name, items in profiles.items():
+            stats = pstats.Stats(items[0])
+            for profile in items[1:]:
+                stats.add(profile)
+            
+            safe_name = ''.join(ch if ch.isalnum() or ch in '-_' else '_' for ch in name)
+            path = f"{path_prefix}_{safe_name}.prof"
+            stats.dump_stats(path)
+            paths[name] = path
+        return paths
+
+
+# Profiler disattivato per i componenti usati senza profiling
+NULL_PROFILER = Profiler(enabled=False)
+
+
+__all__ = ['Profiler', 'Span', 'NULL_PROFILER', 'peak_rss_bytes']
@@ -1,12 +1,93 @@
 """
-SQL Module - Type Mapper and SQL Server utilities
+SQL Module - Type Mapper and SQL Server utilities (SQLite/DuckDB via src.dialect)
 """
+import os
 import json
+import hashlib
+import math
 import time
-import pyodbc
-from typing import Any, Dict, Optional, List
-from dataclasses import dataclass
-from datetime import datetime
+import threading
+import base64
+import struct
+import tempfile
+import itertools
+import uuid
+from typing import Any, Dict, Optional, List, Iterable, Iterator, Callable, Tuple, Union
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from src.bcp import BcpWriter
+from src.dialect import Dialect, SQLServerDialect, SIZED_TYPES, get_dialect, format_sql_type
+from src.profiling import NULL_PROFILER
+
+
+# Origine di _creationTime (millisecondi dall'epoch Unix, UTC)
+_EPOCH = datetime(1970, 1, 1)
+
+
+# Chiavi dei valori Convex codificati come oggetto JSON con un solo campo
+# (es. {"$integer": "<base64>"}) -> tipo Convex del valore decodificato
+CONVEX_VALUE_TAGS = {
+    '$integer': 'integer',  # Int64: 8 byte little-endian in base64
+    '$bytes': 'bytes',      # ArrayBuffer in base64
+    '$float': 'number',     # Float64 non rappresentabile in JSON (NaN, ±Inf, -0): 8 byte little-endian
+}
+
+
+def convex_value_tag(value: Any) -> Optional[str]:
+    """
+    Tag di un valore Convex codificato, se il valore lo è
+    
+    Args:
+        value: Valore di un documento
+        
+    Returns:
+        Chiave del tag (es. '$integer') o None per i valori normali
+    """
+    if type(value) is not dict or len(value) != 1:
+        return None
+    tag = next(iter(value))
+    return tag if tag in CONVEX_VALUE_TAGS else None
+
+
+def decode_convex_value(value: Any) -> Any:
+    """
+    Decodifica un valore Convex codificato ($integer, $bytes, $float)
+    
+    I float NaN e ±Inf non sono rappresentabili in una colonna FLOAT di
+    SQL Server e diventano None. I valori non codificati sono restituiti
+    invariati.
+    
+    Args:
+        value: Valore di un documento
+        
+    Returns:
+        int, bytes, float o None; il valore stesso se non è codificato
+    """
+    tag = convex_value_tag(value)
+    if tag is None:
+        return value
+    
+    try:
+        raw = base64.b64decode(value[tag], validate=True)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid {tag} value: {value[tag]!r}") from e
+    
+    if tag == '$bytes':
+        return raw
+    if len(raw) != 8:
+        raise ValueError(f"Invalid {tag} value: expected 8 bytes, got {len(raw)}")
+    if tag == '$integer':
+        return int.from_bytes(raw, 'little', signed=True)
+    
+    number = struct.unpack('<d', raw)[0]
+    return number if math.isfinite(number) else None
+
+
+@dataclass
+class ColumnSchema:
+    """Tipo inferito di una colonna (vedi TypeMapper.infer_schema)"""
+    convex_type: str = 'null'
+    max_length: int = 0  # caratteri UTF-16 massimi dei valori stringa, -1 se illimitata
 
 
 class TypeMapper:
@@ -23,8 +104,42 @@ class TypeMapper:
         'id': 'NVARCHAR(50)',
         'array': 'NVARCHAR(MAX)',  # Serializzato come JSON
         'object': 'NVARCHAR(MAX)',  # Serializzato come JSON
+        'integer': 'BIGINT',  # numeri solo interi (inferenza di schema) e Int64 ($integer)
+        'bytes': 'VARBINARY(MAX)',  # ArrayBuffer ($bytes)
+        'timestamp': 'DATETIME2',  # millisecondi dall'epoch (_creationTime)
+    }
+    
+    # Tipi SQL Server delle colonne esistenti -> tipo Convex usato per la conversione
+    SQL_TYPE_MAPPING = {
+        'bigint': 'integer',
+        'int': 'integer',
+        'smallint': 'integer',
+        'tinyint': 'integer',
+        'float': 'number',
+        'real': 'number',
+        'bit': 'boolean',
+        'datetime2': 'timestamp',
+        'datetime': 'timestamp',
+        'varbinary': 'bytes',
+        'binary': 'bytes',
     }
     
+    # Tipi SQL testuali: i valori Convex codificati vi restano testo (JSON)
+    TEXT_SQL_TYPES = ('nvarchar', 'varchar', 'nchar', 'char', 'ntext', 'text')
+    
+    # Tipo Python del valore -> tipo usato dall'inferenza di schema
+    SCHEMA_KINDS = {bool: 'boolean', int: 'integer', float: 'number', str: 'string', list: 'array', dict: 'object'}
+    
+    # Interi rappresentabili in BIGINT; quelli fuori range diventano 'number' (FLOAT)
+    BIGINT_MIN = -2 ** 63
+    BIGINT_MAX = 2 ** 63 - 1
+    
+    # Colonne numeriche che contengono un istante in millisecondi dall'epoch
+    TIMESTAMP_COLUMNS = ('_creationTime',)
+    
+    # Lunghezze NVARCHAR(n) usate per le colonne stringa; oltre l'ultima NVARCHAR(MAX)
+    STRING_LENGTHS = (16, 64, 256, 1024, 4000)
+    
     def map_convex_to_sql(self, convex_type: str) -> str:
         """
         Mappa tipo Convex a tipo SQL Server
@@ -60,9 +175,14 @@ class TypeMapper:
         
         # Conversione basata sul tipo
         if convex_type == 'string':
+            # Valore codificato ($bytes, $integer...) in una colonna testuale: JSON come nel documento
+            if convex_value_tag(value) is not None:
+                return json.dumps(value)
             return str(value)
         
         elif convex_type == 'number':
+            if type(value) is dict:
+                return decode_convex_value(value)
             return float(value)
         
         elif convex_type == 'boolean':
@@ -82,6 +202,21 @@ class TypeMapper:
         elif convex_type == 'null':
             return None
         
+        elif convex_type == 'integer':
+            if type(value) is dict:
+                value = decode_convex_value(value)
+            if isinstance(value, float) and not value.is_integer():
+                raise ValueError(f"Value {value!r} is not an integer")
+            return int(value)
+        
+        elif convex_type == 'timestamp':
+            return _EPOCH + timedelta(milliseconds=float(value))
+        
+        elif convex_type == 'bytes':
+            if type(value) is dict:
+                return decode_convex_value(value)
+            return bytes(value)
+        
         else:
             raise ValueError(f"Unsupported Convex type: {convex_type}")
     
@@ -114,11 +249,360 @@ class TypeMapper:
             return 'array'
         
         if isinstance(value, dict):
-            return 'object'
+            # Valori Convex codificati ({"$integer": ...}) prima degli oggetti generici
+            tag = convex_value_tag(value)
+            return CONVEX_VALUE_TAGS[tag] if tag else 'object'
         
         # Default a string per tipi sconosciuti
         return 'string'
     
+    def infer_column_types(self, rows: Iterable[Dict[str, Any]], columns: List[str]) -> Dict[str, str]:
+        """
+        Inferisce il tipo Convex di ogni colonna da un campione di righe
+        
+        Per ogni colonna viene usato il tipo del primo valore non nullo;
+        le colonne sempre nulle nel campione restano di tipo 'null'.
+        
+        Args:
+            rows: Righe campione
+            columns: Colonne da inferire
+            
+        Returns:
+            Dizionario column_name -> convex_type
+        """
+        schema = {col: 'null' for col in columns}
+        pending = set(columns)
+        
+        for row in rows:
+            if not pending:
+                break
+            for col in list(pending):
+                value = row.get(col)
+                if value is not None:
+                    schema[col] = self.infer_convex_type(value)
+                    pending.discard(col)
+        
+        return schema
+    
+    def infer_schema(self, rows: Iterable[Dict[str, Any]]) -> Dict[str, ColumnSchema]:
+        """
+        Inferisce lo schema di una tabella dall'unione delle chiavi di tutte le righe
+        
+        Le colonne sono nell'ordine in cui compaiono per la prima volta. Per
+        ogni colonna si tiene il tipo più stretto compatibile con tutti i
+        valori: solo int Python e $integer -> 'integer' (i float restano
+        'number' anche se interi, gli int fuori dal range di BIGINT pure),
+        interi e decimali -> 'number', numeri nelle colonne TIMESTAMP_COLUMNS
+        -> 'timestamp'; tipi diversi tra loro diventano 'string' di
+        lunghezza illimitata.
+        
+        Args:
+            rows: Righe da analizzare (tutte per un'inferenza completa o un campione)
+            
+        Returns:
+            Dizionario column_name -> ColumnSchema
+        """
+        schema: Dict[str, ColumnSchema] = {}
+        
+        for row in rows:
+            for col, value in row.items():
+                column = schema.get(col)
+                if column is None:
+                    column = schema[col] = ColumnSchema()
+                if value is not None:
+                    self.add_value(column, col, value)
+        
+        return schema
+    
+    def add_value(self, column: ColumnSchema, col: str, value: Any):
+        """
+        Aggiorna lo schema di una colonna con un valore non nullo
+        
+        Args:
+            column: Schema della colonna (modificato sul posto)
+            col: Nome della colonna
+            value: Valore del documento
+        """
+        kind = self.SCHEMA_KINDS.get(type(value), 'string')
+        if kind == 'object':
+            tag = convex_value_tag(value)
+            if tag is not None:
+                kind = CONVEX_VALUE_TAGS[tag]
+        elif kind == 'integer' and not self.BIGINT_MIN <= value <= self.BIGINT_MAX:
+            kind = 'number'
+        if kind in ('integer', 'number') and col in self.TIMESTAMP_COLUMNS:
+            kind = 'timestamp'
+        
+        if kind != column.convex_type:
+            previous = column.convex_type
+            kind = column.convex_type = self._merge_types(previous, kind)
+            if kind == 'string' and (previous not in ('null', 'string') or type(value) is not str):
+                # Valori non stringa convertiti in testo: lunghezza non stimabile
+                column.max_length = -1
+        
+        if kind == 'string' and column.max_length >= 0 and type(value) is str:
+            length = len(value)
+            if length > column.max_length:
+                if not value.isascii():
+                    # I caratteri fuori dal BMP occupano due unità UTF-16
+                    length = len(value.encode('utf-16-le')) // 2
+                column.max_length = max(column.max_length, length)
+    
+    def merge_schema(self, schema: Dict[str, ColumnSchema], other: Dict[str, ColumnSchema]):
+        """
+        Unisce a uno schema inferito quello inferito dalle righe successive
+        
+        Il risultato è lo stesso di infer_schema su tutte le righe: lo schema
+        può essere inferito a blocchi (es. nei processi di decodifica) e i
+        risultati uniti nell'ordine dei blocchi.
+        
+        Args:
+            schema: Schema delle righe precedenti (modificato sul posto)
+            other: Schema delle righe successive
+        """
+        for col, column in other.items():
+            current = schema.get(col)
+            if current is None:
+                schema[col] = ColumnSchema(column.convex_type, column.max_length)
+            else:
+                self.merge_column(current, column)
+    
+    def merge_column(self, column: ColumnSchema, other: ColumnSchema):
+        """
+        Aggiorna lo schema di una colonna con lo schema inferito da altre righe
+        
+        Args:
+            column: Schema della colonna (modificato sul posto)
+            other: Schema della stessa colonna inferito dalle righe successive
+        """
+        if other.convex_type == 'null':
+            return
+        if column.convex_type == 'null':
+            column.convex_type = other.convex_type
+            column.max_length = other.max_length
+            return
+        
+        if other.convex_type != column.convex_type:
+            column.convex_type = self._merge_types(column.convex_type, other.convex_type)
+            if column.convex_type == 'string':
+                # Come in add_value: tipi diversi convertiti in testo
+                column.max_length = -1
+        elif column.convex_type == 'string' and column.max_length >= 0:
+            column.max_length = -1 if other.max_length < 0 else max(column.max_length, other.max_length)
+    
+    @staticmethod
+    def _merge_types(current: str, new: str) -> str:
+        """
+        Tipo comune a due tipi inferiti della stessa colonna
+        
+        Args:
+            current: Tipo inferito finora
+            new: Tipo dell'ultimo valore
+            
+        Returns:
+            Tipo che rappresenta entrambi
+        """
+        if current == 'null':
+            return new
+        if {current, new} == {'integer', 'number'}:
+            return 'number'
+        return 'string'
+    
+    def map_column_to_sql(self, column: ColumnSchema, exact: bool = True) -> str:
+        """
+        Tipo SQL Server di una colonna inferita
+        
+        Con uno schema inferito da un campione (exact=False) le scelte che
+        righe successive potrebbero violare sono evitate: le stringhe restano
+        NVARCHAR(MAX) e gli interi diventano FLOAT.
+        
+        Args:
+            column: Schema della colonna
+            exact: True se lo schema è stato inferito da tutte le righe
+            
+        Returns:
+            Tipo SQL Server
+        """
+        convex_type = column.convex_type
+        
+        if convex_type == 'string':
+            if exact and column.max_length >= 0:
+                for length in self.STRING_LENGTHS:
+                    if column.max_length <= length:
+                        return f"NVARCHAR({length})"
+            return 'NVARCHAR(MAX)'
+        
+        if convex_type == 'integer' and not exact:
+            return self.TYPE_MAPPING['number']
+        
+        if convex_type == 'null':
+            # Colonna sempre nulla: il tipo più generico
+            return self.TYPE_MAPPING['string']
+        
+        return self.map_convex_to_sql(convex_type)
+    
+    def schema_to_sql(self, schema: Dict[str, ColumnSchema], exact: bool = True) -> Dict[str, str]:
+        """
+        Tipi SQL Server di tutte le colonne di uno schema inferito
+        
+        Args:
+            schema: Dizionario column_name -> ColumnSchema
+            exact: True se lo schema è stato inferito da tutte le righe
+            
+        Returns:
+            Dizionario column_name -> tipo SQL Server
+        """
+        return {col: self.map_column_to_sql(column, exact) for col, column in schema.items()}
+    
+    def widen_sql_type(
+        self,
+        data_type: str,
+        max_length: Optional[int],
+        column: ColumnSchema,
+        exact: bool = True
+    ) -> Optional[str]:
+        """
+        Tipo più largo necessario a una colonna esistente per i nuovi valori
+        
+        Le colonne testuali vengono allargate solo se i valori sono più lunghi
+        della lunghezza dichiarata; le colonne tipizzate passano al tipo comune
+        (es. BIGINT -> FLOAT, BIT con numeri -> NVARCHAR(MAX)). Un tipo non
+        viene mai ristretto.
+        
+        Args:
+            data_type: DATA_TYPE della colonna esistente (INFORMATION_SCHEMA)
+            max_length: CHARACTER_MAXIMUM_LENGTH della colonna (-1 per MAX)
+            column: Schema inferito dei nuovi valori
+            exact: True se lo schema è stato inferito da tutte le righe
+            
+        Returns:
+            Nuovo tipo SQL Server, o None se la colonna va già bene
+        """
+        if column.convex_type == 'null':
+            return None
+        
+        existing_type = self.convex_type_for_sql(data_type)
+        
+        if existing_type is None:
+            # Colonna testuale: basta che sia abbastanza lunga
+            if max_length is None or max_length < 0:
+                return None
+            needed = column.max_length if column.convex_type == 'string' else -1
+            if 0 <= needed <= max_length:
+                return None
+            return self.map_column_to_sql(ColumnSchema('string', needed), exact)
+        
+        if column.convex_type == existing_type:
+            return None
+        merged = self._merge_types(existing_type, column.convex_type)
+        if merged == existing_type:
+            return None
+        
+        length = column.max_length if merged == column.convex_type == 'string' else -1
+        return self.map_column_to_sql(ColumnSchema(merged, length), exact)
+    
+    def convex_type_for_sql(self, data_type: Optional[str]) -> Optional[str]:
+        """
+        Tipo Convex con cui convertire i valori di una colonna SQL esistente
+        
+        Args:
+            data_type: DATA_TYPE della colonna (INFORMATION_SCHEMA)
+            
+        Returns:
+            Tipo Convex, o None per le colonne testuali (conversione dal valore)
+        """
+        if data_type is None:
+            return None
+        return self.SQL_TYPE_MAPPING.get(data_type.lower())
+    
+    def build_row_converter(
+        self,
+        columns: List[str],
+        schema: Dict[str, str]
+    ) -> Callable[[Dict[str, Any]], Tuple[Any, ...]]:
+        """
+        Compila una funzione che converte una riga in una tupla di valori SQL
+        
+        Il codice della funzione viene generato una volta per layout di
+        colonne: per ogni colonna il tipo atteso viene verificato inline con
+        `type(value) is ...`, senza chiamate a infer_convex_type/convert_value.
+        I valori di tipo diverso da quello atteso (o nulli) passano dal
+        percorso generico, quindi il risultato è identico a quello di
+        convert_value(value, infer_convex_type(value)).
+        
+        Args:
+            columns: Colonne nell'ordine dell'INSERT
+            schema: Dizionario column_name -> convex_type (es. da infer_column_types)
+            
+        Returns:
+            Funzione row -> tuple
+        """
+        def convert_any(value):
+            return self.convert_value(value, self.infer_convex_type(value))
+        
+        def convert_text(value):
+            # Colonna testuale: i valori codificati non vengono decodificati (es. $bytes in bytes)
+            if convex_value_tag(value) is not None:
+                return json.dumps(value)
+            return convert_any(value)
+        
+        def convert_integer(value):
+            return self.convert_value(value, 'integer')
+        
+        def convert_timestamp(value):
+            return _EPOCH + timedelta(milliseconds=value)
+        
+        expressions = []
+        for index, col in enumerate(columns):
+            value = f"_v{index}"
+            fetch = f"({value} := _get(_c{index}))"
+            convex_type = schema.get(col, 'null')
+            
+            if convex_type in ('string', 'id'):
+                expr = f"({value} if type{fetch} is str else _text({value}))"
+            elif convex_type == 'number':
+                expr = (
+                    f"({value} if type{fetch} is float "
+                    f"else float({value}) if type({value}) is int else _any({value}))"
+                )
+            elif convex_type == 'boolean':
+                expr = f"({value} if type{fetch} is bool else _any({value}))"
+            elif convex_type == 'integer':
+                expr = f"({value} if type{fetch} is int else _int({value}))"
+            elif convex_type == 'timestamp':
+                expr = (
+                    f"(_ts({value}) if type{fetch} is float or type({value}) is int "
+                    f"else _any({value}))"
+                )
+            elif convex_type in ('array', 'object'):
+                expr = (
+                    f"(_dumps({value}) if type{fetch} is list or type({value}) is dict "
+                    f"else _any({value}))"
+                )
+            else:
+                expr = f"_any(_get(_c{index}))"
+            
+            expressions.append(expr)
+        
+        # I nomi delle colonne sono passati come default, mai inseriti nel sorgente
+        params = ''.join(f", _c{index}=_columns[{index}]" for index in range(len(columns)))
+        source = (
+            f"def convert_row(row{params}, _any=_any, _text=_text, _int=_int, _ts=_ts, _dumps=_dumps):\n"
+            f"    _get = row.get\n"
+            f"    return ({', '.join(expressions)},)\n"
+        )
+        
+        namespace = {
+            '_columns': tuple(columns),
+            '_any': convert_any,
+            '_text': convert_text,
+            '_int': convert_integer,
+            '_ts': convert_timestamp,
+            '_dumps': json.dumps
+        }
+        exec(compile(source, '<row_converter>', 'exec'), namespace)
+        return namespace['convert_row']
+    
     def get_table_schema_sql(self, table_name: str, schema: Dict[str, str]) -> str:
         """
         Genera SQL CREATE TABLE per una tabella Convex
@@ -143,228 +627,2057 @@ class TypeMapper:
 );"""
 
 
-@dataclass
-class ImportResult:
-    """Risultato dell'import di una tabella"""
-    table_name: str
-    success: bool
-    rows_imported: int
-    error: Optional[str] = None
-    duration_seconds: float = 0.0
-
+class SchemaMismatchError(Exception):
+    """Documento non compatibile con lo schema in cache (vedi SchemaValidator)"""
+    pass
 
 
-class SQLImporter:
+class SchemaValidator:
     """
-    Gestisce connessione a SQL Server e import dati
+    Verifica in streaming che i documenti rispettino uno schema già inferito
+    
+    Con `min_creation_time` sono verificati solo i documenti con
+    `_creationTime` successivo (quelli non presenti quando lo schema è stato
+    inferito): va indicato solo se i documenti precedenti non possono essere
+    cambiati, dato che i documenti Convex sono modificabili. Un documento con una chiave sconosciuta o con un valore che
+    cambierebbe il tipo SQL di una colonna solleva SchemaMismatchError;
+    i valori compatibili aggiornano lo schema (es. la lunghezza massima
+    delle stringhe entro la stessa NVARCHAR(n)).
+    
+    Esempio:
+        validator = SchemaValidator(type_mapper, cached_schema, cached_max_creation_time)
+        importer.import_table('users', validator.wrap(rows), type_mapper, column_schema=validator.schema)
     """
     
-    def __init__(self, connection_string: str, schema: str, timeout: int = 30):
+    def __init__(
+        self,
+        type_mapper: TypeMapper,
+        schema: Dict[str, ColumnSchema],
+        min_creation_time: Optional[float] = None,
+        cached: bool = False
+    ):
         """
-        Inizializza SQL Importer
+        Inizializza il validatore
         
         Args:
-            connection_string: Stringa di connessione SQL Server
-            schema: Schema SQL Server dove importare i dati
-            timeout: Timeout connessione in secondi
+            type_mapper: TypeMapper usato per l'inferenza
+            schema: Schema di riferimento (copiato)
+            min_creation_time: `_creationTime` massimo dei documenti già verificati
+                (None = verifica tutti i documenti)
+            cached: True se lo schema proviene dalla cache degli schemi
         """
-        self.connection_string = connection_string
-        self.schema = schema
-        self.timeout = timeout
-        self.connection = None
-        self.cursor = None
+        self.type_mapper = type_mapper
+        self.schema = {
+            col: ColumnSchema(column.convex_type, column.max_length)
+            for col, column in schema.items()
+        }
+        self.sql_types = type_mapper.schema_to_sql(self.schema)
+        self.min_creation_time = min_creation_time
+        self.max_creation_time = min_creation_time
+        self.cached = cached
+        self.validated_rows = 0
+        self.mismatch: Optional[str] = None
     
-    def connect(self) -> bool:
+    def wrap(self, rows: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
         """
-        Stabilisce connessione a SQL Server
+        Restituisce le righe verificando quelle nuove
         
-        Returns:
-            True se connessione riuscita
+        Args:
+            rows: Righe da verificare
+            
+        Yields:
+            Le stesse righe
             
         Raises:
-            Exception: Se connessione fallisce
+            SchemaMismatchError: Al primo documento non compatibile
         """
-        try:
-            self.connection = pyodbc.connect(
-                self.connection_string,
-                timeout=self.timeout
-            )
-            self.cursor = self.connection.cursor()
-            return True
-        except Exception as e:
-            raise Exception(f"Failed to connect to SQL Server: {str(e)}")
-    
-    def close(self):
-        """Chiude connessione SQL Server"""
-        if self.cursor:
-            self.cursor.close()
-        if self.connection:
-            self.connection.close()
+        min_creation_time = self.min_creation_time
+        
+        for row in rows:
+            creation_time = row.get('_creationTime')
+            if creation_time is not None:
+                if self.max_creation_time is None or creation_time > self.max_creation_time:
+                    self.max_creation_time = creation_time
+                if min_creation_time is not None and creation_time <= min_creation_time:
+                    yield row
+                    continue
+            
+            self.check_row(row)
+            yield row
     
-    def table_exists(self, table_name: str) -> bool:
+    def block_converter(
+        self,
+        columns: List[str],
+        types: Dict[str, str],
+        flatten: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+    ) -> 'RowBlockConverter':
         """
-        Verifica se tabella esiste nello schema
+        RowBlockConverter che verifica i documenti con lo schema di questo validatore
         
         Args:
-            table_name: Nome della tabella
+            columns: Colonne nell'ordine dell'INSERT
+            types: Dizionario column_name -> convex_type della conversione
+            flatten: Appiattimento dei documenti (es. DocumentFlattener.flatten)
             
         Returns:
-            True se tabella esiste
-        """
-        if not self.connection:
-            raise Exception("Not connected to SQL Server")
-        
-        query = """
-            SELECT COUNT(*) 
-            FROM INFORMATION_SCHEMA.TABLES 
-            WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ?
+            RowBlockConverter da usare come transform di ConvexClient.iter_table
         """
-        
-        self.cursor.execute(query, (self.schema, table_name))
-        count = self.cursor.fetchone()[0]
-        return count > 0
+        return RowBlockConverter(
+            self.type_mapper, columns, types,
+            schema=self.schema, min_creation_time=self.min_creation_time, flatten=flatten
+        )
     
-    def create_table(self, table_name: str, columns: List[str]):
-        """
-        Crea tabella con tutti i campi come NVARCHAR(MAX)
-        
-        Args:
-            table_name: Nome della tabella
-            columns: Lista nomi colonne
+    def wrap_blocks(self, blocks: Iterable['RowBlock']) -> Iterator[Tuple[Any, ...]]:
         """
-        if not self.connection:
-            raise Exception("Not connected to SQL Server")
-        
-        # Crea definizione colonne (tutte NVARCHAR(MAX))
-        column_defs = [f"[{col}] NVARCHAR(MAX)" for col in columns]
-        columns_sql = ',\n    '.join(column_defs)
-        
-        # Query CREATE TABLE
-        query = f"""
-CREATE TABLE [{self.schema}].[{table_name}] (
-    {columns_sql}
-)
-"""
+        Come wrap, per i blocchi già verificati e convertiti da block_converter
         
-        self.cursor.execute(query)
-        self.connection.commit()
-    
-    def import_table(
-        self, 
-        table_name: str,
-        rows: List[Dict[str, Any]], 
-        type_mapper: TypeMapper,
-        auto_create: bool = True
-    ) -> ImportResult:
-        """
-        Importa dati di una tabella con TRUNCATE prima dell'insert
+        Gli aggiornamenti di schema e il `_creationTime` massimo di ogni
+        blocco vengono uniti a quelli del validatore.
         
         Args:
-            table_name: Nome della tabella
-            rows: Lista di righe da importare
-            type_mapper: TypeMapper per conversione valori
-            auto_create: Se True, crea la tabella se non esiste
+            blocks: RowBlock nell'ordine dei documenti
             
-        Returns:
-            ImportResult con statistiche
-        """
-        start_time = time.time()
-        
-        try:
-            # Verifica esistenza tabella
-            table_exists = self.table_exists(table_name)
+        Yields:
+            Righe convertite
             
-            if not table_exists:
-                if auto_create and rows:
-                    # Crea tabella con colonne dalla prima riga
-                    columns = list(rows[0].keys())
-                    self.create_table(table_name, columns)
-                else:
-                    return ImportResult(
-                        table_name=table_name,
-                        success=False,
-                        rows_imported=0,
-                        error=f"Table {table_name} does not exist in schema {self.schema}",
-                        duration_seconds=time.time() - start_time
-                    )
-            else:
-                # Tabella esiste: TRUNCATE prima dell'import
-                self.truncate_table(table_name)
+        Raises:
+            SchemaMismatchError: Al primo blocco con un documento non compatibile
+        """
+        for block in blocks:
+            if block.mismatch is not None:
+                self._fail(block.mismatch)
             
-            # Import righe
-            rows_imported = self.bulk_insert(table_name, rows, type_mapper)
+            self.validated_rows += block.validated_rows
+            if block.max_creation_time is not None and (
+                self.max_creation_time is None or block.max_creation_time > self.max_creation_time
+            ):
+                self.max_creation_time = block.max_creation_time
             
-            return ImportResult(
-                table_name=table_name,
-                success=True,
-                rows_imported=rows_imported,
-                duration_seconds=time.time() - start_time
-            )
+            for col, updated in block.schema.items():
+                column = ColumnSchema(self.schema[col].convex_type, self.schema[col].max_length)
+                self.type_mapper.merge_column(column, updated)
+                if self.type_mapper.map_column_to_sql(column) != self.sql_types[col]:
+                    self._fail(f"column {col} changes type to {self.type_mapper.map_column_to_sql(column)}")
+                self.schema[col] = column
             
-        except Exception as e:
-            return ImportResult(
-                table_name=table_name,
-                success=False,
-                rows_imported=0,
-                error=str(e),
-                duration_seconds=time.time() - start_time
-            )
+            yield from block.rows
     
-    def bulk_insert(
-        self, 
-        table_name: str, 
-        rows: List[Dict[str, Any]],
-        type_mapper: TypeMapper
-    ) -> int:
+    def check_row(self, row: Dict[str, Any]):
         """
-        Esegue bulk insert ottimizzato
+        Verifica un documento e aggiorna lo schema
         
         Args:
-            table_name: Nome della tabella
-            rows: Lista di righe da inserire
-            type_mapper: TypeMapper per conversione valori
-            
-        Returns:
-            Numero di righe inserite
+            row: Documento Convex
             
         Raises:
-            Exception: Se insert fallisce
+            SchemaMismatchError: Se il documento non è compatibile
         """
-        if not rows:
-            return 0
+        schema = self.schema
+        kinds = self.type_mapper.SCHEMA_KINDS
+        self.validated_rows += 1
         
-        if not self.connection:
-            raise Exception("Not connected to SQL Server")
+        for col, value in row.items():
+            column = schema.get(col)
+            if column is None:
+                self._fail(f"unknown column {col}")
+            if value is None:
+                continue
+            
+            # Percorso veloce: valore già rappresentato dallo schema
+            kind = kinds.get(type(value))
+            if kind == 'object' and (tag := convex_value_tag(value)) is not None:
+                kind = CONVEX_VALUE_TAGS[tag]
+            expected = column.convex_type
+            if kind == expected:
+                if kind == 'string':
+                    if column.max_length < 0 or (len(value) <= column.max_length and value.isascii()):
+                        continue
+                elif kind != 'integer' or type(value) is not int or (
+                    self.type_mapper.BIGINT_MIN <= value <= self.type_mapper.BIGINT_MAX
+                ):
+                    continue
+            elif (
+                (expected == 'string' and column.max_length < 0)
+                or (expected == 'number' and kind == 'integer')
+                or (expected == 'timestamp' and kind in ('integer', 'number'))
+            ):
+                continue
+            
+            updated = ColumnSchema(column.convex_type, column.max_length)
+            self.type_mapper.add_value(updated, col, value)
+            if updated == column:
+                continue
+            if self.type_mapper.map_column_to_sql(updated) != self.sql_types[col]:
+                self._fail(f"column {col} changes type to {self.type_mapper.map_column_to_sql(updated)}")
+            schema[col] = updated
+    
+    def _fail(self, reason: str):
+        """Registra il motivo dell'incompatibilità e solleva SchemaMismatchError"""
+        self.mismatch = reason
+        raise SchemaMismatchError(f"Cached schema mismatch: {reason}")
+
+
+# Converter compilati nel processo corrente per (colonne, tipi): i
+# RowBlockConverter arrivano ai processi di decodifica a ogni blocco
+_ROW_CONVERTERS: Dict[Tuple[Tuple[str, ...], Tuple[Tuple[str, str], ...]], Callable] = {}
+
+
+@dataclass
+class RowBlock:
+    """Righe convertite di un blocco di documenti (vedi RowBlockConverter)"""
+    rows: List[Tuple[Any, ...]] = field(default_factory=list)
+    # Colonne il cui schema è stato aggiornato dai documenti del blocco
+    schema: Dict[str, ColumnSchema] = field(default_factory=dict)
+    max_creation_time: Optional[float] = None
+    validated_rows: int = 0
+    mismatch: Optional[str] = None
+
+
+class RowBlockConverter:
+    """
+    Converte blocchi di documenti nelle righe SQL di una tabella
+    
+    È la `transform` di ConvexClient.iter_table per i caricamenti con schema
+    noto: con i processi di decodifica appiattimento, verifica dello schema
+    e conversione dei valori avvengono nel processo che decodifica il blocco
+    e al processo principale arrivano solo le tuple dell'INSERT, che costano
+    molto meno da deserializzare dei documenti. La verifica è quella di
+    SchemaValidator, eseguita per blocco rispetto allo schema iniziale; i
+    risultati vanno uniti con SchemaValidator.wrap_blocks.
+    
+    Esempio:
+        converter = validator.block_converter(columns, types)
+        blocks = client.iter_table(zip_path, 'users', batch_size=1000, transform=converter)
+        importer.import_table('users', [], type_mapper, column_schema=validator.schema,
+                              row_values=lambda columns, types: validator.wrap_blocks(blocks))
+    """
+    
+    def __init__(
+        self,
+        type_mapper: TypeMapper,
+        columns: List[str],
+        types: Dict[str, str],
+        schema: Optional[Dict[str, ColumnSchema]] = None,
+        min_creation_time: Optional[float] = None,
+        flatten: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+    ):
+        """
+        Inizializza il converter
+        
+        Args:
+            type_mapper: TypeMapper per conversione valori
+            columns: Colonne nell'ordine dell'INSERT
+            types: Dizionario column_name -> convex_type (vedi build_row_converter)
+            schema: Schema con cui verificare i documenti (None = nessuna verifica)
+            min_creation_time: Vedi SchemaValidator
+            flatten: Appiattimento dei documenti (es. DocumentFlattener.flatten)
+        """
+        self.type_mapper = type_mapper
+        self.columns = list(columns)
+        self.types = dict(types)
+        self.schema = dict(schema) if schema is not None else None
+        self.min_creation_time = min_creation_time
+        self.flatten = flatten
+    
+    def __call__(self, documents: List[Dict[str, Any]]) -> RowBlock:
+        """
+        Converte un blocco di documenti
+        
+        Args:
+            documents: Documenti Convex del blocco
+            
+        Returns:
+            RowBlock con le righe convertite; senza righe e con `mismatch`
+            se un documento non è compatibile con lo schema
+        """
+        if self.flatten is not None:
+            documents = [self.flatten(document) for document in documents]
+        
+        block = RowBlock()
+        if self.schema is not None:
+            validator = SchemaValidator(self.type_mapper, self.schema, self.min_creation_time)
+            try:
+                documents = list(validator.wrap(documents))
+            except SchemaMismatchError:
+                block.mismatch = validator.mismatch
+                return block
+            block.max_creation_time = validator.max_creation_time
+            block.validated_rows = validator.validated_rows
+            block.schema = {
+                col: column for col, column in validator.schema.items() if column != self.schema[col]
+            }
+        
+        block.rows = list(map(self._row_converter(), documents))
+        return block
+    
+    def _row_converter(self) -> Callable[[Dict[str, Any]], Tuple[Any, ...]]:
+        """Converter compilato (build_row_converter), uno per processo e layout di colonne"""
+        key = (tuple(self.columns), tuple(sorted(self.types.items())))
+        convert_row = _ROW_CONVERTERS.get(key)
+        if convert_row is None:
+            convert_row = _ROW_CONVERTERS[key] = self.type_mapper.build_row_converter(self.columns, self.types)
+        return convert_row
+
+
+@dataclass
+class SchemaBlock:
+    """Schema inferito da un blocco di documenti (vedi SchemaBlockInference)"""
+    schema: Dict[str, ColumnSchema]
+    rows: int = 0
+    max_creation_time: Optional[float] = None
+
+
+class SchemaBlockInference:
+    """
+    Inferisce lo schema di blocchi di documenti
+    
+    È la `transform` di ConvexClient.iter_table per l'inferenza completa:
+    con i processi di decodifica al processo principale arrivano solo gli
+    schemi parziali, da unire nell'ordine dei blocchi con
+    TypeMapper.merge_schema.
+    """
+    
+    def __init__(
+        self,
+        type_mapper: TypeMapper,
+        flatten: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+    ):
+        """
+        Inizializza l'inferenza
+        
+        Args:
+            type_mapper: TypeMapper usato per l'inferenza
+            flatten: Appiattimento dei documenti (es. DocumentFlattener.flatten)
+        """
+        self.type_mapper = type_mapper
+        self.flatten = flatten
+    
+    def __call__(self, documents: List[Dict[str, Any]]) -> SchemaBlock:
+        """
+        Inferisce lo schema di un blocco di documenti
+        
+        Args:
+            documents: Documenti Convex del blocco
+            
+        Returns:
+            SchemaBlock con schema, numero di righe e `_creationTime` massimo
+        """
+        if self.flatten is not None:
+            documents = [self.flatten(document) for document in documents]
+        
+        max_creation_time = None
+        for document in documents:
+            creation_time = document.get('_creationTime')
+            if creation_time is not None and (max_creation_time is None or creation_time > max_creation_time):
+                max_creation_time = creation_time
+        
+        return SchemaBlock(self.type_mapper.infer_schema(documents), len(documents), max_creation_time)
+
+
+def _max_text_length(values: Iterable[Any]) -> int:
+    """
+    Lunghezza massima in caratteri UTF-16 dei valori di una colonna
+    
+    I valori non stringa (numeri, booleani) vengono convertiti dal driver:
+    per loro si riserva la lunghezza della loro rappresentazione testuale.
+    
+    Args:
+        values: Valori della colonna
+        
+    Returns:
+        Lunghezza massima (almeno 1)
+    """
+    max_length = 1
+    for value in values:
+        if value is None:
+            continue
+        if type(value) is not str:
+            value = str(value)
+        length = len(value)
+        if length > max_length // 2 and not value.isascii():
+            # I caratteri fuori dal BMP occupano due unità UTF-16
+            length = len(value.encode('utf-16-le')) // 2
+        if length > max_length:
+            max_length = length
+    return max_length
+
+
+def _estimate_row_bytes(values: Tuple[Any, ...]) -> int:
+    """
+    Stima i byte di una riga convertita così come viene inviata al driver
+    
+    Le stringhe contano 2 byte per carattere (UTF-16), gli altri valori
+    non nulli 8 byte.
+    
+    Args:
+        values: Valori convertiti della riga
+        
+    Returns:
+        Byte stimati
+    """
+    size = 0
+    for value in values:
+        if value is None:
+            continue
+        if type(value) is str:
+            size += 2 * len(value)
+        else:
+            size += 8
+    return size
+
+
+def _iter_chunks(
+    values: Iterable[Tuple[Any, ...]],
+    max_rows: int,
+    max_bytes: int
+) -> Iterable[Tuple[List[Tuple[Any, ...]], int]]:
+    """
+    Raggruppa righe convertite in chunk limitati per righe e byte stimati
+    
+    Un chunk contiene sempre almeno una riga, anche se da sola supera max_bytes.
+    
+    Args:
+        values: Iterabile di righe convertite
+        max_rows: Righe massime per chunk
+        max_bytes: Byte stimati massimi per chunk
+        
+    Yields:
+        Tuple (righe del chunk, byte stimati del chunk)
+    """
+    chunk = []
+    chunk_bytes = 0
+    
+    for row in values:
+        row_bytes = _estimate_row_bytes(row)
+        if chunk and chunk_bytes + row_bytes > max_bytes:
+            yield chunk, chunk_bytes
+            chunk = []
+            chunk_bytes = 0
+        
+        chunk.append(row)
+        chunk_bytes += row_bytes
+        
+        if len(chunk) >= max_rows:
+            yield chunk, chunk_bytes
+            chunk = []
+            chunk_bytes = 0
+    
+    if chunk:
+        yield chunk, chunk_bytes
+
+
+def _sql_string(value: str) -> str:
+    """Letterale stringa T-SQL (N'...') con apici raddoppiati"""
+    return "N'" + value.replace("'", "''") + "'"
+
+
+def _server_path(directory: str, file_name: str) -> str:
+    """
+    Path di un file nella directory vista da SQL Server
+    
+    Args:
+        directory: Directory (path Windows, UNC o POSIX)
+        file_name: Nome del file
+        
+    Returns:
+        Path completo con il separatore della directory
+    """
+    separator = '\\' if '\\' in directory else '/'
+    return directory.rstrip('\\/') + separator + file_name
+
+
+def _watermark_key(row: Dict[str, Any]) -> Optional[Tuple[float, str]]:
+    """
+    Chiave di ordinamento (_creationTime, _id) di un documento Convex
+    
+    Args:
+        row: Documento Convex
+        
+    Returns:
+        Tupla (creation_time, id) o None se mancano i campi di sistema
+    """
+    creation_time = row.get('_creationTime')
+    document_id = row.get('_id')
+    if creation_time is None or document_id is None:
+        return None
+    return (float(creation_time), str(document_id))
+
+
+class _WatermarkTracker:
+    """
+    Iteratore che registra la chiave (_creationTime, _id) massima delle righe lette
+    """
+    
+    def __init__(self, rows: Iterable[Dict[str, Any]]):
+        self._rows = iter(rows)
+        self.max_key: Optional[Tuple[float, str]] = None
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self) -> Dict[str, Any]:
+        row = next(self._rows)
+        key = _watermark_key(row)
+        if key is not None and (self.max_key is None or key > self.max_key):
+            self.max_key = key
+        return row
+
+
+class MetadataCatalog:
+    """
+    Tabelle e colonne di uno schema tenute in memoria
+    
+    Viene caricato con una sola query sulle colonne dello schema (vedi
+    Dialect.load_columns) alla connessione e aggiornato da SQLImporter a
+    ogni CREATE, ALTER, DROP e rename eseguito: le verifiche di esistenza e la lettura dei tipi delle
+    colonne non richiedono round trip. Può essere condiviso tra più
+    SQLImporter dello stesso schema (import paralleli). I nomi delle
+    tabelle sono confrontati senza distinzione tra maiuscole e minuscole,
+    come con la collation di default di SQL Server.
+    """
+    
+    def __init__(self):
+        """Inizializza un catalogo vuoto"""
+        self._tables: Dict[str, Dict[str, Tuple[str, Optional[int]]]] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(table_name: str) -> str:
+        """Chiave della tabella nel catalogo"""
+        return table_name.lower()
+    
+    def __len__(self) -> int:
+        """Numero di tabelle nel catalogo"""
+        with self._lock:
+            return len(self._tables)
+    
+    def load(self, cursor, schema: str, dialect: Optional[Dialect] = None):
+        """
+        Carica tabelle e colonne di uno schema con una sola query
+        
+        Args:
+            cursor: Cursor della connessione
+            schema: Schema di destinazione
+            dialect: Dialetto del database (default: SQL Server)
+        """
+        dialect = dialect or SQLServerDialect()
+        tables = {}
+        for table_name, column, data_type, max_length in dialect.load_columns(cursor, schema):
+            tables.setdefault(self._key(table_name), {})[column] = (data_type, max_length)
+        
+        with self._lock:
+            self._tables = tables
+    
+    def has_table(self, table_name: str) -> bool:
+        """True se la tabella esiste"""
+        with self._lock:
+            return self._key(table_name) in self._tables
+    
+    def get_columns(self, table_name: str) -> Dict[str, Tuple[str, Optional[int]]]:
+        """
+        Colonne di una tabella
+        
+        Args:
+            table_name: Nome della tabella
+            
+        Returns:
+            Copia del dizionario column_name -> (data_type, character_maximum_length),
+            vuoto se la tabella non esiste
+        """
+        with self._lock:
+            return dict(self._tables.get(self._key(table_name), {}))
+    
+    def set_table(self, table_name: str, columns: Dict[str, Tuple[str, Optional[int]]]):
+        """Registra una tabella creata (o sostituisce le sue colonne)"""
+        with self._lock:
+            self._tables[self._key(table_name)] = dict(columns)
+    
+    def set_columns(self, table_name: str, columns: Dict[str, Tuple[str, Optional[int]]]):
+        """Registra colonne aggiunte o modificate di una tabella esistente"""
+        with self._lock:
+            self._tables.setdefault(self._key(table_name), {}).update(columns)
+    
+    def drop_table(self, table_name: str):
+        """Rimuove una tabella eliminata"""
+        with self._lock:
+            self._tables.pop(self._key(table_name), None)
+    
+    def rename_table(self, table_name: str, new_name: str):
+        """Registra il rename di una tabella"""
+        with self._lock:
+            columns = self._tables.pop(self._key(table_name), None)
+            if columns is not None:
+                self._tables[self._key(new_name)] = columns
+    
+    def copy_table(self, table_name: str, new_name: str):
+        """Registra una tabella creata con le stesse colonne di un'altra (SELECT INTO)"""
+        with self._lock:
+            self._tables[self._key(new_name)] = dict(self._tables.get(self._key(table_name), {}))
+
+
+@dataclass
+class ImportResult:
+    """Risultato dell'import di una tabella"""
+    table_name: str
+    success: bool
+    rows_imported: int
+    error: Optional[str] = None
+    duration_seconds: float = 0.0
+    skipped: bool = False
+    skip_reason: Optional[str] = None
+    chunks: int = 0
+    bytes_estimated: int = 0
+    sync_mode: str = 'full'
+    fallback_reason: Optional[str] = None
+    stage_stats: Optional[Dict[str, Any]] = None  # tempi decode/insert della pipeline
+    schema_changes: Optional[List[str]] = None  # ALTER TABLE eseguiti prima del caricamento
+    child_tables: Optional[Dict[str, int]] = None  # tabella figlia -> righe caricate
+    insert_method: Optional[str] = None  # 'executemany' o 'tvp' (metodo effettivamente usato)
+    rows_deleted: int = 0  # documenti eliminati (sync_mode 'delta')
+
+
+@dataclass
+class InsertStats:
+    """Statistiche di un bulk insert a chunk"""
+    rows: int = 0
+    chunks: int = 0
+    bytes: int = 0
+    method: Optional[str] = None
+
+
+
+class SQLImporter:
+    """
+    Gestisce connessione al database di destinazione (SQL Server o un dialetto
+    di src.dialect) e import dati
+    """
+    
+    # Limiti di default di un chunk di insert (righe e byte stimati)
+    DEFAULT_BATCH_SIZE = 5000
+    DEFAULT_BATCH_BYTES = 16 * 1024 * 1024
+    
+    # Righe usate per inferire i tipi del converter di riga
+    SCHEMA_SAMPLE_ROWS = 1000
+    
+    # Modalità di caricamento: TRUNCATE + INSERT sulla tabella live,
+    # oppure caricamento in una tabella di staging e swap atomico
+    LOAD_MODE_TRUNCATE = 'truncate'
+    LOAD_MODE_SWAP = 'swap'
+    LOAD_MODES = (LOAD_MODE_TRUNCATE, LOAD_MODE_SWAP)
+    
+    STAGING_SUFFIX = '__staging'
+    OLD_SUFFIX = '__old'
+    
+    # Tabella di controllo con i watermark del sync incrementale
+    WATERMARK_TABLE = '_sync_watermarks'
+    
+    # _id per DELETE ... WHERE _id IN (...) dei documenti eliminati (sync 'delta')
+    DELETE_BATCH_SIZE = 1000
+    
+    # Metodi di insert dei chunk: array di parametri (executemany), un
+    # table-valued parameter per chunk (INSERT ... SELECT FROM ?) oppure
+    # file dati bcp caricato con BULK INSERT
+    INSERT_METHOD_EXECUTEMANY = 'executemany'
+    INSERT_METHOD_TVP = 'tvp'
+    INSERT_METHOD_BCP = 'bcp'
+    INSERT_METHODS = (INSERT_METHOD_EXECUTEMANY, INSERT_METHOD_TVP, INSERT_METHOD_BCP)
+    
+    # Prefisso dei table type creati per i TVP (seguito dall'hash delle colonne)
+    TVP_TYPE_PREFIX = '_sync_tvp_'
+    
+    # Tipi SQL Server usati così come sono nelle colonne dei table type;
+    # gli altri (es. DECIMAL con precisione) diventano NVARCHAR(MAX) e sono
+    # convertiti implicitamente dall'INSERT ... SELECT
+    TVP_COLUMN_TYPES = (
+        'bigint', 'int', 'smallint', 'tinyint', 'bit', 'float', 'real',
+        'datetime2', 'datetime', 'date',
+    ) + SIZED_TYPES
+    
+    # Limite (in caratteri UTF-16) dei parametri NVARCHAR dichiarati con setinputsizes:
+    # oltre questa soglia la colonna viene inviata in streaming (dimensione 0)
+    MAX_DECLARED_NVARCHAR = 4000
+    # Stesso limite (in byte) per i parametri VARBINARY
+    MAX_DECLARED_VARBINARY = 8000
+    
+    # Tipi SQL Server -> costante pyodbc del tipo parametro per setinputsizes
+    # (risolta alla prima chiamata: pyodbc serve solo con il dialetto SQL Server)
+    INPUT_SIZE_TYPES = {
+        'bigint': ('SQL_BIGINT', 0, 0),
+        'int': ('SQL_INTEGER', 0, 0),
+        'float': ('SQL_DOUBLE', 0, 0),
+        'bit': ('SQL_BIT', 0, 0),
+        'datetime2': ('SQL_TYPE_TIMESTAMP', 27, 7),
+    }
+    
+    def __init__(
+        self,
+        connection_string: str,
+        schema: str,
+        timeout: int = 30,
+        fast_executemany: bool = True,
+        batch_rows: int = DEFAULT_BATCH_SIZE,
+        batch_bytes: int = DEFAULT_BATCH_BYTES,
+        load_mode: str = LOAD_MODE_TRUNCATE,
+        metadata_cache: bool = True,
+        catalog: Optional[MetadataCatalog] = None,
+        insert_method: str = INSERT_METHOD_EXECUTEMANY,
+        bulk_dir: Optional[str] = None,
+        bulk_server_dir: Optional[str] = None,
+        dialect: Union[str, Dialect] = 'sqlserver',
+        profiler=None
+    ):
+        """
+        Inizializza SQL Importer
+        
+        Args:
+            connection_string: Stringa di connessione SQL Server (path del file
+                del database per SQLite e DuckDB)
+            schema: Schema dove importare i dati (ignorato da SQLite)
+            timeout: Timeout connessione in secondi
+            fast_executemany: Usa fast_executemany + setinputsizes se il driver lo supporta
+            batch_rows: Righe massime per chunk di insert
+            batch_bytes: Byte stimati massimi per chunk di insert
+            load_mode: 'truncate' (default) o 'swap' (staging + swap atomico)
+            metadata_cache: Carica il catalogo di tabelle e colonne alla connessione
+                invece di interrogare INFORMATION_SCHEMA per ogni tabella
+            catalog: Catalogo già caricato da condividere (es. di un altro importer)
+            insert_method: 'executemany' (default), 'tvp' (table-valued parameter per
+                chunk) o 'bcp' (file dati bcp + BULK INSERT)
+            bulk_dir: Directory dove scrivere i file bcp (default: directory temporanea)
+            bulk_server_dir: La stessa directory vista da SQL Server, se diversa
+                (es. share UNC); BULK INSERT legge i file dal server
+            dialect: Nome del dialetto ('sqlserver', 'sqlite', 'duckdb') o istanza di Dialect
+            profiler: Profiler opzionale (fasi sql.*: connessione, DDL, conversione, insert)
+        """
+        if load_mode not in self.LOAD_MODES:
+            raise ValueError(f"Unsupported load mode: {load_mode}")
+        if insert_method not in self.INSERT_METHODS:
+            raise ValueError(f"Unsupported insert method: {insert_method}")
+        
+        self.dialect = get_dialect(dialect) if isinstance(dialect, str) else dialect
+        self.connection_string = connection_string
+        self.schema = schema
+        self.timeout = timeout
+        self.fast_executemany = fast_executemany
+        self.batch_rows = batch_rows
+        self.batch_bytes = batch_bytes
+        self.load_mode = load_mode
+        self.metadata_cache = metadata_cache
+        self.catalog = catalog if metadata_cache else None
+        self.insert_method = insert_method
+        self.bulk_dir = bulk_dir
+        self.bulk_server_dir = bulk_server_dir
+        self.profiler = profiler or NULL_PROFILER
+        self.connection = None
+        self.cursor = None
+        self._fast_executemany_supported = False
+        # Table type già verificati o creati su questa connessione
+        self._table_types = set()
+    
+    def connect(self) -> bool:
+        """
+        Stabilisce connessione al database di destinazione
+        
+        Returns:
+            True se connessione riuscita
+            
+        Raises:
+            Exception: Se connessione fallisce
+        """
+        try:
+            span = self.profiler.span('sql.connect').start()
+            self.connection = self.dialect.connect(self.connection_string, self.timeout)
+            self.cursor = self.connection.cursor()
+            self._fast_executemany_supported = self.dialect.supports_fast_executemany(
+                self.connection, self.cursor
+            )
+            self.dialect.prepare(self.cursor, self.schema)
+            if self.metadata_cache and self.catalog is None:
+                catalog = MetadataCatalog()
+                catalog.load(self.cursor, self.schema, self.dialect)
+                self.catalog = catalog
+                span.add(rows=len(catalog))
+            span.stop()
+            return True
+        except Exception as e:
+            raise Exception(f"Failed to connect to {self.dialect.label}: {str(e)}")
+    
+    def _table(self, table_name: str) -> str:
+        """Nome qualificato di una tabella dello schema"""
+        return self.dialect.table(self.schema, table_name)
+    
+    @property
+    def use_fast_executemany(self) -> bool:
+        """True se gli insert usano fast_executemany + setinputsizes"""
+        return self.fast_executemany and self._fast_executemany_supported
+    
+    def close(self):
+        """Chiude connessione al database (più chiamate non hanno effetto)"""
+        cursor, connection = self.cursor, self.connection
+        self.cursor = None
+        self.connection = None
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
+    
+    def is_alive(self) -> bool:
+        """
+        Verifica che la connessione sia ancora utilizzabile
+        
+        Returns:
+            True se la connessione risponde a una query banale
+        """
+        if not self.connection:
+            return False
+        try:
+            self.cursor.execute("SELECT 1")
+            self.cursor.fetchall()
+            return True
+        except Exception:
+            return False
+    
+    def table_exists(self, table_name: str) -> bool:
+        """
+        Verifica se tabella esiste nello schema
+        
+        Args:
+            table_name: Nome della tabella
+            
+        Returns:
+            True se tabella esiste
+        """
+        if not self.connection:
+            raise Exception("Not connected to SQL Server")
+        
+        if self.catalog is not None:
+            return self.catalog.has_table(table_name)
+        
+        return self.dialect.table_exists(self.cursor, self.schema, table_name)
+    
+    def get_column_types(self, table_name: str) -> Dict[str, Tuple[str, Optional[int]]]:
+        """
+        Legge tipi e lunghezze delle colonne di una tabella
+        
+        Args:
+            table_name: Nome della tabella
+    
+        Returns:
+            Dizionario column_name -> (data_type, character_maximum_length),
+            dove la lunghezza vale -1 per i tipi (MAX) e None per i tipi non testuali
+        """
+        if not self.connection:
+            raise Exception("Not connected to SQL Server")
+        
+        if self.catalog is not None:
+            return self.catalog.get_columns(table_name)
+        
+        return self.dialect.column_types(self.cursor, self.schema, table_name)
+    
+    def _get_input_sizes(
+        self,
+        columns: List[str],
+        column_types: Dict[str, Tuple[str, Optional[int]]],
+        values_list: List[Tuple[Any, ...]]
+    ) -> List[Optional[Tuple[int, int, int]]]:
+        """
+        Calcola i parametri di setinputsizes per un batch
+        
+        Con fast_executemany pyodbc alloca per ogni parametro un buffer pari
+        alla dimensione dichiarata moltiplicata per le righe del batch: per le
+        colonne NVARCHAR(MAX) viene quindi dichiarata la lunghezza massima
+        effettiva del batch, e se supera MAX_DECLARED_NVARCHAR la colonna
+        viene inviata in streaming (dimensione 0) invece di allocare buffer enormi.
+        
+        Args:
+            columns: Colonne nell'ordine dell'INSERT
+            column_types: Tipi delle colonne (da get_column_types)
+            values_list: Valori convertiti del batch
+            
+        Returns:
+            Lista di tuple (sql_type, size, decimal_digits) o None (tipo non dichiarato)
+        """
+        pyodbc = self.dialect.driver
+        input_sizes = []
+        
+        for index, col in enumerate(columns):
+            data_type, max_length = column_types.get(col, (None, None))
+            
+            if data_type in ('nvarchar', 'nchar', 'varchar', 'char'):
+                sql_type = pyodbc.SQL_WVARCHAR if data_type.startswith('n') else pyodbc.SQL_VARCHAR
+                
+                if max_length is not None and max_length > 0:
+                    input_sizes.append((sql_type, max_length, 0))
+                    continue
+                
+                # Colonna (MAX): lunghezza effettiva dei valori del batch
+                size = _max_text_length(values[index] for values in values_list)
+                if size > self.MAX_DECLARED_NVARCHAR:
+                    size = 0
+                input_sizes.append((sql_type, size, 0))
+            elif data_type in ('varbinary', 'binary'):
+                if max_length is not None and max_length > 0:
+                    input_sizes.append((pyodbc.SQL_VARBINARY, max_length, 0))
+                    continue
+                
+                # Colonna (MAX): dimensione effettiva dei valori del batch
+                size = max((len(values[index]) for values in values_list
+                            if type(values[index]) is bytes), default=1)
+                if size > self.MAX_DECLARED_VARBINARY:
+                    size = 0
+                input_sizes.append((pyodbc.SQL_VARBINARY, size, 0))
+            elif data_type in self.INPUT_SIZE_TYPES:
+                sql_type, size, digits = self.INPUT_SIZE_TYPES[data_type]
+                input_sizes.append((getattr(pyodbc, sql_type), size, digits))
+            else:
+                input_sizes.append(None)
+        
+        return input_sizes
+    
+    def create_table(
+        self,
+        table_name: str,
+        columns: List[str],
+        column_types: Optional[Dict[str, str]] = None
+    ):
+        """
+        Crea tabella con i tipi indicati (default NVARCHAR(MAX) per tutti i campi)
+        
+        Args:
+            table_name: Nome della tabella
+            columns: Lista nomi colonne
+            column_types: Tipo SQL Server per colonna (es. da TypeMapper.schema_to_sql)
+        """
+        if not self.connection:
+            raise Exception("Not connected to SQL Server")
+        
+        column_types = column_types or {}
+        column_defs = [
+            self.dialect.column_definition(col, column_types.get(col, 'NVARCHAR(MAX)'))
+            for col in columns
+        ]
+        
+        self.cursor.execute(self.dialect.create_table_sql(self._table(table_name), column_defs))
+        self.connection.commit()
+        
+        if self.catalog is not None:
+            self.catalog.set_table(
+                table_name,
+                {col: self.dialect.normalize_type(column_types.get(col, 'NVARCHAR(MAX)')) for col in columns}
+            )
+    
+    def evolve_table(
+        self,
+        table_name: str,
+        column_schema: Dict[str, ColumnSchema],
+        type_mapper: TypeMapper,
+        exact: bool = True
+    ) -> List[str]:
+        """
+        Adegua una tabella esistente allo schema dei documenti da caricare
+        
+        Le colonne nuove vengono aggiunte come nullable (ALTER TABLE ADD,
+        operazione solo di metadati); le colonne esistenti vengono allargate
+        con ALTER COLUMN quando i nuovi valori non ci stanno (vedi
+        TypeMapper.widen_sql_type). Le colonne assenti dai documenti restano
+        invariate e ricevono NULL.
+        
+        Args:
+            table_name: Nome della tabella
+            column_schema: Schema inferito dei documenti
+            type_mapper: TypeMapper per i tipi SQL
+            exact: True se lo schema è stato inferito da tutte le righe
+            
+        Returns:
+            Descrizione delle modifiche eseguite (es. "ADD [email] NVARCHAR(64)")
+        """
+        if not self.connection:
+            raise Exception("Not connected to SQL Server")
+        
+        existing = self.get_column_types(table_name)
+        table_sql = self._table(table_name)
+        changes = []
+        statements = []
+        new_types = {}
+        
+        for col, column in column_schema.items():
+            if col not in existing:
+                sql_type = type_mapper.map_column_to_sql(column, exact)
+                changes.append(f"ADD [{col}] {sql_type} NULL")
+                statements.extend(self.dialect.add_column_sql(table_sql, col, sql_type))
+                new_types[col] = self.dialect.normalize_type(sql_type)
+                continue
+            
+            data_type, max_length = existing[col]
+            sql_type = type_mapper.widen_sql_type(data_type, max_length, column, exact)
+            if sql_type is not None:
+                changes.append(f"ALTER COLUMN [{col}] {sql_type} NULL")
+                statements.extend(self.dialect.alter_column_sql(table_sql, col, sql_type))
+                new_types[col] = self.dialect.normalize_type(sql_type)
+        
+        if not statements:
+            return []
+        
+        try:
+            with self.profiler.span('sql.evolve', table=table_name):
+                for statement in statements:
+                    self.cursor.execute(statement)
+                self.connection.commit()
+        except Exception as e:
+            self.connection.rollback()
+            raise Exception(f"Schema evolution of {table_name} failed: {str(e)}")
+        
+        if self.catalog is not None:
+            self.catalog.set_columns(table_name, new_types)
+        
+        return changes
+    
+    def import_table(
+        self, 
+        table_name: str,
+        rows: Iterable[Dict[str, Any]], 
+        type_mapper: TypeMapper,
+        auto_create: bool = True,
+        load_mode: Optional[str] = None,
+        column_schema: Optional[Dict[str, ColumnSchema]] = None,
+        insert_method: Optional[str] = None,
+        row_values: Optional[Callable[[List[str], Dict[str, str]], Iterable[Tuple[Any, ...]]]] = None,
+        exact: bool = True
+    ) -> ImportResult:
+        """
+        Importa dati di una tabella con TRUNCATE prima dell'insert
+        
+        In modalità 'swap' la tabella live non viene toccata durante il
+        caricamento: le righe vanno in `<table>__staging`, che viene poi
+        scambiata con la tabella live in una transazione breve.
+        
+        Una tabella nuova viene creata con i tipi di `column_schema`
+        (inferito da tutte le righe, es. con TypeMapper.infer_schema); senza
+        schema i tipi vengono inferiti dalle prime SCHEMA_SAMPLE_ROWS righe.
+        Una tabella esistente viene prima adeguata allo schema (evolve_table):
+        colonne nuove aggiunte e tipi allargati, senza ricrearla.
+        
+        Con `row_values` le righe arrivano già convertite nei valori SQL (es.
+        dai processi di decodifica, vedi RowBlockConverter): la funzione
+        viene chiamata quando la tabella di destinazione è pronta, con le
+        colonne dell'INSERT e il tipo Convex in cui convertire ogni colonna,
+        e `rows` non viene letto. Richiede `column_schema`; la sorgente deve
+        avere almeno un documento.
+        
+        Args:
+            table_name: Nome della tabella
+            rows: Righe da importare (lista o iteratore, es. ConvexClient.iter_table)
+            type_mapper: TypeMapper per conversione valori
+            auto_create: Se True, crea la tabella se non esiste
+            load_mode: Override della modalità di caricamento dell'importer
+            column_schema: Schema inferito da tutte le righe per la creazione della tabella
+            insert_method: Override del metodo di insert dell'importer ('executemany' o 'tvp')
+            row_values: Sorgente delle righe già convertite: (colonne, tipi) -> tuple
+            exact: False se `column_schema` è inferito da un campione (vedi
+                TypeMapper.map_column_to_sql)
+            
+        Returns:
+            ImportResult con statistiche
+        """
+        start_time = time.time()
+        load_mode = load_mode or self.load_mode
+        
+        try:
+            if row_values is not None and column_schema is None:
+                raise ValueError("row_values requires column_schema")
+            
+            # Legge la prima riga senza consumare l'iteratore
+            rows_iter = iter(rows)
+            has_rows = row_values is not None
+            if not has_rows:
+                first_row = next(rows_iter, None)
+                if first_row is not None:
+                    has_rows = True
+                    rows_iter = itertools.chain([first_row], rows_iter)
+            
+            # Verifica esistenza tabella
+            table_exists = self.table_exists(table_name)
+            
+            if not table_exists and not (auto_create and has_rows):
+                return ImportResult(
+                    table_name=table_name,
+                    success=False,
+                    rows_imported=0,
+                    error=f"Table {table_name} does not exist in schema {self.schema}",
+                    duration_seconds=time.time() - start_time
+                )
+            
+            exact = exact and column_schema is not None
+            if column_schema is None:
+                # Schema dalle prime righe, rimesse in testa all'iteratore
+                sample = list(itertools.islice(rows_iter, self.SCHEMA_SAMPLE_ROWS))
+                rows_iter = itertools.chain(sample, rows_iter)
+                column_schema = type_mapper.infer_schema(sample)
+            columns = list(column_schema)
+            schema_changes = []
+            
+            if load_mode == self.LOAD_MODE_SWAP:
+                # Caricamento in staging e swap: la tabella live resta leggibile
+                stats, schema_changes = self._load_via_staging(
+                    table_name, column_schema, exact, rows_iter, type_mapper, table_exists,
+                    insert_method, row_values
+                )
+            else:
+                if not table_exists:
+                    # Crea tabella con le colonne e i tipi inferiti
+                    column_types = type_mapper.schema_to_sql(column_schema, exact=exact)
+                    self.create_table(table_name, columns, column_types)
+                else:
+                    # Tabella esiste: nuove colonne/tipi più larghi, poi TRUNCATE
+                    schema_changes = self.evolve_table(table_name, column_schema, type_mapper, exact)
+                    self.truncate_table(table_name)
+            
+                # Import righe
+                stats = self._insert_chunks(
+                    table_name, rows_iter, type_mapper, columns=columns, insert_method=insert_method,
+                    row_values=row_values
+                )
+            
+            return ImportResult(
+                table_name=table_name,
+                success=True,
+                rows_imported=stats.rows,
+                duration_seconds=time.time() - start_time,
+                chunks=stats.chunks,
+                bytes_estimated=stats.bytes,
+                schema_changes=schema_changes or None,
+                insert_method=stats.method
+            )
+            
+        except Exception as e:
+            return ImportResult(
+                table_name=table_name,
+                success=False,
+                rows_imported=0,
+                error=str(e),
+                duration_seconds=time.time() - start_time
+            )
+    
+    def _load_via_staging(
+        self,
+        table_name: str,
+        column_schema: Dict[str, ColumnSchema],
+        exact: bool,
+        rows: Iterable[Dict[str, Any]],
+        type_mapper: TypeMapper,
+        table_exists: bool,
+        insert_method: Optional[str] = None,
+        row_values: Optional[Callable[[List[str], Dict[str, str]], Iterable[Tuple[Any, ...]]]] = None
+    ) -> Tuple[InsertStats, List[str]]:
+        """
+        Carica le righe in `<table>__staging` e la scambia con la tabella live
+        
+        La staging è un heap senza indici con le stesse colonne della tabella
+        live (SELECT TOP 0 * INTO), caricato con hint TABLOCK per consentire
+        il minimal logging. Le modifiche di schema (evolve_table) vengono
+        applicate alla staging, quindi la tabella live viene bloccata solo
+        durante lo swap. Gli indici e i permessi definiti sulla tabella live
+        non vengono riportati sulla nuova tabella.
+        
+        Args:
+            table_name: Nome della tabella live
+            column_schema: Schema inferito dei documenti
+            exact: True se lo schema è stato inferito da tutte le righe
+            rows: Righe da caricare
+            type_mapper: TypeMapper per conversione valori
+            table_exists: True se la tabella live esiste già
+            insert_method: Metodo di insert (default: quello dell'importer)
+            row_values: Sorgente delle righe già convertite (vedi import_table)
+            
+        Returns:
+            Tupla (InsertStats del caricamento, modifiche di schema eseguite)
+        """
+        staging_name = f"{table_name}{self.STAGING_SUFFIX}"
+        schema_changes = []
+        
+        # Residui di un caricamento precedente interrotto
+        self.drop_table(staging_name)
+        
+        try:
+            if table_exists:
+                self.copy_table_structure(table_name, staging_name)
+                schema_changes = self.evolve_table(staging_name, column_schema, type_mapper, exact)
+            else:
+                column_types = type_mapper.schema_to_sql(column_schema, exact=exact)
+                self.create_table(staging_name, list(column_types), column_types)
+            
+            stats = self._insert_chunks(
+                staging_name, rows, type_mapper, table_hint='TABLOCK', columns=list(column_schema),
+                insert_method=insert_method, row_values=row_values
+            )
+            self.swap_table(table_name, staging_name)
+            return stats, schema_changes
+        except Exception:
+            # La tabella live resta invariata
+            self.drop_table(staging_name)
+            raise
+    
+    def swap_table(self, table_name: str, staging_name: str):
+        """
+        Sostituisce la tabella live con la staging in una transazione breve
+        
+        Entrambi i rename (sp_rename su SQL Server) avvengono nella stessa transazione: i lettori
+        vedono la vecchia tabella completa oppure la nuova, mai una tabella
+        vuota o parziale. La vecchia tabella viene eliminata dopo il commit.
+        Le opzioni di sessione dello swap (XACT_ABORT su SQL Server) vengono
+        ripristinate dopo commit o rollback.
+        
+        Args:
+            table_name: Nome della tabella live
+            staging_name: Nome della tabella di staging
+        """
+        if not self.connection:
+            raise Exception("Not connected to SQL Server")
+        
+        old_name = f"{table_name}{self.OLD_SUFFIX}"
+        self.drop_table(old_name)
+        
+        table_exists = self.table_exists(table_name)
+        
+        statements = []
+        if table_exists:
+            statements.extend(self.dialect.rename_table_statements(self.schema, table_name, old_name))
+        statements.extend(self.dialect.rename_table_statements(self.schema, staging_name, table_name))
+        
+        begin_sql = self.dialect.begin_swap_sql()
+        try:
+            with self.profiler.span('sql.swap', table=table_name):
+                if begin_sql:
+                    self.cursor.execute(begin_sql)
+                for query, params in statements:
+                    if params:
+                        self.cursor.execute(query, params)
+                    else:
+                        self.cursor.execute(query)
+                self.connection.commit()
+        except Exception as e:
+            self.connection.rollback()
+            raise Exception(f"Table swap failed: {str(e)}")
+        finally:
+            end_sql = self.dialect.end_swap_sql()
+            if begin_sql and end_sql:
+                try:
+                    self.cursor.execute(end_sql)
+                except Exception:
+                    # Connessione non più utilizzabile: l'errore dello swap è già stato sollevato
+                    pass
+        
+        if self.catalog is not None:
+            if table_exists:
+                self.catalog.rename_table(table_name, old_name)
+            self.catalog.rename_table(staging_name, table_name)
+        
+        if table_exists:
+            self.drop_table(old_name)
+    
+    def import_table_incremental(
+        self,
+        table_name: str,
+        rows_source: Callable[[], Iterable[Dict[str, Any]]],
+        type_mapper: TypeMapper,
+        column_schema: Optional[Dict[str, ColumnSchema]] = None,
+        insert_method: Optional[str] = None
+    ) -> ImportResult:
+        """
+        Importa solo i documenti nuovi rispetto al watermark e li unisce con MERGE
+        
+        Il watermark è la coppia (_creationTime, _id) più alta caricata, salvata
+        in `[schema].[_sync_watermarks]`. I documenti successivi al watermark
+        vengono caricati in `<table>__staging` e uniti alla tabella con MERGE
+        su `_id`; MERGE e aggiornamento del watermark sono nella stessa transazione.
+        
+        Si torna a un caricamento completo (import_table) se il watermark o la
+        tabella mancano. Se i documenti nuovi contengono campi non presenti
+        nella tabella, o valori che non stanno nei tipi delle colonne, la
+        tabella viene adeguata con evolve_table prima del MERGE. Le modifiche
+        e le cancellazioni di documenti già caricati non vengono rilevate in
+        questa modalità.
+        
+        Args:
+            table_name: Nome della tabella
+            rows_source: Funzione che restituisce un nuovo iteratore sulle righe
+                (serve a rileggere lo snapshot in caso di fallback)
+            type_mapper: TypeMapper per conversione valori
+            column_schema: Schema inferito per la creazione della tabella (vedi import_table)
+            insert_method: Override del metodo di insert dell'importer ('executemany' o 'tvp')
+            
+        Returns:
+            ImportResult con statistiche (sync_mode 'incremental' o 'full')
+        """
+        start_time = time.time()
+        
+        try:
+            self.ensure_watermark_table()
+            watermark = self.get_watermark(table_name)
+            table_exists = self.table_exists(table_name)
+            
+            if watermark is None or not table_exists:
+                reason = 'missing watermark' if table_exists else 'missing table'
+                return self._import_full_with_watermark(
+                    table_name, rows_source, type_mapper, reason, start_time, column_schema,
+                    insert_method
+                )
+            
+            # Solo i documenti successivi al watermark (in memoria: per le tabelle
+            # append-heavy sono pochi rispetto al totale)
+            last_key = (watermark['creation_time'], watermark['last_id'])
+            tracker = _WatermarkTracker(rows_source())
+            new_rows = [
+                row for row in tracker
+                if (key := _watermark_key(row)) is not None and key > last_key
+            ]
+            
+            # Campi nuovi o valori più larghi: ALTER TABLE invece di un ricaricamento completo
+            schema_changes = []
+            if new_rows:
+                schema_changes = self.evolve_table(
+                    table_name, type_mapper.infer_schema(new_rows), type_mapper
+                )
+            target_columns = list(self.get_column_types(table_name).keys())
+            
+            stats = InsertStats(method=self._resolve_insert_method(insert_method))
+            if new_rows:
+                stats = self._merge_rows(
+                    table_name, new_rows, target_columns, type_mapper, insert_method
+                )
+            
+            # Aggiorna il watermark anche se non ci sono documenti nuovi (colonne correnti)
+            self.set_watermark(table_name, tracker.max_key, target_columns)
+            self.connection.commit()
+            
+            return ImportResult(
+                table_name=table_name,
+                success=True,
+                rows_imported=stats.rows,
+                duration_seconds=time.time() - start_time,
+                chunks=stats.chunks,
+                bytes_estimated=stats.bytes,
+                sync_mode='incremental',
+                schema_changes=schema_changes or None,
+                insert_method=stats.method
+            )
+            
+        except Exception as e:
+            if self.connection:
+                self.connection.rollback()
+            return ImportResult(
+                table_name=table_name,
+                success=False,
+                rows_imported=0,
+                error=str(e),
+                duration_seconds=time.time() - start_time,
+                sync_mode='incremental'
+            )
+    
+    def _import_full_with_watermark(
+        self,
+        table_name: str,
+        rows_source: Callable[[], Iterable[Dict[str, Any]]],
+        type_mapper: TypeMapper,
+        reason: str,
+        start_time: float,
+        column_schema: Optional[Dict[str, ColumnSchema]] = None,
+        insert_method: Optional[str] = None
+    ) -> ImportResult:
+        """
+        Caricamento completo di fallback che inizializza il watermark
+        
+        Args:
+            table_name: Nome della tabella
+            rows_source: Funzione che restituisce un nuovo iteratore sulle righe
+            type_mapper: TypeMapper per conversione valori
+            reason: Motivo del fallback
+            start_time: Inizio dell'import (per la durata)
+            column_schema: Schema inferito per la creazione della tabella
+            insert_method: Metodo di insert (default: quello dell'importer)
+            
+        Returns:
+            ImportResult del caricamento completo
+        """
+        # Il watermark precedente non è più valido durante il ricaricamento
+        self.clear_watermark(table_name)
+        self.connection.commit()
+        
+        tracker = _WatermarkTracker(rows_source())
+        result = self.import_table(
+            table_name, tracker, type_mapper, auto_create=True, column_schema=column_schema,
+            insert_method=insert_method
+        )
+        
+        if result.success and tracker.max_key is not None:
+            self.set_watermark(
+                table_name, tracker.max_key, list(self.get_column_types(table_name).keys())
+            )
+            self.connection.commit()
+        
+        result.duration_seconds = time.time() - start_time
+        result.fallback_reason = reason
+        return result
+    
+    def _merge_rows(
+        self,
+        table_name: str,
+        rows: List[Dict[str, Any]],
+        columns: List[str],
+        type_mapper: TypeMapper,
+        insert_method: Optional[str] = None
+    ) -> InsertStats:
+        """
+        Carica le righe in staging e le unisce alla tabella con MERGE su _id
+        
+        Il MERGE (DELETE + INSERT sugli altri dialetti) non viene committato:
+        il chiamante esegue il commit insieme all'aggiornamento del watermark.
+        
+        Args:
+            table_name: Nome della tabella
+            rows: Righe da unire
+            columns: Colonne della tabella di destinazione
+            type_mapper: TypeMapper per conversione valori
+            insert_method: Metodo di insert (default: quello dell'importer)
+            
+        Returns:
+            InsertStats del caricamento in staging
+        """
+        staging_name = f"{table_name}{self.STAGING_SUFFIX}"
+        
+        self.drop_table(staging_name)
+        self.copy_table_structure(table_name, staging_name)
+        
+        try:
+            stats = self._insert_chunks(
+                staging_name, rows, type_mapper, table_hint='TABLOCK', columns=columns,
+                insert_method=insert_method
+            )
+            
+            with self.profiler.span('sql.merge', table=table_name) as span:
+                for query in self.dialect.upsert_sql(
+                    self._table(table_name), self._table(staging_name), columns, '_id'
+                ):
+                    self.cursor.execute(query)
+                span.add(rows=stats.rows)
+            return stats
+        finally:
+            self.cursor.execute(f"DROP TABLE IF EXISTS {self._table(staging_name)}")
+            if self.catalog is not None:
+                self.catalog.drop_table(staging_name)
+    
+    def apply_document_changes(
+        self,
+        table_name: str,
+        changes: Iterable[Dict[str, Any]],
+        type_mapper: TypeMapper,
+        insert_method: Optional[str] = None
+    ) -> ImportResult:
+        """
+        Applica a una tabella esistente i documenti modificati ed eliminati
+        
+        Le modifiche (es. ConvexClient.iter_document_deltas) sono documenti
+        completi, oppure documenti con `_deleted: true` da eliminare. Per ogni
+        _id conta solo l'ultima modifica: i documenti modificati vengono uniti
+        con MERGE su _id (dopo evolve_table per campi nuovi o valori più
+        larghi), quelli eliminati rimossi con DELETE, nella stessa transazione.
+        
+        Args:
+            table_name: Nome della tabella
+            changes: Documenti modificati o eliminati, in ordine di modifica
+            type_mapper: TypeMapper per conversione valori
+            insert_method: Override del metodo di insert dell'importer ('executemany' o 'tvp')
+        
+        Returns:
+            ImportResult con righe unite ed eliminate (sync_mode 'delta')
+        """
+        start_time = time.time()
+        
+        try:
+            latest: Dict[str, Dict[str, Any]] = {}
+            for document in changes:
+                # Le modifiche sono poche rispetto alla tabella: ultima versione per _id in memoria
+                latest.pop(document['_id'], None)
+                latest[document['_id']] = document
+            
+            deleted_ids = [doc_id for doc_id, document in latest.items() if document.get('_deleted')]
+            upserts = [document for document in latest.values() if not document.get('_deleted')]
+            
+            schema_changes = []
+            stats = InsertStats(method=self._resolve_insert_method(insert_method))
+            if upserts:
+                schema_changes = self.evolve_table(
+                    table_name, type_mapper.infer_schema(upserts), type_mapper
+                )
+                stats = self._merge_rows(
+                    table_name, upserts, list(self.get_column_types(table_name).keys()),
+                    type_mapper, insert_method
+                )
+            if deleted_ids:
+                self.delete_rows(table_name, deleted_ids)
+            self.connection.commit()
+            
+            return ImportResult(
+                table_name=table_name,
+                success=True,
+                rows_imported=stats.rows,
+                duration_seconds=time.time() - start_time,
+                chunks=stats.chunks,
+                bytes_estimated=stats.bytes,
+                sync_mode='delta',
+                schema_changes=schema_changes or None,
+                insert_method=stats.method,
+                rows_deleted=len(deleted_ids)
+            )
+        
+        except Exception as e:
+            if self.connection:
+                self.connection.rollback()
+            return ImportResult(
+                table_name=table_name,
+                success=False,
+                rows_imported=0,
+                error=str(e),
+                duration_seconds=time.time() - start_time,
+                sync_mode='delta'
+            )
+    
+    def delete_rows(self, table_name: str, ids: List[str]):
+        """
+        Elimina le righe con gli _id indicati (senza commit)
+        
+        Args:
+            table_name: Nome della tabella
+            ids: Valori di _id da eliminare
+        """
+        if not self.connection:
+            raise Exception("Not connected to SQL Server")
+        
+        # SQL Server accetta al massimo 2100 parametri per istruzione
+        for start in range(0, len(ids), self.DELETE_BATCH_SIZE):
+            batch = ids[start:start + self.DELETE_BATCH_SIZE]
+            placeholders = ', '.join('?' for _ in batch)
+            self.cursor.execute(
+                f"DELETE FROM {self._table(table_name)} WHERE {self.dialect.quote('_id')} IN ({placeholders})",
+                batch
+            )
+    
+    def ensure_watermark_table(self):
+        """
+        Crea la tabella di controllo dei watermark se non esiste
+        
+        Con più connessioni (import paralleli) la tabella può essere creata
+        da un'altra connessione tra la verifica e il CREATE TABLE: l'errore
+        viene ignorato se la tabella esiste.
+        """
+        if not self.connection:
+            raise Exception("Not connected to SQL Server")
+        
+        column_def = self.dialect.column_definition
+        query = self.dialect.create_table_if_missing_sql(self._table(self.WATERMARK_TABLE), [
+            column_def('table_name', 'NVARCHAR(128)', 'NOT NULL PRIMARY KEY'),
+            column_def('creation_time', 'FLOAT', 'NULL'),
+            column_def('last_id', 'NVARCHAR(128)', 'NULL'),
+            column_def('columns', 'NVARCHAR(MAX)', 'NULL'),
+            column_def('updated_at', 'DATETIME2', 'NOT NULL'),
+        ])
+        try:
+            self.cursor.execute(query)
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            if not self.dialect.table_exists(self.cursor, self.schema, self.WATERMARK_TABLE):
+                raise
+        
+        if self.catalog is not None and not self.catalog.has_table(self.WATERMARK_TABLE):
+            normalize = self.dialect.normalize_type
+            self.catalog.set_table(self.WATERMARK_TABLE, {
+                'table_name': normalize('NVARCHAR(128)'),
+                'creation_time': normalize('FLOAT'),
+                'last_id': normalize('NVARCHAR(128)'),
+                'columns': normalize('NVARCHAR(MAX)'),
+                'updated_at': normalize('DATETIME2'),
+            })
+    
+    def get_watermark(self, table_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Legge il watermark di una tabella
+        
+        Args:
+            table_name: Nome della tabella
+            
+        Returns:
+            Dizionario con creation_time, last_id e columns, o None se assente
+        """
+        if not self.connection:
+            raise Exception("Not connected to SQL Server")
+        
+        q = self.dialect.quote
+        query = f"""
+            SELECT {q('creation_time')}, {q('last_id')}, {q('columns')}
+            FROM {self._table(self.WATERMARK_TABLE)}
+            WHERE {q('table_name')} = ?
+        """
+        self.cursor.execute(query, (table_name,))
+        row = self.cursor.fetchone()
+        
+        if row is None or row[0] is None or row[1] is None:
+            return None
+        
+        return {
+            'creation_time': float(row[0]),
+            'last_id': row[1],
+            'columns': json.loads(row[2]) if row[2] else []
+        }
+    
+    def set_watermark(self, table_name: str, max_key: Optional[Tuple[float, str]], columns: List[str]):
+        """
+        Salva il watermark di una tabella (senza commit)
+        
+        Args:
+            table_name: Nome della tabella
+            max_key: Coppia (_creationTime, _id) più alta caricata; None per non modificarla
+            columns: Colonne della tabella al momento del caricamento
+        """
+        if not self.connection:
+            raise Exception("Not connected to SQL Server")
+        
+        watermark_table = self._table(self.WATERMARK_TABLE)
+        q = self.dialect.quote
+        now_sql = self.dialect.NOW_SQL
+        
+        if max_key is None:
+            self.cursor.execute(
+                f"UPDATE {watermark_table} SET {q('columns')} = ?, {q('updated_at')} = {now_sql} "
+                f"WHERE {q('table_name')} = ?",
+                (json.dumps(columns), table_name)
+            )
+            return
+        
+        self.cursor.execute(f"DELETE FROM {watermark_table} WHERE {q('table_name')} = ?", (table_name,))
+        self.cursor.execute(
+            f"INSERT INTO {watermark_table} "
+            f"({q('table_name')}, {q('creation_time')}, {q('last_id')}, {q('columns')}, {q('updated_at')}) "
+            f"VALUES (?, ?, ?, ?, {now_sql})",
+            (table_name, max_key[0], max_key[1], json.dumps(columns))
+        )
+    
+    def clear_watermark(self, table_name: str):
+        """
+        Elimina il watermark di una tabella (senza commit)
+        
+        Args:
+            table_name: Nome della tabella
+        """
+        if not self.connection:
+            raise Exception("Not connected to SQL Server")
+        
+        self.cursor.execute(
+            f"DELETE FROM {self._table(self.WATERMARK_TABLE)} WHERE {self.dialect.quote('table_name')} = ?",
+            (table_name,)
+        )
+    
+    def drop_table(self, table_name: str):
+        """
+        Elimina una tabella se esiste
+        
+        Args:
+            table_name: Nome della tabella
+        """
+        if not self.connection:
+            raise Exception("Not connected to SQL Server")
+        
+        query = f"DROP TABLE IF EXISTS {self._table(table_name)}"
+        self.cursor.execute(query)
+        self.connection.commit()
+        
+        if self.catalog is not None:
+            self.catalog.drop_table(table_name)
+    
+    def copy_table_structure(self, table_name: str, new_name: str):
+        """
+        Crea una tabella vuota con le stesse colonne di un'altra (es. la staging)
+        
+        Su SQL Server con SELECT TOP 0 * INTO; se il dialetto non conserva i
+        tipi con una copia (SQLite) la tabella viene creata dai tipi letti.
+        
+        Args:
+            table_name: Tabella di origine
+            new_name: Nome della nuova tabella
+        """
+        if not self.connection:
+            raise Exception("Not connected to SQL Server")
+        
+        query = self.dialect.copy_structure_sql(self._table(table_name), self._table(new_name))
+        if query is None:
+            column_types = {
+                col: format_sql_type(data_type, max_length)
+                for col, (data_type, max_length) in self.get_column_types(table_name).items()
+            }
+            self.create_table(new_name, list(column_types), column_types)
+            return
+        
+        self.cursor.execute(query)
+        self.connection.commit()
+        
+        if self.catalog is not None:
+            self.catalog.copy_table(table_name, new_name)
+    
+    def bulk_insert(
+        self, 
+        table_name: str, 
+        rows: Iterable[Dict[str, Any]],
+        type_mapper: TypeMapper,
+        batch_size: Optional[int] = None
+    ) -> int:
+        """
+        Esegue bulk insert ottimizzato
+        
+        Le righe vengono consumate in chunk limitati sia per numero di righe
+        sia per byte stimati, con un commit per chunk: `rows` può essere un
+        iteratore e in memoria resta un solo chunk alla volta.
+        
+        Args:
+            table_name: Nome della tabella
+            rows: Righe da inserire (lista o iteratore)
+            type_mapper: TypeMapper per conversione valori
+            batch_size: Righe massime per chunk (default: batch_rows dell'importer)
+            
+        Returns:
+            Numero di righe inserite
+            
+        Raises:
+            Exception: Se insert fallisce
+        """
+        return self._insert_chunks(table_name, rows, type_mapper, batch_size).rows
+    
+    def _insert_chunks(
+        self,
+        table_name: str,
+        rows: Iterable[Dict[str, Any]],
+        type_mapper: TypeMapper,
+        batch_size: Optional[int] = None,
+        table_hint: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        insert_method: Optional[str] = None,
+        row_values: Optional[Callable[[List[str], Dict[str, str]], Iterable[Tuple[Any, ...]]]] = None
+    ) -> InsertStats:
+        """
+        Inserisce le righe in chunk con commit per chunk (vedi bulk_insert)
+        
+        Con il metodo 'tvp' ogni chunk è inviato come un solo table-valued
+        parameter a un INSERT ... SELECT: un round trip per chunk anche
+        senza fast_executemany. Con il metodo 'bcp' le righe vengono scritte
+        in un file dati caricato con un solo BULK INSERT (vedi _bulk_copy).
+        
+        Args:
+            table_name: Nome della tabella
+            rows: Righe da inserire (lista o iteratore)
+            type_mapper: TypeMapper per conversione valori
+            batch_size: Righe massime per chunk (default: batch_rows dell'importer)
+            table_hint: Hint di tabella per l'INSERT (es. 'TABLOCK')
+            columns: Colonne dell'INSERT (default: chiavi della prima riga)
+            insert_method: Metodo di insert (default: quello dell'importer)
+            row_values: Sorgente delle righe già convertite (vedi import_table,
+                richiede `columns`); `rows` non viene letto
+            
+        Returns:
+            InsertStats con righe, chunk e byte inseriti
+            
+        Raises:
+            Exception: Se insert fallisce
+        """
+        stats = InsertStats(method=self._resolve_insert_method(insert_method))
+        
+        rows_iter = iter(rows)
+        first_row = None
+        if row_values is None:
+            first_row = next(rows_iter, None)
+            if first_row is None:
+                return stats
+        
+        if not self.connection:
+            raise Exception("Not connected to SQL Server")
+        
+        max_rows = batch_size or self.batch_rows
         
         # Ottieni colonne dalla prima riga
-        columns = list(rows[0].keys())
+        if columns is None:
+            columns = list(first_row.keys())
         
         # Costruisci query INSERT
-        columns_sql = ', '.join([f'[{col}]' for col in columns])
+        columns_sql = ', '.join([self.dialect.quote(col) for col in columns])
         placeholders = ', '.join(['?' for _ in columns])
-        query = f"INSERT INTO [{self.schema}].[{table_name}] ({columns_sql}) VALUES ({placeholders})"
+        hint_sql = self.dialect.table_hint_sql(table_hint)
+        query = (
+            f"INSERT INTO {self._table(table_name)}{hint_sql} "
+            f"({columns_sql}) VALUES ({placeholders})"
+        )
+        column_types = self.get_column_types(table_name)
         
-        # Prepara valori per bulk insert
-        values_list = []
-        for row in rows:
-            # Converti valori usando type_mapper
-            converted_values = []
-            for col in columns:
-                value = row.get(col)
-                # Inferisci tipo e converti
-                convex_type = type_mapper.infer_convex_type(value)
-                converted_value = type_mapper.convert_value(value, convex_type)
-                converted_values.append(converted_value)
-            values_list.append(tuple(converted_values))
+        use_tvp = stats.method == self.INSERT_METHOD_TVP
+        if use_tvp:
+            type_name = self.ensure_table_type(columns, column_types)
+            query = (
+                f"INSERT INTO {self._table(table_name)}{hint_sql} "
+                f"({columns_sql}) SELECT {columns_sql} FROM ?"
+            )
+        
+        if row_values is not None:
+            # Righe convertite fuori dall'importer nel tipo delle colonne di
+            # destinazione (le altre con il percorso generico)
+            schema = {col: 'null' for col in columns}
+            schema.update(self._target_types(columns, column_types, type_mapper))
+            values_iter = iter(row_values(columns, schema))
+            first_values = next(values_iter, None)
+            if first_values is None:
+                return stats
+            values_iter = itertools.chain([first_values], values_iter)
+        else:
+            # Converter compilato una volta per tabella: le colonne tipizzate sono
+            # convertite nel tipo della colonna di destinazione, quelle testuali
+            # secondo il tipo dei valori di un campione iniziale
+            sample = [first_row]
+            sample.extend(itertools.islice(rows_iter, min(max_rows, self.SCHEMA_SAMPLE_ROWS) - 1))
+            schema = type_mapper.infer_column_types(sample, columns)
+            schema.update(self._target_types(columns, column_types, type_mapper))
+            convert_row = type_mapper.build_row_converter(columns, schema)
+            values_iter = map(convert_row, itertools.chain(sample, rows_iter))
+        
+        if stats.method == self.INSERT_METHOD_BCP:
+            return self._bulk_copy(table_name, columns, column_types, values_iter, max_rows, stats)
         
-        # Esegui bulk insert
+        # fast_executemany invia ogni chunk come array di parametri in un solo round trip
+        use_fast = self.use_fast_executemany and not use_tvp
+        if hasattr(self.cursor, 'fast_executemany'):
+            self.cursor.fast_executemany = use_fast
+        
+        # Tempi per chunk: preparazione (conversione dei valori e attesa delle
+        # righe in ingresso, inclusa la decodifica senza pipeline) e insert + commit
+        record = self.profiler.record
+        clock = time.perf_counter
+        cpu_clock = time.thread_time
+        chunks = _iter_chunks(values_iter, max_rows, self.batch_bytes)
+        
+        try:
+            while True:
+                wall_start, cpu_start = clock(), cpu_clock()
+                chunk = next(chunks, None)
+                wall_ready, cpu_ready = clock(), cpu_clock()
+                if chunk is None:
+                    break
+                values_list, chunk_bytes = chunk
+                
+                if use_tvp:
+                    # Il tipo del TVP va indicato per nome: le prime due voci
+                    # della lista sono nome del table type e schema
+                    self.cursor.execute(query, ([type_name, self.schema, *values_list],))
+                else:
+                    if use_fast:
+                        self.cursor.setinputsizes(
+                            self._get_input_sizes(columns, column_types, values_list)
+                        )
+                    self.cursor.executemany(query, values_list)
+                
+                # Commit per chunk: memoria e transaction log restano limitati
+                self.connection.commit()
+                stats.rows += len(values_list)
+                stats.chunks += 1
+                stats.bytes += chunk_bytes
+                
+                record(
+                    'sql.convert', wall_ready - wall_start, cpu_ready - cpu_start,
+                    rows=len(values_list), table=table_name
+                )
+                record(
+                    'sql.insert', clock() - wall_ready, cpu_clock() - cpu_ready,
+                    rows=len(values_list), bytes=chunk_bytes, table=table_name, method=stats.method
+                )
+            
+            return stats
+        except Exception as e:
+            self.connection.rollback()
+            raise Exception(
+                f"Bulk insert failed after {stats.rows} committed rows: {str(e)}"
+            )
+    
+    @staticmethod
+    def _target_types(
+        columns: List[str],
+        column_types: Dict[str, Tuple[str, Optional[int]]],
+        type_mapper: TypeMapper
+    ) -> Dict[str, str]:
+        """
+        Tipo Convex in cui convertire i valori delle colonne con un tipo SQL noto
+        
+        Args:
+            columns: Colonne dell'INSERT
+            column_types: Tipi delle colonne della tabella (vedi get_column_types)
+            type_mapper: TypeMapper per conversione valori
+            
+        Returns:
+            Dizionario column_name -> convex_type (solo le colonne con tipo noto)
+        """
+        types = {}
+        for col in columns:
+            data_type = column_types.get(col, (None, None))[0]
+            target_type = type_mapper.convex_type_for_sql(data_type)
+            if target_type is None and data_type is not None and data_type.lower() in type_mapper.TEXT_SQL_TYPES:
+                target_type = 'string'
+            if target_type is not None:
+                types[col] = target_type
+        return types
+    
+    def _bulk_copy(
+        self,
+        table_name: str,
+        columns: List[str],
+        column_types: Dict[str, Tuple[str, Optional[int]]],
+        values: Iterable[Tuple[Any, ...]],
+        batch_size: int,
+        stats: InsertStats
+    ) -> InsertStats:
+        """
+        Carica righe convertite con un file dati bcp nativo e BULK INSERT
+        
+        Il file dati e il format file vengono scritti in streaming in
+        bulk_dir e rimossi dopo il caricamento. BULK INSERT usa TABLOCK
+        (minimal logging su heap e tabelle vuote) e BATCHSIZE pari alle
+        righe per chunk; il commit avviene al termine del caricamento.
+        
+        Args:
+            table_name: Nome della tabella
+            columns: Colonne dei valori
+            column_types: Tipi delle colonne della tabella (da get_column_types)
+            values: Tuple di valori convertiti
+            batch_size: Righe per batch di BULK INSERT
+            stats: InsertStats da completare
+            
+        Returns:
+            InsertStats con righe, batch e byte del file dati
+            
+        Raises:
+            Exception: Se scrittura o caricamento falliscono
+        """
+        writer = BcpWriter(columns, column_types)
+        
+        local_dir = self.bulk_dir or tempfile.gettempdir()
+        server_dir = self.bulk_server_dir or local_dir
+        base_name = f"{table_name}_{uuid.uuid4().hex[:12]}"
+        data_path = os.path.join(local_dir, f"{base_name}.dat")
+        format_path = os.path.join(local_dir, f"{base_name}.fmt")
+        
+        try:
+            with self.profiler.span('bcp.write', table=table_name) as span:
+                writer.write_format_file(format_path)
+                rows = writer.write_data_file(data_path, values)
+                span.add(rows=rows, bytes=os.path.getsize(data_path))
+            
+            query = (
+                f"BULK INSERT {self._table(table_name)} "
+                f"FROM {_sql_string(_server_path(server_dir, f'{base_name}.dat'))} "
+                f"WITH (FORMATFILE = {_sql_string(_server_path(server_dir, f'{base_name}.fmt'))}, "
+                f"TABLOCK, KEEPNULLS, BATCHSIZE = {batch_size})"
+            )
+            with self.profiler.span('sql.insert', table=table_name, method=stats.method) as span:
+                self.cursor.execute(query)
+                self.connection.commit()
+                span.add(rows=rows)
+            
+            stats.rows = rows
+            stats.chunks = math.ceil(rows / batch_size)
+            stats.bytes = os.path.getsize(data_path)
+            return stats
+        except Exception as e:
+            self.connection.rollback()
+            raise Exception(f"Bulk copy into {table_name} failed: {str(e)}")
+        finally:
+            for path in (data_path, format_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+    
+    def _resolve_insert_method(self, insert_method: Optional[str]) -> str:
+        """
+        Metodo di insert effettivo per un caricamento
+        
+        TVP e bcp sono disponibili solo con il dialetto SQL Server, e i TVP
+        richiedono un driver Microsoft ODBC Driver for SQL Server (gli stessi
+        di fast_executemany): negli altri casi si usa executemany.
+        
+        Args:
+            insert_method: Metodo richiesto (None: quello dell'importer)
+            
+        Returns:
+            'executemany', 'tvp' o 'bcp'
+        """
+        method = insert_method or self.insert_method
+        if method not in self.INSERT_METHODS:
+            raise ValueError(f"Unsupported insert method: {method}")
+        if method not in self.dialect.INSERT_METHODS:
+            return self.INSERT_METHOD_EXECUTEMANY
+        if method == self.INSERT_METHOD_TVP and not self._fast_executemany_supported:
+            return self.INSERT_METHOD_EXECUTEMANY
+        return method
+    
+    def ensure_table_type(
+        self,
+        columns: List[str],
+        column_types: Dict[str, Tuple[str, Optional[int]]]
+    ) -> str:
+        """
+        Crea (o riusa) il table type con le colonne di un INSERT via TVP
+        
+        Il nome contiene un hash di nomi e tipi delle colonne: tabelle con lo
+        stesso layout condividono il tipo, e una modifica di schema produce
+        un tipo nuovo invece di alterare quello in uso.
+        
+        Args:
+            columns: Colonne dell'INSERT
+            column_types: Tipi delle colonne di destinazione (da get_column_types)
+            
+        Returns:
+            Nome del table type (nello schema dell'importer)
+        """
+        if not self.connection:
+            raise Exception("Not connected to SQL Server")
+        
+        definitions = []
+        for col in columns:
+            data_type, max_length = column_types.get(col, (None, None))
+            if data_type not in self.TVP_COLUMN_TYPES:
+                sql_type = 'NVARCHAR(MAX)'
+            else:
+                sql_type = format_sql_type(data_type, max_length)
+            definitions.append(f"[{col}] {sql_type}")
+        
+        digest = hashlib.sha1('\n'.join(definitions).encode('utf-8')).hexdigest()[:16]
+        type_name = f"{self.TVP_TYPE_PREFIX}{digest}"
+        if type_name in self._table_types:
+            return type_name
+        
+        qualified_name = f"[{self.schema}].[{type_name}]"
+        columns_sql = ',\n    '.join(definitions)
+        query = f"""
+IF TYPE_ID(N'{qualified_name}') IS NULL
+CREATE TYPE {qualified_name} AS TABLE (
+    {columns_sql}
+)
+"""
         try:
-            self.cursor.executemany(query, values_list)
+            self.cursor.execute(query)
             self.connection.commit()
-            return len(values_list)
         except Exception as e:
+            # Un altro importer può averlo creato nel frattempo
             self.connection.rollback()
-            raise Exception(f"Bulk insert failed: {str(e)}")
+            self.cursor.execute("SELECT TYPE_ID(?)", (qualified_name,))
+            row = self.cursor.fetchone()
+            if not row or row[0] is None:
+                raise Exception(f"Failed to create table type {type_name}: {str(e)}")
+        
+        self._table_types.add(type_name)
+        return type_name
     
     def truncate_table(self, table_name: str):
         """
@@ -376,6 +2689,6 @@ CREATE TABLE [{self.schema}].[{table_name}] (
         if not self.connection:
             raise Exception("Not connected to SQL Server")
         
-        query = f"TRUNCATE TABLE [{self.schema}].[{table_name}]"
+        query = self.dialect.truncate_sql(self._table(table_name))
         self.cursor.execute(query)
         self.connection.commit()
@@ -0,0 +1,565 @@
+"""
+Stato locale persistente tra le esecuzioni del sync.
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+
+def _load_json(path: str) -> Dict[str, Any]:
+    """
+    Legge un file di stato JSON.
+    
+    Un file mancante o corrotto viene trattato come stato vuoto:
+    lo stato è solo un'ottimizzazione e non deve bloccare il sync.
+    
+    Args:
+        path: Path del file JSON
+    
+    Returns:
+        Contenuto del file o dizionario vuoto
+    """
+    if not os.path.exists(path):
+        return {}
+    
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_json(path: str, data: Dict[str, Any]):
+    """
+    Scrive un file di stato JSON in modo atomico (file temporaneo + replace).
+    
+    Args:
+        path: Path del file JSON
+        data: Dati da salvare
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+class FingerprintStore:
+    """
+    Fingerprint dell'ultimo caricamento riuscito di ogni tabella.
+    
+    Il fingerprint è formato da CRC32 e dimensione non compressa del
+    membro documents.jsonl, letti dalla central directory dello ZIP, e
+    dall'hash delle opzioni della tabella che cambiano il risultato del
+    caricamento (es. flatten, child_tables, sync_mode). Viene salvato per app e per tabella SQL di destinazione nel file
+    `fingerprints_<app>.json` della directory di stato.
+    """
+    
+    def __init__(self, state_dir: str, app_name: str):
+        """
+        Inizializza lo store e carica i fingerprint salvati.
+        
+        Args:
+            state_dir: Directory dei file di stato
+            app_name: Nome dell'applicazione Convex
+        """
+        self.app_name = app_name
+        self.path = os.path.join(state_dir, f"fingerprints_{app_name}.json")
+        self._entries: Dict[str, Dict[str, Any]] = _load_json(self.path)
+        # Le tabelle possono essere importate in parallelo (sync.py --parallel)
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(schema: str, sql_table: str) -> str:
+        """Chiave della tabella di destinazione."""
+        return f"{schema}.{sql_table}"
+    
+    def get(self, schema: str, sql_table: str) -> Optional[Dict[str, Any]]:
+        """
+        Restituisce il fingerprint salvato per una tabella.
+        
+        Args:
+            schema: Schema SQL di destinazione
+            sql_table: Tabella SQL di destinazione
+        
+        Returns:
+            Fingerprint salvato o None
+        """
+        return self._entries.get(self._key(schema, sql_table))
+    
+    @staticmethod
+    def options_hash(options: Optional[Dict[str, Any]]) -> Optional[str]:
+        """
+        Hash stabile delle opzioni di caricamento di una tabella.
+        
+        Args:
+            options: Opzioni effettive della tabella (valori serializzabili in JSON)
+        
+        Returns:
+            Hash delle opzioni, None se non indicate
+        """
+        if options is None:
+            return None
+        encoded = json.dumps(options, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]
+    
+    def is_unchanged(
+        self,
+        schema: str,
+        sql_table: str,
+        source_table: str,
+        crc: int,
+        file_size: int,
+        options: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        Verifica se la tabella sorgente è identica all'ultimo caricamento riuscito.
+        
+        Args:
+            schema: Schema SQL di destinazione
+            sql_table: Tabella SQL di destinazione
+            source_table: Tabella Convex di origine
+            crc: CRC32 del membro documents.jsonl
+            file_size: Dimensione non compressa del membro
+            options: Opzioni effettive della tabella (vedi options_hash)
+        
+        Returns:
+            True se CRC, dimensione, tabella di origine e opzioni coincidono
+        """
+        entry = self.get(schema, sql_table)
+        if not entry:
+            return False
+        
+        return (
+            entry.get('source_table') == source_table
+            and entry.get('crc') == crc
+            and entry.get('file_size') == file_size
+            and entry.get('options_hash') == self.options_hash(options)
+        )
+    
+    def record(
+        self,
+        schema: str,
+        sql_table: str,
+        source_table: str,
+        crc: int,
+        file_size: int,
+        options: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Salva il fingerprint di un caricamento riuscito.
+        
+        Args:
+            schema: Schema SQL di destinazione
+            sql_table: Tabella SQL di destinazione
+            source_table: Tabella Convex di origine
+            crc: CRC32 del membro documents.jsonl
+            file_size: Dimensione non compressa del membro
+            options: Opzioni effettive della tabella (vedi options_hash)
+        """
+        with self._lock:
+            self._entries[self._key(schema, sql_table)] = {
+                'source_table': source_table,
+                'crc': crc,
+                'file_size': file_size,
+                'options_hash': self.options_hash(options),
+                'loaded_at': datetime.now().isoformat(timespec='seconds')
+            }
+            _save_json(self.path, self._entries)
+    
+    def forget(self, schema: str, sql_table: str):
+        """
+        Invalida il fingerprint di una tabella (es. prima di ricaricarla).
+        
+        Args:
+            schema: Schema SQL di destinazione
+            sql_table: Tabella SQL di destinazione
+        """
+        with self._lock:
+            if self._entries.pop(self._key(schema, sql_table), None) is not None:
+                _save_json(self.path, self._entries)
+
+
+class SchemaCache:
+    """
+    Schema inferito (colonne e tipi) di ogni tabella caricata.
+    
+    Evita di rileggere tutti i documenti per inferire lo schema a ogni
+    esecuzione: viene salvato per app e per tabella SQL di destinazione nel
+    file `schemas_<app>.json`, insieme al fingerprint dello snapshot da cui
+    è stato ricavato e al `_creationTime` massimo dei documenti già
+    verificati. Le colonne sono una lista `[nome, convex_type, max_length]`
+    per conservarne l'ordine.
+    """
+    
+    def __init__(self, state_dir: str, app_name: str):
+        """
+        Inizializza la cache e carica gli schemi salvati.
+        
+        Args:
+            state_dir: Directory dei file di stato
+            app_name: Nome dell'applicazione Convex
+        """
+        self.app_name = app_name
+        self.path = os.path.join(state_dir, f"schemas_{app_name}.json")
+        self._entries: Dict[str, Dict[str, Any]] = _load_json(self.path)
+        self._lock = threading.Lock()
+    
+    def get(self, schema: str, sql_table: str, source_table: str) -> Optional[Dict[str, Any]]:
+        """
+        Restituisce lo schema salvato per una tabella.
+        
+        Args:
+            schema: Schema SQL di destinazione
+            sql_table: Tabella SQL di destinazione
+            source_table: Tabella Convex di origine
+        
+        Returns:
+            Voce con columns, max_creation_time, crc e file_size, oppure
+            None se assente, non valida o relativa a un'altra tabella di origine
+        """
+        entry = self._entries.get(FingerprintStore._key(schema, sql_table))
+        if not entry or entry.get('source_table') != source_table:
+            return None
+        if not isinstance(entry.get('columns'), list):
+            return None
+        return entry
+    
+    def record(
+        self,
+        schema: str,
+        sql_table: str,
+        source_table: str,
+        columns: List[List[Any]],
+        max_creation_time: Optional[float],
+        crc: Optional[int] = None,
+        file_size: Optional[int] = None
+    ):
+        """
+        Salva lo schema di una tabella caricata con successo.
+        
+        Args:
+            schema: Schema SQL di destinazione
+            sql_table: Tabella SQL di destinazione
+            source_table: Tabella Convex di origine
+            columns: Colonne come liste [nome, convex_type, max_length]
+            max_creation_time: `_creationTime` massimo dei documenti verificati
+            crc: CRC32 del membro documents.jsonl dello snapshot
+            file_size: Dimensione non compressa del membro
+        """
+        with self._lock:
+            self._entries[FingerprintStore._key(schema, sql_table)] = {
+                'source_table': source_table,
+                'columns': columns,
+                'max_creation_time': max_creation_time,
+                'crc': crc,
+                'file_size': file_size,
+                'updated_at': datetime.now().isoformat(timespec='seconds')
+            }
+            _save_json(self.path, self._entries)
+    
+    def forget(self, schema: str, sql_table: str):
+        """
+        Elimina lo schema salvato di una tabella.
+        
+        Args:
+            schema: Schema SQL di destinazione
+            sql_table: Tabella SQL di destinazione
+        """
+        with self._lock:
+            if self._entries.pop(FingerprintStore._key(schema, sql_table), None) is not None:
+                _save_json(self.path, self._entries)
+
+
+class DeltaCursorStore:
+    """
+    Cursori dello streaming export (document_deltas) di ogni tabella caricata.
+    
+    Il cursore è il punto fino a cui le modifiche dei documenti sono già
+    state applicate alla tabella di destinazione: il timestamp dello snapshot
+    del caricamento iniziale, poi il cursore restituito dall'ultima lettura
+    delle modifiche. Viene salvato per app e per tabella SQL di destinazione
+    nel file `cursors_<app>.json`, dopo il commit delle modifiche: se
+    l'esecuzione si interrompe prima del salvataggio le stesse modifiche
+    vengono rilette e riapplicate (upsert e delete per _id sono idempotenti).
+    """
+    
+    def __init__(self, state_dir: str, app_name: str):
+        """
+        Inizializza lo store e carica i cursori salvati.
+        
+        Args:
+            state_dir: Directory dei file di stato
+            app_name: Nome dell'applicazione Convex
+        """
+        self.app_name = app_name
+        self.path = os.path.join(state_dir, f"cursors_{app_name}.json")
+        self._entries: Dict[str, Dict[str, Any]] = _load_json(self.path)
+        self._lock = threading.Lock()
+    
+    def get(self, schema: str, sql_table: str, source_table: str) -> Optional[int]:
+        """
+        Restituisce il cursore salvato per una tabella.
+        
+        Args:
+            schema: Schema SQL di destinazione
+            sql_table: Tabella SQL di destinazione
+            source_table: Tabella Convex di origine
+        
+        Returns:
+            Cursore o None se assente o relativo a un'altra tabella di origine
+        """
+        entry = self._entries.get(FingerprintStore._key(schema, sql_table))
+        if not entry or entry.get('source_table') != source_table:
+            return None
+        cursor = entry.get('cursor')
+        return cursor if isinstance(cursor, int) else None
+    
+    def record(self, schema: str, sql_table: str, source_table: str, cursor: int):
+        """
+        Salva il cursore di una tabella dopo il commit delle modifiche.
+        
+        Args:
+            schema: Schema SQL di destinazione
+            sql_table: Tabella SQL di destinazione
+            source_table: Tabella Convex di origine
+            cursor: Cursore da cui leggere le modifiche successive
+        """
+        with self._lock:
+            self._entries[FingerprintStore._key(schema, sql_table)] = {
+                'source_table': source_table,
+                'cursor': cursor,
+                'updated_at': datetime.now().isoformat(timespec='seconds')
+            }
+            _save_json(self.path, self._entries)
+    
+    def forget(self, schema: str, sql_table: str):
+        """
+        Elimina il cursore di una tabella (es. prima di un caricamento completo).
+        
+        Args:
+            schema: Schema SQL di destinazione
+            sql_table: Tabella SQL di destinazione
+        """
+        with self._lock:
+            if self._entries.pop(FingerprintStore._key(schema, sql_table), None) is not None:
+                _save_json(self.path, self._entries)
+
+
+class SnapshotCache:
+    """
+    Cache su disco degli snapshot ZIP scaricati da Convex.
+    
+    Ogni snapshot è indirizzato dal contenuto: il file si chiama
+    `<hash della deploy key>_<timestamp dello snapshot>.zip`, quindi lo stesso
+    snapshot di un deployment viene salvato una sola volta e la deploy key
+    non compare nei nomi dei file. La data di modifica del file è l'ultimo
+    utilizzo: superata la quota vengono eliminati gli snapshot usati meno
+    di recente.
+    
+    Il riuso di uno snapshot già scaricato va chiesto esplicitamente con
+    max_age (secondi): con max_age=0 ogni esecuzione esporta uno snapshot
+    nuovo e la cache si limita a conservarlo.
+    
+    I file della directory che non sono snapshot della cache (download
+    parziali `.partial` o temporanei `convex_backup_*` lasciati da versioni
+    precedenti) vengono eliminati da put quando non sono stati modificati
+    da almeno STALE_SECONDS.
+    """
+    
+    FILE_PATTERN = re.compile(r'^([0-9a-f]{16})_(\d+)\.zip$')
+    STALE_PATTERN = re.compile(r'(^convex_backup_.*|\.partial)$')
+    STALE_SECONDS = 24 * 60 * 60
+    
+    def __init__(self, cache_dir: str, max_bytes: int, max_age: float = 0):
+        """
+        Inizializza la cache.
+        
+        Args:
+            cache_dir: Directory degli snapshot
+            max_bytes: Quota su disco (byte)
+            max_age: Età massima (secondi) di uno snapshot riusabile senza
+                esportarne uno nuovo (0 = nessun riuso)
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(deploy_key: str) -> str:
+        """Hash della deploy key usato nei nomi dei file."""
+        return hashlib.sha256(deploy_key.encode('utf-8')).hexdigest()[:16]
+    
+    def path_for(self, deploy_key: str, snapshot_ts: int) -> str:
+        """
+        Path dello snapshot in cache.
+        
+        Args:
+            deploy_key: Deploy key del deployment
+            snapshot_ts: Timestamp dello snapshot (nanosecondi)
+        
+        Returns:
+            Path del file ZIP
+        """
+        return os.path.join(self.cache_dir, f"{self._key(deploy_key)}_{int(snapshot_ts)}.zip")
+    
+    def _entries(self) -> List[Dict[str, Any]]:
+        """Snapshot presenti nella directory (path, key, snapshot_ts, size, last_used)."""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            match = self.FILE_PATTERN.match(name)
+            if not match:
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append({
+                'path': path,
+                'key': match.group(1),
+                'snapshot_ts': int(match.group(2)),
+                'size': stat.st_size,
+                'last_used': stat.st_mtime
+            })
+        return entries
+    
+    def contains(self, path: Optional[str]) -> bool:
+        """
+        Verifica se un path è uno snapshot della cache (da non eliminare dopo l'uso).
+        
+        Args:
+            path: Path del file ZIP
+        
+        Returns:
+            True se il file è uno snapshot (nome secondo FILE_PATTERN) nella directory della cache
+        """
+        if not path or not self.FILE_PATTERN.match(os.path.basename(path)):
+            return False
+        return os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.cache_dir)
+    
+    def find(self, deploy_key: str, snapshot_ts: Optional[int] = None) -> Optional[str]:
+        """
+        Cerca uno snapshot riusabile e ne aggiorna l'ultimo utilizzo.
+        
+        Args:
+            deploy_key: Deploy key del deployment
+            snapshot_ts: Timestamp esatto dello snapshot; se None, lo snapshot
+                più recente non più vecchio di max_age
+        
+        Returns:
+            Path dello snapshot in cache o None (conteggiato come miss)
+        """
+        with self._lock:
+            key = self._key(deploy_key)
+            candidates = [entry for entry in self._entries() if entry['key'] == key]
+            
+            if snapshot_ts is not None:
+                candidates = [entry for entry in candidates if entry['snapshot_ts'] == int(snapshot_ts)]
+            elif self.max_age > 0:
+                oldest = (time.time() - self.max_age) * 1_000_000_000
+                candidates = [entry for entry in candidates if entry['snapshot_ts'] >= oldest]
+            else:
+                candidates = []
+            
+            if not candidates:
+                self.misses += 1
+                return None
+            
+            path = max(candidates, key=lambda entry: entry['snapshot_ts'])['path']
+            os.utime(path)
+            self.hits += 1
+            return path
+    
+    def put(self, deploy_key: str, snapshot_ts: int, path: str) -> str:
+        """
+        Sposta uno snapshot scaricato nella cache e applica la quota.
+        
+        Args:
+            deploy_key: Deploy key del deployment
+            snapshot_ts: Timestamp dello snapshot (nanosecondi)
+            path: Path del file ZIP scaricato
+        
+        Returns:
+            Path dello snapshot in cache
+        """
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            cached_path = self.path_for(deploy_key, snapshot_ts)
+            if os.path.abspath(path) != os.path.abspath(cached_path):
+                shutil.move(path, cached_path)
+            os.utime(cached_path)
+            self._sweep_stale()
+            self._evict(keep=cached_path)
+            return cached_path
+    
+    def _sweep_stale(self):
+        """Elimina i download parziali e i file temporanei abbandonati nella directory."""
+        oldest = time.time() - self.STALE_SECONDS
+        for name in os.listdir(self.cache_dir):
+            if not self.STALE_PATTERN.search(name):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if os.path.isfile(path) and os.stat(path).st_mtime < oldest:
+                    os.remove(path)
+            except OSError:
+                continue
+    
+    def _evict(self, keep: str):
+        """
+        Elimina gli snapshot usati meno di recente finché la cache rientra nella quota.
+        
+        Args:
+            keep: Snapshot appena aggiunto, mai eliminato
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry['last_used'])
+        total = sum(entry['size'] for entry in entries)
+        
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if os.path.abspath(entry['path']) == os.path.abspath(keep):
+                continue
+            try:
+                os.remove(entry['path'])
+            except OSError:
+                # Snapshot in uso da un'altra esecuzione
+                continue
+            total -= entry['size']
+            self.evictions += 1
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Contatori della cache per il riepilogo del sync.
+        
+        Returns:
+            Dict con hits, misses, evictions, entries e bytes
+        """
+        entries = self._entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(entries),
+            'bytes': sum(entry['size'] for entry in entries)
+        }
+
+
+__all__ = ['FingerprintStore', 'SchemaCache', 'DeltaCursorStore', 'SnapshotCache']
@@ -9,7 +9,14 @@ Eseguibile da linea di comando e schedulabile con Task Manager.
 
 import sys
 import io
+import os
 import argparse
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Optional, Set
 import time
 import traceback
 import requests
@@ -27,12 +34,17 @@ if sys.platform == 'win32':
         # If stdout/stderr don't have buffer attribute, skip
         pass
 
-from src.config import ConfigurationManager, ConfigurationError
-from src.convex import ConvexClient
-from src.export import DataExporter
-from src.sql import SQLImporter, TypeMapper, ImportResult
+from src.config import ConfigurationManager, ConfigurationError, ConvexConfig, SQLConfig
+from src.convex import ConvexClient, SnapshotManifest
+from src.export import DataExporter, DocumentFlattener
+from src.sql import (
+    SQLImporter, TypeMapper, ImportResult, ColumnSchema, SchemaValidator, SchemaBlockInference, RowBlockConverter
+)
 from src.logging import SyncLogger
 from src.notifications import EmailNotifier
+from src.state import FingerprintStore, SchemaCache, DeltaCursorStore, SnapshotCache
+from src.pipeline import BatchPipeline
+from src.profiling import Profiler, NULL_PROFILER
 
 
 # Exit codes
@@ -77,6 +89,998 @@ def get_app_config_from_convex(app_name, webhook_url="http://localhost:5000", we
         return None
 
 
+@dataclass
+class SyncContext:
+    """Stato condiviso dall'import delle tabelle di una esecuzione"""
+    convex_config: ConvexConfig
+    sql_config: SQLConfig
+    convex_client: ConvexClient
+    zip_path: Optional[str]
+    manifest: SnapshotManifest
+    fingerprints: FingerprintStore
+    schemas: SchemaCache
+    logger: SyncLogger
+    full_reload: bool
+    type_mapper: TypeMapper
+    pipeline_queue_size: int = 0
+    profiler: Profiler = NULL_PROFILER
+    # Streaming export: tabelle del deployment e cursori delle modifiche (None = snapshot ZIP)
+    streaming_tables: Optional[Set[str]] = None
+    cursors: Optional[DeltaCursorStore] = None
+
+
+class TableOutput:
+    """
+    Output su console dell'import di una tabella
+    
+    In modalità sequenziale scrive subito; con buffered=True accumula il
+    testo e lo stampa in un blocco unico con flush(), così le righe di
+    tabelle importate in parallelo non si mescolano.
+    """
+    
+    _print_lock = threading.Lock()
+    
+    def __init__(self, buffered: bool = False):
+        self.buffered = buffered
+        self._parts = []
+    
+    def write(self, text: str, end: str = '\n'):
+        if self.buffered:
+            self._parts.append(text + end)
+        else:
+            print(text, end=end, flush=True)
+    
+    def flush(self):
+        if self._parts:
+            with self._print_lock:
+                print(''.join(self._parts), end='', flush=True)
+            self._parts = []
+
+
+class TableRows:
+    """
+    Righe di una tabella da caricare, lette dallo snapshot solo quando servono
+    
+    Con la pipeline (pipeline_queue_size > 0) la decodifica avviene in un
+    thread separato mentre il thread dell'import esegue gli insert. Per le
+    tabelle dello snapshot ZIP con schema noto values() fa appiattire,
+    verificare e convertire i documenti nei processi di decodifica (vedi
+    RowBlockConverter): al thread dell'import arrivano le tuple dell'INSERT.
+    Ogni lettura chiude quella precedente.
+    """
+    
+    def __init__(self, context, table_name):
+        self.context = context
+        self.table_name = table_name
+        self.pipeline = None
+        # PipelineStats dell'ultima lettura con la pipeline
+        self.stats = None
+        self._rows = None
+        self._peeked = None
+    
+    @property
+    def converts_blocks(self) -> bool:
+        """True se le righe possono essere convertite durante la decodifica (snapshot ZIP)"""
+        return self.context.streaming_tables is None
+    
+    def is_empty(self) -> bool:
+        """True se la tabella non ha documenti (per lo streaming export legge la prima riga)"""
+        if self.converts_blocks:
+            return not self.context.convex_client.has_documents(self.context.zip_path, self.table_name)
+        
+        rows = self.rows()
+        first_row = next(rows, None)
+        if first_row is None:
+            return True
+        self._peeked = itertools.chain([first_row], rows)
+        return False
+    
+    def rows(self):
+        """Righe (dict) già appiattite"""
+        if self._peeked is not None:
+            rows, self._peeked = self._peeked, None
+            return rows
+        
+        self.close()
+        context = self.context
+        if context.pipeline_queue_size > 0:
+            batches = table_documents(context, self.table_name, batch_size=context.sql_config.batch_rows)
+            self._start_pipeline(batches)
+            self._rows = self.pipeline.rows()
+        else:
+            self._rows = table_documents(context, self.table_name)
+        return self._rows
+    
+    def sample_schema(self, sample_rows):
+        """
+        Schema inferito dalle prime righe, come SQLImporter.import_table senza schema
+        
+        Args:
+            sample_rows: Righe del campione (SQLImporter.SCHEMA_SAMPLE_ROWS)
+        
+        Returns:
+            Dizionario column_name -> ColumnSchema
+        """
+        rows = table_documents(self.context, self.table_name)
+        try:
+            return self.context.type_mapper.infer_schema(itertools.islice(rows, sample_rows))
+        finally:
+            rows.close()
+    
+    def values(self, validator=None):
+        """
+        Sorgente `row_values` di SQLImporter.import_table
+        
+        Args:
+            validator: SchemaValidator con lo schema della tabella (None = nessuna verifica)
+        
+        Returns:
+            Funzione (colonne, tipi) -> righe convertite (e verificate)
+        """
+        def row_values(columns, types):
+            self.close()
+            context = self.context
+            flattener = table_flattener(context, self.table_name)
+            flatten = flattener.flatten if flattener is not None else None
+            if validator is not None:
+                converter = validator.block_converter(columns, types, flatten=flatten)
+            else:
+                converter = RowBlockConverter(context.type_mapper, columns, types, flatten=flatten)
+            blocks = context.convex_client.iter_table(
+                context.zip_path, self.table_name,
+                batch_size=context.sql_config.batch_rows, transform=converter
+            )
+            if context.pipeline_queue_size > 0:
+                self._start_pipeline(blocks)
+                blocks = self.pipeline.batches()
+            if validator is not None:
+                self._rows = validator.wrap_blocks(blocks)
+            else:
+                self._rows = (row for block in blocks for row in block.rows)
+            return self._rows
+        
+        return row_values
+    
+    def _start_pipeline(self, batches):
+        """Avvia la decodifica dei batch in un thread separato (BatchPipeline)"""
+        self.pipeline = BatchPipeline(
+            batches, queue_size=self.context.pipeline_queue_size, name=self.table_name
+        ).start()
+    
+    def close(self):
+        """Interrompe la lettura in corso, se presente"""
+        self._peeked = None
+        if self.pipeline is not None:
+            self.pipeline.close()
+            self.stats = self.pipeline.stats
+            self.pipeline = None
+        if self._rows is not None:
+            self._rows.close()
+            self._rows = None
+
+
+def import_table_job(context, sql_importer, table_name, out):
+    """
+    Importa una tabella del backup (skip, tabella vuota, incrementale o completa)
+    
+    Args:
+        context: SyncContext dell'esecuzione
+        sql_importer: SQLImporter connesso da usare per questa tabella
+        table_name: Nome della tabella Convex
+        out: TableOutput per i messaggi su console
+    
+    Returns:
+        ImportResult della tabella
+    """
+    with context.profiler.span('table', table=table_name) as span:
+        if context.streaming_tables is not None and table_name in context.streaming_tables:
+            result = _import_table_streaming(context, sql_importer, table_name, out)
+        else:
+            result = _import_table(context, sql_importer, table_name, out)
+        span.add(rows=result.rows_imported, bytes=result.bytes_estimated)
+    return result
+
+
+def _import_table_streaming(context, sql_importer, table_name, out):
+    """
+    Import di una tabella con lo streaming export (export_mode 'streaming')
+    
+    Con un cursore salvato vengono lette e applicate solo le modifiche dei
+    documenti (document_deltas); altrimenti la tabella viene caricata per
+    intero da list_snapshot, con lo stesso percorso dello snapshot ZIP, e il
+    timestamp dello snapshot diventa il cursore. Le tabelle con tabelle
+    figlie vengono sempre ricaricate per intero.
+    """
+    convex_config = context.convex_config
+    sql_config = context.sql_config
+    logger = context.logger
+    cursors = context.cursors
+    sql_table_name = convex_config.get_sql_table_name(table_name)
+    flattener = table_flattener(context, table_name)
+    
+    cursor = None
+    if not context.full_reload and not (flattener is not None and flattener.child_paths):
+        cursor = cursors.get(sql_config.schema, sql_table_name, table_name)
+    
+    if cursor is None or not sql_importer.table_exists(sql_table_name):
+        # Caricamento completo: il cursore precedente non è più valido finché non riesce
+        cursors.forget(sql_config.schema, sql_table_name)
+        result = _import_table(context, sql_importer, table_name, out)
+        snapshot_ts = context.convex_client.snapshot_timestamps.get(table_name)
+        if result.success and snapshot_ts is not None:
+            cursors.record(sql_config.schema, sql_table_name, table_name, snapshot_ts)
+        return result
+    
+    out.write(f"  - {table_name} → {sql_table_name} (document deltas)...", end=' ')
+    logger.info(f"Applying document deltas of {table_name} since cursor {cursor}")
+    
+    changes = context.convex_client.iter_document_deltas(table_name, cursor)
+    if flattener is not None:
+        changes = (
+            change if change.get('_deleted') else flattener.flatten(change)
+            for change in changes
+        )
+    result = sql_importer.apply_document_changes(
+        sql_table_name, changes, context.type_mapper,
+        insert_method=convex_config.get_table_option(table_name, 'insert_method')
+    )
+    
+    if result.success:
+        new_cursor = context.convex_client.delta_cursors[table_name]
+        cursors.record(sql_config.schema, sql_table_name, table_name, new_cursor)
+        schema_changes = f", schema changes: {len(result.schema_changes)}" if result.schema_changes else ''
+        out.write(
+            f"✓ {result.rows_imported} upserted, {result.rows_deleted} deleted "
+            f"({result.duration_seconds:.2f}s{schema_changes})"
+        )
+        logger.info(
+            f"Applied document deltas of {table_name} → {sql_table_name}",
+            rows=result.rows_imported,
+            rows_deleted=result.rows_deleted,
+            schema_changes=result.schema_changes,
+            cursor=new_cursor,
+            duration=f"{result.duration_seconds:.2f}s"
+        )
+    else:
+        out.write(f"✗ Error: {result.error}")
+        logger.error(f"Failed to apply document deltas of {table_name} → {sql_table_name}: {result.error}")
+    
+    return result
+
+
+def _import_table(context, sql_importer, table_name, out):
+    """Corpo di import_table_job (misurato nella fase 'table' del profiler)"""
+    convex_config = context.convex_config
+    sql_config = context.sql_config
+    logger = context.logger
+    fingerprints = context.fingerprints
+    
+    # Ottieni nome tabella SQL dal mapping
+    sql_table_name = convex_config.get_sql_table_name(table_name)
+    
+    # Opzioni che cambiano il risultato del caricamento: fanno parte del fingerprint
+    options = table_load_options(context, table_name)
+    
+    def record_fingerprint():
+        if snapshot_table is not None:
+            fingerprints.record(
+                sql_config.schema, sql_table_name, table_name,
+                snapshot_table.crc, snapshot_table.file_size, options
+            )
+    
+    # Tabella invariata dall'ultimo caricamento (stesse opzioni): nessuna decompressione né query di import
+    snapshot_table = context.manifest.tables.get(table_name)
+    if (
+        snapshot_table is not None
+        and not context.full_reload
+        and fingerprints.is_unchanged(
+            sql_config.schema, sql_table_name, table_name,
+            snapshot_table.crc, snapshot_table.file_size, options
+        )
+        and sql_importer.table_exists(sql_table_name)
+    ):
+        out.write(f"  - {table_name} → {sql_table_name} (unchanged, skipped) ✓")
+        logger.info(f"Table {table_name} unchanged since last sync - skipped", crc=snapshot_table.crc)
+        
+        return ImportResult(
+            table_name=table_name,
+            success=True,
+            rows_imported=0,
+            skipped=True,
+            skip_reason='unchanged'
+        )
+    
+    # Il fingerprint precedente non è più valido finché il caricamento non riesce
+    fingerprints.forget(sql_config.schema, sql_table_name)
+    
+    # Documenti letti in streaming dallo snapshot solo dopo la risoluzione dello schema
+    rows = TableRows(context, table_name)
+    has_documents = snapshot_table is not None or (
+        context.streaming_tables is not None and table_name in context.streaming_tables
+    )
+    try:
+        empty = not has_documents or rows.is_empty()
+        return _load_table(
+            context, sql_importer, table_name, sql_table_name,
+            rows, empty, out, record_fingerprint
+        )
+    finally:
+        rows.close()
+
+
+def _load_table(context, sql_importer, table_name, sql_table_name, rows, empty, out, record_fingerprint):
+    """
+    Carica nella tabella SQL le righe di una tabella del backup
+    
+    Args:
+        context: SyncContext dell'esecuzione
+        sql_importer: SQLImporter connesso da usare per questa tabella
+        table_name: Nome della tabella Convex
+        sql_table_name: Nome della tabella SQL di destinazione
+        rows: TableRows della tabella
+        empty: True se la tabella non ha documenti
+        out: TableOutput per i messaggi su console
+        record_fingerprint: Callback che registra il fingerprint a caricamento riuscito
+    
+    Returns:
+        ImportResult della tabella
+    """
+    convex_config = context.convex_config
+    sql_config = context.sql_config
+    logger = context.logger
+    
+    if empty:
+        # Tabella vuota: crea tabella con schema di base se non esiste
+        logger.info(f"Table {table_name} is empty - creating empty table with basic schema")
+        
+        table_exists = sql_importer.table_exists(sql_table_name)
+        
+        if not table_exists:
+            out.write(f"  - {table_name} → {sql_table_name} (create empty)...", end=' ')
+            
+            # Crea tabella vuota con schema di base Convex
+            basic_columns = ['_id', '_creationTime']  # Colonne standard Convex
+            sql_importer.create_table(sql_table_name, basic_columns)
+            
+            out.write("✓")
+            logger.info(f"Created empty table {sql_table_name} with basic schema")
+        else:
+            out.write(f"  - {table_name} → {sql_table_name} (exists, empty)...", end=' ')
+            
+            # Tabella esiste ma è vuota: truncate per sicurezza
+            sql_importer.truncate_table(sql_table_name)
+            
+            out.write("✓")
+            logger.info(f"Table {sql_table_name} exists but source is empty - truncated")
+        
+        record_fingerprint()
+        return ImportResult(
+            table_name=table_name,
+            success=True,
+            rows_imported=0,
+            error=None,
+            duration_seconds=0.0
+        )
+    
+    # Verifica se tabella esiste
+    table_exists = sql_importer.table_exists(sql_table_name)
+    incremental = convex_config.get_table_option(table_name, 'sync_mode', 'full') == 'incremental'
+    insert_method = convex_config.get_table_option(table_name, 'insert_method')
+    
+    if table_exists and incremental:
+        out.write(f"  - {table_name} → {sql_table_name} (incremental merge)...", end=' ')
+        logger.info(f"Incremental sync of table {sql_table_name} by _creationTime watermark")
+    elif table_exists and sql_config.load_mode == 'swap':
+        out.write(f"  - {table_name} → {sql_table_name} (staging + swap)...", end=' ')
+        logger.info(f"Loading table {sql_table_name} via staging table swap")
+    elif table_exists:
+        out.write(f"  - {table_name} → {sql_table_name} (truncate + insert)...", end=' ')
+        logger.info(f"Truncating table {sql_table_name} before import")
+    else:
+        out.write(f"  - {table_name} → {sql_table_name} (create + insert)...", end=' ')
+        logger.info(f"Creating table {sql_table_name}")
+    
+    # Schema dei documenti dalla cache (verificando solo i documenti nuovi)
+    # oppure inferito da tutti i documenti (unione delle chiavi): crea la
+    # tabella nuova o adegua quella esistente. In modalità incrementale la
+    # tabella esistente viene adeguata dai soli documenti nuovi.
+    validator = None
+    if not (table_exists and incremental):
+        validator = resolve_table_schema(context, table_name, sql_table_name)
+    
+    def validated(source_rows):
+        return validator.wrap(source_rows) if validator is not None else source_rows
+    
+    def run_import():
+        if incremental:
+            # Lo snapshot viene riletto da rows_source (anche in caso di fallback completo)
+            return sql_importer.import_table_incremental(
+                table_name=sql_table_name,
+                rows_source=lambda: validated(table_documents(context, table_name)),
+                type_mapper=context.type_mapper,
+                column_schema=validator.schema if validator is not None else None,
+                insert_method=insert_method
+            )
+        
+        if rows.converts_blocks:
+            # Schema noto prima della lettura (senza validatore: dalle prime
+            # righe): documenti convertiti nei processi di decodifica
+            if validator is not None:
+                column_schema = validator.schema
+            else:
+                column_schema = rows.sample_schema(sql_importer.SCHEMA_SAMPLE_ROWS)
+            return sql_importer.import_table(
+                table_name=sql_table_name,
+                rows=[],
+                type_mapper=context.type_mapper,
+                auto_create=True,
+                column_schema=column_schema,
+                insert_method=insert_method,
+                row_values=rows.values(validator),
+                exact=validator is not None
+            )
+        
+        # Import con auto-create
+        return sql_importer.import_table(
+            table_name=sql_table_name,
+            rows=validated(rows.rows()),
+            type_mapper=context.type_mapper,
+            auto_create=True,
+            column_schema=validator.schema if validator is not None else None,
+            insert_method=insert_method
+        )
+    
+    if incremental:
+        # Lo snapshot viene riletto dall'inizio (anche in caso di fallback completo)
+        rows.close()
+        rows.stats = None
+    
+    result = run_import()
+    rows.close()
+    
+    if validator is not None and validator.cached and (validator.mismatch is not None or not result.success):
+        # Documento non compatibile con lo schema in cache o errore di conversione:
+        # la voce in cache viene eliminata, poi nuova inferenza e ricaricamento (la
+        # tabella creata con lo schema in cache viene eliminata, quella esistente
+        # viene adeguata al nuovo schema)
+        reason = validator.mismatch or result.error
+        out.write(f"cached schema mismatch ({reason}), re-inferring...", end=' ')
+        logger.warning(
+            f"Cached schema of {sql_table_name} does not match the snapshot - re-inferring",
+            reason=reason
+        )
+        context.schemas.forget(sql_config.schema, sql_table_name)
+        if not table_exists and sql_importer.table_exists(sql_table_name):
+            sql_importer.drop_table(sql_table_name)
+        validator = infer_table_schema(context, table_name, sql_table_name)
+        result = run_import()
+        rows.close()
+    
+    if rows.stats is not None:
+        result.stage_stats = rows.stats.to_dict()
+    
+    if not result.success:
+        # Nessuno schema salvato da un caricamento fallito
+        context.schemas.forget(sql_config.schema, sql_table_name)
+    
+    if result.success and validator is not None:
+        snapshot_table = context.manifest.tables.get(table_name)
+        context.schemas.record(
+            sql_config.schema, sql_table_name, table_name,
+            [[col, column.convex_type, column.max_length] for col, column in validator.schema.items()],
+            validator.max_creation_time,
+            crc=snapshot_table.crc if snapshot_table else None,
+            file_size=snapshot_table.file_size if snapshot_table else None
+        )
+    
+    if result.success:
+        # Tabelle figlie degli array (sempre ricaricate per intero)
+        child_results = import_child_tables(
+            context, sql_importer, table_name, sql_table_name, insert_method
+        )
+        result.child_tables = {child.table_name: child.rows_imported for child in child_results} or None
+        failed_child = next((child for child in child_results if not child.success), None)
+        if failed_child is not None:
+            result.success = False
+            result.error = f"child table {failed_child.table_name}: {failed_child.error}"
+    
+    if result.success:
+        record_fingerprint()
+        fallback = f", full reload: {result.fallback_reason}" if result.fallback_reason else ''
+        if result.schema_changes:
+            fallback += f", schema changes: {len(result.schema_changes)}"
+        out.write(
+            f"✓ {result.rows_imported} rows in {result.chunks} chunks "
+            f"({result.duration_seconds:.2f}s{fallback})"
+        )
+        if rows.stats is not None:
+            out.write(f"      {_format_stage_stats(rows.stats)}")
+        for child_table, child_rows in (result.child_tables or {}).items():
+            out.write(f"      ↳ {child_table}: {child_rows} rows")
+        logger.info(
+            f"Imported table {table_name} → {sql_table_name}",
+            rows=result.rows_imported,
+            chunks=result.chunks,
+            bytes=result.bytes_estimated,
+            sync_mode=result.sync_mode,
+            fallback_reason=result.fallback_reason,
+            schema_changes=result.schema_changes,
+            child_tables=result.child_tables,
+            insert_method=result.insert_method,
+            duration=f"{result.duration_seconds:.2f}s",
+            pipeline=result.stage_stats
+        )
+    else:
+        out.write(f"✗ Error: {result.error}")
+        logger.error(f"Failed to import table {table_name} → {sql_table_name}: {result.error}")
+    
+    return result
+
+
+def table_load_options(context, table_name):
+    """
+    Opzioni effettive che determinano il contenuto caricato di una tabella
+    
+    Un cambiamento di queste opzioni invalida il fingerprint della tabella
+    anche se lo snapshot è invariato.
+    
+    Returns:
+        Dizionario delle opzioni (serializzabile in JSON)
+    """
+    convex_config = context.convex_config
+    return {
+        'flatten': convex_config.get_table_option(table_name, 'flatten', False),
+        'child_tables': convex_config.get_table_option(table_name, 'child_tables', []),
+        'sync_mode': convex_config.get_table_option(table_name, 'sync_mode', 'full'),
+        'schema_inference': context.sql_config.schema_inference,
+        'load_mode': context.sql_config.load_mode,
+    }
+
+
+def table_flattener(context, table_name):
+    """
+    DocumentFlattener configurato per una tabella (table_options flatten/child_tables)
+    
+    Returns:
+        DocumentFlattener, o None se la tabella non va appiattita
+    """
+    convex_config = context.convex_config
+    flattener = DocumentFlattener(
+        flatten=convex_config.get_table_option(table_name, 'flatten', False),
+        child_tables=convex_config.get_table_option(table_name, 'child_tables', [])
+    )
+    return flattener if flattener.enabled else None
+
+
+def source_documents(context, table_name, batch_size=None):
+    """
+    Documenti di una tabella letti in streaming dallo snapshot ZIP oppure,
+    con lo streaming export, dallo snapshot della tabella (list_snapshot)
+    
+    Args:
+        context: SyncContext dell'esecuzione
+        table_name: Nome della tabella Convex
+        batch_size: Se indicato, restituisce batch di documenti (vedi ConvexClient.iter_table)
+    
+    Returns:
+        Generatore di documenti (o di batch di documenti)
+    """
+    if context.streaming_tables is not None:
+        return context.convex_client.iter_snapshot(table_name, batch_size=batch_size)
+    return context.convex_client.iter_table(context.zip_path, table_name, batch_size=batch_size)
+
+
+def table_documents(context, table_name, batch_size=None):
+    """
+    Documenti di una tabella letti in streaming dallo snapshot, già appiattiti
+    
+    Args:
+        context: SyncContext dell'esecuzione
+        table_name: Nome della tabella Convex
+        batch_size: Se indicato, restituisce batch di documenti (vedi ConvexClient.iter_table)
+    
+    Returns:
+        Generatore di righe (o di batch di righe)
+    """
+    documents = source_documents(context, table_name, batch_size=batch_size)
+    flattener = table_flattener(context, table_name)
+    if flattener is None:
+        return documents
+    if batch_size:
+        return ([flattener.flatten(document) for document in batch] for batch in documents)
+    return (flattener.flatten(document) for document in documents)
+
+
+def import_child_tables(context, sql_importer, table_name, sql_table_name, insert_method=None):
+    """
+    Carica le tabelle figlie degli array di una tabella (table_options child_tables)
+    
+    Ogni tabella figlia rilegge lo snapshot in streaming e viene ricaricata
+    per intero, anche quando la tabella principale è incrementale.
+    
+    Args:
+        context: SyncContext dell'esecuzione
+        sql_importer: SQLImporter connesso
+        table_name: Nome della tabella Convex
+        sql_table_name: Nome della tabella SQL principale
+        insert_method: Metodo di insert della tabella principale (None: default dell'importer)
+    
+    Returns:
+        Lista di ImportResult, una per tabella figlia
+    """
+    flattener = table_flattener(context, table_name)
+    if flattener is None:
+        return []
+    
+    results = []
+    for path in flattener.child_paths:
+        child_table = flattener.child_table_name(sql_table_name, path)
+        
+        def child_rows():
+            return flattener.iter_children(source_documents(context, table_name), path)
+        
+        column_schema = None
+        if context.sql_config.schema_inference == 'full':
+            try:
+                column_schema = context.type_mapper.infer_schema(child_rows())
+            except ValueError as e:
+                # Elemento non proiettabile (es. campo _parent_id): tabella figlia in errore
+                results.append(ImportResult(table_name=child_table, success=False, rows_imported=0, error=str(e)))
+                continue
+        
+        if column_schema is not None and not column_schema:
+            # Nessun elemento negli array: tabella figlia vuota con le sole chiavi
+            if sql_importer.table_exists(child_table):
+                sql_importer.truncate_table(child_table)
+            else:
+                sql_importer.create_table(
+                    child_table, [flattener.PARENT_ID_COLUMN, flattener.ORDINAL_COLUMN]
+                )
+            results.append(ImportResult(table_name=child_table, success=True, rows_imported=0))
+            continue
+        
+        results.append(sql_importer.import_table(
+            table_name=child_table,
+            rows=child_rows(),
+            type_mapper=context.type_mapper,
+            auto_create=True,
+            column_schema=column_schema,
+            insert_method=insert_method
+        ))
+        context.logger.info(
+            f"Imported child table {table_name}.{path} → {child_table}",
+            rows=results[-1].rows_imported,
+            success=results[-1].success
+        )
+    
+    return results
+
+
+def resolve_table_schema(context, table_name, sql_table_name):
+    """
+    Schema dei documenti con cui creare o adeguare una tabella SQL
+    
+    Lo schema salvato nella cache viene riusato senza rileggere lo snapshot:
+    il SchemaValidator restituito verifica i documenti durante il
+    caricamento. Solo se il membro dello snapshot ha lo stesso CRC e la
+    stessa dimensione di quando lo schema è stato salvato vengono verificati
+    i soli documenti nuovi; altrimenti i documenti già presenti possono
+    essere stati modificati e vengono verificati tutti. Senza cache (o con
+    --full-reload) lo schema viene inferito da tutti i documenti.
+    
+    Args:
+        context: SyncContext dell'esecuzione
+        table_name: Nome della tabella Convex
+        sql_table_name: Nome della tabella SQL
+    
+    Returns:
+        SchemaValidator con lo schema da usare, oppure None se lo schema va
+        inferito da un campione durante l'import (schema_inference 'sample')
+    """
+    cached = None
+    if not context.full_reload:
+        cached = context.schemas.get(context.sql_config.schema, sql_table_name, table_name)
+    
+    if cached is not None:
+        schema = {
+            col: ColumnSchema(convex_type, max_length)
+            for col, convex_type, max_length in cached['columns']
+        }
+        snapshot_table = context.manifest.tables.get(table_name)
+        unchanged = (
+            snapshot_table is not None
+            and cached.get('crc') == snapshot_table.crc
+            and cached.get('file_size') == snapshot_table.file_size
+        )
+        min_creation_time = cached.get('max_creation_time') if unchanged else None
+        context.logger.info(
+            f"Reusing cached schema of {sql_table_name}",
+            columns=len(schema),
+            max_creation_time=min_creation_time,
+            validate='new documents' if unchanged else 'all documents'
+        )
+        return SchemaValidator(context.type_mapper, schema, min_creation_time, cached=True)
+    
+    if context.sql_config.schema_inference == 'full':
+        return infer_table_schema(context, table_name, sql_table_name)
+    
+    return None
+
+
+def infer_table_schema(context, table_name, sql_table_name):
+    """
+    Inferisce lo schema di una tabella da tutti i documenti dello snapshot
+    
+    Args:
+        context: SyncContext dell'esecuzione
+        table_name: Nome della tabella Convex
+        sql_table_name: Nome della tabella SQL
+    
+    Returns:
+        SchemaValidator con lo schema inferito (i documenti dello snapshot
+        risultano già verificati)
+    """
+    type_mapper = context.type_mapper
+    max_creation_time = None
+    row_count = 0
+    
+    def tracked_rows():
+        nonlocal max_creation_time, row_count
+        for row in table_documents(context, table_name):
+            row_count += 1
+            creation_time = row.get('_creationTime')
+            if creation_time is not None and (max_creation_time is None or creation_time > max_creation_time):
+                max_creation_time = creation_time
+            yield row
+    
+    with context.profiler.span('schema', table=table_name) as span:
+        if context.streaming_tables is None:
+            # Schema parziali inferiti durante la decodifica (nei processi di
+            # decodifica, se presenti) e uniti nell'ordine dei blocchi
+            flattener = table_flattener(context, table_name)
+            inference = SchemaBlockInference(
+                type_mapper, flatten=flattener.flatten if flattener is not None else None
+            )
+            schema = {}
+            for block in context.convex_client.iter_table(
+                context.zip_path, table_name, batch_size=context.sql_config.batch_rows, transform=inference
+            ):
+                type_mapper.merge_schema(schema, block.schema)
+                row_count += block.rows
+                if block.max_creation_time is not None and (
+                    max_creation_time is None or block.max_creation_time > max_creation_time
+                ):
+                    max_creation_time = block.max_creation_time
+        else:
+            schema = type_mapper.infer_schema(tracked_rows())
+        span.add(rows=row_count)
+    context.logger.info(
+        f"Inferred schema of {sql_table_name} from all documents",
+        columns=type_mapper.schema_to_sql(schema)
+    )
+    return SchemaValidator(type_mapper, schema, max_creation_time)
+
+
+def _format_stage_stats(stats):
+    """Riga di console con i tempi attivo/in attesa degli stadi della pipeline"""
+    return (
+        f"decode {stats.decode.busy_seconds:.2f}s busy / {stats.decode.idle_seconds:.2f}s idle, "
+        f"insert {stats.insert.busy_seconds:.2f}s busy / {stats.insert.idle_seconds:.2f}s idle "
+        f"(bottleneck: {stats.bottleneck})"
+    )
+
+
+def _sum_stage_stats(results):
+    """
+    Somma per stadio i tempi della pipeline di tutte le tabelle
+    
+    Returns:
+        Dict {stadio: {busy_seconds, idle_seconds}} oppure None se nessuna
+        tabella è passata dalla pipeline
+    """
+    totals = None
+    for result in results:
+        if not result.stage_stats:
+            continue
+        if totals is None:
+            totals = {stage: {'busy_seconds': 0.0, 'idle_seconds': 0.0} for stage in ('decode', 'insert')}
+        for stage, stage_totals in totals.items():
+            for key in stage_totals:
+                stage_totals[key] += result.stage_stats[stage][key]
+    return totals
+
+
+def import_tables_parallel(context, table_names, primary_importer, workers):
+    """
+    Importa le tabelle in parallelo su un pool di connessioni SQL Server
+    
+    Ogni thread usa un proprio SQLImporter (il primo riusa quello già
+    connesso). Le tabelle vengono assegnate dalla più grande alla più
+    piccola (dimensione non compressa nello snapshot), così le tabelle
+    lunghe partono per prime e il tempo totale si riduce. Un importer la
+    cui connessione non risponde più dopo una tabella fallita viene chiuso
+    e non torna nel pool: la tabella successiva apre una nuova connessione.
+    
+    Args:
+        context: SyncContext dell'esecuzione
+        table_names: Tabelle Convex da importare
+        primary_importer: SQLImporter già connesso
+        workers: Numero di connessioni/thread
+    
+    Returns:
+        Lista di ImportResult nell'ordine di table_names
+    """
+    sizes = {
+        name: (context.manifest.tables[name].file_size if name in context.manifest.tables else 0)
+        for name in table_names
+    }
+    ordered = sorted(table_names, key=lambda name: sizes[name], reverse=True)
+    
+    sql_config = context.sql_config
+    if any(
+        context.convex_config.get_table_option(name, 'sync_mode', 'full') == 'incremental'
+        for name in table_names
+    ):
+        # Tabella dei watermark creata prima dei worker, non da più connessioni insieme
+        try:
+            primary_importer.ensure_watermark_table()
+        except Exception as e:
+            context.logger.warning(f"Failed to create watermark table before parallel import: {str(e)}")
+    
+    idle_importers = queue.Queue()
+    idle_importers.put(primary_importer)
+    extra_importers = []
+    extra_lock = threading.Lock()
+    
+    def acquire_importer():
+        try:
+            return idle_importers.get_nowait()
+        except queue.Empty:
+            importer = SQLImporter(
+                connection_string=sql_config.connection_string,
+                schema=sql_config.schema,
+                timeout=sql_config.timeout,
+                fast_executemany=sql_config.fast_executemany,
+                batch_rows=sql_config.batch_rows,
+                batch_bytes=sql_config.batch_bytes,
+                load_mode=sql_config.load_mode,
+                metadata_cache=sql_config.metadata_cache,
+                catalog=primary_importer.catalog,
+                insert_method=sql_config.insert_method,
+                bulk_dir=sql_config.bulk_dir,
+                bulk_server_dir=sql_config.bulk_server_dir,
+                dialect=sql_config.dialect,
+                profiler=primary_importer.profiler
+            )
+            importer.connect()
+            with extra_lock:
+                extra_importers.append(importer)
+            return importer
+    
+    def release_importer(importer, result):
+        # Dopo un errore la connessione può essere caduta: non va riusata
+        if result.success or importer.is_alive():
+            idle_importers.put(importer)
+            return
+        context.logger.warning(f"SQL connection lost after table {result.table_name} - reconnecting")
+        try:
+            importer.close()
+        except Exception:
+            pass
+    
+    def run(table_name):
+        out = TableOutput(buffered=True)
+        try:
+            importer = acquire_importer()
+        except Exception as e:
+            out.write(f"  - {table_name} ✗ Error: {str(e)}")
+            out.flush()
+            return ImportResult(table_name=table_name, success=False, rows_imported=0, error=str(e))
+        
+        result = ImportResult(table_name=table_name, success=False, rows_imported=0)
+        try:
+            result = import_table_job(context, importer, table_name, out)
+            return result
+        except Exception as e:
+            out.write(f"✗ Error: {str(e)}")
+            context.logger.error(f"Failed to import table {table_name}", error=e)
+            result.error = str(e)
+            return result
+        finally:
+            out.flush()
+            release_importer(importer, result)
+    
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run, name): name for name in ordered}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+    finally:
+        for importer in extra_importers:
+            importer.close()
+    
+    return [results[name] for name in table_names]
+
+
+def _perf_report_path(logger):
+    """Path del report delle prestazioni, accanto al file di log dell'esecuzione"""
+    return os.path.join(logger.log_dir, f"perf_{logger.app_name}_{logger.timestamp}.json")
+
+
+def _write_perf_report(profiler, logger, summary):
+    """
+    Scrive il report JSON del profiler (e i file cProfile con --profile)
+    
+    Un errore di scrittura viene registrato senza cambiare l'esito del sync.
+    
+    Args:
+        profiler: Profiler dell'esecuzione
+        logger: SyncLogger dell'esecuzione (directory e timestamp dei file)
+        summary: Totali dell'esecuzione da includere nel report
+    
+    Returns:
+        Path del report, None se la scrittura è fallita
+    """
+    path = _perf_report_path(logger)
+    try:
+        cprofile_files = None
+        if profiler.cprofile:
+            cprofile_files = profiler.dump_cprofile(path[:-len('.json')])
+        profiler.write_report(
+            path,
+            app_name=logger.app_name,
+            log_file=logger.log_path,
+            summary=summary,
+            cprofile_files=cprofile_files
+        )
+        logger.info(f"Performance report written to {path}")
+        return path
+    except Exception as e:
+        logger.warning(f"Failed to write performance report: {str(e)}")
+        return None
+
+
+def _download_progress(step=0.1, unknown_step=64 * 1024 * 1024):
+    """
+    Callback di avanzamento del download HTTP del backup
+    
+    Args:
+        step: Frazione del totale tra due righe di console
+        unknown_step: Byte tra due righe se la dimensione totale non è nota
+    
+    Returns:
+        Funzione (byte scaricati, byte totali o None)
+    """
+    next_report = [0]
+    
+    def progress(downloaded, total):
+        threshold = total * step if total else unknown_step
+        if downloaded < next_report[0] and downloaded != total:
+            return
+        next_report[0] = downloaded + threshold
+        if total:
+            print(f"  Downloaded {downloaded / (1024 * 1024):.1f} / {total / (1024 * 1024):.1f} MB")
+        else:
+            print(f"  Downloaded {downloaded / (1024 * 1024):.1f} MB")
+    
+    return progress
+
+
+def _remove_file(path):
+    """
+    Rimuove un file temporaneo ignorando gli errori
+    
+    Args:
+        path: Path del file da rimuovere
+    """
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # Ignora errori di pulizia
+
+
 def parse_arguments():
     """
     Parse argomenti da linea di comando
@@ -92,6 +1096,11 @@ Examples:
   python sync.py appclinics
   python sync.py appclinics --config custom_config.json
   python sync.py appclinics --config config.json --log-dir ./logs
+  python sync.py appclinics --full-reload
+  python sync.py appclinics --parallel 4
+  python sync.py appclinics --pipeline-queue 0
+  python sync.py appclinics --profile
+  python sync.py appclinics --snapshot-max-age 3600
 
 Exit Codes:
   0 - Success
@@ -123,7 +1132,63 @@ Exit Codes:
         help='Directory per i log (override configurazione)'
     )
     
-    return parser.parse_args()
+    parser.add_argument(
+        '--full-reload',
+        action='store_true',
+        help='Ricarica tutte le tabelle ignorando i fingerprint delle tabelle invariate'
+    )
+    
+    parser.add_argument(
+        '--parallel',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Importa le tabelle in parallelo su N connessioni SQL Server (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--pipeline-queue',
+        type=int,
+        default=None,
+        metavar='N',
+        help='Batch decodificati in coda verso l\'insert, 0 disattiva la pipeline (override configurazione)'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Salva anche le statistiche cProfile di ogni fase (perf_<app>_<timestamp>_<fase>.prof); '
+             'con --parallel il lavoro dei worker è nel file della fase table, non in quello della fase import'
+    )
+    
+    parser.add_argument(
+        '--snapshot-max-age',
+        type=int,
+        default=None,
+        metavar='SECONDS',
+        help='Riusa lo snapshot in cache se non più vecchio di SECONDS (override configurazione, richiede snapshot_cache_dir)'
+    )
+    
+    parser.add_argument(
+        '--decode-workers',
+        type=int,
+        default=None,
+        metavar='N',
+        help='Processi per la decodifica JSON delle tabelle dello snapshot, 0 o 1 nel processo corrente (override configurazione)'
+    )
+    
+    args = parser.parse_args()
+    
+    if args.parallel < 1:
+        parser.error('--parallel must be a positive integer')
+    if args.pipeline_queue is not None and args.pipeline_queue < 0:
+        parser.error('--pipeline-queue must be a non-negative integer')
+    if args.snapshot_max_age is not None and args.snapshot_max_age < 0:
+        parser.error('--snapshot-max-age must be a non-negative integer')
+    if args.decode_workers is not None and args.decode_workers < 0:
+        parser.error('--decode-workers must be a non-negative integer')
+    
+    return args
 
 
 def main():
@@ -136,7 +1201,15 @@ def main():
     start_time = time.time()
     args = parse_arguments()
     
+    # Fasi misurate dal profiler: report perf_<app>_<timestamp>.json accanto al log
+    profiler = Profiler(cprofile=args.profile)
+    config_span = profiler.span('config').start()
+    
     logger = None
+    zip_path = None
+    snapshot_cache = None
+    convex_client = None
+    perf_summary = {}
     
     try:
         # 1. Carica configurazione
@@ -166,12 +1239,15 @@ def main():
             print(f"  - Deploy key: {convex_app_config.get('deploy_key', '')[:20]}...")
             
             # Create ConvexConfig from Convex data
-            from src.config import ConvexConfig
             convex_config = ConvexConfig(
                 app_name=convex_app_config['name'],
                 deploy_key=convex_app_config['deploy_key'],
                 tables=convex_app_config.get('tables'),
-                table_mapping=convex_app_config.get('table_mapping')
+                table_mapping=convex_app_config.get('table_mapping'),
+                table_options=convex_app_config.get('table_options'),
+                deployment_url=convex_app_config.get('deployment_url'),
+                export_transport=convex_app_config.get('export_transport', 'auto'),
+                export_mode=convex_app_config.get('export_mode', 'snapshot')
             )
         else:
             print(f"⚠ Could not load from Convex, falling back to JSON config...")
@@ -185,8 +1261,12 @@ def main():
         sql_config = config_manager.get_sql_config()
         email_config = config_manager.get_email_config()
         
-        # Override log_dir se specificato
+        # Override log_dir e coda della pipeline se specificati
         log_dir = args.log_dir if args.log_dir else config.log_dir
+        pipeline_queue_size = (
+            args.pipeline_queue if args.pipeline_queue is not None else sql_config.pipeline_queue_size
+        )
+        decode_workers = args.decode_workers if args.decode_workers is not None else config.decode_workers
         
         print(f"✓ Configuration loaded")
         print(f"  - Tables: {convex_config.tables or 'all'}")
@@ -200,6 +1280,8 @@ def main():
         print(f"  - Deploy key: {convex_config.deploy_key[:20]}...")
         print()
         
+        config_span.stop()
+        
         # 2. Inizializza logger
         logger = SyncLogger(log_dir, args.app_name)
         logger.log_execution_start({
@@ -211,19 +1293,73 @@ def main():
         # 3. Inizializza email notifier
         email_notifier = EmailNotifier(email_config, logger)
         
-        # 3. Download backup da Convex
-        print("Downloading backup from Convex...")
-        convex_client = ConvexClient(convex_config.deploy_key, logger=logger)
+        # 3. Download backup da Convex (o riuso dalla cache degli snapshot)
+        if config.snapshot_cache_dir:
+            snapshot_cache = SnapshotCache(
+                config.snapshot_cache_dir,
+                config.snapshot_cache_max_bytes,
+                max_age=(
+                    args.snapshot_max_age if args.snapshot_max_age is not None
+                    else config.snapshot_cache_max_age
+                )
+            )
+        elif args.snapshot_max_age:
+            print("⚠ --snapshot-max-age ignored: snapshot_cache_dir is not configured")
+        
+        streaming = convex_config.export_mode == 'streaming'
+        print("Reading tables from Convex streaming export..." if streaming else "Downloading backup from Convex...")
+        convex_client = ConvexClient(
+            convex_config.deploy_key,
+            logger=logger,
+            profiler=profiler,
+            deployment_url=convex_config.deployment_url,
+            transport=convex_config.export_transport,
+            progress=_download_progress(),
+            cache=snapshot_cache,
+            decode_workers=decode_workers
+        )
         
         try:
-            backup_data = convex_client.get_backup_data(convex_config.tables)
-            total_rows = sum(len(rows) for rows in backup_data.values())
+            if streaming:
+                # Nessuno snapshot ZIP: le tabelle vengono lette pagina per pagina
+                # dalle API di streaming export durante l'import
+                available_tables = convex_client.list_streaming_tables()
+                manifest = SnapshotManifest()
+                if convex_config.tables is not None:
+                    backup_tables = [t for t in convex_config.tables if t in available_tables]
+                    manifest.missing_tables = [t for t in convex_config.tables if t not in available_tables]
+                else:
+                    backup_tables = available_tables
+                for table_name in manifest.missing_tables:
+                    print(f"⚠ Warning: Tabella '{table_name}' non trovata nel deployment")
             
-            print(f"✓ Backup downloaded")
-            print(f"  - Tables: {len(backup_data)}")
-            print(f"  - Total rows: {total_rows}\n")
+                print(f"✓ Streaming export ready")
+                print(f"  - Tables: {len(backup_tables)}\n")
             
-            logger.info(f"Backup downloaded - tables: {len(backup_data)}, rows: {total_rows}")
+                logger.info(f"Streaming export ready - tables: {len(backup_tables)}")
+            else:
+                zip_path = convex_client.download_backup()
+            
+                # Le tabelle vengono lette in streaming dallo ZIP durante l'import:
+                # quelle non configurate non vengono mai decompresse
+                manifest = convex_client.read_manifest(zip_path, convex_config.tables)
+                for table_name in manifest.missing_tables:
+                    print(f"⚠ Warning: Tabella '{table_name}' non trovata nel backup")
+                backup_tables = list(manifest.tables)
+            
+                snapshot_size = os.path.getsize(zip_path)
+                
+                print(f"✓ Backup downloaded")
+                print(f"  - Tables: {len(backup_tables)}")
+                print(f"  - Snapshot size: {snapshot_size / (1024 * 1024):.2f} MB")
+                print(f"  - Bytes skipped: {manifest.skipped_bytes} ({len(manifest.skipped_tables)} unselected tables)\n")
+                
+                logger.info(
+                    f"Backup downloaded - tables: {len(backup_tables)}, size: {snapshot_size} bytes",
+                    bytes_to_decode=manifest.selected_bytes,
+                    bytes_skipped=manifest.skipped_bytes,
+                    compressed_bytes_skipped=manifest.skipped_compressed_bytes
+                )
             
         except Exception as e:
             logger.error(f"Failed to download backup", error=e)
@@ -239,29 +1375,47 @@ def main():
             
             return EXIT_NETWORK_ERROR
         
-        # 4. Connessione SQL Server
-        print("Connecting to SQL Server...")
+        # 4. Connessione al database di destinazione
         sql_importer = SQLImporter(
             connection_string=sql_config.connection_string,
             schema=sql_config.schema,
-            timeout=sql_config.timeout
+            timeout=sql_config.timeout,
+            fast_executemany=sql_config.fast_executemany,
+            batch_rows=sql_config.batch_rows,
+            batch_bytes=sql_config.batch_bytes,
+            load_mode=sql_config.load_mode,
+            metadata_cache=sql_config.metadata_cache,
+            insert_method=sql_config.insert_method,
+            bulk_dir=sql_config.bulk_dir,
+            bulk_server_dir=sql_config.bulk_server_dir,
+            dialect=sql_config.dialect,
+            profiler=profiler
         )
+        target_label = sql_importer.dialect.label
+        print(f"Connecting to {target_label}...")
         
         try:
             sql_importer.connect()
-            print(f"✓ Connected to SQL Server")
-            print(f"  - Schema: {sql_config.schema}\n")
+            print(f"✓ Connected to {target_label}")
+            print(f"  - Schema: {sql_config.schema}")
+            print(f"  - fast_executemany: {'on' if sql_importer.use_fast_executemany else 'off'}")
+            print(f"  - Insert method: {sql_config.insert_method}")
+            print(f"  - Load mode: {sql_config.load_mode}")
+            if sql_importer.catalog is not None:
+                print(f"  - Metadata catalog: {len(sql_importer.catalog)} tables")
+            print(f"  - Decode pipeline: {f'{pipeline_queue_size} batches queued' if pipeline_queue_size else 'off'}")
+            print(f"  - Decode workers: {decode_workers if decode_workers > 1 else 'off'}\n")
             
-            logger.info("Connected to SQL Server")
+            logger.info(f"Connected to {target_label}")
             
         except Exception as e:
-            logger.error(f"Failed to connect to SQL Server", error=e)
-            print(f"✗ Error connecting to SQL Server: {str(e)}\n")
+            logger.error(f"Failed to connect to {target_label}", error=e)
+            print(f"✗ Error connecting to {target_label}: {str(e)}\n")
             
             # Invia notifica email
             email_notifier.send_error_notification(
                 app_name=args.app_name,
-                error_type="SQL Server Connection Error",
+                error_type=f"{target_label} Connection Error",
                 error_message=str(e),
                 stack_trace=traceback.format_exc()
             )
@@ -270,95 +1424,41 @@ def main():
         
         # 5. Import tabelle
         print("Importing tables...")
-        type_mapper = TypeMapper()
         results = []
         
-        from src.export import TableData
-        
         # Check for tables that exist in Convex but are empty
         configured_tables = convex_config.tables
+        import_tables = list(backup_tables)
         if configured_tables:  # Solo se ci sono tabelle configurate
             for table_name in configured_tables:
-                if table_name not in backup_data:
+                if table_name not in backup_tables:
                     print(f"  Adding empty '{table_name}' table (configured but not in backup)...")
-                    backup_data[table_name] = []  # Tabella vuota
+                    import_tables.append(table_name)  # Tabella vuota
         
-        for table_name, rows in backup_data.items():
-            # Ottieni nome tabella SQL dal mapping
-            sql_table_name = convex_config.get_sql_table_name(table_name)
-            
-            if not rows:
-                # Tabella vuota: crea tabella con schema di base se non esiste
-                logger.info(f"Table {table_name} is empty - creating empty table with basic schema")
-                
-                table_exists = sql_importer.table_exists(sql_table_name)
-                
-                if not table_exists:
-                    print(f"  - {table_name} → {sql_table_name} (create empty)...", end=' ')
-                    
-                    # Crea tabella vuota con schema di base Convex
-                    basic_columns = ['_id', '_creationTime']  # Colonne standard Convex
-                    sql_importer.create_table(sql_table_name, basic_columns)
-                    
-                    print("✓")
-                    logger.info(f"Created empty table {sql_table_name} with basic schema")
-                    
-                    results.append(ImportResult(
-                        table_name=table_name,
-                        success=True,
-                        rows_imported=0,
-                        error=None,
-                        duration_seconds=0.0
-                    ))
-                else:
-                    print(f"  - {table_name} → {sql_table_name} (exists, empty)...", end=' ')
-                    
-                    # Tabella esiste ma è vuota: truncate per sicurezza
-                    sql_importer.truncate_table(sql_table_name)
-                    
-                    print("✓")
-                    logger.info(f"Table {sql_table_name} exists but source is empty - truncated")
-                    
-                    results.append(ImportResult(
-                        table_name=table_name,
-                        success=True,
-                        rows_imported=0,
-                        error=None,
-                        duration_seconds=0.0
-                    ))
-                
-                continue
-            
-            # Verifica se tabella esiste
-            table_exists = sql_importer.table_exists(sql_table_name)
-            
-            if table_exists:
-                print(f"  - {table_name} → {sql_table_name} (truncate + insert)...", end=' ')
-                logger.info(f"Truncating table {sql_table_name} before import")
-            else:
-                print(f"  - {table_name} → {sql_table_name} (create + insert)...", end=' ')
-                logger.info(f"Creating table {sql_table_name}")
-            
-            # Import con auto-create
-            result = sql_importer.import_table(
-                table_name=sql_table_name,
-                rows=rows,
-                type_mapper=type_mapper,
-                auto_create=True
-            )
-            
-            results.append(result)
+        context = SyncContext(
+            convex_config=convex_config,
+            sql_config=sql_config,
+            convex_client=convex_client,
+            zip_path=zip_path,
+            manifest=manifest,
+            fingerprints=FingerprintStore(config.state_dir, args.app_name),
+            schemas=SchemaCache(config.state_dir, args.app_name),
+            logger=logger,
+            full_reload=args.full_reload,
+            type_mapper=TypeMapper(),
+            pipeline_queue_size=pipeline_queue_size,
+            profiler=profiler,
+            streaming_tables=set(backup_tables) if streaming else None,
+            cursors=DeltaCursorStore(config.state_dir, args.app_name) if streaming else None
+        )
             
-            if result.success:
-                print(f"✓ {result.rows_imported} rows ({result.duration_seconds:.2f}s)")
-                logger.info(
-                    f"Imported table {table_name} → {sql_table_name}",
-                    rows=result.rows_imported,
-                    duration=f"{result.duration_seconds:.2f}s"
-                )
+        with profiler.span('import') as import_span:
+            if args.parallel > 1:
+                results = import_tables_parallel(context, import_tables, sql_importer, args.parallel)
             else:
-                print(f"✗ Error: {result.error}")
-                logger.error(f"Failed to import table {table_name} → {sql_table_name}: {result.error}")
+                for table_name in import_tables:
+                    results.append(import_table_job(context, sql_importer, table_name, TableOutput()))
+            import_span.add(rows=sum(r.rows_imported for r in results))
         
         # 6. Chiudi connessione
         sql_importer.close()
@@ -366,8 +1466,17 @@ def main():
         # 7. Summary
         success_count = sum(1 for r in results if r.success)
         failed_count = len(results) - success_count
+        skipped_count = sum(1 for r in results if r.skipped)
         total_rows_imported = sum(r.rows_imported for r in results)
         duration = time.time() - start_time
+        stage_totals = _sum_stage_stats(results)
+        cache_stats = snapshot_cache.stats() if snapshot_cache else None
+        perf_summary.update(
+            tables_processed=len(results),
+            tables_failed=failed_count,
+            total_rows=total_rows_imported,
+            snapshot_cache=cache_stats
+        )
         
         print(f"\n{'='*70}")
         print("SUMMARY")
@@ -375,8 +1484,22 @@ def main():
         print(f"Tables processed: {len(results)}")
         print(f"  ✓ Success: {success_count}")
         print(f"  ✗ Failed: {failed_count}")
+        print(f"  ↷ Skipped (unchanged): {skipped_count}")
         print(f"Total rows imported: {total_rows_imported}")
         print(f"Duration: {duration:.2f}s")
+        if cache_stats:
+            print(
+                f"Snapshot cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                f"{cache_stats['evictions']} evictions "
+                f"({cache_stats['entries']} snapshots, {cache_stats['bytes'] / (1024 * 1024):.2f} MB)"
+            )
+        if stage_totals:
+            print(
+                f"Pipeline: decode {stage_totals['decode']['busy_seconds']:.2f}s busy / "
+                f"{stage_totals['decode']['idle_seconds']:.2f}s idle, "
+                f"insert {stage_totals['insert']['busy_seconds']:.2f}s busy / "
+                f"{stage_totals['insert']['idle_seconds']:.2f}s idle"
+            )
         print(f"Log file: {logger.log_path}")
         print(f"{'='*70}\n")
         
@@ -387,7 +1510,11 @@ def main():
                 'tables_processed': len(results),
                 'tables_success': success_count,
                 'tables_failed': failed_count,
-                'total_rows': total_rows_imported
+                'tables_skipped': skipped_count,
+                'total_rows': total_rows_imported,
+                'bytes_skipped': manifest.skipped_bytes,
+                'pipeline': stage_totals,
+                'snapshot_cache': cache_stats
             }
         )
         
@@ -424,6 +1551,20 @@ def main():
         import traceback
         traceback.print_exc()
         return EXIT_DATA_ERROR
+    
+    finally:
+        # Termina i processi di decodifica
+        if convex_client is not None:
+            convex_client.close()
+        
+        # Rimuovi il backup temporaneo (gli snapshot in cache restano per le esecuzioni successive)
+        if not (snapshot_cache and snapshot_cache.contains(zip_path)):
+            _remove_file(zip_path)
+        
+        if logger is not None:
+            report_path = _write_perf_report(profiler, logger, perf_summary)
+            if report_path is not None:
+                print(f"Perf report: {report_path}")
 
 
 if __name__ == '__main__':
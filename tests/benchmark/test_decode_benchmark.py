@@ -0,0 +1,133 @@
+"""
+Benchmark: dai documenti di una tabella dello snapshot alle righe pronte
+per l'INSERT, nel processo corrente vs con N processi di decodifica (decode_workers)
+
+Modalità misurate:
+- single process: decodifica, verifica e conversione nel processo corrente
+- N workers, dicts: documenti decodificati nei processi e ricostruiti come
+  dict, conversione nel processo principale
+- N workers, rows: verifica e conversione nei processi (RowBlockConverter),
+  al processo principale arrivano le tuple convertite (caricamento di sync.py)
+
+Per ogni modalità viene riportata anche la CPU del processo principale per
+documento: il suo inverso è il throughput massimo raggiungibile con core
+illimitati. Eseguire con `python -m pytest tests/benchmark -s` per vedere i
+risultati, oppure direttamente con `python -m tests.benchmark.test_decode_benchmark`
+(numero di processi: CONVEX_SYNC_BENCHMARK_DECODE_WORKERS, default: CPU disponibili).
+Il guadagno reale dipende dai core liberi: con una sola CPU i processi competono
+con il processo principale e le modalità parallele risultano più lente.
+"""
+import json
+import os
+import tempfile
+import time
+import zipfile
+from src.convex import ConvexClient
+from src.sql import SchemaValidator, TypeMapper
+
+
+DOCUMENT_COUNT = 20000
+WORKERS = max(2, int(os.environ.get('CONVEX_SYNC_BENCHMARK_DECODE_WORKERS') or os.cpu_count() or 2))
+
+
+def _write_snapshot(path, count):
+    """Snapshot sintetico con una tabella di documenti tipici di un export Convex"""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        with zip_ref.open('users/documents.jsonl', 'w') as doc_file:
+            for i in range(count):
+                document = {
+                    '_id': f"k{i:015d}",
+                    '_creationTime': 1.7e12 + i,
+                    'name': f"user {i}",
+                    'email': f"user{i}@example.com",
+                    'age': i % 90,
+                    'score': i * 1.5,
+                    'active': i % 2 == 0,
+                    'tags': ['a', 'b'],
+                    'address': {'city': 'Milano', 'zip': '20100'},
+                    'notes': None,
+                }
+                doc_file.write(json.dumps(document).encode() + b'\n')
+
+
+def _converted_rows(client, path, converter):
+    """Righe convertite da `converter` nel processo che decodifica ogni blocco"""
+    blocks = client.iter_table(path, 'users', batch_size=5000, transform=converter)
+    return [row for block in blocks for row in block.rows]
+
+
+def _dict_rows(client, path, converter):
+    """Documenti ricostruiti come dict e convertiti nel processo principale"""
+    batches = client.iter_table(path, 'users', batch_size=5000)
+    return [row for batch in batches for row in converter(batch).rows]
+
+
+def _measure(load, repeat=3):
+    """
+    Miglior tempo su `repeat` caricamenti completi della tabella
+    
+    Returns:
+        Tupla (secondi, secondi di CPU del processo principale, righe)
+    """
+    best = None
+    for _ in range(repeat):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        rows = load()
+        elapsed, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, cpu, rows)
+    return best
+
+
+def run_benchmark(document_count=DOCUMENT_COUNT, workers=WORKERS):
+    """Esegue il benchmark e restituisce {modalità: documenti/sec}"""
+    mapper = TypeMapper()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'snapshot.zip')
+        _write_snapshot(path, document_count)
+        size = os.path.getsize(path)
+        
+        # Schema noto (come con la cache degli schemi): tutti i documenti vengono verificati
+        schema = mapper.infer_schema(ConvexClient('key').iter_table(path, 'users'))
+        types = {col: column.convex_type for col, column in schema.items()}
+        converter = SchemaValidator(mapper, schema).block_converter(list(schema), types)
+        
+        serial = ConvexClient('key')
+        results = {'single process': _measure(lambda: _converted_rows(serial, path, converter))}
+        
+        client = ConvexClient('key', decode_workers=workers)
+        try:
+            # Avvio dei processi escluso dalla misura
+            warmup = client.iter_table(path, 'users')
+            next(warmup)
+            warmup.close()
+            results[f'{workers} workers, dicts'] = _measure(lambda: _dict_rows(client, path, converter))
+            results[f'{workers} workers, rows'] = _measure(lambda: _converted_rows(client, path, converter))
+        finally:
+            client.close()
+    
+    expected = results['single process'][2]
+    assert all(rows == expected for _, _, rows in results.values())
+    
+    serial_seconds = results['single process'][0]
+    print(f"\nSnapshot load ({document_count} documents, {size / (1024 * 1024):.1f} MB compressed, "
+          f"{os.cpu_count()} CPUs)")
+    for mode, (seconds, cpu, _) in results.items():
+        print(
+            f"  {mode + ':':<20}{document_count / seconds:>10,.0f} documents/sec  "
+            f"speedup {serial_seconds / seconds:.2f}x  "
+            f"main process {cpu / document_count * 1e6:.1f} us/document "
+            f"(ceiling {serial_seconds / cpu:.1f}x)"
+        )
+    
+    return {mode: document_count / seconds for mode, (seconds, _, _) in results.items()}
+
+
+def test_decode_benchmark():
+    """Benchmark caricamento dello snapshot (verifica anche l'equivalenza delle righe)"""
+    results = run_benchmark(workers=min(WORKERS, 4))
+    assert all(dps > 0 for dps in results.values())
+
+
+if __name__ == '__main__':
+    run_benchmark(500000)
@@ -0,0 +1,89 @@
+"""
+Benchmark: metodi di insert di SQLImporter su un SQL Server reale
+
+Richiede un database di test: impostare CONVEX_SYNC_BENCHMARK_DSN con la
+stringa di connessione ODBC (lo schema usato è CONVEX_SYNC_BENCHMARK_SCHEMA,
+default 'dbo'). Senza la variabile il benchmark viene saltato. Il metodo
+'bcp' scrive i file in CONVEX_SYNC_BENCHMARK_BULK_DIR (default: directory
+temporanea), che deve essere leggibile dal server.
+
+    CONVEX_SYNC_BENCHMARK_DSN="Driver={ODBC Driver 18 for SQL Server};..." \\
+        python -m pytest tests/benchmark/test_insert_benchmark.py -s
+"""
+import os
+import time
+import pytest
+from src.sql import SQLImporter, TypeMapper
+
+
+DSN = os.environ.get('CONVEX_SYNC_BENCHMARK_DSN')
+SCHEMA = os.environ.get('CONVEX_SYNC_BENCHMARK_SCHEMA', 'dbo')
+BULK_DIR = os.environ.get('CONVEX_SYNC_BENCHMARK_BULK_DIR')
+ROW_COUNT = 20000
+TABLE_NAME = '_sync_insert_benchmark'
+
+# (etichetta, fast_executemany, insert_method)
+STRATEGIES = [
+    ('executemany', False, 'executemany'),
+    ('fast_executemany', True, 'executemany'),
+    ('tvp', False, 'tvp'),
+    ('bcp', False, 'bcp'),
+]
+
+
+def _make_rows(count):
+    """Righe sintetiche con i tipi tipici di un export Convex"""
+    return [
+        {
+            '_id': f"k{i:015d}",
+            '_creationTime': 1.7e12 + i,
+            'name': f"user {i}",
+            'age': i % 90,
+            'score': i * 1.5,
+            'active': i % 2 == 0,
+        }
+        for i in range(count)
+    ]
+
+
+def run_benchmark(row_count=ROW_COUNT):
+    """Carica le stesse righe con ogni strategia e restituisce label -> righe/sec"""
+    mapper = TypeMapper()
+    rows = _make_rows(row_count)
+    schema = mapper.infer_schema(rows)
+    results = {}
+    
+    for label, fast_executemany, insert_method in STRATEGIES:
+        importer = SQLImporter(
+            DSN, SCHEMA, fast_executemany=fast_executemany, insert_method=insert_method,
+            bulk_dir=BULK_DIR
+        )
+        importer.connect()
+        try:
+            importer.drop_table(TABLE_NAME)
+            start = time.perf_counter()
+            result = importer.import_table(TABLE_NAME, rows, mapper, column_schema=schema)
+            elapsed = time.perf_counter() - start
+            assert result.success, result.error
+            assert result.rows_imported == row_count
+            results[label] = row_count / elapsed
+        finally:
+            importer.drop_table(TABLE_NAME)
+            importer.close()
+    
+    print(f"\nInsert strategies ({row_count} rows)")
+    for label, rows_per_second in results.items():
+        print(f"  {label:<17} {rows_per_second:,.0f} rows/sec")
+    
+    return results
+
+
+@pytest.mark.skipif(not DSN, reason="CONVEX_SYNC_BENCHMARK_DSN not set")
+def test_insert_strategies_benchmark():
+    """Benchmark executemany / fast_executemany / TVP / bcp sulla stessa tabella"""
+    results = run_benchmark()
+    assert all(rows_per_second > 0 for rows_per_second in results.values())
+
+
+if __name__ == '__main__':
+    run_benchmark(100000)
@@ -0,0 +1,89 @@
+"""
+Unit tests per il writer di file bcp
+"""
+import struct
+import pytest
+from datetime import datetime
+from src.bcp import BcpWriter
+
+
+COLUMN_TYPES = {
+    '_id': ('nvarchar', 16),
+    'count': ('bigint', None),
+    'score': ('float', None),
+    'active': ('bit', None),
+    'created': ('datetime2', None),
+    'data': ('varbinary', -1),
+}
+
+
+def _text(value):
+    data = value.encode('utf-16-le')
+    return struct.pack('<q', len(data)) + data
+
+
+class TestBcpWriter:
+    """Test per BcpWriter"""
+    
+    def test_native_row_encoding(self):
+        """Test codifica nativa con prefissi di lunghezza"""
+        writer = BcpWriter(list(COLUMN_TYPES), COLUMN_TYPES)
+        row = ('a😀', -2, 1.5, True, datetime(2024, 1, 2, 3, 4, 5, 600000), b'\x00\x01')
+        
+        assert writer.encode_row(row) == (
+            _text('a😀')
+            + b'\x08' + struct.pack('<q', -2)
+            + b'\x08' + struct.pack('<d', 1.5)
+            + b'\x01\x01'
+            + _text('2024-01-02 03:04:05.600000')
+            + struct.pack('<q', 2) + b'\x00\x01'
+        )
+    
+    def test_native_nulls(self):
+        """Test rappresentazione dei NULL nel formato nativo"""
+        writer = BcpWriter(['_id', 'count', 'active'], COLUMN_TYPES)
+        assert writer.encode_row((None, None, None)) == struct.pack('<q', -1) + b'\xff\xff'
+    
+    def test_format_file_maps_server_ordinals(self):
+        """Test format file con ordinali delle colonne della tabella"""
+        writer = BcpWriter(['data', '_id'], COLUMN_TYPES)
+        
+        assert writer.format_file().splitlines() == [
+            '14.0',
+            '2',
+            '1\tSQLBINARY\t8\t0\t""\t6\tdata\t""',
+            '2\tSQLNCHAR\t8\t0\t""\t1\t_id\t""',
+        ]
+    
+    def test_char_format(self):
+        """Test formato carattere UTF-16 con terminatori"""
+        writer = BcpWriter(['_id', 'count', 'active'], COLUMN_TYPES, data_format='char')
+        
+        assert writer.encode_row(('a', 3, False)) == 'a\t3\t0\r\n'.encode('utf-16-le')
+        assert writer.format_file().splitlines()[2:] == [
+            '1\tSQLNCHAR\t0\t0\t"\\t\\0"\t1\t_id\t""',
+            '2\tSQLNCHAR\t0\t0\t"\\t\\0"\t2\tcount\t""',
+            '3\tSQLNCHAR\t0\t0\t"\\r\\0\\n\\0"\t4\tactive\t""',
+        ]
+        with pytest.raises(ValueError, match='terminator'):
+            writer.encode_row(('a\tb', 1, True))
+    
+    def test_write_files(self, tmp_path):
+        """Test scrittura in streaming di file dati e format file"""
+        writer = BcpWriter(['_id', 'count'], COLUMN_TYPES)
+        rows = ((str(i), i) for i in range(5))
+        
+        assert writer.write_data_file(str(tmp_path / 'items.dat'), rows) == 5
+        writer.write_format_file(str(tmp_path / 'items.fmt'))
+        
+        data = (tmp_path / 'items.dat').read_bytes()
+        assert data.startswith(_text('0') + b'\x08' + struct.pack('<q', 0))
+        assert (tmp_path / 'items.fmt').read_bytes().startswith(b'14.0\r\n2\r\n')
+    
+    def test_invalid_values_and_columns(self):
+        """Test errori per valori non rappresentabili e colonne sconosciute"""
+        writer = BcpWriter(['count'], COLUMN_TYPES)
+        with pytest.raises(ValueError, match='native format'):
+            writer.encode_row((2 ** 70,))
+        with pytest.raises(ValueError, match='Columns not in target table: email'):
+            BcpWriter(['email'], COLUMN_TYPES)
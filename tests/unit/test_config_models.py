@@ -40,6 +40,50 @@ class TestConvexConfig:
         """Test that empty deploy_key raises ValueError."""
         with pytest.raises(ValueError, match="deploy_key must be a non-empty string"):
             ConvexConfig(app_name="app", deploy_key="")
+    
+    def test_convex_config_table_options(self):
+        """Test per-table options lookup with defaults."""
+        config = ConvexConfig(
+            app_name="app",
+            deploy_key="key",
+            table_options={"orders": {"sync_mode": "incremental"}}
+        )
+        assert config.get_table_option("orders", "sync_mode", "full") == "incremental"
+        assert config.get_table_option("users", "sync_mode", "full") == "full"
+    
+    def test_convex_config_invalid_sync_mode(self):
+        """Test that an unknown sync_mode raises ValueError."""
+        with pytest.raises(ValueError, match="sync_mode must be 'full' or 'incremental'"):
+            ConvexConfig(
+                app_name="app",
+                deploy_key="key",
+                table_options={"orders": {"sync_mode": "append"}}
+            )
+    
+    def test_convex_config_invalid_flatten_options(self):
+        """Test that invalid flatten/child_tables options raise ValueError."""
+        with pytest.raises(ValueError, match="flatten must be a boolean or a list of paths"):
+            ConvexConfig(app_name="app", deploy_key="key", table_options={"users": {"flatten": "address"}})
+        with pytest.raises(ValueError, match="child_tables must be a list of paths"):
+            ConvexConfig(app_name="app", deploy_key="key", table_options={"users": {"child_tables": [""]}})
+        with pytest.raises(ValueError, match="insert_method must be 'executemany', 'tvp' or 'bcp'"):
+            ConvexConfig(app_name="app", deploy_key="key", table_options={"users": {"insert_method": "bulk"}})
+    
+    def test_convex_config_export_options(self):
+        """Test export_transport and deployment_url validation."""
+        config = ConvexConfig(app_name="app", deploy_key="key", deployment_url="https://a-b-1.convex.cloud")
+        assert config.export_transport == "auto"
+        with pytest.raises(ValueError, match="export_transport must be 'auto', 'http' or 'cli'"):
+            ConvexConfig(app_name="app", deploy_key="key", export_transport="npx")
+        with pytest.raises(ValueError, match="deployment_url must be an http"):
+            ConvexConfig(app_name="app", deploy_key="key", deployment_url="a-b-1.convex.cloud")
+    
+    def test_convex_config_export_mode(self):
+        """Test export_mode validation."""
+        assert ConvexConfig(app_name="app", deploy_key="key").export_mode == "snapshot"
+        assert ConvexConfig(app_name="app", deploy_key="key", export_mode="streaming").export_mode == "streaming"
+        with pytest.raises(ValueError, match="export_mode must be 'snapshot' or 'streaming'"):
+            ConvexConfig(app_name="app", deploy_key="key", export_mode="deltas")
 
 
 class TestSQLConfig:
@@ -78,6 +122,31 @@ class TestSQLConfig:
         """Test that invalid timeout raises ValueError."""
         with pytest.raises(ValueError, match="timeout must be a positive integer"):
             SQLConfig(connection_string="conn", schema="schema", timeout=0)
+    
+    def test_sql_config_invalid_pipeline_queue_size(self):
+        """Test that a negative pipeline_queue_size raises ValueError."""
+        assert SQLConfig(connection_string="conn", schema="schema", pipeline_queue_size=0).pipeline_queue_size == 0
+        with pytest.raises(ValueError, match="pipeline_queue_size must be a non-negative integer"):
+            SQLConfig(connection_string="conn", schema="schema", pipeline_queue_size=-1)
+    
+    def test_sql_config_invalid_metadata_cache(self):
+        """Test that a non-boolean metadata_cache raises ValueError."""
+        with pytest.raises(ValueError, match="metadata_cache must be a boolean"):
+            SQLConfig(connection_string="conn", schema="schema", metadata_cache="yes")
+    
+    def test_sql_config_invalid_insert_method(self):
+        """Test that an unknown insert_method raises ValueError."""
+        with pytest.raises(ValueError, match="insert_method must be 'executemany', 'tvp' or 'bcp'"):
+            SQLConfig(connection_string="conn", schema="schema", insert_method="bulk")
+        with pytest.raises(ValueError, match="bulk_dir must be a non-empty string or None"):
+            SQLConfig(connection_string="conn", schema="schema", bulk_dir="")
+    
+    def test_sql_config_dialect(self):
+        """Test that dialect accepts sqlserver, sqlite and duckdb only."""
+        assert SQLConfig(connection_string="conn", schema="schema").dialect == "sqlserver"
+        assert SQLConfig(connection_string="sync.db", schema="main", dialect="sqlite").dialect == "sqlite"
+        with pytest.raises(ValueError, match="dialect must be 'sqlserver', 'sqlite' or 'duckdb'"):
+            SQLConfig(connection_string="conn", schema="schema", dialect="postgres")
 
 
 class TestEmailConfig:
@@ -179,6 +248,32 @@ class TestConfig:
         assert config.log_dir == "logs"
         assert config.retry_attempts == 3
         assert config.retry_backoff == 2.0
+        assert config.snapshot_cache_dir is None
+        assert config.snapshot_cache_max_age == 0
+        assert config.decode_workers == 0
+        with pytest.raises(ValueError, match="decode_workers must be a non-negative integer"):
+            Config(convex_apps={"test-app": convex_config}, sql=sql_config, email=email_config, decode_workers=-1)
+    
+    def test_config_snapshot_cache_options(self):
+        """Test snapshot cache quota and max_age validation."""
+        kwargs = dict(
+            convex_apps={"test-app": ConvexConfig(app_name="test-app", deploy_key="key")},
+            sql=SQLConfig(connection_string="conn", schema="schema"),
+            email=EmailConfig(
+                smtp_host="smtp.example.com",
+                smtp_port=587,
+                smtp_user="user",
+                smtp_password="pass",
+                from_email="from@example.com",
+                to_emails=["to@example.com"]
+            )
+        )
+        config = Config(snapshot_cache_dir="cache", snapshot_cache_max_age=3600, **kwargs)
+        assert config.snapshot_cache_max_bytes == 10 * 1024 * 1024 * 1024
+        with pytest.raises(ValueError, match="snapshot_cache_max_bytes must be a positive integer"):
+            Config(snapshot_cache_max_bytes=0, **kwargs)
+        with pytest.raises(ValueError, match="snapshot_cache_max_age must be a non-negative integer"):
+            Config(snapshot_cache_max_age=-1, **kwargs)
     
     def test_config_empty_convex_apps(self):
         """Test that empty convex_apps raises ValueError."""
@@ -0,0 +1,727 @@
+"""
+Unit tests per ConvexClient (lettura backup)
+"""
+import pytest
+import base64
+import json
+import os
+import re
+import threading
+import zipfile
+from urllib.parse import parse_qs, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.convex import (
+    ConvexClient, ConvexError, HttpExportTransport, decode_json_lines, deployment_url_from_key, intact_prefix,
+    transform_json_lines, verify_snapshot
+)
+from src.profiling import Profiler
+from src.state import SnapshotCache
+
+
+def _write_backup(path, tables):
+    """Crea un backup ZIP con un documents.jsonl per ogni tabella"""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        for table_name, documents in tables.items():
+            content = '\n'.join(json.dumps(doc) for doc in documents)
+            zip_ref.writestr(f"{table_name}/documents.jsonl", content + '\n')
+        zip_ref.writestr("_tables/documents.jsonl", '')
+        zip_ref.writestr("README.md", 'snapshot')
+    return str(path)
+
+
+def _document_ids(documents):
+    """Transform di prova (picklable): id dei documenti del blocco"""
+    return [document['_id'] for document in documents]
+
+
+@pytest.fixture
+def backup_path(tmp_path):
+    """Backup di esempio con due tabelle"""
+    return _write_backup(tmp_path / 'snapshot.zip', {
+        'users': [{'_id': f'u{i}', 'name': f'user {i}'} for i in range(5)],
+        'orders': [{'_id': 'o1', 'total': 10.5}],
+    })
+
+
+class TestConvexClientStreaming:
+    """Test per la lettura in streaming dei backup"""
+    
+    def test_list_tables(self, backup_path):
+        """Test elenco tabelle dalla central directory"""
+        client = ConvexClient('prod:test|key')
+        assert client.list_tables(backup_path) == ['users', 'orders', '_tables']
+    
+    def test_iter_table_yields_documents(self, backup_path):
+        """Test lettura documenti uno alla volta"""
+        client = ConvexClient('prod:test|key')
+        documents = list(client.iter_table(backup_path, 'users'))
+        assert len(documents) == 5
+        assert documents[0] == {'_id': 'u0', 'name': 'user 0'}
+    
+    def test_iter_table_yields_batches(self, backup_path):
+        """Test lettura documenti a batch"""
+        client = ConvexClient('prod:test|key')
+        batches = list(client.iter_table(backup_path, 'users', batch_size=2))
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+    
+    def test_iter_table_empty_table(self, backup_path):
+        """Test tabella senza documenti"""
+        client = ConvexClient('prod:test|key')
+        assert list(client.iter_table(backup_path, '_tables')) == []
+    
+    def test_iter_table_missing_table_raises_error(self, backup_path):
+        """Test che una tabella mancante sollevi ConvexError"""
+        client = ConvexClient('prod:test|key')
+        with pytest.raises(ConvexError, match="non trovata"):
+            list(client.iter_table(backup_path, 'missing'))
+    
+    def test_iter_table_transform(self, backup_path):
+        """Test transform applicata a ogni blocco di batch_size documenti"""
+        client = ConvexClient('prod:test|key')
+        blocks = list(client.iter_table(backup_path, 'users', batch_size=2, transform=_document_ids))
+        assert blocks == [['u0', 'u1'], ['u2', 'u3'], ['u4']]
+    
+    def test_has_documents(self, backup_path):
+        """Test tabella con e senza documenti"""
+        client = ConvexClient('prod:test|key')
+        assert client.has_documents(backup_path, 'users')
+        assert not client.has_documents(backup_path, '_tables')
+        with pytest.raises(ConvexError, match="non trovata"):
+            client.has_documents(backup_path, 'missing')
+    
+    def test_iter_table_records_decode_stage(self, backup_path):
+        """Test fase convex.decode accumulata per tabella nel profiler"""
+        profiler = Profiler()
+        client = ConvexClient('prod:test|key', profiler=profiler)
+        assert len(list(client.iter_table(backup_path, 'users', batch_size=2))) == 3
+        list(client.iter_table(backup_path, 'users'))
+        
+        decode = profiler.stage_totals()['convex.decode']
+        assert decode['count'] == 2
+        assert decode['rows'] == 10
+        assert decode['bytes'] > 0
+    
+    def test_extract_backup_does_not_extract_to_disk(self, backup_path, tmp_path):
+        """Test che extract_backup non scriva file su disco"""
+        client = ConvexClient('prod:test|key')
+        extract_dir = tmp_path / 'extract'
+        extract_dir.mkdir()
+        data = client.extract_backup(backup_path, str(extract_dir))
+        assert set(data.keys()) == {'users', 'orders', '_tables'}
+        assert len(data['users']) == 5
+        assert list(extract_dir.iterdir()) == []
+
+
+class TestParallelDecode:
+    """Test per la decodifica JSON con i processi di decodifica (decode_workers)"""
+    
+    DOCUMENTS = [
+        {'_id': f'u{i}', 'name': f'user {i}', 'tags': ['a'], **({'age': i} if i % 3 else {})}
+        for i in range(200)
+    ]
+    
+    @pytest.fixture
+    def client(self):
+        client = ConvexClient('key', decode_workers=2)
+        # Blocchi piccoli: la tabella viene divisa tra i processi per intervalli di righe
+        client.DECODE_CHUNK_BYTES = 500
+        yield client
+        client.close()
+    
+    def test_decode_json_lines_shares_keys(self):
+        """Test forma compatta: tuple delle chiavi condivise tra documenti con gli stessi campi"""
+        documents, cpu = decode_json_lines(b'{"a": 1, "b": 2}\n\n{"a": 3, "b": 4}\n{"a": 5}')
+        
+        assert [(keys, values) for keys, values in documents] == [
+            (('a', 'b'), (1, 2)), (('a', 'b'), (3, 4)), (('a',), (5,))
+        ]
+        assert documents[0][0] is documents[1][0]
+        assert cpu >= 0
+    
+    def test_transform_json_lines(self):
+        """Test transform eseguita sui documenti decodificati del blocco"""
+        result, documents, cpu = transform_json_lines(b'{"_id": "a"}\n\n{"_id": "b"}', _document_ids)
+        
+        assert result == ['a', 'b']
+        assert documents == 2
+        assert cpu >= 0
+    
+    def test_transform_runs_in_workers(self, client, tmp_path):
+        """Test un risultato per blocco inviato ai processi, nell'ordine dei documenti"""
+        path = _write_backup(tmp_path / 'snapshot.zip', {'users': self.DOCUMENTS})
+        profiler = client.profiler = Profiler()
+        
+        blocks = list(client.iter_table(path, 'users', transform=_document_ids))
+        
+        assert len(blocks) > 1
+        assert [document_id for block in blocks for document_id in block] == [
+            document['_id'] for document in self.DOCUMENTS
+        ]
+        assert profiler.stage_totals()['convex.decode']['rows'] == len(self.DOCUMENTS)
+    
+    def test_documents_match_serial_decode(self, client, tmp_path):
+        """Test stessi documenti, nello stesso ordine, della decodifica nel processo corrente"""
+        path = _write_backup(tmp_path / 'snapshot.zip', {'users': self.DOCUMENTS})
+        
+        assert list(client.iter_table(path, 'users')) == self.DOCUMENTS
+        assert list(client.iter_table(path, 'users')) == list(ConvexClient('key').iter_table(path, 'users'))
+    
+    def test_batches(self, client, tmp_path):
+        """Test batch di al massimo batch_size documenti"""
+        path = _write_backup(tmp_path / 'snapshot.zip', {'users': self.DOCUMENTS})
+        
+        batches = list(client.iter_table(path, 'users', batch_size=7))
+        
+        assert all(0 < len(batch) <= 7 for batch in batches)
+        assert [doc for batch in batches for doc in batch] == self.DOCUMENTS
+    
+    def test_last_line_without_newline(self, client, tmp_path):
+        """Test ultima riga senza terminatore e righe vuote"""
+        path = str(tmp_path / 'snapshot.zip')
+        with zipfile.ZipFile(path, 'w') as zip_ref:
+            zip_ref.writestr('users/documents.jsonl', '{"_id": "a"}\n\n{"_id": "b"}')
+        
+        assert list(client.iter_table(path, 'users')) == [{'_id': 'a'}, {'_id': 'b'}]
+    
+    def test_invalid_json_raises_error(self, client, tmp_path):
+        """Test errore di decodifica in un processo riportato come ConvexError"""
+        path = str(tmp_path / 'snapshot.zip')
+        with zipfile.ZipFile(path, 'w') as zip_ref:
+            zip_ref.writestr('users/documents.jsonl', '{"_id": "a"}\n{not json\n')
+        
+        with pytest.raises(ConvexError, match="users"):
+            list(client.iter_table(path, 'users'))
+    
+    def test_records_decode_stage(self, tmp_path):
+        """Test fase 'convex.decode' con righe e byte della tabella"""
+        path = _write_backup(tmp_path / 'snapshot.zip', {'users': self.DOCUMENTS})
+        profiler = Profiler()
+        client = ConvexClient('key', profiler=profiler, decode_workers=2)
+        try:
+            list(client.iter_table(path, 'users'))
+        finally:
+            client.close()
+        
+        decode = profiler.stage_totals()['convex.decode']
+        assert decode['rows'] == len(self.DOCUMENTS)
+        with zipfile.ZipFile(path) as zip_ref:
+            assert decode['bytes'] == zip_ref.getinfo('users/documents.jsonl').file_size
+
+
+class TestConvexClientManifest:
+    """Test per il manifest letto dalla central directory"""
+    
+    def test_manifest_without_filter_selects_all_tables(self, backup_path):
+        """Test manifest senza filtro"""
+        client = ConvexClient('prod:test|key')
+        manifest = client.read_manifest(backup_path)
+        assert list(manifest.tables) == ['users', 'orders', '_tables']
+        assert manifest.skipped_bytes == 0
+        assert manifest.missing_tables == []
+    
+    def test_manifest_with_filter_reports_skipped_bytes(self, backup_path):
+        """Test che le tabelle escluse siano contate nei byte saltati"""
+        client = ConvexClient('prod:test|key')
+        manifest = client.read_manifest(backup_path, ['orders', 'missing'])
+        
+        with zipfile.ZipFile(backup_path) as zip_ref:
+            users_size = zip_ref.getinfo('users/documents.jsonl').file_size
+            orders_crc = zip_ref.getinfo('orders/documents.jsonl').CRC
+        
+        assert list(manifest.tables) == ['orders']
+        assert manifest.tables['orders'].crc == orders_crc
+        assert manifest.missing_tables == ['missing']
+        assert sorted(manifest.skipped_tables) == ['_tables', 'users']
+        assert manifest.skipped_bytes == users_size
+    
+    def test_extract_backup_with_filter(self, backup_path):
+        """Test estrazione limitata alle tabelle richieste"""
+        client = ConvexClient('prod:test|key')
+        data = client.extract_backup(backup_path, table_filter=['users'])
+        assert list(data.keys()) == ['users']
+
+
+class FakeDeployment:
+    """Deployment Convex locale con le API di export e di streaming export (http.server)"""
+    
+    SNAPSHOT_TS = 1766487443024722602
+    PAGE_SIZE = 2
+    
+    def __init__(self, zip_bytes, pending_polls=2, final_state='completed', truncate_at=None, corrupt_at=None,
+                 documents=None, bad_range=False):
+        self.zip_bytes = zip_bytes
+        # Streaming export: documenti per tabella e modifiche (ts, tabella, documento)
+        self.documents = documents or {}
+        self.deltas = []
+        self.pending_polls = pending_polls
+        self.final_state = final_state
+        # Il primo download completo si interrompe dopo truncate_at byte
+        # oppure contiene un byte alterato in posizione corrupt_at
+        self.truncate_at = truncate_at
+        self.corrupt_at = corrupt_at
+        # La prima richiesta Range riceve i byte dall'inizio del file
+        self.bad_range = bad_range
+        self.requests = []
+        self.ranges = []
+        self.export = None
+        deployment = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+            
+            def _send(self, status, body, content_type='application/json'):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length)
+                deployment.requests.append(('POST', self.path, self.headers.get('Authorization')))
+                
+                if self.path.startswith('/api/export/request/zip'):
+                    deployment.export = {'state': 'requested', 'polls': 0}
+                    self._send(200, b'null')
+                elif self.path == '/api/query':
+                    assert json.loads(body)['path'] == '_system/cli/exports:getLatest'
+                    self._send(200, json.dumps({'status': 'success', 'value': deployment.poll()}).encode())
+                else:
+                    self._send(404, b'not found', 'text/plain')
+            
+            def do_GET(self):
+                deployment.requests.append(('GET', self.path, self.headers.get('Authorization')))
+                url = urlsplit(self.path)
+                if url.path in ('/api/json_schemas', '/api/list_snapshot', '/api/document_deltas'):
+                    params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                    body = deployment.streaming(url.path.rsplit('/', 1)[1], params)
+                    self._send(200, json.dumps(body).encode())
+                    return
+                if self.path != f'/api/export/zip/{deployment.SNAPSHOT_TS}':
+                    self._send(404, b'not found', 'text/plain')
+                    return
+                
+                data = deployment.zip_bytes
+                requested = self.headers.get('Range')
+                deployment.ranges.append(requested)
+                if requested:
+                    match = re.match(r'bytes=(\d+)-(\d*)', requested)
+                    start = int(match.group(1))
+                    end = int(match.group(2)) + 1 if match.group(2) else len(data)
+                    if deployment.bad_range:
+                        start, end = 0, len(data)
+                        deployment.bad_range = False
+                    self.send_response(206)
+                    self.send_header('Content-Range', f'bytes {start}-{end - 1}/{len(data)}')
+                    self.send_header('Content-Length', str(end - start))
+                    self.end_headers()
+                    self.wfile.write(data[start:end])
+                    return
+                
+                if deployment.corrupt_at is not None:
+                    data = bytearray(data)
+                    data[deployment.corrupt_at] ^= 0xFF
+                    data = bytes(data)
+                    deployment.corrupt_at = None
+                
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                if deployment.truncate_at is not None:
+                    # Connessione chiusa a metà del body
+                    self.wfile.write(data[:deployment.truncate_at])
+                    self.close_connection = True
+                    deployment.truncate_at = None
+                    return
+                self.wfile.write(data)
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+    
+    def poll(self):
+        """Stato dell'export: in corso per pending_polls letture, poi final_state"""
+        if self.export is None:
+            return None
+        self.export['polls'] += 1
+        if self.export['polls'] <= self.pending_polls:
+            return {'state': 'in_progress', 'progress_message': 'exporting'}
+        # start_ts Int64 nel formato JSON di Convex
+        start_ts = base64.b64encode(self.SNAPSHOT_TS.to_bytes(8, 'little', signed=True)).decode()
+        return {'state': self.final_state, 'start_ts': {'$integer': start_ts}}
+    
+    def streaming(self, endpoint, params):
+        """Risposte delle API di streaming export (pagine di PAGE_SIZE documenti)"""
+        if endpoint == 'json_schemas':
+            return {table_name: {} for table_name in self.documents}
+        
+        table_name = params['tableName']
+        if endpoint == 'list_snapshot':
+            start = int(params.get('cursor', 0))
+            documents = self.documents[table_name]
+            page = documents[start:start + self.PAGE_SIZE]
+            return {
+                'values': [dict(doc, _table=table_name, _ts=self.SNAPSHOT_TS) for doc in page],
+                'hasMore': start + self.PAGE_SIZE < len(documents),
+                'snapshot': self.SNAPSHOT_TS,
+                'cursor': str(start + self.PAGE_SIZE),
+            }
+        
+        cursor = int(params['cursor'])
+        changes = [(ts, doc) for ts, table, doc in self.deltas if table == table_name and ts > cursor]
+        page = changes[:self.PAGE_SIZE]
+        return {
+            'values': [dict(doc, _table=table_name, _ts=ts) for ts, doc in page],
+            'hasMore': len(changes) > self.PAGE_SIZE,
+            'cursor': page[-1][0] if page else cursor,
+        }
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def make_deployment(backup_path):
+    """Crea deployment locali che servono il backup di esempio"""
+    deployments = []
+    
+    def make(**kwargs):
+        with open(backup_path, 'rb') as f:
+            deployment = FakeDeployment(f.read(), **kwargs)
+        deployments.append(deployment)
+        return deployment
+    
+    yield make
+    for deployment in deployments:
+        deployment.close()
+
+
+def _member_range(zip_path, member):
+    """Offset dell'header locale e dei dati compressi di un membro"""
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        info = zip_ref.getinfo(member)
+    data_offset = info.header_offset + 30 + len(info.filename.encode())
+    return info.header_offset, data_offset + info.compress_size // 2
+
+
+class TestIntactPrefix:
+    """Test per intact_prefix (membri integri senza central directory)"""
+    
+    def test_valid_backup_ends_at_central_directory(self, backup_path):
+        """Test backup integro: tutti i membri fino alla central directory"""
+        with zipfile.ZipFile(backup_path) as zip_ref:
+            assert intact_prefix(backup_path) == zip_ref.start_dir
+    
+    def test_stops_at_corrupt_member(self, backup_path):
+        """Test prefisso fino all'header del primo membro corrotto"""
+        header_offset, corrupt_at = _member_range(backup_path, 'users/documents.jsonl')
+        data = bytearray(open(backup_path, 'rb').read())
+        data[corrupt_at] ^= 0xFF
+        with open(backup_path, 'wb') as f:
+            f.write(data)
+        
+        assert intact_prefix(backup_path) == header_offset
+    
+    def test_stops_at_truncated_member(self, backup_path, tmp_path):
+        """Test file troncato a metà di un membro"""
+        header_offset, cut = _member_range(backup_path, 'orders/documents.jsonl')
+        path = tmp_path / 'truncated.zip'
+        path.write_bytes(open(backup_path, 'rb').read()[:cut])
+        
+        assert intact_prefix(str(path)) == header_offset
+
+
+class TestVerifySnapshot:
+    """Test per la verifica di integrità dei backup"""
+    
+    def test_valid_backup(self, backup_path):
+        """Test backup integro: nessun membro corrotto"""
+        assert verify_snapshot(backup_path, chunk_size=16) == []
+    
+    def test_corrupt_member_is_reported_with_byte_range(self, backup_path):
+        """Test membro con dati alterati riportato con i suoi byte nel file"""
+        header_offset, corrupt_at = _member_range(backup_path, 'users/documents.jsonl')
+        with open(backup_path, 'r+b') as f:
+            f.seek(corrupt_at)
+            byte = f.read(1)[0]
+            f.seek(corrupt_at)
+            f.write(bytes([byte ^ 0xFF]))
+        
+        corrupt = verify_snapshot(backup_path)
+        
+        assert len(corrupt) == 1
+        name, start, end = corrupt[0]
+        assert name == 'users/documents.jsonl'
+        assert start == header_offset < corrupt_at < end
+    
+    def test_truncated_backup_raises_error(self, backup_path):
+        """Test backup troncato: central directory non leggibile"""
+        with open(backup_path, 'r+b') as f:
+            f.truncate(100)
+        with pytest.raises(ConvexError, match="Central directory"):
+            verify_snapshot(backup_path)
+
+
+class TestHttpExport:
+    """Test per l'export HTTP dello snapshot"""
+    
+    def test_deployment_url_from_key(self):
+        """Test URL del deployment ricavato dalle deploy key prod/dev"""
+        assert deployment_url_from_key('prod:happy-animal-123|token') == 'https://happy-animal-123.convex.cloud'
+        assert deployment_url_from_key('dev:quiet-fish-7|token') == 'https://quiet-fish-7.convex.cloud'
+        assert deployment_url_from_key('preview:team:project|token') is None
+    
+    def test_export_polls_and_downloads_zip(self, make_deployment, backup_path, tmp_path):
+        """Test richiesta, polling fino al completamento e download a blocchi"""
+        deployment = make_deployment()
+        transport = HttpExportTransport(deployment.url, 'prod:test|key', poll_interval=0.01, chunk_size=64)
+        output_path = str(tmp_path / 'download.zip')
+        progress = []
+        
+        info = transport.export(output_path, lambda done, total: progress.append((done, total)))
+        
+        with open(output_path, 'rb') as f:
+            assert f.read() == deployment.zip_bytes
+        size = len(deployment.zip_bytes)
+        assert progress[-1] == (size, size)
+        assert len(progress) == -(-size // 64)
+        assert info['timestamp'] == str(FakeDeployment.SNAPSHOT_TS)
+        assert [path for _, path, _ in deployment.requests].count('/api/query') == 3
+        assert all(auth == 'Convex prod:test|key' for _, _, auth in deployment.requests)
+    
+    def test_failed_export_raises_error(self, make_deployment, tmp_path):
+        """Test export fallito sul deployment: nessun file scaricato"""
+        deployment = make_deployment(pending_polls=0, final_state='failed')
+        transport = HttpExportTransport(deployment.url, 'prod:test|key', poll_interval=0.01)
+        output_path = tmp_path / 'download.zip'
+        
+        with pytest.raises(ConvexError, match="fallito"):
+            transport.export(str(output_path))
+        assert not output_path.exists()
+    
+    def test_client_downloads_with_http(self, make_deployment, tmp_path):
+        """Test download_backup con trasporto HTTP e lettura del backup scaricato"""
+        deployment = make_deployment(pending_polls=0)
+        client = ConvexClient('prod:test|key', deployment_url=deployment.url, transport='http')
+        
+        path = client.download_backup(str(tmp_path / 'backup.zip'))
+        
+        assert client.list_tables(path) == ['users', 'orders', '_tables']
+    
+    def test_auto_falls_back_to_cli(self, make_deployment, tmp_path, monkeypatch):
+        """Test fallback al CLI quando l'export HTTP fallisce"""
+        deployment = make_deployment()
+        deployment.close()
+        client = ConvexClient('prod:test|key', deployment_url=deployment.url)
+        monkeypatch.setattr('src.convex.time.sleep', lambda seconds: None)
+        cli_calls = []
+        monkeypatch.setattr(client, '_export_with_cli', lambda path: cli_calls.append(path) or path)
+        
+        output_path = tmp_path / 'backup.zip'
+        output_path.write_bytes(deployment.zip_bytes)
+        
+        assert client.download_backup(str(output_path), max_retries=1) == str(output_path)
+        assert cli_calls == [str(output_path)]
+    
+    def test_http_transport_requires_deployment_url(self):
+        """Test errore con trasporto HTTP e deploy key senza nome del deployment"""
+        client = ConvexClient('preview:team:project|key', transport='http')
+        with pytest.raises(ConvexError, match="deployment_url"):
+            client.download_backup()
+    
+    def test_interrupted_download_resumes_with_range(self, make_deployment, tmp_path):
+        """Test retry dopo una connessione interrotta: solo i byte mancanti, stesso snapshot"""
+        deployment = make_deployment(pending_polls=0, truncate_at=100)
+        transport = HttpExportTransport(deployment.url, 'prod:test|key', chunk_size=10)
+        output_path = tmp_path / 'backup.zip'
+        
+        with pytest.raises(Exception):
+            transport.export(str(output_path))
+        assert (tmp_path / 'backup.zip.partial').stat().st_size == 100
+        transport.export(str(output_path))
+        
+        assert output_path.read_bytes() == deployment.zip_bytes
+        assert not (tmp_path / 'backup.zip.partial').exists()
+        assert deployment.ranges == [None, 'bytes=100-']
+        export_requests = [path for _, path, _ in deployment.requests if path.startswith('/api/export/request')]
+        assert len(export_requests) == 1
+    
+    def test_client_retry_reuses_exported_snapshot(self, make_deployment, tmp_path, monkeypatch):
+        """Test retry di download_backup senza richiedere un nuovo export"""
+        deployment = make_deployment(pending_polls=0, truncate_at=100)
+        client = ConvexClient('prod:test|key', deployment_url=deployment.url, transport='http')
+        monkeypatch.setattr('src.convex.time.sleep', lambda seconds: None)
+        output_path = tmp_path / 'backup.zip'
+        
+        client.download_backup(str(output_path))
+        
+        assert output_path.read_bytes() == deployment.zip_bytes
+        export_requests = [path for _, path, _ in deployment.requests if path.startswith('/api/export/request')]
+        assert len(export_requests) == 1
+    
+    def test_corrupt_member_is_downloaded_again(self, make_deployment, backup_path, tmp_path):
+        """Test membro corrotto: riscaricati solo i suoi byte con una richiesta Range"""
+        header_offset, corrupt_at = _member_range(backup_path, 'users/documents.jsonl')
+        deployment = make_deployment(pending_polls=0, corrupt_at=corrupt_at)
+        transport = HttpExportTransport(deployment.url, 'prod:test|key', poll_interval=0.01)
+        output_path = tmp_path / 'backup.zip'
+        
+        transport.export(str(output_path))
+        
+        assert output_path.read_bytes() == deployment.zip_bytes
+        assert deployment.ranges[0] is None
+        assert deployment.ranges[1].startswith(f'bytes={header_offset}-')
+        assert len(deployment.ranges) == 2
+    
+    def test_corrupt_central_directory_is_downloaded_again(self, make_deployment, backup_path, tmp_path):
+        """Test central directory illeggibile: file troncato ai membri integri e ripreso con Range"""
+        with zipfile.ZipFile(backup_path) as zip_ref:
+            start_dir = zip_ref.start_dir
+        deployment = make_deployment(pending_polls=0, corrupt_at=start_dir)
+        transport = HttpExportTransport(deployment.url, 'prod:test|key')
+        output_path = tmp_path / 'backup.zip'
+        
+        with pytest.raises(ConvexError):
+            transport.export(str(output_path))
+        assert (tmp_path / 'backup.zip.partial').stat().st_size == start_dir
+        transport.export(str(output_path))
+        
+        assert output_path.read_bytes() == deployment.zip_bytes
+        assert deployment.ranges == [None, f'bytes={start_dir}-']
+    
+    def test_client_retries_after_corrupt_central_directory(self, make_deployment, backup_path, tmp_path, monkeypatch):
+        """Test retry di download_backup dopo una verifica fallita (nessun tentativo a vuoto)"""
+        with zipfile.ZipFile(backup_path) as zip_ref:
+            start_dir = zip_ref.start_dir
+        deployment = make_deployment(pending_polls=0, corrupt_at=start_dir)
+        client = ConvexClient('prod:test|key', deployment_url=deployment.url, transport='http')
+        monkeypatch.setattr('src.convex.time.sleep', lambda seconds: None)
+        output_path = tmp_path / 'backup.zip'
+        
+        client.download_backup(str(output_path))
+        
+        assert output_path.read_bytes() == deployment.zip_bytes
+        assert len(deployment.ranges) == 2
+    
+    def test_mismatched_content_range_restarts_from_zero(self, make_deployment, tmp_path):
+        """Test risposta 206 con un offset diverso da quello richiesto: rifiutata, poi download da zero"""
+        deployment = make_deployment(pending_polls=0, truncate_at=100, bad_range=True)
+        transport = HttpExportTransport(deployment.url, 'prod:test|key', chunk_size=10)
+        output_path = tmp_path / 'backup.zip'
+        
+        with pytest.raises(Exception):
+            transport.export(str(output_path))
+        with pytest.raises(ConvexError, match="Content-Range"):
+            transport.export(str(output_path))
+        assert (tmp_path / 'backup.zip.partial').stat().st_size == 0
+        transport.export(str(output_path))
+        
+        assert output_path.read_bytes() == deployment.zip_bytes
+        assert deployment.ranges == [None, 'bytes=100-', None]
+    
+    def test_snapshot_cache_reuse(self, make_deployment, tmp_path):
+        """Test snapshot scaricato salvato in cache e riusato entro max_age senza export"""
+        deployment = make_deployment(pending_polls=0)
+        # SNAPSHOT_TS è una data fissa: max_age ampio per considerarlo recente
+        cache = SnapshotCache(str(tmp_path / 'cache'), max_bytes=10 * 1024 * 1024, max_age=10 ** 9)
+        client = ConvexClient('prod:test|key', deployment_url=deployment.url, transport='http', cache=cache)
+        
+        first = client.download_backup()
+        requests_after_download = len(deployment.requests)
+        second = client.download_backup()
+        
+        assert first == second == cache.path_for('prod:test|key', FakeDeployment.SNAPSHOT_TS)
+        assert len(deployment.requests) == requests_after_download
+        assert client.snapshot_info['timestamp'] == str(FakeDeployment.SNAPSHOT_TS)
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert [name for name in os.listdir(cache.cache_dir)] == [os.path.basename(first)]
+
+
+class TestStreamingExport:
+    """Test per le API di streaming export (list_snapshot / document_deltas)"""
+    
+    @pytest.fixture
+    def deployment(self, make_deployment):
+        return make_deployment(documents={
+            'users': [{'_id': f'u{i}', 'name': f'user {i}'} for i in range(5)],
+            'orders': [],
+        })
+    
+    def test_list_streaming_tables(self, deployment):
+        """Test tabelle lette da json_schemas"""
+        client = ConvexClient('prod:test|key', deployment_url=deployment.url)
+        assert client.list_streaming_tables() == ['orders', 'users']
+    
+    def test_iter_snapshot_pages_and_pins_timestamp(self, deployment):
+        """Test snapshot letto pagina per pagina senza campi di sistema"""
+        client = ConvexClient('prod:test|key', deployment_url=deployment.url)
+        
+        documents = list(client.iter_snapshot('users'))
+        
+        assert documents == [{'_id': f'u{i}', 'name': f'user {i}'} for i in range(5)]
+        assert client.snapshot_timestamps['users'] == FakeDeployment.SNAPSHOT_TS
+        list_requests = [path for _, path, _ in deployment.requests if 'list_snapshot' in path]
+        assert len(list_requests) == 3
+        assert f'snapshot={FakeDeployment.SNAPSHOT_TS}' in list_requests[-1]
+    
+    def test_iter_snapshot_batches(self, deployment):
+        """Test batch limitati alla pagina letta (nessuna attesa della pagina successiva)"""
+        client = ConvexClient('prod:test|key', deployment_url=deployment.url)
+        assert [len(batch) for batch in client.iter_snapshot('users', batch_size=3)] == [2, 2, 1]
+        assert [len(batch) for batch in client.iter_snapshot('users', batch_size=1)] == [1] * 5
+    
+    def test_iter_snapshot_empty_table_pins_timestamp(self, deployment):
+        """Test tabella vuota: il timestamp dello snapshot è comunque registrato"""
+        client = ConvexClient('prod:test|key', deployment_url=deployment.url)
+        assert list(client.iter_snapshot('orders')) == []
+        assert client.snapshot_timestamps['orders'] == FakeDeployment.SNAPSHOT_TS
+    
+    def test_iter_document_deltas_advances_cursor(self, deployment):
+        """Test modifiche successive al cursore, incluse le cancellazioni"""
+        ts = FakeDeployment.SNAPSHOT_TS
+        deployment.deltas = [
+            (ts - 1, 'users', {'_id': 'u0', 'name': 'old'}),
+            (ts + 1, 'users', {'_id': 'u1', 'name': 'renamed'}),
+            (ts + 2, 'orders', {'_id': 'o1', 'total': 3}),
+            (ts + 3, 'users', {'_id': 'u2', '_deleted': True}),
+            (ts + 4, 'users', {'_id': 'u5', 'name': 'new'}),
+        ]
+        client = ConvexClient('prod:test|key', deployment_url=deployment.url)
+        
+        changes = list(client.iter_document_deltas('users', ts))
+        
+        assert changes == [
+            {'_id': 'u1', 'name': 'renamed'},
+            {'_id': 'u2', '_deleted': True},
+            {'_id': 'u5', 'name': 'new'},
+        ]
+        assert client.delta_cursors['users'] == ts + 4
+    
+    def test_streaming_requires_deployment_url(self):
+        """Test streaming export senza URL del deployment"""
+        client = ConvexClient('self-hosted-key')
+        with pytest.raises(ConvexError):
+            client.list_streaming_tables()
+    
+    def test_snapshot_without_timestamp_is_not_cached(self, backup_path, tmp_path, monkeypatch):
+        """Test snapshot senza timestamp: file temporaneo fuori dalla cache, da eliminare dopo l'uso"""
+        cache = SnapshotCache(str(tmp_path / 'cache'), max_bytes=10 * 1024 * 1024)
+        client = ConvexClient('prod:test|key', transport='cli', cache=cache)
+        
+        def export_with_cli(output_path):
+            with open(backup_path, 'rb') as src, open(output_path, 'wb') as dst:
+                dst.write(src.read())
+            return output_path
+        
+        monkeypatch.setattr(client, '_export_with_cli', export_with_cli)
+        
+        path = client.download_backup()
+        try:
+            assert not cache.contains(path)
+            assert not os.path.isdir(cache.cache_dir) or os.listdir(cache.cache_dir) == []
+        finally:
+            os.remove(path)
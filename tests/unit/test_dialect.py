@@ -0,0 +1,236 @@
+"""
+Unit tests per i dialetti SQL (SQLite e DuckDB con database reali su file)
+"""
+import pytest
+from src.dialect import Dialect, SQLServerDialect, SQLiteDialect, get_dialect, parse_sql_type, format_sql_type
+from src.sql import SQLImporter, TypeMapper
+
+
+ROWS = [
+    {'_id': 'a', '_creationTime': 1000.0, 'name': 'Anna', 'age': 30},
+    {'_id': 'b', '_creationTime': 2000.0, 'name': 'Bruno', 'age': 41},
+]
+
+
+def make_importer(tmp_path, dialect, **kwargs):
+    """Crea un SQLImporter connesso a un database locale"""
+    importer = SQLImporter(str(tmp_path / f'target.{dialect}'), 'convex_data', dialect=dialect, **kwargs)
+    importer.connect()
+    return importer
+
+
+def fetch_rows(importer, table_name):
+    """Righe (_id, name, age) di una tabella ordinate per _id"""
+    importer.cursor.execute(
+        f'SELECT "_id", "name", "age" FROM {importer._table(table_name)} ORDER BY "_id"'
+    )
+    return [tuple(row) for row in importer.cursor.fetchall()]
+
+
+class TestSqlTypes:
+    """Test per parse_sql_type e format_sql_type"""
+    
+    def test_parse_and_format_round_trip(self):
+        """Test conversione tra tipo SQL Server e formato INFORMATION_SCHEMA"""
+        assert parse_sql_type('NVARCHAR(64)') == ('nvarchar', 64)
+        assert parse_sql_type('VARBINARY(MAX)') == ('varbinary', -1)
+        assert parse_sql_type('BIGINT') == ('bigint', None)
+        assert format_sql_type('nvarchar', -1) == 'NVARCHAR(MAX)'
+        assert format_sql_type('nvarchar', 64) == 'NVARCHAR(64)'
+        assert format_sql_type('float', None) == 'FLOAT'
+    
+    def test_unknown_dialect(self):
+        """Test errore per un dialetto non supportato"""
+        with pytest.raises(ValueError, match="Unsupported SQL dialect"):
+            get_dialect('oracle')
+
+
+class TestDialectSql:
+    """Test per l'SQL generato dai dialetti"""
+    
+    def test_sql_server_quoting_and_rename(self):
+        """Test identificatori tra parentesi quadre e rename con sp_rename"""
+        dialect = SQLServerDialect()
+        assert dialect.table('convex_data', 'a]b') == '[convex_data].[a]]b]'
+        assert dialect.rename_table_statements('convex_data', 'users', 'users__old') == [
+            ("EXEC sp_rename ?, ?", ('[convex_data].[users]', 'users__old'))
+        ]
+    
+    def test_sqlite_types_and_alter_column(self):
+        """Test tipi (MAX) senza lunghezza e ALTER COLUMN con copia della colonna"""
+        dialect = SQLiteDialect()
+        assert dialect.column_type('NVARCHAR(MAX)') == 'NVARCHAR'
+        assert dialect.table('convex_data', 'users') == '"users"'
+        statements = dialect.alter_column_sql('"users"', 'age', 'FLOAT')
+        assert statements[0] == 'ALTER TABLE "users" RENAME COLUMN "age" TO "age__old"'
+        assert statements[-1] == 'ALTER TABLE "users" DROP COLUMN "age__old"'
+
+
+class TestDialectBase:
+    """Test per la classe base dei dialetti"""
+    
+    def test_dialect_requires_connect_and_load_columns(self):
+        """Test che un dialetto senza connect/load_columns non sia istanziabile"""
+        class Incomplete(Dialect):
+            def connect(self, connection_string, timeout):
+                return None
+        
+        with pytest.raises(TypeError, match='load_columns'):
+            Incomplete()
+        with pytest.raises(TypeError):
+            Dialect()
+
+
+@pytest.mark.parametrize('metadata_cache', [True, False])
+class TestSQLiteImport:
+    """Test di import su un database SQLite reale"""
+    
+    def test_full_import_and_schema_evolution(self, tmp_path, metadata_cache):
+        """Test creazione, ricaricamento con colonne nuove e tipi allargati"""
+        importer = make_importer(tmp_path, 'sqlite', metadata_cache=metadata_cache)
+        type_mapper = TypeMapper()
+        
+        result = importer.import_table('users', ROWS, type_mapper)
+        assert result.success, result.error
+        
+        rows = ROWS + [{'_id': 'c', '_creationTime': 3000.0, 'name': 'C' * 300, 'age': 2.5, 'email': 'c@x'}]
+        result = importer.import_table('users', rows, type_mapper, column_schema=type_mapper.infer_schema(rows))
+        
+        assert result.success, result.error
+        assert result.rows_imported == 3
+        assert 'ADD [email] NVARCHAR(16) NULL' in result.schema_changes
+        assert importer.get_column_types('users')['age'] == ('float', None)
+        assert fetch_rows(importer, 'users')[2] == ('c', 'C' * 300, 2.5)
+        importer.close()
+    
+    def test_swap_load(self, tmp_path, metadata_cache):
+        """Test caricamento in staging e rename senza tabelle residue"""
+        importer = make_importer(tmp_path, 'sqlite', metadata_cache=metadata_cache, load_mode='swap')
+        type_mapper = TypeMapper()
+        
+        importer.import_table('users', ROWS, type_mapper)
+        result = importer.import_table('users', ROWS[:1], type_mapper)
+        
+        assert result.success, result.error
+        assert fetch_rows(importer, 'users') == [('a', 'Anna', 30)]
+        assert not importer.table_exists('users__staging')
+        assert not importer.table_exists('users__old')
+        importer.close()
+    
+    def test_incremental_upsert(self, tmp_path, metadata_cache):
+        """Test sync incrementale: documenti nuovi e aggiornati uniti per _id"""
+        importer = make_importer(tmp_path, 'sqlite', metadata_cache=metadata_cache)
+        type_mapper = TypeMapper()
+        
+        result = importer.import_table_incremental('users', lambda: ROWS, type_mapper)
+        assert result.sync_mode == 'full'
+        
+        rows = ROWS + [
+            {'_id': 'c', '_creationTime': 3000.0, 'name': 'Carla', 'age': 25},
+            {'_id': 'a', '_creationTime': 4000.0, 'name': 'Anna M.', 'age': 31},
+        ]
+        result = importer.import_table_incremental('users', lambda: rows, type_mapper)
+        
+        assert result.success, result.error
+        assert result.sync_mode == 'incremental'
+        assert result.rows_imported == 2
+        assert fetch_rows(importer, 'users') == [('a', 'Anna M.', 31), ('b', 'Bruno', 41), ('c', 'Carla', 25)]
+        importer.close()
+    
+    def test_apply_document_changes(self, tmp_path, metadata_cache):
+        """Test modifiche dei documenti: upsert per _id, cancellazioni e nuove colonne"""
+        importer = make_importer(tmp_path, 'sqlite', metadata_cache=metadata_cache)
+        type_mapper = TypeMapper()
+        importer.import_table('users', ROWS, type_mapper, column_schema=type_mapper.infer_schema(ROWS))
+        
+        changes = [
+            {'_id': 'c', '_creationTime': 3000.0, 'name': 'Carla', 'age': 25},
+            {'_id': 'a', '_creationTime': 1000.0, 'name': 'Anna', 'age': 30, 'city': 'Roma'},
+            {'_id': 'c', '_creationTime': 3000.0, 'name': 'Carla', 'age': 26},
+            {'_id': 'b', '_deleted': True},
+            {'_id': 'd', '_deleted': True},
+        ]
+        result = importer.apply_document_changes('users', changes, type_mapper)
+        
+        assert result.success, result.error
+        assert result.sync_mode == 'delta'
+        assert (result.rows_imported, result.rows_deleted) == (2, 2)
+        assert any('city' in change for change in result.schema_changes)
+        assert fetch_rows(importer, 'users') == [('a', 'Anna', 30), ('c', 'Carla', 26)]
+        importer.close()
+    
+    @pytest.mark.parametrize('first', ['plain', 'bytes'])
+    def test_mixed_bytes_and_string_column(self, tmp_path, metadata_cache, first):
+        """Test colonna con $bytes e stringhe: testo, con i $bytes in JSON (in qualunque ordine)"""
+        importer = make_importer(tmp_path, 'sqlite', metadata_cache=metadata_cache)
+        type_mapper = TypeMapper()
+        rows = [{'_id': 'a', 'data': 'plain'}, {'_id': 'b', 'data': {'$bytes': 'AQI='}}]
+        if first == 'bytes':
+            rows.reverse()
+        
+        result = importer.import_table('files', rows, type_mapper, column_schema=type_mapper.infer_schema(rows))
+        
+        assert result.success, result.error
+        importer.cursor.execute(f'SELECT "_id", "data" FROM {importer._table("files")} ORDER BY "_id"')
+        assert [tuple(row) for row in importer.cursor.fetchall()] == [('a', 'plain'), ('b', '{"$bytes": "AQI="}')]
+        importer.close()
+    
+    def test_catalog_is_loaded_from_existing_file(self, tmp_path, metadata_cache):
+        """Test lettura delle tabelle esistenti alla riconnessione"""
+        importer = make_importer(tmp_path, 'sqlite', metadata_cache=metadata_cache)
+        type_mapper = TypeMapper()
+        importer.import_table('users', ROWS, type_mapper, column_schema=type_mapper.infer_schema(ROWS))
+        importer.close()
+        
+        importer = make_importer(tmp_path, 'sqlite', metadata_cache=metadata_cache)
+        assert importer.table_exists('users')
+        assert importer.get_column_types('users')['age'] == ('bigint', None)
+        importer.close()
+    
+    def test_sql_server_insert_methods_fall_back(self, tmp_path, metadata_cache):
+        """Test fallback a executemany per tvp e bcp"""
+        importer = make_importer(tmp_path, 'sqlite', metadata_cache=metadata_cache, insert_method='bcp')
+        result = importer.import_table('users', ROWS, TypeMapper(), insert_method='tvp')
+        
+        assert result.success, result.error
+        assert result.insert_method == 'executemany'
+        importer.close()
+
+
+class TestDuckDBImport:
+    """Test di import su un database DuckDB reale (pacchetto opzionale)"""
+    
+    @pytest.fixture(autouse=True)
+    def _require_duckdb(self):
+        pytest.importorskip('duckdb')
+    
+    def test_import_evolution_and_incremental(self, tmp_path):
+        """Test import completo, colonne nuove e sync incrementale"""
+        importer = make_importer(tmp_path, 'duckdb')
+        type_mapper = TypeMapper()
+        
+        result = importer.import_table_incremental('users', lambda: ROWS, type_mapper)
+        assert result.success, result.error
+        
+        rows = ROWS + [{'_id': 'c', '_creationTime': 3000.0, 'name': 'Carla', 'age': 2.5, 'email': 'c@x'}]
+        result = importer.import_table_incremental('users', lambda: rows, type_mapper)
+        
+        assert result.success, result.error
+        assert result.sync_mode == 'incremental'
+        assert result.schema_changes == ['ADD [email] NVARCHAR(16) NULL']
+        assert importer.get_column_types('users')['email'] == ('nvarchar', -1)
+        assert fetch_rows(importer, 'users')[2] == ('c', 'Carla', 2.5)
+        importer.close()
+    
+    def test_swap_load(self, tmp_path):
+        """Test caricamento in staging e rename nello schema"""
+        importer = make_importer(tmp_path, 'duckdb', load_mode='swap')
+        type_mapper = TypeMapper()
+        
+        importer.import_table('users', ROWS, type_mapper)
+        result = importer.import_table('users', ROWS[1:], type_mapper)
+        
+        assert result.success, result.error
+        assert fetch_rows(importer, 'users') == [('b', 'Bruno', 41)]
+        assert not importer.table_exists('users__old')
+        importer.close()
@@ -0,0 +1,98 @@
+"""
+Unit tests per DocumentFlattener
+"""
+import pytest
+from src.export import DocumentFlattener
+
+
+DOCUMENT = {
+    '_id': 'u1',
+    'address': {'city': 'Roma', 'geo': {'lat': 41.9, 'lng': 12.5}},
+    'profile': {'age': 30},
+    'tags': ['a', 'b'],
+    'orders': [{'sku': 'x', 'price': {'amount': 10}}, {'sku': 'y'}],
+}
+
+
+class TestDocumentFlattener:
+    """Test per DocumentFlattener"""
+    
+    def test_flatten_selected_paths(self):
+        """Test appiattimento dei soli percorsi indicati"""
+        flattener = DocumentFlattener(flatten=['address'])
+        row = flattener.flatten(DOCUMENT)
+        
+        assert row['address_city'] == 'Roma'
+        assert row['address_geo'] == {'lat': 41.9, 'lng': 12.5}
+        assert row['profile'] == {'age': 30}
+        assert 'address' not in row
+    
+    def test_flatten_nested_path(self):
+        """Test percorso annidato: vengono espansi anche gli oggetti padre"""
+        row = DocumentFlattener(flatten=['address.geo']).flatten(DOCUMENT)
+        assert row['address_geo_lat'] == 41.9
+        assert row['address_city'] == 'Roma'
+    
+    def test_flatten_all(self):
+        """Test appiattimento di tutti gli oggetti"""
+        row = DocumentFlattener(flatten=True).flatten(DOCUMENT)
+        assert row['address_geo_lng'] == 12.5
+        assert row['profile_age'] == 30
+        assert row['tags'] == ['a', 'b']
+    
+    def test_encoded_values_are_not_expanded(self):
+        """Test che i valori Convex codificati restino scalari"""
+        row = DocumentFlattener(flatten=True).flatten({'count': {'$integer': 'AQAAAAAAAAA='}})
+        assert row == {'count': {'$integer': 'AQAAAAAAAAA='}}
+    
+    @pytest.mark.parametrize('document', [
+        {'_id': 'u1', 'address': {'city': 'Roma'}, 'address_city': 'Milano'},
+        {'_id': 'u1', 'address_city': 'Milano', 'address': {'city': 'Roma'}},
+    ])
+    def test_column_collision_is_rejected(self, document):
+        """Test campi che producono la stessa colonna: errore in qualunque ordine"""
+        with pytest.raises(ValueError, match="address_city"):
+            DocumentFlattener(flatten=['address']).flatten(document)
+    
+    def test_child_arrays_are_removed_from_parent(self):
+        """Test che gli array delle tabelle figlie non restino nella riga principale"""
+        row = DocumentFlattener(child_tables=['tags']).flatten(DOCUMENT)
+        assert 'tags' not in row
+        assert row['orders'] == DOCUMENT['orders']
+    
+    def test_scalar_children(self):
+        """Test righe figlie di un array di scalari"""
+        flattener = DocumentFlattener(child_tables=['tags'])
+        children = list(flattener.iter_children([DOCUMENT, {'_id': 'u2'}], 'tags'))
+        assert children == [
+            {'_parent_id': 'u1', '_ordinal': 0, 'value': 'a'},
+            {'_parent_id': 'u1', '_ordinal': 1, 'value': 'b'},
+        ]
+    
+    def test_object_children_are_flattened(self):
+        """Test righe figlie di un array di oggetti"""
+        flattener = DocumentFlattener(child_tables=['orders'])
+        children = list(flattener.iter_children([DOCUMENT], 'orders'))
+        assert children == [
+            {'_parent_id': 'u1', '_ordinal': 0, 'sku': 'x', 'price_amount': 10},
+            {'_parent_id': 'u1', '_ordinal': 1, 'sku': 'y'},
+        ]
+    
+    def test_reserved_child_fields_are_rejected(self):
+        """Test elemento con _parent_id/_ordinal: errore invece di sovrascrivere le chiavi generate"""
+        flattener = DocumentFlattener(child_tables=['orders'])
+        document = {'_id': 'u1', 'orders': [{'sku': 'x', '_ordinal': 7}]}
+        
+        with pytest.raises(ValueError, match="_ordinal"):
+            list(flattener.iter_children([document], 'orders'))
+    
+    def test_child_table_name(self):
+        """Test nome della tabella figlia"""
+        flattener = DocumentFlattener(child_tables=['order.items'])
+        assert flattener.child_table_name('users', 'order.items') == 'users_order_items'
+    
+    def test_disabled_flattener(self):
+        """Test flattener senza opzioni"""
+        flattener = DocumentFlattener()
+        assert flattener.enabled is False
+        assert flattener.flatten(DOCUMENT) == DOCUMENT
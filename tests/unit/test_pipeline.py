@@ -0,0 +1,100 @@
+"""
+Unit tests per la pipeline decode -> insert
+"""
+import threading
+import time
+import pytest
+from src.pipeline import BatchPipeline
+
+
+def make_batches(count, size=3):
+    """Genera `count` batch di `size` righe"""
+    for b in range(count):
+        yield [{'_id': f"{b}-{i}"} for i in range(size)]
+
+
+class TestBatchPipeline:
+    """Test per BatchPipeline"""
+    
+    def test_rows_preserve_order(self):
+        """Test che le righe arrivino nell'ordine della sorgente"""
+        pipeline = BatchPipeline(make_batches(5), queue_size=2).start()
+        try:
+            ids = [row['_id'] for row in pipeline.rows()]
+        finally:
+            pipeline.close()
+        
+        assert ids == [f"{b}-{i}" for b in range(5) for i in range(3)]
+        assert pipeline.stats.decode.items == 5
+        assert pipeline.stats.insert.items == 5
+    
+    def test_queue_size_bounds_decoded_batches(self):
+        """Test backpressure: il decoder non supera la dimensione della coda"""
+        produced = []
+        
+        def source():
+            for batch in make_batches(20):
+                produced.append(batch)
+                yield batch
+        
+        pipeline = BatchPipeline(source(), queue_size=2).start()
+        try:
+            time.sleep(0.2)
+            # 2 batch in coda + 1 in attesa di spazio
+            assert len(produced) <= 3
+            assert len(list(pipeline.rows())) == 60
+        finally:
+            pipeline.close()
+        
+        assert pipeline.stats.max_queue_depth <= 2
+    
+    def test_decoder_error_is_raised_in_consumer(self):
+        """Test propagazione degli errori di decodifica al consumer"""
+        def source():
+            yield [{'_id': 'a'}]
+            raise ValueError("bad line")
+        
+        pipeline = BatchPipeline(source(), queue_size=2).start()
+        try:
+            with pytest.raises(ValueError, match="bad line"):
+                list(pipeline.rows())
+        finally:
+            pipeline.close()
+    
+    def test_close_stops_decoder_early(self):
+        """Test che close() fermi il decoder e chiuda la sorgente"""
+        closed = threading.Event()
+        
+        def source():
+            try:
+                yield from make_batches(1000)
+            finally:
+                closed.set()
+        
+        pipeline = BatchPipeline(source(), queue_size=1).start()
+        rows = pipeline.rows()
+        next(rows)
+        pipeline.close()
+        
+        assert closed.is_set()
+        assert not pipeline._thread.is_alive()
+    
+    def test_stage_stats_identify_slow_insert(self):
+        """Test che con insert lento il collo di bottiglia sia l'insert"""
+        pipeline = BatchPipeline(make_batches(5), queue_size=1).start()
+        try:
+            for _ in pipeline.batches():
+                time.sleep(0.02)
+        finally:
+            pipeline.close()
+        
+        stats = pipeline.stats
+        assert stats.insert.busy_seconds >= 0.08
+        assert stats.decode.idle_seconds > stats.insert.idle_seconds
+        assert stats.bottleneck == 'insert'
+        assert set(stats.to_dict()) == {'decode', 'insert', 'max_queue_depth', 'bottleneck'}
+    
+    def test_invalid_queue_size(self):
+        """Test validazione della dimensione della coda"""
+        with pytest.raises(ValueError):
+            BatchPipeline(make_batches(1), queue_size=0)
@@ -0,0 +1,105 @@
+"""
+Unit tests per Profiler (fasi, report JSON e cProfile)
+"""
+import json
+import os
+import pstats
+import threading
+from src.profiling import Profiler, NULL_PROFILER, peak_rss_bytes
+
+
+class TestProfiler:
+    """Test per Profiler"""
+    
+    def test_nested_spans(self):
+        """Test fasi annidate con fase padre, righe e byte"""
+        profiler = Profiler()
+        with profiler.span('import'):
+            with profiler.span('table', table='users') as span:
+                span.add(rows=3, bytes=120)
+        
+        spans = profiler.report()['spans']
+        assert [span['name'] for span in spans] == ['import', 'table']
+        table = spans[1]
+        assert table['table'] == 'users'
+        assert table['parent'] == 'import'
+        assert (table['rows'], table['bytes']) == (3, 120)
+        assert table['wall_seconds'] >= 0
+    
+    def test_record_accumulates_by_name_and_attributes(self):
+        """Test misure accumulate in una sola voce per fase e tabella"""
+        profiler = Profiler()
+        for _ in range(3):
+            profiler.record('sql.insert', 0.5, 0.25, rows=10, bytes=100, table='users')
+        profiler.record('sql.insert', 1.0, rows=1, table='orders')
+        
+        spans = profiler.report()['spans']
+        assert len(spans) == 2
+        users = next(span for span in spans if span['table'] == 'users')
+        assert (users['count'], users['rows'], users['wall_seconds']) == (3, 30, 1.5)
+        assert profiler.stage_totals()['sql.insert']['rows'] == 31
+    
+    def test_spans_from_threads(self):
+        """Test fasi registrate da più thread senza fase padre condivisa"""
+        profiler = Profiler()
+        
+        def work(name):
+            with profiler.span('table', table=name) as span:
+                span.add(rows=1)
+        
+        with profiler.span('import'):
+            threads = [threading.Thread(target=work, args=(f't{i}',)) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        tables = [span for span in profiler.report()['spans'] if span['name'] == 'table']
+        assert len(tables) == 4
+        assert all('parent' not in span for span in tables)
+    
+    def test_start_stop_span(self):
+        """Test fase misurata con start()/stop(); stop senza start non registra nulla"""
+        profiler = Profiler()
+        profiler.span('unused').stop()
+        span = profiler.span('config').start()
+        span.stop()
+        
+        assert list(profiler.stage_totals()) == ['config']
+    
+    def test_write_report(self, tmp_path):
+        """Test report JSON con metadati, totali per fase e memoria"""
+        profiler = Profiler()
+        with profiler.span('export') as span:
+            span.add(bytes=2048)
+        path = str(tmp_path / 'logs' / 'perf_app_20240101_000000.json')
+        
+        profiler.write_report(path, app_name='app', summary={'total_rows': 0})
+        
+        with open(path, encoding='utf-8') as f:
+            report = json.load(f)
+        assert report['app_name'] == 'app'
+        assert report['stages']['export']['bytes'] == 2048
+        assert report['duration_seconds'] >= 0
+        assert report['peak_rss_bytes'] == peak_rss_bytes() or report['peak_rss_bytes'] is None
+    
+    def test_cprofile_stats_per_stage(self, tmp_path):
+        """Test statistiche cProfile salvate per fase di primo livello"""
+        profiler = Profiler(cprofile=True)
+        with profiler.span('decode'):
+            with profiler.span('nested'):
+                sorted(range(1000), key=lambda value: -value)
+        
+        paths = profiler.dump_cprofile(str(tmp_path / 'perf'))
+        
+        assert list(paths) == ['decode']
+        assert os.path.basename(paths['decode']) == 'perf_decode.prof'
+        assert pstats.Stats(paths['decode']).total_calls > 0
+    
+    def test_null_profiler(self):
+        """Test profiler disattivato: nessuna fase registrata"""
+        with NULL_PROFILER.span('export') as span:
+            span.add(rows=1)
+        NULL_PROFILER.record('sql.insert', 1.0)
+        
+        assert NULL_PROFILER.stage_totals() == {}
@@ -0,0 +1,671 @@
+"""
+Unit tests per SQLImporter (con connessione pyodbc simulata)
+"""
+import pytest
+import pyodbc
+from datetime import datetime
+from src.sql import SQLImporter, TypeMapper, MetadataCatalog
+
+
+class FakeCursor:
+    """Cursor pyodbc simulato che registra le query eseguite"""
+    
+    def __init__(self, results=None):
+        self.executed = []
+        self.executemany_calls = []
+        self.input_sizes = []
+        self.fast_executemany = False
+        self.results = results or {}
+        self._last_query = ''
+    
+    def execute(self, query, *params):
+        self.executed.append((query, params))
+        self._last_query = query
+        return self
+    
+    def executemany(self, query, values):
+        self.executemany_calls.append((query, list(values), self.fast_executemany))
+    
+    def setinputsizes(self, sizes):
+        self.input_sizes.append(sizes)
+    
+    def _result_for_last_query(self):
+        for marker, rows in self.results.items():
+            if marker in self._last_query:
+                return rows
+        return None
+    
+    def fetchone(self):
+        rows = self._result_for_last_query()
+        if rows is None:
+            return (0,)
+        return rows[0] if rows else None
+    
+    def fetchall(self):
+        return self._result_for_last_query() or []
+    
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Connessione pyodbc simulata"""
+    
+    def __init__(self, cursor, driver_name='libmsodbcsql-17.10.so'):
+        self._cursor = cursor
+        self.driver_name = driver_name
+        self.commits = 0
+        self.rollbacks = 0
+    
+    def cursor(self):
+        return self._cursor
+    
+    def getinfo(self, info_type):
+        return self.driver_name
+    
+    def commit(self):
+        self.commits += 1
+    
+    def rollback(self):
+        self.rollbacks += 1
+    
+    def close(self):
+        pass
+
+
+def make_importer(monkeypatch, results=None, driver_name='libmsodbcsql-17.10.so', **kwargs):
+    """Crea un SQLImporter connesso a una connessione simulata"""
+    cursor = FakeCursor(results)
+    connection = FakeConnection(cursor, driver_name)
+    monkeypatch.setattr(pyodbc, 'connect', lambda *args, **kw: connection, raising=False)
+    # I risultati simulati sono per query di tabella: catalogo solo se richiesto
+    kwargs.setdefault('metadata_cache', False)
+    importer = SQLImporter('Driver=test;', 'convex_data', **kwargs)
+    importer.connect()
+    return importer, cursor, connection
+
+
+COLUMNS_QUERY = 'INFORMATION_SCHEMA.COLUMNS'
+
+
+class TestSQLImporterBulkInsert:
+    """Test per bulk_insert"""
+    
+    def test_bulk_insert_from_iterator_in_batches(self, monkeypatch):
+        """Test insert da iteratore con un executemany per batch"""
+        importer, cursor, connection = make_importer(monkeypatch, fast_executemany=False)
+        rows = ({'_id': str(i), 'value': i} for i in range(25))
+        
+        inserted = importer.bulk_insert('items', rows, TypeMapper(), batch_size=10)
+        
+        assert inserted == 25
+        assert [len(call[1]) for call in cursor.executemany_calls] == [10, 10, 5]
+        assert cursor.executemany_calls[0][1][0] == ('0', 0.0)
+        assert connection.commits == 3
+    
+    def test_chunks_are_capped_by_estimated_bytes(self, monkeypatch):
+        """Test chunk limitati dai byte stimati oltre che dalle righe"""
+        importer, cursor, connection = make_importer(
+            monkeypatch, fast_executemany=False, batch_rows=100, batch_bytes=100
+        )
+        # 20 caratteri = 40 byte stimati per riga -> 2 righe per chunk
+        rows = [{'text': 'x' * 20} for _ in range(5)]
+        
+        importer.bulk_insert('items', rows, TypeMapper())
+        
+        assert [len(call[1]) for call in cursor.executemany_calls] == [2, 2, 1]
+        assert connection.commits == 3
+    
+    def test_oversized_row_gets_its_own_chunk(self, monkeypatch):
+        """Test che una riga oltre il limite di byte venga comunque inserita"""
+        importer, cursor, _ = make_importer(
+            monkeypatch, fast_executemany=False, batch_bytes=10
+        )
+        importer.bulk_insert('items', [{'text': 'x' * 50}, {'text': 'y'}], TypeMapper())
+        assert [len(call[1]) for call in cursor.executemany_calls] == [1, 1]
+    
+    def test_import_table_reports_chunks(self, monkeypatch):
+        """Test statistiche dei chunk in ImportResult"""
+        importer, _, _ = make_importer(monkeypatch, fast_executemany=False, batch_rows=4)
+        rows = ({'_id': str(i)} for i in range(10))
+        
+        result = importer.import_table('items', rows, TypeMapper())
+        
+        assert result.success is True
+        assert result.rows_imported == 10
+        assert result.chunks == 3
+        assert result.bytes_estimated == 2 * 10
+    
+    def test_bulk_insert_empty_rows(self, monkeypatch):
+        """Test insert senza righe"""
+        importer, cursor, _ = make_importer(monkeypatch)
+        assert importer.bulk_insert('items', iter([]), TypeMapper()) == 0
+        assert cursor.executemany_calls == []
+
+
+class TestSQLImporterFastExecutemany:
+    """Test per il percorso fast_executemany + setinputsizes"""
+    
+    def test_fast_executemany_enabled_for_msodbc_driver(self, monkeypatch):
+        """Test abilitazione con Microsoft ODBC Driver"""
+        importer, _, _ = make_importer(monkeypatch)
+        assert importer.use_fast_executemany is True
+    
+    def test_fast_executemany_disabled_for_legacy_driver(self, monkeypatch):
+        """Test che il driver legacy usi executemany classico"""
+        importer, cursor, _ = make_importer(monkeypatch, driver_name='SQLSRV32.DLL')
+        importer.bulk_insert('items', [{'a': 'x'}], TypeMapper())
+        
+        assert importer.use_fast_executemany is False
+        assert cursor.executemany_calls[0][2] is False
+        assert cursor.input_sizes == []
+    
+    def test_fast_executemany_disabled_by_config(self, monkeypatch):
+        """Test disattivazione da configurazione"""
+        importer, _, _ = make_importer(monkeypatch, fast_executemany=False)
+        assert importer.use_fast_executemany is False
+    
+    def test_input_sizes_from_table_schema(self, monkeypatch):
+        """Test setinputsizes derivato da INFORMATION_SCHEMA.COLUMNS"""
+        results = {COLUMNS_QUERY: [
+            ('_id', 'nvarchar', 50),
+            ('name', 'nvarchar', -1),
+            ('age', 'float', None),
+            ('active', 'bit', None),
+        ]}
+        importer, cursor, _ = make_importer(monkeypatch, results)
+        rows = [
+            {'_id': 'a', 'name': 'short', 'age': 1, 'active': True},
+            {'_id': 'b', 'name': 'a longer name', 'age': 2, 'active': False},
+        ]
+        
+        importer.bulk_insert('items', rows, TypeMapper())
+        
+        assert cursor.executemany_calls[0][2] is True
+        assert cursor.input_sizes == [[
+            (pyodbc.SQL_WVARCHAR, 50, 0),
+            (pyodbc.SQL_WVARCHAR, len('a longer name'), 0),
+            (pyodbc.SQL_DOUBLE, 0, 0),
+            (pyodbc.SQL_BIT, 0, 0),
+        ]]
+    
+    def test_long_nvarchar_max_values_are_streamed(self, monkeypatch):
+        """Test che valori oltre il limite usino dimensione 0 (streaming)"""
+        results = {COLUMNS_QUERY: [('body', 'nvarchar', -1)]}
+        importer, cursor, _ = make_importer(monkeypatch, results)
+        rows = [{'body': 'x' * (SQLImporter.MAX_DECLARED_NVARCHAR + 1)}]
+        
+        importer.bulk_insert('items', rows, TypeMapper())
+        
+        assert cursor.input_sizes == [[(pyodbc.SQL_WVARCHAR, 0, 0)]]
+    
+    def test_non_bmp_characters_count_as_two_units(self, monkeypatch):
+        """Test lunghezza UTF-16 per caratteri fuori dal BMP"""
+        results = {COLUMNS_QUERY: [('text', 'nvarchar', -1)]}
+        importer, cursor, _ = make_importer(monkeypatch, results)
+        
+        importer.bulk_insert('items', [{'text': 'ok 😀😀'}], TypeMapper())
+        
+        assert cursor.input_sizes == [[(pyodbc.SQL_WVARCHAR, 7, 0)]]
+
+
+class TestSQLImporterTypedTables:
+    """Test per la creazione di tabelle con tipi inferiti"""
+    
+    ROWS = [
+        {'_id': 'a', '_creationTime': 1000.0, 'count': 1},
+        {'_id': 'b', '_creationTime': 2000.0, 'count': 2, 'email': 'b@example.com'},
+    ]
+    
+    def _create_query(self, cursor):
+        return next(query for query, _ in cursor.executed if 'CREATE TABLE' in query)
+    
+    def test_create_table_from_full_schema(self, monkeypatch):
+        """Test CREATE TABLE con l'unione delle colonne e tipi stretti"""
+        results = {COLUMNS_QUERY: [('_id', 'nvarchar', 16), ('_creationTime', 'datetime2', None),
+                                   ('count', 'bigint', None), ('email', 'nvarchar', 16)]}
+        importer, cursor, _ = make_importer(monkeypatch, results, fast_executemany=False)
+        mapper = TypeMapper()
+        
+        result = importer.import_table(
+            'users', iter(self.ROWS), mapper, column_schema=mapper.infer_schema(self.ROWS)
+        )
+        
+        assert result.success is True
+        create_query = self._create_query(cursor)
+        assert '[_creationTime] DATETIME2' in create_query
+        assert '[count] BIGINT' in create_query
+        assert '[email] NVARCHAR(16)' in create_query
+        
+        insert_query, values, _ = cursor.executemany_calls[0]
+        assert '[email]' in insert_query
+        assert values[0] == ('a', datetime(1970, 1, 1, 0, 0, 1), 1, None)
+    
+    def test_create_table_from_sample(self, monkeypatch):
+        """Test CREATE TABLE senza schema: tipi dalle prime righe"""
+        importer, cursor, _ = make_importer(monkeypatch, fast_executemany=False)
+        
+        result = importer.import_table('users', iter(self.ROWS), TypeMapper())
+        
+        assert result.success is True
+        assert result.rows_imported == 2
+        create_query = self._create_query(cursor)
+        assert '[count] FLOAT' in create_query
+        assert '[email] NVARCHAR(MAX)' in create_query
+    
+    def test_existing_text_columns_keep_value_conversion(self, monkeypatch):
+        """Test che le tabelle NVARCHAR esistenti ricevano i valori come prima"""
+        results = {
+            'INFORMATION_SCHEMA.TABLES': [(1,)],
+            COLUMNS_QUERY: [('_id', 'nvarchar', -1), ('_creationTime', 'nvarchar', -1), ('count', 'nvarchar', -1)],
+        }
+        importer, cursor, _ = make_importer(monkeypatch, results, fast_executemany=False)
+        
+        importer.import_table('users', iter(self.ROWS[:1]), TypeMapper())
+        
+        assert cursor.executemany_calls[0][1] == [('a', 1000.0, 1.0)]
+
+
+class TestSQLImporterSchemaEvolution:
+    """Test per l'adeguamento dello schema delle tabelle esistenti"""
+    
+    EXISTING = {
+        'INFORMATION_SCHEMA.TABLES': [(1,)],
+        COLUMNS_QUERY: [('_id', 'nvarchar', 16), ('count', 'bigint', None), ('note', 'nvarchar', -1)],
+    }
+    
+    def _alters(self, cursor):
+        return [query for query, _ in cursor.executed if query.startswith('ALTER TABLE')]
+    
+    def test_new_columns_are_added_and_types_widened(self, monkeypatch):
+        """Test ALTER TABLE ADD e ALTER COLUMN prima del caricamento"""
+        importer, cursor, connection = make_importer(monkeypatch, self.EXISTING, fast_executemany=False)
+        mapper = TypeMapper()
+        rows = [{'_id': 'x' * 40, 'count': 1.5, 'note': 'n', 'email': 'a@b.c'}]
+        
+        changes = importer.evolve_table('users', mapper.infer_schema(rows), mapper)
+        
+        assert self._alters(cursor) == [
+            'ALTER TABLE [convex_data].[users] ALTER COLUMN [_id] NVARCHAR(64) NULL',
+            'ALTER TABLE [convex_data].[users] ALTER COLUMN [count] FLOAT NULL',
+            'ALTER TABLE [convex_data].[users] ADD [email] NVARCHAR(16) NULL',
+        ]
+        assert len(changes) == 3
+        assert connection.commits == 1
+    
+    def test_import_adds_new_columns_to_insert(self, monkeypatch):
+        """Test che l'import carichi anche le colonne aggiunte"""
+        importer, cursor, _ = make_importer(monkeypatch, self.EXISTING, fast_executemany=False)
+        mapper = TypeMapper()
+        rows = [{'_id': 'a', 'count': 1}, {'_id': 'b', 'email': 'a@b.c'}]
+        
+        result = importer.import_table('users', iter(rows), mapper, column_schema=mapper.infer_schema(rows))
+        
+        assert result.success is True
+        assert result.schema_changes == ['ADD [email] NVARCHAR(16) NULL']
+        insert_query, values, _ = cursor.executemany_calls[0]
+        assert '[email]' in insert_query
+        assert values == [('a', 1, None), ('b', None, 'a@b.c')]
+    
+    def test_compatible_schema_is_not_altered(self, monkeypatch):
+        """Test nessuna modifica quando le colonne esistenti bastano"""
+        importer, cursor, _ = make_importer(monkeypatch, self.EXISTING, fast_executemany=False)
+        mapper = TypeMapper()
+        rows = [{'_id': 'abc', 'count': 2, 'note': 'x' * 10000}]
+        
+        result = importer.import_table('users', iter(rows), mapper, column_schema=mapper.infer_schema(rows))
+        
+        assert result.success is True
+        assert result.schema_changes is None
+        assert self._alters(cursor) == []
+    
+    def test_swap_mode_alters_staging_only(self, monkeypatch):
+        """Test che in modalità swap le modifiche riguardino solo la staging"""
+        importer, cursor, _ = make_importer(
+            monkeypatch, self.EXISTING, fast_executemany=False, load_mode='swap'
+        )
+        mapper = TypeMapper()
+        rows = [{'_id': 'a', 'email': 'a@b.c'}]
+        
+        importer.import_table('users', iter(rows), mapper, column_schema=mapper.infer_schema(rows))
+        
+        assert self._alters(cursor) == [
+            'ALTER TABLE [convex_data].[users__staging] ADD [email] NVARCHAR(16) NULL'
+        ]
+
+
+class TestSQLImporterSwapLoad:
+    """Test per la modalità di caricamento staging + swap"""
+    
+    def test_swap_load_never_truncates_live_table(self, monkeypatch):
+        """Test caricamento in staging e swap con sp_rename"""
+        results = {'INFORMATION_SCHEMA.TABLES': [(1,)]}
+        importer, cursor, _ = make_importer(
+            monkeypatch, results, fast_executemany=False, load_mode='swap'
+        )
+        
+        result = importer.import_table('users', [{'_id': 'a'}], TypeMapper())
+        
+        queries = [query for query, _ in cursor.executed]
+        assert result.success is True
+        assert not any('TRUNCATE' in query for query in queries)
+        assert any('SELECT TOP 0 * INTO [convex_data].[users__staging]' in query for query in queries)
+        assert 'WITH (TABLOCK)' in cursor.executemany_calls[0][0]
+        assert '[users__staging]' in cursor.executemany_calls[0][0]
+        
+        renames = [params[0] for query, params in cursor.executed if 'sp_rename' in query]
+        assert renames == [
+            ('[convex_data].[users]', 'users__old'),
+            ('[convex_data].[users__staging]', 'users'),
+        ]
+        assert queries[-1] == 'DROP TABLE IF EXISTS [convex_data].[users__old]'
+        
+        # XACT_ABORT attivo solo per i rename dello swap
+        switches = [query for query in queries if 'XACT_ABORT' in query or 'sp_rename' in query]
+        assert switches[0] == 'SET XACT_ABORT ON' and switches[-1] == 'SET XACT_ABORT OFF'
+    
+    def test_failed_swap_restores_xact_abort(self, monkeypatch):
+        """Test errore in sp_rename: rollback e XACT_ABORT riportato a OFF"""
+        importer, cursor, connection = make_importer(monkeypatch, {'INFORMATION_SCHEMA.TABLES': [(1,)]})
+        execute = cursor.execute
+        
+        def failing_execute(query, *params):
+            execute(query, *params)
+            if 'sp_rename' in query:
+                raise RuntimeError('rename failed')
+            return cursor
+        cursor.execute = failing_execute
+        
+        with pytest.raises(Exception, match="Table swap failed"):
+            importer.swap_table('users', 'users__staging')
+        
+        queries = [query for query, _ in cursor.executed]
+        assert connection.rollbacks == 1
+        assert queries[-1] == 'SET XACT_ABORT OFF'
+    
+    def test_swap_load_failure_keeps_live_table(self, monkeypatch):
+        """Test che un errore di caricamento lasci invariata la tabella live"""
+        results = {'INFORMATION_SCHEMA.TABLES': [(1,)]}
+        importer, cursor, _ = make_importer(
+            monkeypatch, results, fast_executemany=False, load_mode='swap'
+        )
+        
+        def failing_executemany(query, values):
+            raise RuntimeError('boom')
+        cursor.executemany = failing_executemany
+        
+        result = importer.import_table('users', [{'_id': 'a'}], TypeMapper())
+        
+        queries = [query for query, _ in cursor.executed]
+        assert result.success is False
+        assert not any('sp_rename' in query for query in queries)
+        assert queries[-1] == 'DROP TABLE IF EXISTS [convex_data].[users__staging]'
+    
+    def test_watermark_table_created_concurrently(self, monkeypatch):
+        """Test CREATE TABLE dei watermark fallito perché creata da un'altra connessione"""
+        importer, cursor, connection = make_importer(monkeypatch, {'INFORMATION_SCHEMA.TABLES': [(1,)]})
+        execute = cursor.execute
+        
+        def racing_execute(query, *params):
+            execute(query, *params)
+            if 'CREATE TABLE' in query:
+                raise RuntimeError("There is already an object named '_sync_watermarks' in the database.")
+            return cursor
+        cursor.execute = racing_execute
+        
+        importer.ensure_watermark_table()
+        assert connection.rollbacks == 1
+        
+        cursor.results = {}
+        with pytest.raises(RuntimeError, match="already an object"):
+            importer.ensure_watermark_table()
+    
+    def test_unsupported_load_mode_raises_error(self):
+        """Test modalità di caricamento non valida"""
+        with pytest.raises(ValueError, match="Unsupported load mode"):
+            SQLImporter('Driver=test;', 'convex_data', load_mode='append')
+
+
+class TestSQLImporterIncremental:
+    """Test per il sync incrementale con watermark e MERGE"""
+    
+    ROWS = [
+        {'_id': 'a', '_creationTime': 100.0, 'name': 'old'},
+        {'_id': 'b', '_creationTime': 200.0, 'name': 'watermark'},
+        {'_id': 'c', '_creationTime': 300.0, 'name': 'new'},
+    ]
+    
+    def _results(self, watermark):
+        return {
+            'INFORMATION_SCHEMA.TABLES': [(1,)],
+            '[_sync_watermarks]\n            WHERE': [watermark] if watermark else [],
+            COLUMNS_QUERY: [('_id', 'nvarchar', -1), ('_creationTime', 'nvarchar', -1), ('name', 'nvarchar', -1)],
+        }
+    
+    def test_only_rows_after_watermark_are_merged(self, monkeypatch):
+        """Test caricamento dei soli documenti successivi al watermark"""
+        importer, cursor, _ = make_importer(
+            monkeypatch, self._results((200.0, 'b', '[]')), fast_executemany=False
+        )
+        
+        result = importer.import_table_incremental('users', lambda: iter(self.ROWS), TypeMapper())
+        
+        assert result.success is True
+        assert result.sync_mode == 'incremental'
+        assert result.rows_imported == 1
+        assert cursor.executemany_calls[0][1] == [('c', 300.0, 'new')]
+        
+        queries = [query for query, _ in cursor.executed]
+        assert any('MERGE [convex_data].[users]' in query and 'ON target.[_id] = source.[_id]' in query
+                   for query in queries)
+        watermark_insert = [params[0] for query, params in cursor.executed
+                            if query.startswith('INSERT INTO [convex_data].[_sync_watermarks]')]
+        assert watermark_insert[0][:3] == ('users', 300.0, 'c')
+    
+    def test_missing_watermark_falls_back_to_full_reload(self, monkeypatch):
+        """Test fallback a caricamento completo senza watermark"""
+        importer, cursor, _ = make_importer(monkeypatch, self._results(None), fast_executemany=False)
+        
+        result = importer.import_table_incremental('users', lambda: iter(self.ROWS), TypeMapper())
+        
+        assert result.success is True
+        assert result.fallback_reason == 'missing watermark'
+        assert result.rows_imported == 3
+        assert any('TRUNCATE TABLE' in query for query, _ in cursor.executed)
+    
+    def test_schema_drift_adds_columns_before_merge(self, monkeypatch):
+        """Test ALTER TABLE ADD per le colonne nuove invece del ricaricamento completo"""
+        importer, cursor, _ = make_importer(
+            monkeypatch, self._results((200.0, 'b', '[]')), fast_executemany=False
+        )
+        rows = self.ROWS + [{'_id': 'd', '_creationTime': 400.0, 'email': 'x@example.com'}]
+        
+        result = importer.import_table_incremental('users', lambda: iter(rows), TypeMapper())
+        
+        queries = [query for query, _ in cursor.executed]
+        assert result.success is True
+        assert result.fallback_reason is None
+        assert result.sync_mode == 'incremental'
+        assert result.schema_changes == ['ADD [email] NVARCHAR(16) NULL']
+        assert 'ALTER TABLE [convex_data].[users] ADD [email] NVARCHAR(16) NULL' in queries
+        assert not any('TRUNCATE' in query for query in queries)
+
+
+class TestSQLImporterMetadataCatalog:
+    """Test per il catalogo di tabelle e colonne in memoria"""
+    
+    CATALOG = {COLUMNS_QUERY: [
+        ('Users', '_id', 'nvarchar', 16),
+        ('Users', 'count', 'bigint', None),
+        ('orders', '_id', 'nvarchar', -1),
+    ]}
+    
+    def _make(self, monkeypatch, **kwargs):
+        return make_importer(monkeypatch, self.CATALOG, fast_executemany=False, metadata_cache=True, **kwargs)
+    
+    @staticmethod
+    def _metadata_queries(cursor):
+        return [query for query, _ in cursor.executed if 'INFORMATION_SCHEMA' in query]
+    
+    def test_catalog_is_loaded_with_one_query(self, monkeypatch):
+        """Test caricamento del catalogo alla connessione e verifiche senza query"""
+        importer, cursor, _ = self._make(monkeypatch)
+        
+        assert importer.table_exists('users') is True
+        assert importer.table_exists('missing') is False
+        assert importer.get_column_types('USERS') == {'_id': ('nvarchar', 16), 'count': ('bigint', None)}
+        assert len(self._metadata_queries(cursor)) == 1
+        assert cursor.executed[-1][1] == (('convex_data',),)
+    
+    def test_created_and_altered_tables_are_tracked(self, monkeypatch):
+        """Test aggiornamento del catalogo dopo CREATE TABLE e ALTER TABLE"""
+        importer, cursor, _ = self._make(monkeypatch)
+        rows = [{'_id': 'a', 'n': 1, 'data': {'$bytes': 'AA=='}}]
+        
+        importer.import_table('events', rows, TypeMapper(), column_schema=TypeMapper().infer_schema(rows))
+        assert importer.get_column_types('events') == {
+            '_id': ('nvarchar', 16), 'n': ('bigint', None), 'data': ('varbinary', -1)
+        }
+        
+        importer.import_table('events', [{'_id': 'b', 'n': 1.5, 'note': 'x'}], TypeMapper())
+        assert importer.get_column_types('events')['n'] == ('float', None)
+        assert importer.get_column_types('events')['note'] == ('nvarchar', -1)
+        assert len(self._metadata_queries(cursor)) == 1
+    
+    def test_swap_load_updates_catalog(self, monkeypatch):
+        """Test che staging e vecchia tabella non restino nel catalogo dopo lo swap"""
+        importer, cursor, _ = self._make(monkeypatch, load_mode='swap')
+        
+        importer.import_table('users', [{'_id': 'a', 'count': 1, 'email': 'a@b.c'}], TypeMapper())
+        
+        assert set(importer.get_column_types('users')) == {'_id', 'count', 'email'}
+        assert not importer.table_exists('users__staging')
+        assert not importer.table_exists('users__old')
+        assert len(self._metadata_queries(cursor)) == 1
+    
+    def test_catalog_can_be_shared(self, monkeypatch):
+        """Test condivisione del catalogo tra importer senza nuove query"""
+        catalog = MetadataCatalog()
+        importer, cursor, _ = self._make(monkeypatch, catalog=catalog)
+        
+        assert importer.catalog is catalog
+        assert self._metadata_queries(cursor) == []
+    
+    def test_disabled_catalog_queries_information_schema(self, monkeypatch):
+        """Test verifica di esistenza con query diretta a catalogo disattivato"""
+        importer, cursor, _ = make_importer(monkeypatch, {'INFORMATION_SCHEMA.TABLES': [(1,)]})
+        
+        assert importer.catalog is None
+        assert importer.table_exists('users') is True
+        assert len(self._metadata_queries(cursor)) == 1
+
+
+class TestSQLImporterTableValuedParameters:
+    """Test per l'insert via table-valued parameter"""
+    
+    EXISTING = {COLUMNS_QUERY: [('_id', 'nvarchar', 16), ('count', 'bigint', None), ('price', 'decimal', None)]}
+    
+    def test_chunks_are_sent_as_one_tvp(self, monkeypatch):
+        """Test un solo INSERT ... SELECT FROM ? per chunk"""
+        importer, cursor, connection = make_importer(
+            monkeypatch, self.EXISTING, fast_executemany=False, batch_rows=2, insert_method='tvp'
+        )
+        rows = [{'_id': str(i), 'count': i, 'price': '1.50'} for i in range(3)]
+        
+        stats = importer._insert_chunks('items', rows, TypeMapper())
+        
+        create_type = [query for query, _ in cursor.executed if 'CREATE TYPE' in query]
+        assert len(create_type) == 1
+        assert '[_id] NVARCHAR(16),\n    [count] BIGINT,\n    [price] NVARCHAR(MAX)' in create_type[0]
+        
+        inserts = [(query, params) for query, params in cursor.executed if query.startswith('INSERT')]
+        assert [query for query, _ in inserts] == [
+            'INSERT INTO [convex_data].[items] ([_id], [count], [price]) '
+            'SELECT [_id], [count], [price] FROM ?'
+        ] * 2
+        tvp = inserts[0][1][0][0]
+        assert tvp[0].startswith(SQLImporter.TVP_TYPE_PREFIX)
+        assert tvp[1:] == ['convex_data', ('0', 0, '1.50'), ('1', 1, '1.50')]
+        assert cursor.executemany_calls == []
+        assert (stats.rows, stats.chunks, stats.method) == (3, 2, 'tvp')
+    
+    def test_table_type_is_reused(self, monkeypatch):
+        """Test riuso del table type per lo stesso layout di colonne"""
+        importer, cursor, _ = make_importer(monkeypatch, self.EXISTING, insert_method='tvp')
+        
+        importer._insert_chunks('items', [{'_id': 'a', 'count': 1}], TypeMapper())
+        importer._insert_chunks('items', [{'_id': 'b', 'count': 2}], TypeMapper())
+        
+        assert len([query for query, _ in cursor.executed if 'CREATE TYPE' in query]) == 1
+    
+    def test_import_table_override(self, monkeypatch):
+        """Test scelta del metodo per singola tabella"""
+        importer, cursor, _ = make_importer(monkeypatch, fast_executemany=False)
+        
+        result = importer.import_table('items', [{'_id': 'a'}], TypeMapper(), insert_method='tvp')
+        
+        assert result.success is True
+        assert result.insert_method == 'tvp'
+        assert cursor.executemany_calls == []
+    
+    def test_unsupported_driver_falls_back_to_executemany(self, monkeypatch):
+        """Test executemany con driver ODBC senza supporto TVP"""
+        importer, cursor, _ = make_importer(
+            monkeypatch, driver_name='SQLSRV32.DLL', insert_method='tvp'
+        )
+        
+        result = importer.import_table('items', [{'_id': 'a'}], TypeMapper())
+        
+        assert result.insert_method == 'executemany'
+        assert len(cursor.executemany_calls) == 1
+        assert not any('CREATE TYPE' in query for query, _ in cursor.executed)
+    
+    def test_invalid_insert_method(self):
+        """Test metodo di insert non supportato"""
+        with pytest.raises(ValueError, match="Unsupported insert method"):
+            SQLImporter('Driver=test;', 'convex_data', insert_method='bulk')
+
+
+class TestSQLImporterBulkCopy:
+    """Test per il caricamento con file bcp e BULK INSERT"""
+    
+    EXISTING = {COLUMNS_QUERY: [('_id', 'nvarchar', 16), ('count', 'bigint', None), ('note', 'nvarchar', -1)]}
+    
+    def test_rows_are_loaded_with_bulk_insert(self, monkeypatch, tmp_path):
+        """Test un solo BULK INSERT con format file, TABLOCK e BATCHSIZE"""
+        importer, cursor, connection = make_importer(
+            monkeypatch, self.EXISTING, batch_rows=2, insert_method='bcp',
+            bulk_dir=str(tmp_path), bulk_server_dir='\\\\sql01\\bulk\\'
+        )
+        rows = [{'_id': str(i), 'count': i} for i in range(3)]
+        
+        stats = importer._insert_chunks('items', rows, TypeMapper(), columns=['_id', 'count'])
+        
+        bulk = [query for query, _ in cursor.executed if query.startswith('BULK INSERT')]
+        assert len(bulk) == 1
+        assert bulk[0].startswith("BULK INSERT [convex_data].[items] FROM N'\\\\sql01\\bulk\\items_")
+        assert ".fmt', TABLOCK, KEEPNULLS, BATCHSIZE = 2)" in bulk[0]
+        assert cursor.executemany_calls == []
+        assert connection.commits == 1
+        assert (stats.rows, stats.chunks, stats.method) == (3, 2, 'bcp')
+        assert stats.bytes > 0
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_failed_load_removes_files(self, monkeypatch, tmp_path):
+        """Test rollback e rimozione dei file se BULK INSERT fallisce"""
+        importer, cursor, connection = make_importer(
+            monkeypatch, self.EXISTING, insert_method='bcp', bulk_dir=str(tmp_path)
+        )
+        
+        execute = cursor.execute
+        
+        def failing_execute(query, *params):
+            if query.startswith('BULK INSERT'):
+                raise RuntimeError('access denied')
+            return execute(query, *params)
+        monkeypatch.setattr(cursor, 'execute', failing_execute)
+        
+        with pytest.raises(Exception, match='Bulk copy into items failed: access denied'):
+            importer._insert_chunks('items', [{'_id': 'a'}], TypeMapper())
+        assert connection.rollbacks == 1
+        assert list(tmp_path.iterdir()) == []
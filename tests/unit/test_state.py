@@ -0,0 +1,206 @@
+"""
+Unit tests per lo stato persistente del sync
+"""
+import os
+import time
+import pytest
+from src.state import FingerprintStore, SchemaCache, DeltaCursorStore, SnapshotCache
+
+
+class TestFingerprintStore:
+    """Test per FingerprintStore"""
+    
+    def test_unknown_table_is_changed(self, tmp_path):
+        """Test che una tabella mai caricata non sia considerata invariata"""
+        store = FingerprintStore(str(tmp_path), 'app')
+        assert store.is_unchanged('dbo', 'users', 'users', 123, 456) is False
+    
+    def test_record_and_compare(self, tmp_path):
+        """Test confronto con il fingerprint salvato"""
+        store = FingerprintStore(str(tmp_path), 'app')
+        store.record('dbo', 'users', 'users', 123, 456)
+        
+        assert store.is_unchanged('dbo', 'users', 'users', 123, 456) is True
+        assert store.is_unchanged('dbo', 'users', 'users', 124, 456) is False
+        assert store.is_unchanged('dbo', 'users', 'users', 123, 457) is False
+        assert store.is_unchanged('dbo', 'users', 'accounts', 123, 456) is False
+        assert store.is_unchanged('other', 'users', 'users', 123, 456) is False
+    
+    def test_options_are_part_of_fingerprint(self, tmp_path):
+        """Test stesso snapshot con opzioni della tabella diverse"""
+        store = FingerprintStore(str(tmp_path), 'app')
+        store.record('dbo', 'users', 'users', 1, 2, {'flatten': False, 'child_tables': []})
+        
+        assert store.is_unchanged('dbo', 'users', 'users', 1, 2, {'child_tables': [], 'flatten': False})
+        assert not store.is_unchanged('dbo', 'users', 'users', 1, 2, {'flatten': False, 'child_tables': ['tags']})
+        assert not store.is_unchanged('dbo', 'users', 'users', 1, 2)
+    
+    def test_fingerprints_are_persisted_per_app(self, tmp_path):
+        """Test persistenza su file separati per app"""
+        FingerprintStore(str(tmp_path), 'app').record('dbo', 'users', 'users', 1, 2)
+        
+        assert FingerprintStore(str(tmp_path), 'app').is_unchanged('dbo', 'users', 'users', 1, 2)
+        assert not FingerprintStore(str(tmp_path), 'other').is_unchanged('dbo', 'users', 'users', 1, 2)
+    
+    def test_forget_invalidates_fingerprint(self, tmp_path):
+        """Test invalidazione del fingerprint prima di un nuovo caricamento"""
+        store = FingerprintStore(str(tmp_path), 'app')
+        store.record('dbo', 'users', 'users', 1, 2)
+        store.forget('dbo', 'users')
+        
+        assert FingerprintStore(str(tmp_path), 'app').get('dbo', 'users') is None
+    
+    def test_corrupted_file_is_ignored(self, tmp_path):
+        """Test che un file di stato corrotto venga trattato come vuoto"""
+        (tmp_path / 'fingerprints_app.json').write_text('{not json', encoding='utf-8')
+        store = FingerprintStore(str(tmp_path), 'app')
+        assert store.get('dbo', 'users') is None
+
+
+class TestSchemaCache:
+    """Test per SchemaCache"""
+    
+    COLUMNS = [['_id', 'string', 16], ['_creationTime', 'timestamp', 0], ['age', 'integer', 0]]
+    
+    def test_record_and_get_preserves_column_order(self, tmp_path):
+        """Test persistenza dello schema con l'ordine delle colonne"""
+        SchemaCache(str(tmp_path), 'app').record('dbo', 'users', 'users', self.COLUMNS, 1.5e12, 1, 2)
+        
+        entry = SchemaCache(str(tmp_path), 'app').get('dbo', 'users', 'users')
+        assert entry['columns'] == self.COLUMNS
+        assert entry['max_creation_time'] == 1.5e12
+        assert (entry['crc'], entry['file_size']) == (1, 2)
+    
+    def test_other_source_table_is_ignored(self, tmp_path):
+        """Test che uno schema di un'altra tabella di origine non venga riusato"""
+        cache = SchemaCache(str(tmp_path), 'app')
+        cache.record('dbo', 'users', 'users', self.COLUMNS, None)
+        
+        assert cache.get('dbo', 'users', 'accounts') is None
+        assert cache.get('other', 'users', 'users') is None
+    
+    def test_forget(self, tmp_path):
+        """Test eliminazione dello schema salvato"""
+        cache = SchemaCache(str(tmp_path), 'app')
+        cache.record('dbo', 'users', 'users', self.COLUMNS, None)
+        cache.forget('dbo', 'users')
+        
+        assert SchemaCache(str(tmp_path), 'app').get('dbo', 'users', 'users') is None
+
+
+class TestDeltaCursorStore:
+    """Test per DeltaCursorStore"""
+    
+    def test_record_and_get_is_persisted_per_app(self, tmp_path):
+        """Test persistenza del cursore delle modifiche per app"""
+        DeltaCursorStore(str(tmp_path), 'app').record('dbo', 'users', 'users', 1766487443024722602)
+        
+        assert DeltaCursorStore(str(tmp_path), 'app').get('dbo', 'users', 'users') == 1766487443024722602
+        assert DeltaCursorStore(str(tmp_path), 'other').get('dbo', 'users', 'users') is None
+    
+    def test_other_source_table_is_ignored(self, tmp_path):
+        """Test che il cursore di un'altra tabella di origine non venga riusato"""
+        cursors = DeltaCursorStore(str(tmp_path), 'app')
+        cursors.record('dbo', 'users', 'users', 10)
+        
+        assert cursors.get('dbo', 'users', 'accounts') is None
+        assert cursors.get('other', 'users', 'users') is None
+    
+    def test_forget(self, tmp_path):
+        """Test eliminazione del cursore (caricamento completo alla prossima esecuzione)"""
+        cursors = DeltaCursorStore(str(tmp_path), 'app')
+        cursors.record('dbo', 'users', 'users', 10)
+        cursors.forget('dbo', 'users')
+        
+        assert DeltaCursorStore(str(tmp_path), 'app').get('dbo', 'users', 'users') is None
+
+
+def _snapshot_ts(seconds_ago):
+    """Timestamp di uno snapshot (nanosecondi) di seconds_ago secondi fa"""
+    return int((time.time() - seconds_ago) * 1_000_000_000)
+
+
+def _download(tmp_path, name, size):
+    """Crea un file ZIP scaricato di size byte"""
+    path = tmp_path / name
+    path.write_bytes(b'x' * size)
+    return str(path)
+
+
+class TestSnapshotCache:
+    """Test per SnapshotCache"""
+    
+    def test_put_and_find_by_timestamp(self, tmp_path):
+        """Test snapshot indirizzati da deploy key e timestamp, senza la key nel nome"""
+        cache = SnapshotCache(str(tmp_path / 'cache'), max_bytes=1000)
+        ts = _snapshot_ts(10)
+        
+        path = cache.put('prod:app|secret', ts, _download(tmp_path, 'a.zip', 10))
+        
+        assert cache.contains(path)
+        assert 'secret' not in os.path.basename(path)
+        assert os.path.basename(path).endswith(f'_{ts}.zip')
+        assert cache.find('prod:app|secret', ts) == path
+        assert cache.find('prod:other|secret', ts) is None
+        assert (cache.hits, cache.misses) == (1, 1)
+    
+    def test_reuse_requires_max_age(self, tmp_path):
+        """Test riuso dello snapshot più recente solo entro max_age"""
+        cache_dir = str(tmp_path / 'cache')
+        SnapshotCache(cache_dir, 1000).put('key', _snapshot_ts(600), _download(tmp_path, 'old.zip', 10))
+        recent = SnapshotCache(cache_dir, 1000).put('key', _snapshot_ts(30), _download(tmp_path, 'new.zip', 10))
+        
+        assert SnapshotCache(cache_dir, 1000).find('key') is None
+        assert SnapshotCache(cache_dir, 1000, max_age=60).find('key') == recent
+        assert SnapshotCache(cache_dir, 1000, max_age=10).find('key') is None
+    
+    def test_lru_eviction_over_quota(self, tmp_path):
+        """Test eliminazione degli snapshot usati meno di recente oltre la quota"""
+        cache = SnapshotCache(str(tmp_path / 'cache'), max_bytes=250)
+        first = cache.put('key', 1, _download(tmp_path, '1.zip', 100))
+        second = cache.put('key', 2, _download(tmp_path, '2.zip', 100))
+        os.utime(first, (time.time() - 100, time.time() - 100))
+        os.utime(second, (time.time() - 200, time.time() - 200))
+        cache.find('key', 1)
+        
+        third = cache.put('key', 3, _download(tmp_path, '3.zip', 100))
+        
+        assert os.path.exists(first) and os.path.exists(third)
+        assert not os.path.exists(second)
+        assert cache.stats() == {'hits': 1, 'misses': 0, 'evictions': 1, 'entries': 2, 'bytes': 200}
+    
+    def test_new_snapshot_larger_than_quota_is_kept(self, tmp_path):
+        """Test snapshot appena scaricato mantenuto anche se supera da solo la quota"""
+        cache = SnapshotCache(str(tmp_path / 'cache'), max_bytes=50)
+        cache.put('key', 1, _download(tmp_path, '1.zip', 40))
+        path = cache.put('key', 2, _download(tmp_path, '2.zip', 100))
+        
+        assert os.path.exists(path)
+        assert cache.stats()['entries'] == 1
+        assert cache.evictions == 1
+    
+    def test_contains_requires_snapshot_name(self, tmp_path):
+        """Test file della directory della cache che non sono snapshot (da eliminare dopo l'uso)"""
+        cache = SnapshotCache(str(tmp_path / 'cache'), max_bytes=1000)
+        path = cache.put('key', 1, _download(tmp_path, 'a.zip', 10))
+        
+        assert cache.contains(path)
+        assert not cache.contains(os.path.join(cache.cache_dir, 'convex_backup_20260101_000000'))
+        assert not cache.contains(path + '.partial')
+        assert not cache.contains(str(tmp_path / os.path.basename(path)))
+    
+    def test_put_sweeps_stale_partial_downloads(self, tmp_path):
+        """Test eliminazione dei download parziali e temporanei abbandonati"""
+        cache_dir = tmp_path / 'cache'
+        cache_dir.mkdir()
+        stale_time = time.time() - SnapshotCache.STALE_SECONDS - 60
+        for name in ('convex_backup_1.partial', 'convex_backup_1', 'convex_backup_2.partial', 'notes.txt'):
+            (cache_dir / name).write_bytes(b'x' * 10)
+        for name in ('convex_backup_1.partial', 'convex_backup_1', 'notes.txt'):
+            os.utime(cache_dir / name, (stale_time, stale_time))
+        
+        SnapshotCache(str(cache_dir), max_bytes=1000).put('key', 1, _download(tmp_path, 'a.zip', 10))
+        
+        remaining = sorted(os.listdir(cache_dir))
+        assert 'convex_backup_1.partial' not in remaining and 'convex_backup_1' not in remaining
+        assert 'convex_backup_2.partial' in remaining and 'notes.txt' in remaining
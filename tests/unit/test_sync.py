@@ -0,0 +1,504 @@
+"""
+Unit tests per l'import delle tabelle di sync.py (snapshot ZIP e target SQLite)
+"""
+import dataclasses
+import json
+import zipfile
+import pytest
+import sync
+from src.config import ConvexConfig, SQLConfig
+from src.convex import ConvexClient, SnapshotManifest
+from src.logging import SyncLogger
+from src.sql import SQLImporter, TypeMapper
+from src.state import DeltaCursorStore, FingerprintStore, SchemaCache
+
+
+def _write_backup(path, tables):
+    """Crea un backup ZIP con un documents.jsonl per ogni tabella"""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        for table_name, documents in tables.items():
+            content = ''.join(json.dumps(doc) + '\n' for doc in documents)
+            zip_ref.writestr(f"{table_name}/documents.jsonl", content)
+    return str(path)
+
+
+@pytest.fixture
+def make_context(tmp_path):
+    """Crea il SyncContext di una esecuzione (stato e database condivisi tra le esecuzioni)"""
+    def make(tables, table_options=None, full_reload=False, **sql_options):
+        zip_path = _write_backup(tmp_path / 'snapshot.zip', tables)
+        client = ConvexClient('prod:test|key')
+        state_dir = str(tmp_path / 'state')
+        return sync.SyncContext(
+            convex_config=ConvexConfig(
+                app_name='app', deploy_key='prod:test|key',
+                tables=list(tables), table_options=table_options or {}
+            ),
+            sql_config=SQLConfig(
+                connection_string=str(tmp_path / 'target.sqlite'), schema='convex_data',
+                dialect='sqlite', **sql_options
+            ),
+            convex_client=client,
+            zip_path=zip_path,
+            manifest=client.read_manifest(zip_path, list(tables)),
+            fingerprints=FingerprintStore(state_dir, 'app'),
+            schemas=SchemaCache(state_dir, 'app'),
+            logger=SyncLogger(str(tmp_path / 'logs'), 'app'),
+            full_reload=full_reload,
+            type_mapper=TypeMapper()
+        )
+    return make
+
+
+@pytest.fixture
+def importer(tmp_path):
+    """SQLImporter connesso al database SQLite delle esecuzioni"""
+    importer = SQLImporter(str(tmp_path / 'target.sqlite'), 'convex_data', dialect='sqlite')
+    importer.connect()
+    yield importer
+    importer.close()
+
+
+def run_table(context, importer, table_name):
+    """Importa una tabella come import_table_job in modalità sequenziale"""
+    return sync.import_table_job(context, importer, table_name, sync.TableOutput(buffered=True))
+
+
+def fetch(importer, table_name, columns):
+    """Righe di una tabella ordinate per _id"""
+    column_list = ', '.join(f'"{col}"' for col in columns)
+    importer.cursor.execute(f'SELECT {column_list} FROM {importer._table(table_name)} ORDER BY "_id"')
+    return [tuple(row) for row in importer.cursor.fetchall()]
+
+
+USERS = [
+    {'_id': 'a', '_creationTime': 1000.0, 'name': 'Anna', 'age': 30},
+    {'_id': 'b', '_creationTime': 2000.0, 'name': 'Bruno', 'age': 41},
+]
+
+
+class TestCachedSchema:
+    """Test per il riuso dello schema in cache (resolve_table_schema)"""
+    
+    def test_modified_old_document_is_validated(self, make_context, importer):
+        """Test documento esistente modificato dopo l'ultima esecuzione (nuova chiave e valore non intero)"""
+        assert run_table(make_context({'users': USERS}), importer, 'users').success
+        
+        modified = [dict(USERS[0], age=30.5, city='Roma'), USERS[1]]
+        result = run_table(make_context({'users': modified}), importer, 'users')
+        
+        assert result.success, result.error
+        assert fetch(importer, 'users', ['_id', 'age', 'city']) == [('a', 30.5, 'Roma'), ('b', 41, None)]
+    
+    def test_unchanged_member_validates_only_new_documents(self, make_context):
+        """Test CRC e dimensione del membro invariati: documenti già verificati non riletti"""
+        context = make_context({'users': USERS})
+        snapshot_table = context.manifest.tables['users']
+        context.schemas.record(
+            'convex_data', 'users', 'users', [['_id', 'string', 1]], 2000.0,
+            crc=snapshot_table.crc, file_size=snapshot_table.file_size
+        )
+        
+        validator = sync.resolve_table_schema(context, 'users', 'users')
+        assert validator.cached and validator.min_creation_time == 2000.0
+        
+        context.schemas.record('convex_data', 'users', 'users', [['_id', 'string', 1]], 2000.0, crc=1, file_size=2)
+        assert sync.resolve_table_schema(context, 'users', 'users').min_creation_time is None
+    
+    def test_poisoned_cache_entry_is_forgotten(self, make_context, importer, tmp_path):
+        """Test errore di conversione con lo schema in cache: voce eliminata e schema re-inferito"""
+        documents = [dict(USERS[0], age=1.5), USERS[1]]
+        context = make_context({'users': documents})
+        snapshot_table = context.manifest.tables['users']
+        # Schema in cache non più valido per documenti già "verificati"
+        context.schemas.record(
+            'convex_data', 'users', 'users',
+            [['_id', 'string', 1], ['_creationTime', 'timestamp', 0], ['name', 'string', 5], ['age', 'integer', 0]],
+            2000.0, crc=snapshot_table.crc, file_size=snapshot_table.file_size
+        )
+        
+        result = run_table(context, importer, 'users')
+        
+        assert result.success, result.error
+        assert fetch(importer, 'users', ['_id', 'age']) == [('a', 1.5), ('b', 41)]
+        cached = SchemaCache(str(tmp_path / 'state'), 'app').get('convex_data', 'users', 'users')
+        assert ['age', 'number', 0] in cached['columns']
+
+
+ORDERS = [
+    {'_id': 'a', '_creationTime': 1000.0, 'tags': ['x', 'y'], 'items': [{'sku': 'p1', 'price': {'amount': 10}}]},
+    {'_id': 'b', '_creationTime': 2000.0, 'tags': [], 'items': [{'sku': 'p2'}, {'sku': 'p3'}]},
+]
+
+
+class TestFingerprintSkip:
+    """Test per il salto delle tabelle invariate (fingerprint)"""
+    
+    def test_unchanged_snapshot_is_skipped(self, make_context, importer):
+        """Test stesso snapshot e stesse opzioni: tabella saltata"""
+        assert run_table(make_context({'users': USERS}), importer, 'users').success
+        
+        result = run_table(make_context({'users': USERS}), importer, 'users')
+        
+        assert result.skipped is True
+    
+    def test_changed_options_reload_table(self, make_context, importer):
+        """Test stesso snapshot con child_tables aggiunte: tabella ricaricata e tabella figlia creata"""
+        assert run_table(make_context({'orders': ORDERS}), importer, 'orders').success
+        
+        context = make_context({'orders': ORDERS}, table_options={'orders': {'child_tables': ['tags']}})
+        result = run_table(context, importer, 'orders')
+        
+        assert result.success, result.error
+        assert not result.skipped
+        assert result.child_tables == {'orders_tags': 2}
+        assert importer.table_exists('orders_tags')
+        
+        # Di nuovo con le stesse opzioni: saltata
+        context = make_context({'orders': ORDERS}, table_options={'orders': {'child_tables': ['tags']}})
+        assert run_table(context, importer, 'orders').skipped is True
+    
+    def test_changed_sql_settings_reload_table(self, make_context, importer):
+        """Test stesso snapshot con load_mode diverso: tabella ricaricata"""
+        assert run_table(make_context({'users': USERS}), importer, 'users').success
+        
+        result = run_table(make_context({'users': USERS}, load_mode='swap'), importer, 'users')
+        
+        assert result.success, result.error
+        assert not result.skipped
+
+
+class TestChildTables:
+    """Test per il caricamento delle tabelle figlie (import_child_tables)"""
+    
+    def test_child_tables_are_loaded(self, make_context, importer):
+        """Test una riga per elemento, con _parent_id e _ordinal, e array rimossi dalla tabella principale"""
+        context = make_context({'orders': ORDERS}, table_options={'orders': {'child_tables': ['tags', 'items']}})
+        
+        result = run_table(context, importer, 'orders')
+        
+        assert result.success, result.error
+        assert result.child_tables == {'orders_tags': 2, 'orders_items': 3}
+        assert fetch(importer, 'orders_tags', ['_parent_id', '_ordinal', 'value']) == [('a', 0, 'x'), ('a', 1, 'y')]
+        importer.cursor.execute(
+            f'SELECT "_parent_id", "_ordinal", "sku", "price_amount" FROM {importer._table("orders_items")} '
+            'ORDER BY "_parent_id", "_ordinal"'
+        )
+        assert [tuple(row) for row in importer.cursor.fetchall()] == [
+            ('a', 0, 'p1', 10), ('b', 0, 'p2', None), ('b', 1, 'p3', None)
+        ]
+        assert 'tags' not in importer.get_column_types('orders')
+    
+    def test_child_tables_are_fully_reloaded(self, make_context, importer):
+        """Test nuova esecuzione: la tabella figlia viene sostituita, anche se vuota"""
+        options = {'orders': {'child_tables': ['tags']}}
+        assert run_table(make_context({'orders': ORDERS}, table_options=options), importer, 'orders').success
+        
+        emptied = [dict(document, tags=[]) for document in ORDERS]
+        result = run_table(make_context({'orders': emptied}, table_options=options), importer, 'orders')
+        
+        assert result.success, result.error
+        assert result.child_tables == {'orders_tags': 0}
+        assert fetch(importer, 'orders_tags', ['_parent_id', '_ordinal']) == []
+    
+    def test_empty_arrays_create_key_only_table(self, make_context, importer):
+        """Test nessun elemento negli array: tabella figlia creata con le sole chiavi"""
+        documents = [dict(document, tags=[]) for document in ORDERS]
+        context = make_context({'orders': documents}, table_options={'orders': {'child_tables': ['tags']}})
+        
+        result = run_table(context, importer, 'orders')
+        
+        assert result.success, result.error
+        assert set(importer.get_column_types('orders_tags')) == {'_parent_id', '_ordinal'}
+    
+    def test_reserved_element_field_fails_table(self, make_context, importer):
+        """Test elemento con campo _parent_id: tabella in errore, nessuna chiave sovrascritta"""
+        documents = [dict(ORDERS[0], items=[{'sku': 'p1', '_parent_id': 'z'}])]
+        context = make_context({'orders': documents}, table_options={'orders': {'child_tables': ['items']}})
+        
+        result = run_table(context, importer, 'orders')
+        
+        assert not result.success
+        assert '_parent_id' in result.error
+
+
+class TestDecodeWorkers:
+    """Test per il caricamento con i processi di decodifica (righe convertite nei processi)"""
+    
+    DOCUMENTS = [
+        {
+            '_id': f'd{i:03}', '_creationTime': 1000.0 + i, 'name': f'user {i}' * (i % 4),
+            'address': {'city': 'Roma', 'zip': i}, **({'score': i / 2} if i % 3 else {'tags': ['a']})
+        }
+        for i in range(120)
+    ]
+    COLUMNS = ['_id', '_creationTime', 'name', 'address_city', 'address_zip', 'score', 'tags']
+    OPTIONS = {'docs': {'flatten': True}}
+    
+    @pytest.fixture
+    def workers(self):
+        """ConvexClient con 2 processi di decodifica e blocchi piccoli"""
+        client = ConvexClient('prod:test|key', decode_workers=2)
+        client.DECODE_CHUNK_BYTES = 2000
+        yield client
+        client.close()
+    
+    @pytest.fixture
+    def transforms(self, monkeypatch):
+        """Registra la transform di ogni lettura dello snapshot"""
+        calls = []
+        iter_table = ConvexClient.iter_table
+        
+        def spy(client, zip_path, table_name, batch_size=None, transform=None):
+            calls.append(type(transform).__name__ if transform is not None else None)
+            return iter_table(client, zip_path, table_name, batch_size, transform)
+        
+        monkeypatch.setattr(ConvexClient, 'iter_table', spy)
+        return calls
+    
+    def load(self, context, importer, client=None, **fields):
+        if client is not None:
+            context.convex_client = client
+        context = dataclasses.replace(context, **fields)
+        result = run_table(context, importer, 'docs')
+        assert result.success, result.error
+        return result
+    
+    @pytest.mark.parametrize('sql_options', [{}, {'schema_inference': 'sample'}, {'load_mode': 'swap'}])
+    def test_rows_match_serial_load(self, make_context, importer, workers, sql_options):
+        """Test stesse righe del caricamento senza processi, con inferenza completa o da campione"""
+        self.load(make_context({'docs': self.DOCUMENTS}, self.OPTIONS, **sql_options), importer)
+        expected = fetch(importer, 'docs', self.COLUMNS)
+        
+        context = make_context({'docs': self.DOCUMENTS}, self.OPTIONS, full_reload=True, **sql_options)
+        result = self.load(context, importer, workers)
+        
+        assert result.rows_imported == len(self.DOCUMENTS)
+        assert fetch(importer, 'docs', self.COLUMNS) == expected
+    
+    def test_cached_schema_with_pipeline(self, make_context, importer, workers, transforms, tmp_path):
+        """Test schema in cache: documenti verificati e convertiti nei processi, anche con la pipeline"""
+        self.load(make_context({'docs': self.DOCUMENTS}, self.OPTIONS), importer)
+        assert transforms == ['SchemaBlockInference', 'RowBlockConverter']
+        
+        documents = self.DOCUMENTS + [dict(self.DOCUMENTS[1], _id='e000', _creationTime=5000.0, name='x' * 30)]
+        result = self.load(make_context({'docs': documents}, self.OPTIONS), importer, workers, pipeline_queue_size=2)
+        
+        assert transforms[2:] == ['RowBlockConverter']
+        assert result.rows_imported == len(documents)
+        assert result.stage_stats is not None
+        cached = SchemaCache(str(tmp_path / 'state'), 'app').get('convex_data', 'docs', 'docs')
+        assert ['name', 'string', 30] in cached['columns']
+        assert cached['max_creation_time'] == 5000.0
+    
+    def test_cached_schema_mismatch_in_worker(self, make_context, importer, workers, transforms):
+        """Test documento non compatibile verificato in un processo: schema re-inferito e tabella ricaricata"""
+        self.load(make_context({'docs': self.DOCUMENTS}, self.OPTIONS), importer)
+        
+        documents = self.DOCUMENTS + [dict(self.DOCUMENTS[1], _id='e000', _creationTime=5000.0, email='x')]
+        result = self.load(make_context({'docs': documents}, self.OPTIONS), importer, workers)
+        
+        assert transforms[2:] == ['RowBlockConverter', 'SchemaBlockInference', 'RowBlockConverter']
+        assert result.rows_imported == len(documents)
+        assert fetch(importer, 'docs', ['_id', 'email'])[-1] == ('e000', 'x')
+    
+    def test_empty_table(self, make_context, importer, workers, transforms):
+        """Test tabella senza documenti: nessuna lettura avviata"""
+        self.load(make_context({'docs': []}), importer, workers)
+        
+        assert transforms == []
+        assert set(importer.get_column_types('docs')) == {'_id', '_creationTime'}
+
+
+class TestParallelImport:
+    """Test per import_tables_parallel (ordine, pool di connessioni)"""
+    
+    TABLES = {
+        'small': USERS[:1],
+        'large': [dict(USERS[0], _id=f"k{i}", name='x' * 50) for i in range(50)],
+        'medium': [dict(USERS[0], _id=f"k{i}") for i in range(5)],
+    }
+    
+    @pytest.fixture
+    def jobs(self, monkeypatch):
+        """Sostituisce import_table_job registrando tabella e importer usato"""
+        calls = []
+        
+        def fake_job(context, importer, table_name, out):
+            calls.append((table_name, importer))
+            return sync.ImportResult(table_name=table_name, success=True, rows_imported=1)
+        
+        monkeypatch.setattr(sync, 'import_table_job', fake_job)
+        return calls
+    
+    def test_largest_first_and_input_order(self, make_context, importer, jobs):
+        """Test tabelle avviate dalla più grande, risultati nell'ordine di input"""
+        context = make_context(self.TABLES)
+        
+        results = sync.import_tables_parallel(context, ['small', 'large', 'medium'], importer, 1)
+        
+        assert [name for name, _ in jobs] == ['large', 'medium', 'small']
+        assert [result.table_name for result in results] == ['small', 'large', 'medium']
+    
+    def test_idle_importer_is_reused(self, make_context, importer, jobs):
+        """Test un solo worker: tutte le tabelle sulla connessione già aperta"""
+        context = make_context(self.TABLES)
+        
+        sync.import_tables_parallel(context, list(self.TABLES), importer, 1)
+        
+        assert all(used is importer for _, used in jobs)
+        assert importer.is_alive()
+    
+    def test_watermark_table_created_before_workers(self, make_context, importer, jobs):
+        """Test tabelle incrementali: tabella dei watermark creata una volta prima dei worker"""
+        context = make_context(self.TABLES, table_options={'medium': {'sync_mode': 'incremental'}})
+        assert not importer.table_exists(sync.SQLImporter.WATERMARK_TABLE)
+        
+        sync.import_tables_parallel(context, list(self.TABLES), importer, 2)
+        
+        assert importer.table_exists(sync.SQLImporter.WATERMARK_TABLE)
+    
+    def test_broken_importer_is_replaced(self, make_context, importer, monkeypatch):
+        """Test connessione caduta durante una tabella: importer chiuso e sostituito da uno nuovo"""
+        used = []
+        
+        def fake_job(context, sql_importer, table_name, out):
+            used.append(sql_importer)
+            if table_name == 'large':
+                sql_importer.connection.close()
+                raise Exception("connection lost")
+            assert sql_importer.is_alive()
+            return sync.ImportResult(table_name=table_name, success=True, rows_imported=1)
+        
+        monkeypatch.setattr(sync, 'import_table_job', fake_job)
+        context = make_context(self.TABLES)
+        
+        results = sync.import_tables_parallel(context, list(self.TABLES), importer, 1)
+        
+        assert [result.success for result in results] == [True, False, True]
+        assert results[1].error == "connection lost"
+        assert used[0] is importer and importer.connection is None
+        assert used[1] is not importer and used[2] is used[1]
+        # Le connessioni aperte dal pool vengono chiuse al termine
+        assert used[1].connection is None
+
+
+class TestPerfReport:
+    """Test per la scrittura del report delle prestazioni"""
+    
+    def test_failed_write_returns_none(self, tmp_path):
+        """Test path restituito solo se il report è stato scritto"""
+        logger = SyncLogger(str(tmp_path / 'logs'), 'app')
+        profiler = sync.Profiler()
+        
+        path = sync._write_perf_report(profiler, logger, {})
+        assert path is not None and json.loads(open(path).read())
+        
+        # Directory dei log non creabile: esiste un file con lo stesso nome
+        (tmp_path / 'blocked').write_text('')
+        logger.log_dir = str(tmp_path / 'blocked' / 'logs')
+        assert sync._write_perf_report(profiler, logger, {}) is None
+
+
+class FakeStreamingClient:
+    """ConvexClient dello streaming export con pagine in memoria"""
+    
+    def __init__(self, documents, snapshot=100, deltas=None):
+        self.documents = documents
+        self.snapshot = snapshot
+        # cursore -> (documenti modificati o eliminati, nuovo cursore)
+        self.deltas = deltas or {}
+        self.snapshot_timestamps = {}
+        self.delta_cursors = {}
+        self.snapshot_reads = []
+        self.delta_reads = []
+    
+    def iter_snapshot(self, table_name, batch_size=None):
+        self.snapshot_reads.append(table_name)
+        self.snapshot_timestamps[table_name] = self.snapshot
+        documents = list(self.documents[table_name])
+        if batch_size:
+            return (documents[start:start + batch_size] for start in range(0, len(documents), batch_size))
+        return (document for document in documents)
+    
+    def iter_document_deltas(self, table_name, cursor, batch_size=None):
+        self.delta_reads.append((table_name, cursor))
+        changes, new_cursor = self.deltas[cursor]
+        self.delta_cursors[table_name] = cursor
+        
+        def pages():
+            yield from changes
+            # Il nuovo cursore è disponibile solo dopo aver letto tutte le pagine
+            self.delta_cursors[table_name] = new_cursor
+        return pages()
+
+
+@pytest.fixture
+def make_streaming_context(make_context, tmp_path):
+    """SyncContext con lo streaming export (nessuno snapshot ZIP) e il client indicato"""
+    def make(client, full_reload=False):
+        context = make_context({name: [] for name in client.documents}, full_reload=full_reload)
+        return dataclasses.replace(
+            context,
+            convex_client=client,
+            zip_path=None,
+            manifest=SnapshotManifest(),
+            streaming_tables=set(client.documents),
+            cursors=DeltaCursorStore(str(tmp_path / 'state'), 'app')
+        )
+    return make
+
+
+class TestStreamingImport:
+    """Test per l'import con lo streaming export (_import_table_streaming)"""
+    
+    def test_snapshot_load_records_cursor(self, make_streaming_context, importer):
+        """Test primo caricamento da list_snapshot: il timestamp dello snapshot diventa il cursore"""
+        client = FakeStreamingClient({'users': USERS})
+        context = make_streaming_context(client)
+        
+        result = run_table(context, importer, 'users')
+        
+        assert result.success, result.error
+        assert client.snapshot_reads and not client.delta_reads
+        assert fetch(importer, 'users', ['_id', 'name']) == [('a', 'Anna'), ('b', 'Bruno')]
+        assert context.cursors.get('convex_data', 'users', 'users') == 100
+    
+    def test_deltas_are_applied_from_saved_cursor(self, make_streaming_context, importer):
+        """Test esecuzioni successive: modifiche ed eliminazioni dal cursore salvato, cursore ripreso"""
+        assert run_table(make_streaming_context(FakeStreamingClient({'users': USERS})), importer, 'users').success
+        
+        client = FakeStreamingClient({'users': USERS}, deltas={
+            100: ([
+                dict(USERS[0], name='Annalisa'),
+                {'_id': 'c', '_creationTime': 3000.0, 'name': 'Carla', 'age': 25},
+                {'_id': 'b', '_deleted': True},
+            ], 150),
+        })
+        result = run_table(make_streaming_context(client), importer, 'users')
+        
+        assert result.success, result.error
+        assert client.delta_reads == [('users', 100)] and not client.snapshot_reads
+        assert (result.rows_imported, result.rows_deleted) == (2, 1)
+        assert fetch(importer, 'users', ['_id', 'name']) == [('a', 'Annalisa'), ('c', 'Carla')]
+        
+        # Nuovo processo: il cursore viene ripreso dallo stato salvato
+        client = FakeStreamingClient({'users': USERS}, deltas={150: ([{'_id': 'a', '_deleted': True}], 180)})
+        context = make_streaming_context(client)
+        assert run_table(context, importer, 'users').success
+        
+        assert client.delta_reads == [('users', 150)]
+        assert fetch(importer, 'users', ['_id']) == [('c',)]
+        assert context.cursors.get('convex_data', 'users', 'users') == 180
+    
+    def test_full_reload_ignores_cursor(self, make_streaming_context, importer):
+        """Test --full-reload: tabella ricaricata da list_snapshot e nuovo cursore"""
+        assert run_table(make_streaming_context(FakeStreamingClient({'users': USERS})), importer, 'users').success
+        
+        client = FakeStreamingClient({'users': USERS[:1]}, snapshot=200)
+        context = make_streaming_context(client, full_reload=True)
+        assert run_table(context, importer, 'users').success
+        
+        assert client.snapshot_reads and not client.delta_reads
+        assert fetch(importer, 'users', ['_id']) == [('a',)]
+        assert context.cursors.get('convex_data', 'users', 'users') == 200
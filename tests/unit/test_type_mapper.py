@@ -3,7 +3,20 @@ Unit tests per Type Mapper
 """
 import pytest
 import json
-from src.sql import TypeMapper
+import base64
+import struct
+from datetime import datetime
+from src.sql import (
+    TypeMapper, ColumnSchema, SchemaValidator, SchemaMismatchError, SchemaBlockInference, decode_convex_value
+)
+
+
+def _encoded_integer(value):
+    return {'$integer': base64.b64encode(value.to_bytes(8, 'little', signed=True)).decode()}
+
+
+def _encoded_float(value):
+    return {'$float': base64.b64encode(struct.pack('<d', value)).decode()}
 
 
 class TestTypeMapper:
@@ -227,3 +240,325 @@ class TestTypeMapper:
         converted = mapper.convert_value(original, 'object')
         restored = json.loads(converted)
         assert restored == original
+
+
+class TestRowConverter:
+    """Test per il converter di riga compilato"""
+    
+    def _reference(self, mapper, row, columns):
+        """Percorso per cella (infer_convex_type + convert_value)"""
+        return tuple(
+            mapper.convert_value(row.get(col), mapper.infer_convex_type(row.get(col)))
+            for col in columns
+        )
+    
+    def test_infer_column_types_uses_first_non_null_value(self):
+        """Test inferenza tipi colonna dal primo valore non nullo"""
+        mapper = TypeMapper()
+        rows = [{'a': None, 'b': 'x'}, {'a': 3, 'b': None, 'c': [1]}]
+        schema = mapper.infer_column_types(rows, ['a', 'b', 'c', 'd'])
+        assert schema == {'a': 'number', 'b': 'string', 'c': 'array', 'd': 'null'}
+    
+    def test_converter_matches_per_cell_conversion(self):
+        """Test che il converter produca gli stessi valori del percorso per cella"""
+        mapper = TypeMapper()
+        columns = ['_id', 'n', 'i', 'flag', 'tags', 'meta', 'empty']
+        rows = [
+            {'_id': 'abc123def4567890', 'n': 1.5, 'i': 2, 'flag': True,
+             'tags': ['a'], 'meta': {'k': 1}, 'empty': None},
+            {'_id': 'other', 'n': None, 'i': 3.5, 'flag': False, 'tags': {'x': 1}},
+        ]
+        schema = mapper.infer_column_types(rows, columns)
+        convert_row = mapper.build_row_converter(columns, schema)
+        
+        for row in rows:
+            assert convert_row(row) == self._reference(mapper, row, columns)
+    
+    def test_converter_falls_back_on_unexpected_types(self):
+        """Test fallback generico quando il valore non ha il tipo atteso"""
+        mapper = TypeMapper()
+        columns = ['value']
+        convert_row = mapper.build_row_converter(columns, {'value': 'number'})
+        
+        for value in ['text', True, [1, 2], {'a': 1}, None, 7]:
+            row = {'value': value}
+            assert convert_row(row) == self._reference(mapper, row, columns)
+    
+    def test_converter_handles_unusual_column_names(self):
+        """Test colonne con caratteri speciali nel nome"""
+        mapper = TypeMapper()
+        columns = ["it's", 'a b', '_creationTime']
+        convert_row = mapper.build_row_converter(
+            columns, {"it's": 'string', 'a b': 'boolean', '_creationTime': 'number'}
+        )
+        assert convert_row({"it's": 'x', 'a b': True, '_creationTime': 1}) == ('x', True, 1.0)
+    
+    def test_converter_for_typed_columns(self):
+        """Test conversione verso colonne BIGINT e DATETIME2"""
+        mapper = TypeMapper()
+        convert_row = mapper.build_row_converter(
+            ['count', '_creationTime'], {'count': 'integer', '_creationTime': 'timestamp'}
+        )
+        
+        assert convert_row({'count': 3, '_creationTime': 1000.5}) == (
+            3, datetime(1970, 1, 1, 0, 0, 1, 500)
+        )
+        assert convert_row({'count': 4.0, '_creationTime': None}) == (4, None)
+        with pytest.raises(ValueError):
+            convert_row({'count': 4.5})
+
+
+class TestSchemaInference:
+    """Test per l'inferenza dello schema da tutte le righe"""
+    
+    def test_union_of_keys_in_first_seen_order(self):
+        """Test che le colonne assenti dalla prima riga non vengano perse"""
+        schema = TypeMapper().infer_schema([{'a': 1}, {'b': 'x', 'a': 2}, {'c': None}])
+        assert list(schema) == ['a', 'b', 'c']
+        assert schema['c'].convex_type == 'null'
+    
+    def test_narrowest_types(self):
+        """Test scelta del tipo più stretto per colonna"""
+        mapper = TypeMapper()
+        rows = [
+            {'_creationTime': 1.7e12, 'n': 1, 'f': 1, 'b': True, 's': 'abc', 'o': {'k': 1}},
+            {'_creationTime': 1.7e12 + 1, 'n': 2, 'f': 2.5, 'b': None, 's': 'x' * 20, 'o': None},
+        ]
+        sql_types = mapper.schema_to_sql(mapper.infer_schema(rows))
+        assert sql_types == {
+            '_creationTime': 'DATETIME2',
+            'n': 'BIGINT',
+            'f': 'FLOAT',
+            'b': 'BIT',
+            's': 'NVARCHAR(64)',
+            'o': 'NVARCHAR(MAX)',
+        }
+    
+    def test_integer_only_for_int_values(self):
+        """Test 'integer' solo per int e $integer: float interi e int fuori da BIGINT restano numeri"""
+        mapper = TypeMapper()
+        schema = mapper.infer_schema([
+            {'i': 2 ** 63 - 1, 'e': _encoded_integer(-2 ** 63), 'f': 3.0, 'big': 1, 'neg': -1},
+            {'i': -2 ** 63, 'f': 4.0, 'big': 2 ** 63, 'neg': -2 ** 63 - 1},
+        ])
+        assert mapper.schema_to_sql(schema) == {
+            'i': 'BIGINT', 'e': 'BIGINT', 'f': 'FLOAT', 'big': 'FLOAT', 'neg': 'FLOAT'
+        }
+    
+    def test_mixed_types_become_unbounded_text(self):
+        """Test colonne con valori di tipo diverso"""
+        mapper = TypeMapper()
+        schema = mapper.infer_schema([{'v': 1}, {'v': 'a'}, {'w': 'a'}, {'w': [1]}])
+        assert schema['v'].convex_type == 'string'
+        assert mapper.map_column_to_sql(schema['v']) == 'NVARCHAR(MAX)'
+        assert mapper.map_column_to_sql(schema['w']) == 'NVARCHAR(MAX)'
+    
+    def test_string_length_in_utf16_units(self):
+        """Test lunghezza stringhe in unità UTF-16 e limite di NVARCHAR(n)"""
+        mapper = TypeMapper()
+        schema = mapper.infer_schema([{'s': '😀' * 10}, {'long': 'x' * 5000}])
+        assert schema['s'].max_length == 20
+        assert mapper.map_column_to_sql(schema['s']) == 'NVARCHAR(64)'
+        assert mapper.map_column_to_sql(schema['long']) == 'NVARCHAR(MAX)'
+    
+    def test_widen_sql_type(self):
+        """Test allargamento dei tipi delle colonne esistenti"""
+        mapper = TypeMapper()
+        assert mapper.widen_sql_type('bigint', None, ColumnSchema('number')) == 'FLOAT'
+        assert mapper.widen_sql_type('float', None, ColumnSchema('integer')) is None
+        assert mapper.widen_sql_type('bit', None, ColumnSchema('integer')) == 'NVARCHAR(MAX)'
+        assert mapper.widen_sql_type('nvarchar', 16, ColumnSchema('string', 100)) == 'NVARCHAR(256)'
+        assert mapper.widen_sql_type('nvarchar', 16, ColumnSchema('string', 10)) is None
+        assert mapper.widen_sql_type('nvarchar', 16, ColumnSchema('number')) == 'NVARCHAR(MAX)'
+        assert mapper.widen_sql_type('nvarchar', -1, ColumnSchema('object', -1)) is None
+        assert mapper.widen_sql_type('datetime2', None, ColumnSchema('null')) is None
+    
+    def test_sampled_schema_is_conservative(self):
+        """Test tipi di uno schema inferito da un campione"""
+        mapper = TypeMapper()
+        schema = mapper.infer_schema([{'n': 1, 's': 'abc', '_creationTime': 1.7e12}])
+        assert mapper.schema_to_sql(schema, exact=False) == {
+            'n': 'FLOAT', 's': 'NVARCHAR(MAX)', '_creationTime': 'DATETIME2'
+        }
+    
+    def test_merged_blocks_match_single_pass(self):
+        """Test schema inferito a blocchi e unito uguale a quello di una sola passata"""
+        mapper = TypeMapper()
+        rows = [
+            {'_creationTime': 5.0, 'n': 1, 's': 'ab', 'm': None},
+            {'n': 2.5, 's': 'abcdef', 'm': [1], 'x': 'a'},
+            {'_creationTime': 7, 'n': 3, 's': None, 'm': 'text', 'x': 1},
+            {'s': 'x' * 300, 'm': None, 'y': True},
+            {'n': None, 'y': False, 'x': 'b'},
+        ]
+        expected = mapper.infer_schema(rows)
+        
+        for cut in range(len(rows) + 1):
+            inference = SchemaBlockInference(mapper)
+            head, tail = inference(rows[:cut]), inference(rows[cut:])
+            schema = {}
+            mapper.merge_schema(schema, head.schema)
+            mapper.merge_schema(schema, tail.schema)
+            assert schema == expected
+            assert list(schema) == list(expected)
+            assert head.rows + tail.rows == len(rows)
+        
+        assert SchemaBlockInference(mapper)(rows).max_creation_time == 7
+
+
+class TestSchemaValidator:
+    """Test per la verifica dei documenti rispetto a uno schema in cache"""
+    
+    SCHEMA = {
+        '_id': ColumnSchema('string', 4),
+        '_creationTime': ColumnSchema('timestamp'),
+        'age': ColumnSchema('integer'),
+        'name': ColumnSchema('string', 10),
+    }
+    
+    def _validator(self, min_creation_time=100.0):
+        return SchemaValidator(TypeMapper(), self.SCHEMA, min_creation_time)
+    
+    def test_compatible_documents_pass(self):
+        """Test documenti compatibili e aggiornamento della lunghezza massima"""
+        validator = self._validator()
+        rows = [
+            {'_id': 'a', '_creationTime': 200.0, 'age': 3, 'name': None},
+            {'_id': 'b', '_creationTime': 300.0, 'name': 'x' * 14},
+        ]
+        
+        assert list(validator.wrap(rows)) == rows
+        assert validator.mismatch is None
+        assert validator.schema['name'].max_length == 14
+        assert validator.max_creation_time == 300.0
+        assert self.SCHEMA['name'].max_length == 10
+    
+    def test_only_new_documents_are_validated(self):
+        """Test che i documenti già verificati non vengano controllati"""
+        validator = self._validator()
+        rows = [{'_id': 'old', '_creationTime': 50.0, 'extra': 1}]
+        
+        assert list(validator.wrap(rows)) == rows
+        assert validator.validated_rows == 0
+    
+    def test_unknown_key_raises(self):
+        """Test documento nuovo con una chiave sconosciuta"""
+        validator = self._validator()
+        
+        with pytest.raises(SchemaMismatchError):
+            list(validator.wrap([{'_id': 'a', '_creationTime': 200.0, 'email': 'x'}]))
+        assert validator.mismatch == 'unknown column email'
+    
+    def test_incompatible_type_raises(self):
+        """Test valori che cambierebbero il tipo SQL della colonna"""
+        for row in [{'age': 1.5}, {'age': 'x'}, {'name': 'x' * 100}, {'age': 2 ** 63}]:
+            validator = self._validator(min_creation_time=None)
+            with pytest.raises(SchemaMismatchError):
+                validator.check_row(row)
+    
+    def test_block_converter_matches_wrap(self):
+        """Test blocchi verificati e convertiti: stesse righe, schema e _creationTime di wrap"""
+        rows = [
+            {'_id': 'a', '_creationTime': 200.0, 'age': 3, 'name': 'x' * 12},
+            {'_id': 'b', '_creationTime': 50.0, 'age': None, 'name': 'y'},
+            {'_id': 'c', '_creationTime': 300.0, 'name': 'z' * 14},
+        ]
+        columns = list(self.SCHEMA)
+        types = {'_id': 'string', '_creationTime': 'timestamp', 'age': 'integer', 'name': 'string'}
+        expected = self._validator()
+        convert_row = TypeMapper().build_row_converter(columns, types)
+        expected_rows = [convert_row(row) for row in expected.wrap(rows)]
+        
+        validator = self._validator()
+        converter = validator.block_converter(columns, types)
+        values = list(validator.wrap_blocks([converter(rows[:1]), converter(rows[1:])]))
+        
+        assert values == expected_rows
+        assert validator.schema == expected.schema
+        assert validator.max_creation_time == expected.max_creation_time == 300.0
+        assert validator.validated_rows == expected.validated_rows == 2
+    
+    def test_block_mismatch_raises_in_wrap_blocks(self):
+        """Test documento non compatibile in un blocco: SchemaMismatchError all'unione"""
+        validator = self._validator()
+        converter = validator.block_converter(list(self.SCHEMA), {})
+        block = converter([{'_id': 'a', '_creationTime': 200.0, 'email': 'x'}])
+        
+        assert block.rows == []
+        with pytest.raises(SchemaMismatchError):
+            list(validator.wrap_blocks([block]))
+        assert validator.mismatch == 'unknown column email'
+
+
+class TestConvexEncodedValues:
+    """Test per i valori Convex codificati ($integer, $bytes, $float)"""
+    
+    def test_decode_integer(self):
+        """Test decodifica di un Int64 little-endian"""
+        assert decode_convex_value(_encoded_integer(2 ** 62 + 1)) == 2 ** 62 + 1
+        assert decode_convex_value(_encoded_integer(-5)) == -5
+    
+    def test_decode_bytes(self):
+        """Test decodifica di un ArrayBuffer"""
+        assert decode_convex_value({'$bytes': base64.b64encode(b'\x00\xff').decode()}) == b'\x00\xff'
+    
+    def test_decode_special_floats(self):
+        """Test che NaN e infiniti diventino NULL e -0 resti un float"""
+        assert decode_convex_value(_encoded_float(float('nan'))) is None
+        assert decode_convex_value(_encoded_float(float('-inf'))) is None
+        assert str(decode_convex_value(_encoded_float(-0.0))) == '-0.0'
+    
+    def test_plain_values_are_unchanged(self):
+        """Test che valori e oggetti normali non vengano decodificati"""
+        for value in ['x', 1, {'a': 1}, {'$integer': 'AA==', 'b': 1}]:
+            assert decode_convex_value(value) == value
+    
+    def test_invalid_encoding_raises(self):
+        """Test valore codificato non valido"""
+        with pytest.raises(ValueError):
+            decode_convex_value({'$integer': 'AA=='})
+    
+    def test_inference_and_sql_types(self):
+        """Test inferenza dei tipi dei valori codificati"""
+        mapper = TypeMapper()
+        rows = [{
+            'big': _encoded_integer(1),
+            'blob': {'$bytes': 'AA=='},
+            'ratio': _encoded_float(float('inf')),
+        }, {'ratio': 0.5}]
+        
+        assert mapper.infer_convex_type(rows[0]['blob']) == 'bytes'
+        assert mapper.schema_to_sql(mapper.infer_schema(rows)) == {
+            'big': 'BIGINT', 'blob': 'VARBINARY(MAX)', 'ratio': 'FLOAT'
+        }
+    
+    def test_row_converter_decodes_values(self):
+        """Test conversione dei valori codificati nelle colonne tipizzate"""
+        mapper = TypeMapper()
+        converter = mapper.build_row_converter(
+            ['big', 'blob', 'ratio'],
+            {'big': 'integer', 'blob': 'bytes', 'ratio': 'number'}
+        )
+        row = {
+            'big': _encoded_integer(2 ** 40),
+            'blob': {'$bytes': 'AQI='},
+            'ratio': _encoded_float(float('nan')),
+        }
+        
+        assert converter(row) == (2 ** 40, b'\x01\x02', None)
+        assert converter({'big': 3, 'blob': None, 'ratio': 1.5}) == (3, None, 1.5)
+    
+    def test_row_converter_keeps_encoded_values_as_text(self):
+        """Test colonna testuale con $bytes e stringhe: valore codificato serializzato in JSON"""
+        mapper = TypeMapper()
+        converter = mapper.build_row_converter(['data'], {'data': 'string'})
+        
+        assert converter({'data': 'plain'}) == ('plain',)
+        assert converter({'data': {'$bytes': 'AQI='}}) == ('{"$bytes": "AQI="}',)
+        assert mapper.convert_value({'$bytes': 'AQI='}, 'string') == '{"$bytes": "AQI="}'
+    
+    def test_validator_accepts_encoded_values(self):
+        """Test che la verifica dello schema in cache riconosca i valori codificati"""
+        validator = SchemaValidator(TypeMapper(), {'big': ColumnSchema('integer')}, None)
+        validator.check_row({'big': _encoded_integer(7)})
+        assert validator.mismatch is None
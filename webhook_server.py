@@ -25,6 +25,10 @@ from rate_limiter import init_rate_limiter, rate_limit_decorator, get_rate_limit
 # Import audit logger
 from audit_logger import init_audit_logger, get_audit_logger
 
+# Import Convex client and snapshot cache
+from src.convex import ConvexClient, ConvexError
+from src.state import SnapshotCache
+
 # Load environment variables
 load_dotenv()
 
@@ -50,6 +54,15 @@ PORT = int(os.getenv('PORT', 5000))
 RATE_LIMIT_REQUESTS_PER_MINUTE = int(os.getenv('RATE_LIMIT_REQUESTS_PER_MINUTE', 60))
 RATE_LIMIT_BURST_SIZE = int(os.getenv('RATE_LIMIT_BURST_SIZE', 10))
 
+# Snapshot cache shared with sync.py (disabled when SNAPSHOT_CACHE_DIR is not set)
+SNAPSHOT_CACHE_DIR = os.getenv('SNAPSHOT_CACHE_DIR', '')
+SNAPSHOT_CACHE_MAX_BYTES = int(os.getenv('SNAPSHOT_CACHE_MAX_BYTES', 10 * 1024 * 1024 * 1024))
+SNAPSHOT_CACHE_MAX_AGE = int(os.getenv('SNAPSHOT_CACHE_MAX_AGE', 0))
+snapshot_cache = (
+    SnapshotCache(SNAPSHOT_CACHE_DIR, SNAPSHOT_CACHE_MAX_BYTES, max_age=SNAPSHOT_CACHE_MAX_AGE)
+    if SNAPSHOT_CACHE_DIR else None
+)
+
 # Track running syncs to prevent concurrent execution
 running_syncs = {}
 running_syncs_lock = threading.Lock()
@@ -509,71 +522,31 @@ def fetch_tables():
         if not deploy_key:
             return jsonify({'error': 'deploy_key is required'}), 400
         
-        # Create a temporary config to fetch tables
-        temp_app_name = f"temp_{int(time.time())}"
-        
-        # Run convex-helpers list-tables command or use snapshot export
-        # For now, we'll use the snapshot export and parse the JSON
-        import tempfile
-        import zipfile
+        # Download the snapshot (reused from the snapshot cache when configured)
+        # and read the table names from the zip central directory
+        convex_client = ConvexClient(deploy_key, cache=snapshot_cache)
+        try:
+            snapshot_path = convex_client.download_backup()
+        except ConvexError as e:
+            return jsonify({
+                'error': 'Failed to fetch tables from Convex',
+                'details': str(e)
+            }), 500
         
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Download snapshot
-            snapshot_path = os.path.join(temp_dir, 'snapshot.zip')
-            
-            # Use convex CLI to export snapshot
-            # Set deploy key as environment variable (CONVEX_DEPLOY_KEY)
-            # This allows the CLI to run non-interactively
-            # Note: When CONVEX_DEPLOY_KEY is set, we don't need --deployment-name
-            env = os.environ.copy()
-            env['CONVEX_DEPLOY_KEY'] = deploy_key
-            
-            cmd = [
-                r'C:\Program Files\nodejs\npx.cmd',
-                'convex',
-                'export',
-                '--path', snapshot_path
-            ]
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                timeout=60,
-                env=env,
-                cwd=os.path.dirname(os.path.abspath(__file__))
+        try:
+            # Skip system tables (starting with _)
+            tables = sorted(
+                table_name for table_name in convex_client.list_tables(snapshot_path)
+                if not table_name.startswith('_')
             )
-            
-            if result.returncode != 0:
-                return jsonify({
-                    'error': 'Failed to fetch tables from Convex',
-                    'details': result.stderr
-                }), 500
-            
-            # Extract and parse snapshot
-            tables = []
-            if os.path.exists(snapshot_path):
-                with zipfile.ZipFile(snapshot_path, 'r') as zip_ref:
-                    # Extract table names from directory structure
-                    # Format: table_name/documents.jsonl
-                    for file_name in zip_ref.namelist():
-                        # Check if this is a documents.jsonl file in a table directory
-                        if file_name.endswith('/documents.jsonl'):
-                            # Extract table name from path (everything before /documents.jsonl)
-                            table_name = file_name.replace('/documents.jsonl', '')
-                            
-                            # Skip system tables (starting with _)
-                            if not table_name.startswith('_'):
-                                tables.append(table_name)
-            
-            tables.sort()
-            
-            return jsonify({
-                'success': True,
-                'tables': tables
-            }), 200
+        finally:
+            if not (snapshot_cache and snapshot_cache.contains(snapshot_path)):
+                os.remove(snapshot_path)
+        
+        return jsonify({
+            'success': True,
+            'tables': tables
+        }), 200
             
     except subprocess.TimeoutExpired:
         return jsonify({'error': 'Request timeout while fetching tables'}), 504